@@ -1,5 +1,5 @@
 from typing import Annotated
-from langchain_ollama.chat_models import ChatOllama
+from langchain_core.runnables import RunnableConfig
 
 from typing_extensions import TypedDict
 
@@ -8,6 +8,13 @@ from langgraph.graph.message import add_messages
 
 from langgraph.graph import END, START
 
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "module"))
+from graph_tracing import trace_graph
+from prefix_cache_chat import PrefixCacheChat
+
 
 class CustomState(TypedDict):
     messages: Annotated[list, add_messages]
@@ -16,14 +23,17 @@ class CustomState(TypedDict):
 graph_builder = StateGraph(CustomState)
 
 
-llm = ChatOllama(
-    model="gemma3:4b",
-    temperature=0.0,
-)
+# 스레드(thread_id)마다 같은 서버에 고정하고 메시지 접두사를 유지하여 이전 턴의 프리필(KV 캐시)을 재사용
+prefix_chat = PrefixCacheChat()
 
 
-def chatbot(state: CustomState):
-    return {"messages": [llm.invoke(state["messages"])]}
+def chatbot(state: CustomState, config: RunnableConfig):
+    session_id = str(config.get("configurable", {}).get("thread_id", "default"))
+    llm = prefix_chat.create_llm(session_id, "gemma3:4b", temperature=0.0)
+    messages = prefix_chat.arrange(state["messages"])
+    response = llm.invoke(messages)
+    prefix_chat.record(session_id, messages, response.response_metadata, str(response.content))
+    return {"messages": [response]}
 
 
 # The first argument is the unique node name
@@ -36,10 +46,14 @@ graph_builder.add_edge("chatbot", END)
 
 graph = graph_builder.compile()
 
+# 노드별 실행 시간을 기록 (환경 변수 GRAPH_TRACE_FILE에 JSONL로 저장)
+graph = trace_graph(graph, name="gemma3_4b_it")
+
 
 if __name__ == "__main__":
     graph.invoke({"messages": [{"role": "user", "content": "안녕?"}]})
     print(graph.invoke({"messages": [{"role": "user", "content": "안녕?"}]})["messages"][-1].content)
+    print(prefix_chat.stats())
 
 
 
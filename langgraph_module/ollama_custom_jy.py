@@ -8,7 +8,11 @@ from typing import (
 from pydantic import BaseModel, Field
 from typing_extensions import TypedDict
 
-from langchain_ollama.chat_models import ChatOllama
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "module"))
+from ollama_scheduler import create_scheduled_chat_model
 
 
 class OllamaCustomJY():
@@ -19,21 +23,30 @@ class OllamaCustomJY():
             "llama3.2:3b", 
             "llama3.1"], 
         temperature: float, 
-        max_tokens: int
+        max_tokens: int,
+        priority: Literal["interactive", "agent", "batch"] = "agent"
     ) -> None:
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.priority = priority
+        # 마지막 호출의 Ollama 계측 값 (토큰 수, 처리 속도, 로드 시간, 콜드 로드 여부)
+        self.last_telemetry = None
 
-        self.llm = ChatOllama(
-            model=self.model_name,
+        # 에이전트 호출은 공용 스케줄러의 agent 우선순위로 실행 (대화 응답보다 뒤, 인제스트보다 앞)
+        self.llm = create_scheduled_chat_model(
+            self.model_name,
+            priority=self.priority,
             temperature=self.temperature,
             max_tokens=self.max_tokens
         )
 
     
     def invoke(self, messages):
-        return self.llm.invoke(messages)
+        # 계측 값은 스케줄러 래퍼가 공용 기록기(ollama_telemetry.py)에 기록하고 응답 메타데이터에 붙임
+        response = self.llm.invoke(messages)
+        self.last_telemetry = response.response_metadata.get("telemetry")
+        return response
 
     def bind_tools(self, tools):
         self.tools = tools
@@ -1,7 +1,6 @@
 
 import global_variables as gv
 from vector_store_setting import VectorStoreSetting
-from langchain_community.vectorstores.sklearn import SKLearnVectorStoreException
 
 config_setting = {
     "absolute_path": gv.absolute_path,
@@ -16,6 +15,9 @@ config_setting = {
 import logging
 
 def main():
+    # 예외 클래스는 scikit-learn 관련 모듈을 불러오므로 실제 실행 시점에 임포트
+    from langchain_community.vectorstores.sklearn import SKLearnVectorStoreException
+
     # VectorStoreSetting 클래스 인스턴스 생성
     vector_store_setting = VectorStoreSetting(
         **config_setting
@@ -0,0 +1,184 @@
+"""
+비동기 검색 모듈
+
+asyncio 기반 호출자(비동기 LangGraph 노드, 비동기 웹 서버 등)가 이벤트 루프를 막지 않고 검색할 수 있도록
+- 질의 임베딩은 임베딩 모델의 비동기 API(aembed_query)로 기다리고
+- CPU를 쓰는 최근접 이웃 검색은 공용 스레드 풀에서 실행하며
+- 전체 검색에 타임아웃과 취소를 적용합니다.
+
+여러 검색이 하나의 이벤트 루프를 공유해도 스레드 풀 크기만큼만 동시에 CPU를 사용하므로
+다른 코루틴(임베딩 응답 대기 등)이 굶지 않습니다.
+
+사용 예:
+    docs = await asimilarity_search(vectorstore, "보험금 청구 절차", k=3, timeout=5.0)
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 검색 전용 스레드 풀 크기 (기본 실행기와 분리하여 다른 블로킹 작업과 경쟁하지 않도록 함)
+DEFAULT_SEARCH_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """
+    검색용 공용 스레드 풀을 반환합니다. (처음 호출 시 생성)
+
+    Returns:
+        ThreadPoolExecutor: 검색용 스레드 풀
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = int(os.environ.get("RAG_SEARCH_WORKERS", DEFAULT_SEARCH_WORKERS))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-search")
+    return _executor
+
+
+def shutdown_search_executor() -> None:
+    """공용 스레드 풀을 종료합니다. (실행 중인 검색은 끝날 때까지 기다림)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def run_in_search_executor(func, *args, **kwargs) -> Any:
+    """
+    블로킹 함수를 검색용 스레드 풀에서 실행하고 결과를 기다립니다.
+
+    기다리는 코루틴이 취소되면 결과는 버려지며, 아직 시작하지 않은 작업은 실행되지 않습니다.
+
+    Args:
+        func (Callable): 실행할 함수
+        *args, **kwargs: 함수 인자
+
+    Returns:
+        Any: 함수 반환값
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_search_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def aembed_query(embeddings, text: str) -> List[float]:
+    """
+    질의 임베딩을 비동기로 계산합니다.
+
+    임베딩 모델이 비동기 API를 제공하면 그대로 기다리고, 없으면 스레드 풀에서 동기 API를 실행합니다.
+
+    Args:
+        embeddings (Embeddings): 임베딩 모델
+        text (str): 질의 텍스트
+
+    Returns:
+        List[float]: 질의 임베딩 벡터
+    """
+    aembed = getattr(embeddings, "aembed_query", None)
+    if aembed is not None:
+        return await aembed(text)
+    return await run_in_search_executor(embeddings.embed_query, text)
+
+
+def similarity_search_by_vector(vectorstore, embedding: List[float], k: int = 4) -> List[Any]:
+    """
+    질의 벡터로 유사도 검색을 수행합니다. (동기, 스레드 풀에서 실행)
+
+    FAISS처럼 similarity_search_by_vector를 제공하는 저장소는 그대로 사용하고,
+    SKLearnVectorStore는 내부 최근접 이웃 검색 결과로 similarity_search와 같은 형태의 문서를 만듭니다.
+
+    Args:
+        vectorstore (VectorStore): 벡터 저장소
+        embedding (List[float]): 질의 임베딩 벡터
+        k (int): 반환할 문서 수
+
+    Returns:
+        List[Document]: 검색된 문서 리스트
+    """
+    search_by_vector = getattr(vectorstore, "similarity_search_by_vector", None)
+    if search_by_vector is not None:
+        try:
+            return search_by_vector(embedding, k=k)
+        except NotImplementedError:
+            pass
+
+    if hasattr(vectorstore, "_similarity_index_search_with_score"):
+        from langchain_core.documents import Document
+
+        indices_dists = vectorstore._similarity_index_search_with_score(embedding, k=k)
+        return [
+            Document(page_content=vectorstore._texts[idx], metadata={"id": vectorstore._ids[idx], **vectorstore._metadatas[idx]})
+            for idx, _ in indices_dists
+        ]
+    raise TypeError(f"벡터로 검색할 수 없는 저장소입니다: {type(vectorstore).__name__}")
+
+
+async def asimilarity_search(vectorstore, query: str, k: int = 4, timeout: Optional[float] = None) -> List[Any]:
+    """
+    비동기 유사도 검색
+
+    Args:
+        vectorstore (VectorStore): 벡터 저장소
+        query (str): 검색 질의
+        k (int): 반환할 문서 수
+        timeout (float): 임베딩과 검색을 합친 제한 시간(초), None이면 제한 없음
+
+    Returns:
+        List[Document]: 검색된 문서 리스트
+
+    Raises:
+        asyncio.TimeoutError: 제한 시간 안에 검색이 끝나지 않은 경우 발생
+    """
+    async def _search():
+        embedding = await aembed_query(vectorstore.embeddings, query)
+        return await run_in_search_executor(similarity_search_by_vector, vectorstore, embedding, k)
+
+    try:
+        return await asyncio.wait_for(_search(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"검색 제한 시간({timeout}초)을 초과했습니다: {query[:50]}")
+        raise
+
+
+@functools.lru_cache(maxsize=None)
+def _async_retriever_class():
+    from langchain_core.vectorstores import VectorStoreRetriever
+
+    class AsyncVectorStoreRetriever(VectorStoreRetriever):
+        """ainvoke 시 질의 임베딩을 비동기로 기다리고 검색은 공용 스레드 풀에서 실행하는 검색기"""
+
+        timeout: Optional[float] = None
+
+        async def _aget_relevant_documents(self, query: str, *, run_manager, **kwargs):
+            kwargs_ = {**self.search_kwargs, **kwargs}
+            if self.search_type != "similarity":
+                return await super()._aget_relevant_documents(query, run_manager=run_manager, **kwargs)
+            return await asimilarity_search(self.vectorstore, query, k=kwargs_.get("k", 4), timeout=self.timeout)
+
+    return AsyncVectorStoreRetriever
+
+
+def create_async_retriever(vectorstore, k: int = 4, timeout: Optional[float] = None):
+    """
+    동기 호출(invoke)은 기존 검색기와 같고, 비동기 호출(ainvoke)만 네이티브 비동기로 동작하는 검색기를 생성합니다.
+
+    Args:
+        vectorstore (VectorStore): 벡터 저장소
+        k (int): 반환할 문서 수
+        timeout (float): 비동기 검색 제한 시간(초)
+
+    Returns:
+        VectorStoreRetriever: 생성된 검색기
+    """
+    return _async_retriever_class()(vectorstore=vectorstore, search_kwargs={"k": k}, timeout=timeout)
@@ -0,0 +1,495 @@
+"""
+함수 결과 캐시 모듈
+
+임베딩, 검색, 프롬프트 구성처럼 비싼 호출 앞에 둘 수 있는 메모이제이션 데코레이터입니다.
+(practice/decorator.py의 memoize는 크기 제한이 없고, 위치 인자만 키로 쓰며, 스레드 안전하지 않고, 코루틴을 지원하지 않음)
+
+- 크기 제한(LRU)과 만료 시간(TTL)
+- 키: 함수 시그니처로 인자를 정규화하므로 f(1, b=2)와 f(1, 2)가 같은 키, 리스트/딕셔너리 인자도 사용 가능
+- 스레드 안전: 키 해시로 나눈 구역(stripe)마다 락을 따로 두어 여러 스레드가 동시에 조회해도 한 락에 몰리지 않음
+- 단일 실행(single-flight): 같은 키의 호출이 동시에 들어오면 한 번만 실행하고 나머지는 그 결과를 기다림
+- 비동기 함수(async def) 지원
+- 적중/실패/축출 통계
+- 선택적 디스크 계층(sqlite): 메모리에서 밀려나거나 프로세스를 다시 시작해도 디스크에서 읽음
+  (값은 pickle로 저장하므로 신뢰할 수 있는 로컬 경로에만 사용)
+
+사용 예:
+    @memoize(maxsize=1024, ttl=600)
+    def embed(text: str) -> List[float]:
+        ...
+
+    @memoize(maxsize=256, disk_path="cache/answers.sqlite")
+    async def aformat_prompt(question: str, docs: List[str]) -> str:
+        ...
+
+    print(embed.cache_stats())
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 캐시에 없음을 나타내는 값 (None도 캐시할 수 있도록 별도 객체 사용)
+_MISSING = object()
+
+STAT_KEYS = ("hits", "misses", "evictions", "expirations", "coalesced", "disk_hits")
+
+
+def _freeze(value: Any) -> Hashable:
+    # 해시할 수 없는 인자(리스트, 딕셔너리, 집합)를 같은 내용이면 같은 키가 되도록 변환
+    # (타입 이름을 붙여 리스트와 튜플, 딕셔너리와 (키, 값) 쌍 리스트가 같은 키가 되지 않게 함)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        pass
+    if isinstance(value, (list, tuple)):
+        return (type(value).__qualname__, tuple(_freeze(v) for v in value))
+    if isinstance(value, dict):
+        return (type(value).__qualname__, tuple(sorted(((_freeze(k), _freeze(v)) for k, v in value.items()), key=repr)))
+    if isinstance(value, (set, frozenset)):
+        return (type(value).__qualname__, frozenset(_freeze(v) for v in value))
+    # 그 밖의 객체는 repr로 구분 (repr이 내용을 나타내지 않는 객체는 객체마다 다른 키가 됨)
+    return (type(value).__qualname__, repr(value))
+
+
+class DiskCache:
+    """
+    sqlite 파일에 값을 저장하는 캐시 계층
+
+    Args:
+        path (str): sqlite 파일 경로
+        ttl (float): 만료 시간(초) (None이면 만료 없음)
+        max_entries (int): 최대 항목 수, 넘으면 오래 저장된 항목부터 삭제
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 100_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL, stored_at REAL)")
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Any:
+        """값을 읽습니다. (없거나 만료되었거나 읽을 수 없으면 _MISSING)"""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return _MISSING
+                if row[1] is not None and row[1] <= time.time():
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    return _MISSING
+            return pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logger.warning(f"디스크 캐시 읽기 실패 ({self.path}): {e}")
+            return _MISSING
+
+    def set(self, key: str, value: Any) -> None:
+        """값을 저장합니다. (pickle할 수 없는 값은 저장하지 않음)"""
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"디스크 캐시에 저장할 수 없는 값: {e}")
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)",
+                    (key, blob, now + self.ttl if self.ttl else None, now),
+                )
+                self._writes += 1
+                if self._writes % 256 == 0:
+                    self._prune(now)
+        except sqlite3.Error as e:
+            logger.warning(f"디스크 캐시 쓰기 실패 ({self.path}): {e}")
+
+    def _prune(self, now: float) -> None:
+        # self._lock 안에서 호출, 만료된 항목과 최대 항목 수를 넘는 오래된 항목 삭제
+        self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at LIMIT ?)", (excess,))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _Stripe:
+    # 캐시의 한 구역: 자기 락 안에서만 읽고 씀
+    __slots__ = ("lock", "data", "inflight", "ainflight") + STAT_KEYS
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.inflight: Dict[Hashable, Future] = {}
+        self.ainflight: Dict[tuple, asyncio.Future] = {}
+        for key in STAT_KEYS:
+            setattr(self, key, 0)
+
+
+class LRUCache:
+    """
+    크기 제한(LRU)과 만료 시간(TTL)이 있는 스레드 안전 캐시
+
+    키 해시로 stripes개 구역으로 나누고 구역마다 락과 LRU 순서를 따로 둡니다.
+    (크기 제한도 구역별로 maxsize / stripes씩 적용되므로 축출 순서는 전체 LRU의 근사)
+
+    Args:
+        maxsize (int): 최대 항목 수 (None이면 제한 없음)
+        ttl (float): 만료 시간(초) (None이면 만료 없음)
+        stripes (int): 락 구역 수
+        disk (DiskCache): 디스크 계층 (None이면 메모리만 사용)
+        namespace (str): 디스크 계층을 여러 함수가 함께 쓸 때 키를 구분하는 이름
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = 1024,
+        ttl: Optional[float] = None,
+        stripes: int = 8,
+        disk: Optional[DiskCache] = None,
+        namespace: str = "",
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.disk = disk
+        self.namespace = namespace
+        stripes = max(1, min(stripes, maxsize)) if maxsize else max(1, stripes)
+        self._per_stripe = -(-maxsize // stripes) if maxsize else None
+        self._stripes = [_Stripe() for _ in range(stripes)]
+
+    def _stripe(self, key: Hashable) -> _Stripe:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def _disk_key(self, key: Hashable) -> Optional[str]:
+        try:
+            return hashlib.sha256(pickle.dumps((self.namespace, key), protocol=4)).hexdigest()
+        except Exception:
+            return None
+
+    def _peek(self, stripe: _Stripe, key: Hashable) -> Any:
+        # stripe.lock 안에서 호출, 메모리 계층만 조회
+        entry = stripe.data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del stripe.data[key]
+            stripe.expirations += 1
+            return _MISSING
+        stripe.data.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        값을 조회합니다. (메모리 -> 디스크 순서, 디스크에서 읽은 값은 메모리에도 넣음)
+
+        Args:
+            key: 캐시 키
+            default: 없을 때 돌려줄 값
+
+        Returns:
+            캐시된 값 또는 default
+        """
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def _lookup(self, key: Hashable, count_miss: bool = True) -> Any:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            value = self._peek(stripe, key)
+            if value is not _MISSING:
+                stripe.hits += 1
+                return value
+        if self.disk is not None:
+            disk_key = self._disk_key(key)
+            value = self.disk.get(disk_key) if disk_key else _MISSING
+            if value is not _MISSING:
+                self._store(key, value)
+                with stripe.lock:
+                    stripe.hits += 1
+                    stripe.disk_hits += 1
+                return value
+        if count_miss:
+            with stripe.lock:
+                stripe.misses += 1
+        return _MISSING
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        stripe = self._stripe(key)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with stripe.lock:
+            stripe.data[key] = (value, expires_at)
+            stripe.data.move_to_end(key)
+            while self._per_stripe and len(stripe.data) > self._per_stripe:
+                stripe.data.popitem(last=False)
+                stripe.evictions += 1
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """값을 저장합니다. (디스크 계층이 있으면 디스크에도 저장)"""
+        self._store(key, value)
+        if self.disk is not None:
+            disk_key = self._disk_key(key)
+            if disk_key:
+                self.disk.set(disk_key, value)
+
+    def delete(self, key: Hashable) -> None:
+        """값을 지웁니다."""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            stripe.data.pop(key, None)
+        if self.disk is not None:
+            disk_key = self._disk_key(key)
+            if disk_key:
+                self.disk.delete(disk_key)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        캐시된 값을 돌려주고, 없으면 compute()로 계산하여 저장합니다.
+
+        같은 키를 다른 스레드가 계산 중이면 새로 계산하지 않고 그 결과를 기다립니다. (예외도 함께 전달, 예외는 캐시하지 않음)
+
+        Args:
+            key: 캐시 키
+            compute (Callable): 값을 계산하는 함수
+
+        Returns:
+            캐시된 값 또는 계산한 값
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        stripe = self._stripe(key)
+        with stripe.lock:
+            future = stripe.inflight.get(key)
+            owner = future is None
+            if owner:
+                # 조회 직후 다른 스레드가 계산을 끝냈을 수 있음
+                value = self._peek(stripe, key)
+                if value is not _MISSING:
+                    return value
+                future = stripe.inflight[key] = Future()
+            else:
+                stripe.coalesced += 1
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            # 계산 중 표시를 지우기 전에 저장해야 새로 들어온 호출이 다시 계산하지 않음
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with stripe.lock:
+                stripe.inflight.pop(key, None)
+
+    async def aget_or_compute(self, key: Hashable, acompute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        get_or_compute의 비동기 버전 (같은 이벤트 루프 안의 동시 호출을 하나로 합침)
+
+        Args:
+            key: 캐시 키
+            acompute (Callable): 값을 계산하는 코루틴을 돌려주는 함수
+
+        Returns:
+            캐시된 값 또는 계산한 값
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        stripe = self._stripe(key)
+        with stripe.lock:
+            future = stripe.ainflight.get(loop_key)
+            owner = future is None
+            if owner:
+                value = self._peek(stripe, key)
+                if value is not _MISSING:
+                    return value
+                future = stripe.ainflight[loop_key] = loop.create_future()
+            else:
+                stripe.coalesced += 1
+        if not owner:
+            try:
+                # 기다리던 쪽이 취소되어도 계산 중인 작업은 취소하지 않음
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    # 계산하던 쪽이 취소되면 다시 시도
+                    return await self.aget_or_compute(key, acompute)
+                raise
+        try:
+            value = await acompute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 기다리는 쪽이 없을 때 "exception was never retrieved" 경고가 나지 않도록 읽어 둠
+            future.exception()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with stripe.lock:
+                stripe.ainflight.pop(loop_key, None)
+
+    def clear(self, disk: bool = True) -> None:
+        """
+        모든 값을 지웁니다. (통계는 유지)
+
+        Args:
+            disk (bool): 디스크 계층도 지울지 여부
+        """
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.data.clear()
+        if disk and self.disk is not None:
+            self.disk.clear()
+
+    def __len__(self) -> int:
+        return sum(len(stripe.data) for stripe in self._stripes)
+
+    def stats(self) -> dict:
+        """
+        캐시 통계
+
+        Returns:
+            dict: hits, misses(coalesced 포함), evictions, expirations, coalesced(다른 호출의 결과를 기다린 수),
+                disk_hits, size, maxsize, hit_ratio (디스크 계층이 있으면 disk_size)
+        """
+        totals = dict.fromkeys(STAT_KEYS, 0)
+        size = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                for key in STAT_KEYS:
+                    totals[key] += getattr(stripe, key)
+                size += len(stripe.data)
+        lookups = totals["hits"] + totals["misses"]
+        totals.update(size=size, maxsize=self.maxsize, hit_ratio=totals["hits"] / lookups if lookups else 0.0)
+        if self.disk is not None:
+            totals["disk_size"] = len(self.disk)
+        return totals
+
+
+def memoize(
+    func: Optional[Callable] = None,
+    *,
+    maxsize: Optional[int] = 1024,
+    ttl: Optional[float] = None,
+    key: Optional[Callable[..., Hashable]] = None,
+    ignore: Iterable[str] = (),
+    stripes: int = 8,
+    disk_path: Optional[str] = None,
+    cache: Optional[LRUCache] = None,
+    single_flight: bool = True,
+):
+    """
+    함수 결과를 캐시하는 데코레이터 (@memoize 또는 @memoize(...)로 사용)
+
+    감싼 함수에는 cache(LRUCache), cache_stats(), cache_clear(), cache_invalidate(*args, **kwargs)가 붙습니다.
+    메서드에 쓰면 self도 키에 포함되어 인스턴스가 캐시에 남아 있는 동안 해제되지 않습니다. (공유하려면 ignore=("self",))
+
+    Args:
+        func (Callable): 감쌀 함수 (인자 없이 @memoize로 쓸 때)
+        maxsize (int): 최대 항목 수 (None이면 제한 없음)
+        ttl (float): 만료 시간(초) (None이면 만료 없음)
+        key (Callable): 인자로 캐시 키를 만드는 함수 (None이면 시그니처로 정규화한 모든 인자)
+        ignore (Iterable[str]): 키에서 뺄 인자 이름 (예: 콜백, 로거)
+        stripes (int): 락 구역 수
+        disk_path (str): 디스크 계층 sqlite 파일 경로 (None이면 메모리만 사용)
+        cache (LRUCache): 사용할 캐시 (여러 함수가 캐시를 함께 쓸 때, 지정하면 maxsize/ttl/stripes/disk_path는 무시)
+        single_flight (bool): 같은 키의 동시 호출을 한 번만 실행할지 여부
+
+    Returns:
+        Callable: 캐시가 적용된 함수
+    """
+    ignored = frozenset(ignore)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        store = cache or LRUCache(
+            maxsize=maxsize,
+            ttl=ttl,
+            stripes=stripes,
+            disk=DiskCache(disk_path, ttl=ttl) if disk_path else None,
+            namespace=f"{func.__module__}.{func.__qualname__}",
+        )
+
+        def make_key(args: tuple, kwargs: dict) -> Hashable:
+            if key is not None:
+                return _freeze(key(*args, **kwargs))
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return tuple((name, _freeze(value)) for name, value in bound.arguments.items() if name not in ignored)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                cache_key = make_key(args, kwargs)
+                if single_flight:
+                    return await store.aget_or_compute(cache_key, lambda: func(*args, **kwargs))
+                value = store._lookup(cache_key)
+                if value is _MISSING:
+                    value = await func(*args, **kwargs)
+                    store.set(cache_key, value)
+                return value
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                cache_key = make_key(args, kwargs)
+                if single_flight:
+                    return store.get_or_compute(cache_key, lambda: func(*args, **kwargs))
+                value = store._lookup(cache_key)
+                if value is _MISSING:
+                    value = func(*args, **kwargs)
+                    store.set(cache_key, value)
+                return value
+
+        wrapper.cache = store
+        wrapper.cache_stats = store.stats
+        wrapper.cache_clear = store.clear
+        wrapper.cache_invalidate = lambda *args, **kwargs: store.delete(make_key(args, kwargs))
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -0,0 +1,456 @@
+"""
+블록 압축 청크 저장소 모듈
+
+청크 텍스트와 메타데이터를 수백 개 단위 블록으로 묶어 압축(zstd, 없으면 zlib)한 뒤 디스크에 저장하고,
+블록 오프셋 테이블로 필요한 블록만 읽어 압축을 풉니다. 최근에 사용한 블록은 크기가 제한된 LRU 캐시에 보관합니다.
+
+파일 구성 (저장 경로 디렉토리 안):
+    chunks.bin         압축 블록을 이어 붙인 파일
+    chunks_index.json  코덱, 블록 크기, 블록별 (오프셋, 길이) 테이블
+
+블록 내부 형식 (압축 해제 후):
+    [레코드 수 n: uint32][레코드 시작 위치 n+1개: uint32][레코드 JSON 바이트들]
+    레코드 하나만 잘라서 디코딩할 수 있으므로 캐시 적중 시 top-k 조회가 마이크로초 단위로 끝납니다.
+
+- CompressedChunkStore: 위치(행 번호) 기반 저장소
+- LazyChunkSequence: SKLearnVectorStore의 _texts/_metadatas를 대체하는 지연 로딩 시퀀스
+- CompressedDocstore: FAISS용 docstore (InMemoryDocstore 대체)
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # 선택 의존성: 없으면 zlib 사용
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE_NAME = "chunks.bin"
+INDEX_FILE_NAME = "chunks_index.json"
+DEFAULT_BLOCK_SIZE = 256
+DEFAULT_CACHE_BLOCKS = 32
+
+_UINT32 = struct.Struct("<I")
+
+
+def _default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd로 압축된 청크 저장소를 읽으려면 zstandard 패키지가 필요합니다.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _encode_block(records: List[Tuple[str, dict]]) -> bytes:
+    payloads = [json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for record in records]
+    offsets = [0]
+    for payload in payloads:
+        offsets.append(offsets[-1] + len(payload))
+    header = struct.pack(f"<{len(offsets) + 1}I", len(records), *offsets)
+    return header + b"".join(payloads)
+
+
+class _DecodedBlock:
+    """압축이 풀린 블록 (레코드 단위로 잘라서 디코딩)"""
+
+    __slots__ = ("raw", "offsets", "base")
+
+    def __init__(self, raw: bytes):
+        count = _UINT32.unpack_from(raw, 0)[0]
+        self.raw = raw
+        self.offsets = struct.unpack_from(f"<{count + 1}I", raw, 4)
+        self.base = 4 + 4 * (count + 1)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def record(self, i: int) -> Tuple[str, dict]:
+        start = self.base + self.offsets[i]
+        end = self.base + self.offsets[i + 1]
+        text, metadata = json.loads(self.raw[start:end])
+        return text, metadata
+
+
+class CompressedChunkStore:
+    """
+    위치 기반 블록 압축 청크 저장소
+
+    Args:
+        path (str): 저장 디렉토리 경로
+        cache_blocks (int): LRU 캐시에 보관할 최대 블록 수
+    """
+
+    def __init__(self, path: str, cache_blocks: int = DEFAULT_CACHE_BLOCKS):
+        self.path = path
+        self.cache_blocks = cache_blocks
+        with open(os.path.join(path, INDEX_FILE_NAME), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.codec: str = meta["codec"]
+        self.block_size: int = meta["block_size"]
+        self.count: int = meta["count"]
+        self.blocks: List[Tuple[int, int]] = [tuple(block) for block in meta["blocks"]]
+
+        self._cache: "OrderedDict[int, _DecodedBlock]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self.stats = {"hits": 0, "misses": 0, "decompressed_bytes": 0}
+
+    @classmethod
+    def write(
+        cls,
+        path: str,
+        records: Iterable[Tuple[str, dict]],
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        codec: Optional[str] = None,
+        cache_blocks: int = DEFAULT_CACHE_BLOCKS,
+    ) -> "CompressedChunkStore":
+        """
+        (텍스트, 메타데이터) 레코드를 블록 단위로 압축하여 저장합니다.
+
+        Args:
+            path (str): 저장 디렉토리 경로
+            records (Iterable[Tuple[str, dict]]): 저장할 레코드 (순서가 위치 번호가 됨)
+            block_size (int): 블록당 레코드 수
+            codec (str): "zstd" 또는 "zlib" (기본값: zstandard 설치 여부에 따라 선택)
+            cache_blocks (int): LRU 캐시에 보관할 최대 블록 수
+
+        Returns:
+            CompressedChunkStore: 저장된 청크 저장소
+        """
+        codec = codec or _default_codec()
+        os.makedirs(path, exist_ok=True)
+        data_path = os.path.join(path, DATA_FILE_NAME)
+        blocks = []
+        count = 0
+        raw_bytes = 0
+
+        with open(f"{data_path}.tmp", "wb") as f:
+            pending: List[Tuple[str, dict]] = []
+
+            def flush():
+                nonlocal raw_bytes
+                raw = _encode_block(pending)
+                compressed = _compress(raw, codec)
+                blocks.append((f.tell(), len(compressed)))
+                f.write(compressed)
+                raw_bytes += len(raw)
+                pending.clear()
+
+            for text, metadata in records:
+                pending.append((text, metadata))
+                count += 1
+                if len(pending) >= block_size:
+                    flush()
+            if pending:
+                flush()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{data_path}.tmp", data_path)
+
+        cls._write_index(path, codec, block_size, count, blocks)
+        compressed_bytes = sum(length for _, length in blocks)
+        logger.info(
+            f"청크 {count}개를 {len(blocks)}개 블록으로 압축 저장했습니다 "
+            f"({raw_bytes / 1e6:.2f}MB -> {compressed_bytes / 1e6:.2f}MB, {codec})"
+        )
+        return cls(path, cache_blocks=cache_blocks)
+
+    @staticmethod
+    def _write_index(path: str, codec: str, block_size: int, count: int, blocks: List[Tuple[int, int]]) -> None:
+        index_path = os.path.join(path, INDEX_FILE_NAME)
+        with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "codec": codec, "block_size": block_size, "count": count, "blocks": blocks}, f)
+        os.replace(f"{index_path}.tmp", index_path)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, INDEX_FILE_NAME))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError(f"청크 위치가 범위를 벗어났습니다: {position}")
+        return divmod(position, self.block_size)
+
+    def _read_block(self, block_no: int) -> _DecodedBlock:
+        # 호출하는 쪽에서 self._lock을 잡고 있어야 함
+        block = self._cache.get(block_no)
+        if block is not None:
+            self._cache.move_to_end(block_no)
+            self.stats["hits"] += 1
+            return block
+
+        self.stats["misses"] += 1
+        if self._mmap is None:
+            self._file = open(os.path.join(self.path, DATA_FILE_NAME), "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, length = self.blocks[block_no]
+        raw = _decompress(self._mmap[offset:offset + length], self.codec)
+        self.stats["decompressed_bytes"] += len(raw)
+
+        block = _DecodedBlock(raw)
+        self._cache[block_no] = block
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return block
+
+    def get(self, position: int) -> Tuple[str, dict]:
+        """
+        위치 번호로 레코드 하나를 조회합니다.
+
+        Args:
+            position (int): 청크 위치 번호
+
+        Returns:
+            Tuple[str, dict]: (텍스트, 메타데이터)
+        """
+        block_no, slot = self._locate(position)
+        with self._lock:
+            block = self._read_block(block_no)
+        return block.record(slot)
+
+    def get_many(self, positions: Iterable[int]) -> List[Tuple[str, dict]]:
+        """
+        여러 레코드를 조회합니다. 같은 블록의 레코드는 블록을 한 번만 읽습니다.
+
+        Args:
+            positions (Iterable[int]): 청크 위치 번호 목록
+
+        Returns:
+            List[Tuple[str, dict]]: 입력 순서대로 (텍스트, 메타데이터) 리스트
+        """
+        located = [self._locate(position) for position in positions]
+        blocks: Dict[int, _DecodedBlock] = {}
+        with self._lock:
+            for block_no, _ in located:
+                if block_no not in blocks:
+                    blocks[block_no] = self._read_block(block_no)
+        return [blocks[block_no].record(slot) for block_no, slot in located]
+
+    def iter_records(self) -> Iterable[Tuple[str, dict]]:
+        """캐시를 오염시키지 않고 모든 레코드를 순서대로 읽습니다."""
+        with open(os.path.join(self.path, DATA_FILE_NAME), "rb") as f:
+            for offset, length in self.blocks:
+                f.seek(offset)
+                block = _DecodedBlock(_decompress(f.read(length), self.codec))
+                for slot in range(len(block)):
+                    yield block.record(slot)
+
+    def cache_info(self) -> dict:
+        """캐시 적중/실패 횟수와 현재 캐시에 보관 중인 블록 크기를 반환합니다."""
+        with self._lock:
+            resident = sum(len(block.raw) for block in self._cache.values())
+            return {**self.stats, "cached_blocks": len(self._cache), "cached_bytes": resident}
+
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._file.close()
+                self._mmap = None
+                self._file = None
+
+
+class LazyChunkSequence(Sequence):
+    """
+    CompressedChunkStore의 텍스트 또는 메타데이터를 리스트처럼 보여주는 읽기 전용 시퀀스
+
+    SKLearnVectorStore의 _texts/_metadatas를 이 객체로 바꾸면 검색 결과 문서만 필요할 때 압축을 풉니다.
+
+    Args:
+        store (CompressedChunkStore): 청크 저장소
+        field (str): "text" 또는 "metadata"
+    """
+
+    def __init__(self, store: CompressedChunkStore, field: str):
+        if field not in ("text", "metadata"):
+            raise ValueError(f"지원하지 않는 필드입니다: {field}")
+        self.store = store
+        self._field_index = 0 if field == "text" else 1
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [record[self._field_index] for record in self.store.get_many(range(*position.indices(len(self))))]
+        return self.store.get(int(position))[self._field_index]
+
+    def __iter__(self):
+        for record in self.store.iter_records():
+            yield record[self._field_index]
+
+    def extend(self, values):
+        raise TypeError("압축된 청크 저장소는 읽기 전용입니다. 문서를 추가하려면 압축 모드를 끄고 저장소를 다시 생성해주세요.")
+
+
+def _import_docstore_bases():
+    from langchain_community.docstore.base import AddableMixin, Docstore
+
+    return Docstore, AddableMixin
+
+
+try:
+    _DOCSTORE_BASES = _import_docstore_bases()
+except ImportError:  # langchain이 없는 환경에서도 CompressedChunkStore는 사용 가능
+    _DOCSTORE_BASES = (object,)
+
+
+class CompressedDocstore(*_DOCSTORE_BASES):
+    """
+    FAISS용 블록 압축 docstore
+
+    docstore ID를 청크 위치 번호로 바꿔 CompressedChunkStore에서 조회합니다.
+    새로 추가된 문서는 save() 전까지 메모리에 보관하다가 저장 시 새 블록으로 압축합니다.
+    pickle에는 ID 테이블만 저장되고, 로드 후 reopen()으로 청크 파일 경로를 다시 지정합니다.
+
+    Args:
+        path (str): 청크 저장소 디렉토리 경로
+        id_to_position (Dict[str, int]): docstore ID별 청크 위치 번호
+        cache_blocks (int): LRU 캐시에 보관할 최대 블록 수
+    """
+
+    def __init__(self, path: str, id_to_position: Dict[str, int], cache_blocks: int = DEFAULT_CACHE_BLOCKS):
+        self.path = path
+        self.id_to_position = dict(id_to_position)
+        self.cache_blocks = cache_blocks
+        self._pending: Dict[str, object] = {}
+        self._store: Optional[CompressedChunkStore] = None
+
+    @classmethod
+    def from_documents(cls, path: str, documents: Dict[str, object], block_size: int = DEFAULT_BLOCK_SIZE, cache_blocks: int = DEFAULT_CACHE_BLOCKS) -> "CompressedDocstore":
+        """
+        docstore ID별 Document 사전을 압축 저장하여 docstore를 생성합니다.
+
+        Args:
+            path (str): 청크 저장소 디렉토리 경로
+            documents (Dict[str, Document]): docstore ID별 문서 (예: InMemoryDocstore._dict)
+            block_size (int): 블록당 레코드 수
+            cache_blocks (int): LRU 캐시에 보관할 최대 블록 수
+
+        Returns:
+            CompressedDocstore: 생성된 docstore
+        """
+        ids = list(documents)
+        CompressedChunkStore.write(
+            path,
+            ((documents[doc_id].page_content, documents[doc_id].metadata) for doc_id in ids),
+            block_size=block_size,
+            cache_blocks=cache_blocks,
+        )
+        return cls(path, {doc_id: position for position, doc_id in enumerate(ids)}, cache_blocks=cache_blocks)
+
+    @property
+    def store(self) -> CompressedChunkStore:
+        if self._store is None:
+            self._store = CompressedChunkStore(self.path, cache_blocks=self.cache_blocks)
+        return self._store
+
+    def reopen(self, path: str) -> None:
+        """저장소 폴더가 옮겨진 경우 청크 파일 경로를 다시 지정합니다."""
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+        self.path = path
+
+    def search(self, search: str):
+        from langchain_core.documents import Document
+
+        if search in self._pending:
+            return self._pending[search]
+        position = self.id_to_position.get(search)
+        if position is None:
+            return f"ID {search} not found."
+        text, metadata = self.store.get(position)
+        return Document(id=search, page_content=text, metadata=metadata)
+
+    def mget(self, ids: List[str]) -> list:
+        """여러 문서를 블록 단위로 묶어서 조회합니다."""
+        from langchain_core.documents import Document
+
+        stored = [doc_id for doc_id in ids if doc_id in self.id_to_position]
+        records = dict(zip(stored, self.store.get_many(self.id_to_position[doc_id] for doc_id in stored)))
+        results = []
+        for doc_id in ids:
+            if doc_id in self._pending:
+                results.append(self._pending[doc_id])
+            elif doc_id in records:
+                text, metadata = records[doc_id]
+                results.append(Document(id=doc_id, page_content=text, metadata=metadata))
+            else:
+                results.append(None)
+        return results
+
+    def add(self, texts: Dict[str, object]) -> None:
+        overlapping = set(texts).intersection(self.id_to_position).union(set(texts).intersection(self._pending))
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._pending.update(texts)
+
+    def delete(self, ids: List) -> None:
+        missing = [doc_id for doc_id in ids if doc_id not in self.id_to_position and doc_id not in self._pending]
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        for doc_id in ids:
+            # 압축 블록은 그대로 두고 ID 테이블에서만 제거 (다음 save 시 정리)
+            self.id_to_position.pop(doc_id, None)
+            self._pending.pop(doc_id, None)
+
+    def save(self, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        """
+        보류 중인 문서와 삭제 내역을 반영하여 청크 저장소를 다시 씁니다.
+
+        Args:
+            block_size (int): 블록당 레코드 수
+        """
+        if not self._pending and len(self.id_to_position) == len(self.store):
+            return
+        ids = list(self.id_to_position)
+        existing = self.store.get_many(self.id_to_position[doc_id] for doc_id in ids)
+        records = existing + [(doc.page_content, doc.metadata) for doc in self._pending.values()]
+        ids += list(self._pending)
+        self.reopen(self.path)
+        CompressedChunkStore.write(self.path, records, block_size=block_size, cache_blocks=self.cache_blocks)
+        self.id_to_position = {doc_id: position for position, doc_id in enumerate(ids)}
+        self._pending = {}
+
+    def __len__(self) -> int:
+        return len(self.id_to_position) + len(self._pending)
+
+    def __getstate__(self):
+        if self._pending:
+            raise RuntimeError("저장되지 않은 문서가 있습니다. pickle 전에 save()를 호출해주세요.")
+        return {"path": self.path, "id_to_position": self.id_to_position, "cache_blocks": self.cache_blocks}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.id_to_position = state["id_to_position"]
+        self.cache_blocks = state["cache_blocks"]
+        self._pending = {}
+        self._store = None
@@ -0,0 +1,333 @@
+"""
+검색 결과 컨텍스트 조립 모듈
+
+청크는 chunk_overlap(100~150토큰)을 두고 만들어지므로, 같은 페이지의 인접 청크가 함께 검색되면
+같은 문장이 프롬프트에 두 번 들어가 프리필 시간이 늘어납니다. 검색 결과를 모델에 넘기기 전에 다음을 수행합니다.
+
+1. 같은 source_file / page의 청크를 겹치는 부분 기준으로 이어 붙여 연속 구간(span)으로 복원
+   (metadata["start_index"]가 있으면 위치로, 없으면 앞 청크 끝과 뒤 청크 시작의 일치 텍스트로 판단하되,
+   겹치는 텍스트가 청크 안에서 반복되거나 이어 붙일 후보가 둘 이상이면 순서를 알 수 없으므로 합치지 않음)
+2. 질의와 관련도가 낮은 문장 제거 (질의와 겹치는 글자 2-gram 비율, 구간마다 최소 문장 수는 유지)
+3. 검색 순위 순서대로 토큰 예산 안에 채움 (마지막 구간은 관련도 높은 문장만 남겨 잘라 넣음)
+
+출처(파일명, 페이지)는 구간마다 유지되므로 답변에서 [번호]로 인용할 수 있습니다.
+
+사용 예:
+    context = assemble_context(docs, query, token_budget=1500)
+    prompt = RAG_SYSTEM_PROMPT + context.format()
+"""
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from profiler import profile
+from utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# 이 길이보다 짧은 일치는 우연한 일치로 보고 겹침으로 판단하지 않음
+MIN_OVERLAP_CHARS = 20
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?。])\s+|\n+")
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def _overlap_length(left: str, right: str, min_overlap: int = MIN_OVERLAP_CHARS) -> int:
+    """left의 끝과 right의 시작이 겹치는 가장 긴 길이 (없거나 겹치는 텍스트가 반복되는 문구이면 0)"""
+    if len(left) < min_overlap or len(right) < min_overlap:
+        return 0
+    probe = right[:min_overlap]
+    position = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        if right.startswith(left[position:]):
+            piece = left[position:]
+            # 상용구처럼 청크 안에서 반복되는 문구의 일치는 실제 청크 경계인지 알 수 없음
+            if left.find(piece) != position or right.find(piece, 1) != -1:
+                return 0
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def _bigrams(text: str) -> set:
+    compact = _NON_WORD.sub("", text.lower())
+    return {compact[i:i + 2] for i in range(len(compact) - 1)}
+
+
+def split_sentences(text: str) -> List[str]:
+    """텍스트를 문장 단위로 나눕니다. (마침표/물음표/느낌표 뒤 공백, 줄바꿈 기준)"""
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT.split(text) if sentence and sentence.strip()]
+
+
+def lexical_relevance(query: str) -> Callable[[str], float]:
+    """
+    질의의 글자 2-gram 중 문장에 포함된 비율로 관련도를 계산하는 함수를 만듭니다.
+    (형태소 분석기 없이 한국어 조사/어미 변화에도 동작)
+
+    Args:
+        query (str): 검색 질의
+
+    Returns:
+        Callable[[str], float]: 문장을 받아 0~1 관련도를 반환하는 함수
+    """
+    query_grams = _bigrams(query)
+
+    def score(sentence: str) -> float:
+        if not query_grams:
+            return 1.0
+        return len(query_grams & _bigrams(sentence)) / len(query_grams)
+
+    return score
+
+
+class ContextSpan:
+    """
+    같은 문서/페이지에서 이어 붙인 연속 구간
+
+    Args:
+        source_file (str): 출처 파일명
+        page (int): 페이지 번호 (0부터 시작, 없으면 None)
+        text (str): 구간 텍스트
+        rank (int): 구간을 이루는 청크 중 가장 높은 검색 순위 (0부터 시작)
+        start_index (int): 페이지 안에서 구간 시작 위치 (알 수 없으면 None)
+    """
+
+    def __init__(self, source_file: str, page: Optional[int], text: str, rank: int, start_index: Optional[int] = None):
+        self.source_file = source_file
+        self.page = page
+        self.text = text
+        self.rank = rank
+        self.start_index = start_index
+        self.chunk_count = 1
+        self.metadata: List[dict] = []
+
+    @property
+    def citation(self) -> str:
+        """출처 표시 문자열 (파일명과 페이지)"""
+        return f"{self.source_file} p.{self.page + 1}" if isinstance(self.page, int) else self.source_file
+
+    def absorb(self, other: "ContextSpan", overlap: int) -> None:
+        """뒤에 이어지는 구간을 겹치는 부분을 빼고 이어 붙입니다."""
+        self.text = self.text + other.text[overlap:]
+        self.rank = min(self.rank, other.rank)
+        self.chunk_count += other.chunk_count
+        self.metadata.extend(other.metadata)
+
+
+class AssembledContext:
+    """
+    조립된 컨텍스트와 통계
+
+    Args:
+        spans (List[ContextSpan]): 프롬프트에 넣을 구간 (검색 순위 순)
+        input_chunks (int): 입력 청크 수
+        input_tokens (int): 입력 청크 전체 토큰 수
+        stitched_spans (int): 이어 붙인 뒤 구간 수
+        pruned_sentences (int): 관련도가 낮아 제거한 문장 수
+        tokens (int): 최종 컨텍스트 토큰 수
+    """
+
+    def __init__(self, spans: List[ContextSpan], input_chunks: int, input_tokens: int, stitched_spans: int, pruned_sentences: int, tokens: int):
+        self.spans = spans
+        self.input_chunks = input_chunks
+        self.input_tokens = input_tokens
+        self.stitched_spans = stitched_spans
+        self.pruned_sentences = pruned_sentences
+        self.tokens = tokens
+
+    @property
+    def sources(self) -> List[str]:
+        return [span.citation for span in self.spans]
+
+    def format(self) -> str:
+        """번호와 출처가 붙은 참고 문서 텍스트"""
+        return "\n\n".join(f"[{i}] (출처: {span.citation})\n{span.text}" for i, span in enumerate(self.spans, start=1))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "input_chunks": self.input_chunks,
+            "input_tokens": self.input_tokens,
+            "spans": len(self.spans),
+            "stitched_spans": self.stitched_spans,
+            "pruned_sentences": self.pruned_sentences,
+            "tokens": self.tokens,
+        }
+
+
+def _merge_group(spans: List[ContextSpan]) -> List[ContextSpan]:
+    """같은 문서/페이지 구간들 중 겹치거나 포함되는 구간을 합칩니다."""
+    if all(span.start_index is not None for span in spans):
+        # 위치를 알면 정렬 후 겹치는 구간만 합침
+        spans = sorted(spans, key=lambda s: s.start_index)
+        merged = [spans[0]]
+        for span in spans[1:]:
+            current = merged[-1]
+            current_end = current.start_index + len(current.text)
+            if span.start_index <= current_end:
+                overlap = current_end - span.start_index
+                if overlap >= len(span.text):
+                    current.rank = min(current.rank, span.rank)
+                    current.chunk_count += span.chunk_count
+                else:
+                    current.absorb(span, overlap)
+            else:
+                merged.append(span)
+        return merged
+
+    # 위치를 모르면 텍스트 일치로 판단 (포함 관계 제거 후 앞뒤 겹침을 반복해서 합침)
+    remaining = sorted(spans, key=lambda s: len(s.text), reverse=True)
+    merged: List[ContextSpan] = []
+    for span in remaining:
+        container = next((m for m in merged if span.text in m.text), None)
+        if container is not None:
+            container.rank = min(container.rank, span.rank)
+            container.chunk_count += span.chunk_count
+        else:
+            merged.append(span)
+
+    # 앞뒤 후보가 하나뿐인 겹침만 합침 (후보가 여럿이면 어느 청크가 실제로 이어지는지 알 수 없음)
+    while len(merged) > 1:
+        candidates = [
+            (left, right, overlap)
+            for left in merged for right in merged
+            if left is not right and (overlap := _overlap_length(left.text, right.text))
+        ]
+        unique = next(
+            (
+                (left, right, overlap) for left, right, overlap in candidates
+                if sum(c[0] is left for c in candidates) == 1 and sum(c[1] is right for c in candidates) == 1
+            ),
+            None,
+        )
+        if unique is None:
+            break
+        left, right, overlap = unique
+        left.absorb(right, overlap)
+        merged.remove(right)
+    return merged
+
+
+def stitch_chunks(docs: List[Any]) -> List[ContextSpan]:
+    """
+    같은 source_file / page의 인접하거나 겹치는 청크를 연속 구간으로 합칩니다.
+
+    Args:
+        docs (List[Document]): 검색된 문서 (검색 순위 순)
+
+    Returns:
+        List[ContextSpan]: 합친 구간 (가장 높은 검색 순위 순)
+    """
+    groups: Dict[Tuple[str, Any], List[ContextSpan]] = {}
+    for rank, doc in enumerate(docs):
+        metadata = doc.metadata or {}
+        source_file = metadata.get("source_file") or metadata.get("source") or "알 수 없음"
+        page = metadata.get("page")
+        span = ContextSpan(source_file, page, doc.page_content, rank, metadata.get("start_index"))
+        span.metadata.append(metadata)
+        groups.setdefault((source_file, page), []).append(span)
+
+    spans = [span for group in groups.values() for span in _merge_group(group)]
+    return sorted(spans, key=lambda s: s.rank)
+
+
+def prune_sentences(span: ContextSpan, relevance: Callable[[str], float], min_relevance: float, min_sentences: int = 2) -> int:
+    """
+    구간에서 관련도가 min_relevance보다 낮은 문장을 제거합니다. (관련도 상위 min_sentences개 문장은 유지, 순서 유지)
+
+    Args:
+        span (ContextSpan): 대상 구간 (text가 바뀜)
+        relevance (Callable[[str], float]): 문장 관련도 함수
+        min_relevance (float): 유지할 최소 관련도
+        min_sentences (int): 관련도와 관계없이 유지할 문장 수
+
+    Returns:
+        int: 제거한 문장 수
+    """
+    sentences = split_sentences(span.text)
+    if len(sentences) <= min_sentences:
+        return 0
+    scores = [relevance(sentence) for sentence in sentences]
+    top = set(sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True)[:min_sentences])
+    keep = [i for i in range(len(sentences)) if i in top or scores[i] >= min_relevance]
+
+    pieces = []
+    previous = -1
+    for i in keep:
+        if i != previous + 1:
+            pieces.append("…")
+        pieces.append(sentences[i])
+        previous = i
+    if previous != len(sentences) - 1:
+        pieces.append("…")
+    span.text = " ".join(pieces)
+    return len(sentences) - len(keep)
+
+
+def _truncate_to_budget(span: ContextSpan, relevance: Callable[[str], float], budget: int, count: Callable[[str], int]) -> bool:
+    """관련도 높은 문장부터 예산 안에 들어가는 만큼만 남깁니다. (원래 순서 유지) 남는 문장이 없으면 False"""
+    sentences = split_sentences(span.text)
+    order = sorted(range(len(sentences)), key=lambda i: relevance(sentences[i]), reverse=True)
+    chosen = []
+    used = 0
+    for i in order:
+        tokens = count(sentences[i])
+        if used + tokens <= budget:
+            chosen.append(i)
+            used += tokens
+    if not chosen:
+        return False
+    span.text = " ".join(sentences[i] for i in sorted(chosen))
+    return True
+
+
+@profile("rag.assemble_context")
+def assemble_context(
+    docs: List[Any],
+    query: str,
+    token_budget: int,
+    min_relevance: float = 0.15,
+    min_sentences: int = 2,
+    relevance: Optional[Callable[[str], float]] = None,
+    count: Callable[[str], int] = count_tokens,
+) -> AssembledContext:
+    """
+    검색 결과를 이어 붙이고, 관련 없는 문장을 제거한 뒤, 토큰 예산 안에 채웁니다.
+
+    Args:
+        docs (List[Document]): 검색된 문서 (검색 순위 순)
+        query (str): 검색 질의
+        token_budget (int): 컨텍스트 토큰 예산
+        min_relevance (float): 문장을 유지할 최소 관련도 (0이면 문장 제거 안 함)
+        min_sentences (int): 구간마다 관련도와 관계없이 유지할 문장 수
+        relevance (Callable[[str], float]): 문장 관련도 함수 (기본값: 질의 글자 2-gram 일치 비율)
+        count (Callable[[str], int]): 토큰 수 계산 함수
+
+    Returns:
+        AssembledContext: 조립된 컨텍스트
+    """
+    relevance = relevance or lexical_relevance(query)
+    input_tokens = sum(count(doc.page_content) for doc in docs)
+    spans = stitch_chunks(docs)
+    stitched = len(spans)
+
+    pruned = 0
+    if min_relevance > 0:
+        for span in spans:
+            pruned += prune_sentences(span, relevance, min_relevance, min_sentences)
+
+    packed: List[ContextSpan] = []
+    used = 0
+    for span in spans:
+        # 출처 표시 줄도 예산에 포함
+        header = count(f"[{len(packed) + 1}] (출처: {span.citation})\n")
+        tokens = count(span.text) + header
+        if used + tokens <= token_budget:
+            packed.append(span)
+            used += tokens
+        elif token_budget - used - header > 0 and _truncate_to_budget(span, relevance, token_budget - used - header, count):
+            packed.append(span)
+            used += count(span.text) + header
+
+    logger.debug(f"컨텍스트 조립: 청크 {len(docs)}개({input_tokens}토큰) -> 구간 {len(packed)}개({used}토큰), 제거 문장 {pruned}개")
+    return AssembledContext(packed, len(docs), input_tokens, stitched, pruned, used)
@@ -0,0 +1,150 @@
+"""
+임베딩 체크포인트 모듈
+
+인제스트 중 임베딩한 배치를 하나씩 디스크에 확정(commit)하여, 프로세스가 죽거나 Ollama 서버가
+재시작되어도 다음 실행에서 이미 임베딩한 청크는 건너뛰고 이어서 진행할 수 있게 합니다.
+
+- 배치 파일은 청크 텍스트의 SHA-1 다이제스트와 벡터를 함께 저장하므로, 분할 결과의 순서가 바뀌거나
+  문서가 일부 추가되어도 내용이 같은 청크의 벡터는 재사용됩니다.
+- 배치 파일은 임시 파일에 쓰고 fsync한 뒤 os.replace로 교체하므로 중간에 죽어도 깨진 배치가 남지 않습니다.
+- 임베딩 모델이 바뀌면(manifest.json의 모델 이름 불일치) 기존 체크포인트를 버립니다.
+
+디렉토리 구성:
+    manifest.json         모델 이름, 벡터 차원
+    batch_000000.npz ...  확정된 배치 (digests, vectors)
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+def text_digest(text: str) -> bytes:
+    """청크 텍스트의 SHA-1 다이제스트를 구합니다."""
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def _fsync_dir(path: str) -> None:
+    # 디렉토리 엔트리(os.replace 결과)까지 디스크에 반영 (지원하지 않는 플랫폼은 무시)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class EmbeddingCheckpoint:
+    """
+    배치 단위 임베딩 체크포인트
+
+    Args:
+        directory (str): 체크포인트 디렉토리 경로
+        model_name (str): 임베딩 모델 이름 (다르면 기존 체크포인트를 버림)
+    """
+
+    def __init__(self, directory: str, model_name: Optional[str]):
+        self.directory = directory
+        self.model_name = model_name
+        self.dimension: Optional[int] = None
+        self._next_batch = 0
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_FILE_NAME)
+
+    def _batch_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "batch_*.npz")))
+
+    def load(self) -> Dict[bytes, np.ndarray]:
+        """
+        확정된 배치를 모두 읽어 다이제스트별 벡터를 반환합니다.
+
+        Returns:
+            Dict[bytes, np.ndarray]: 청크 텍스트 다이제스트별 임베딩 벡터 (체크포인트가 없으면 빈 사전)
+        """
+        if not os.path.exists(self._manifest_path()):
+            return {}
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"임베딩 체크포인트 manifest를 읽지 못해 새로 시작합니다: {e}")
+            self.clear()
+            return {}
+
+        if manifest.get("model_name") != self.model_name:
+            logger.info(f"임베딩 모델이 바뀌어 기존 체크포인트를 버립니다: {manifest.get('model_name')} -> {self.model_name}")
+            self.clear()
+            return {}
+        self.dimension = manifest.get("dimension")
+
+        vectors: Dict[bytes, np.ndarray] = {}
+        batch_files = self._batch_files()
+        for path in batch_files:
+            try:
+                with np.load(path) as data:
+                    digests = data["digests"]
+                    batch_vectors = data["vectors"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"손상된 체크포인트 배치를 건너뜁니다: {os.path.basename(path)} ({e})")
+                continue
+            for digest, vector in zip(digests, batch_vectors):
+                vectors[digest.tobytes()] = vector
+
+        if batch_files:
+            self._next_batch = int(os.path.basename(batch_files[-1])[len("batch_"):-len(".npz")]) + 1
+        return vectors
+
+    def commit(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """
+        임베딩한 배치 하나를 디스크에 확정합니다.
+
+        Args:
+            texts (Sequence[str]): 배치의 청크 텍스트
+            vectors (Sequence[Sequence[float]]): 배치의 임베딩 벡터 (texts와 같은 순서)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        array = np.asarray(vectors, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = int(array.shape[1])
+            self._write_manifest()
+
+        # 고정 길이 바이트 문자열(S20)은 끝의 0 바이트가 잘리므로 uint8 행렬로 저장
+        digests = np.frombuffer(b"".join(text_digest(text) for text in texts), dtype=np.uint8).reshape(-1, 20)
+        path = os.path.join(self.directory, f"batch_{self._next_batch:06d}.npz")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, digests=digests, vectors=array)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.directory)
+        self._next_batch += 1
+
+    def _write_manifest(self) -> None:
+        tmp_path = f"{self._manifest_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "model_name": self.model_name, "dimension": self.dimension}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path())
+
+    def clear(self) -> None:
+        """체크포인트 디렉토리를 삭제합니다. (벡터 저장소 저장이 끝난 뒤 호출)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.dimension = None
+        self._next_batch = 0
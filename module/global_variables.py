@@ -28,6 +28,31 @@ absolute_vector_store_path = os.path.abspath(os.path.join(os.path.dirname(__file
 # 기본 모델 종류 설정
 model_type = "ollama"
 
+# Ollama 서버 주소 (환경 변수 OLLAMA_BASE_URL로 변경 가능)
+ollama_base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# 임베딩에 사용할 Ollama 서버 주소 목록 (환경 변수 OLLAMA_EMBEDDING_ENDPOINTS에 쉼표로 구분하여 지정)
+# 둘 이상이면 인제스트 임베딩 배치를 여러 서버에 나누어 보냄
+ollama_embedding_endpoints = [
+    url.strip() for url in os.environ.get("OLLAMA_EMBEDDING_ENDPOINTS", "").split(",") if url.strip()
+] or [ollama_base_url]
+
+# Ollama 요청 스케줄러 설정 (ollama_scheduler.py)
+# 서버당 동시 실행 수 (Ollama의 OLLAMA_NUM_PARALLEL과 맞추는 것을 권장)
+ollama_scheduler_max_concurrency = int(os.environ.get("OLLAMA_SCHEDULER_MAX_CONCURRENCY", "4"))
+# 우선순위 클래스별 동시 실행 수 (batch를 낮게 두어 대화 응답용 슬롯 확보)
+ollama_scheduler_class_limits = {
+    "interactive": ollama_scheduler_max_concurrency,
+    "agent": max(1, ollama_scheduler_max_concurrency - 1),
+    "batch": max(1, ollama_scheduler_max_concurrency // 2),
+}
+# 우선순위 클래스별 최대 대기 시간(초), 넘기면 요청을 거절 (None이면 무제한 대기)
+ollama_scheduler_queue_deadlines = {
+    "interactive": 30.0,
+    "agent": 120.0,
+    "batch": None,
+}
+
 # Ollama 모델 목록
 ollama_models = [
     "llama3.1",
@@ -36,6 +61,8 @@ ollama_models = [
     "phi4",
     "olmo2:13b",
     "command-r7b",
+    "gemma3:4b",
+    "llama3.2:3b",
 ]
 
 # Ollama 임베딩 모델 목록
@@ -45,6 +72,82 @@ ollama_embedding_models = [
     "nomic-embed-text:latest"
 ]
 
+# 모델 상주 관리 설정 (model_residency.py)
+# Ollama에 상주시킬 모델 전체 메모리 예산(GB)
+ollama_ram_budget_gb = float(os.environ.get("OLLAMA_RAM_BUDGET_GB", "16"))
+# 시작 시 미리 로드할 모델 (앞쪽 우선, 환경 변수 OLLAMA_PRELOAD_MODELS에 쉼표로 구분하여 지정)
+ollama_preload_models = [
+    name.strip() for name in os.environ.get("OLLAMA_PRELOAD_MODELS", "").split(",") if name.strip()
+] or ["gemma3:4b", ollama_embedding_models[2]]
+
+# 대화 접두사 캐시 재사용 설정 (prefix_cache_chat.py)
+# 채팅에 사용할 Ollama 서버 목록 (환경 변수 OLLAMA_CHAT_ENDPOINTS에 쉼표로 구분하여 지정), 세션마다 한 서버에 고정
+ollama_chat_endpoints = [
+    url.strip() for url in os.environ.get("OLLAMA_CHAT_ENDPOINTS", "").split(",") if url.strip()
+] or [ollama_base_url]
+# 세션 모델의 최소 keep_alive(초), 대화 턴 사이에 모델(과 KV 캐시)이 언로드되지 않도록 충분히 길게 설정
+ollama_session_keep_alive = int(os.environ.get("OLLAMA_SESSION_KEEP_ALIVE", "1800"))
+# 고정 컨텍스트 길이 (요청마다 바뀌면 Ollama가 모델을 다시 로드하여 캐시가 사라짐)
+ollama_chat_num_ctx = int(os.environ.get("OLLAMA_CHAT_NUM_CTX", "8192"))
+
+# 자동 모델 선택 설정 (model_router.py)
+# 작은 모델부터 큰 모델 순서 (환경 변수 OLLAMA_ROUTER_TIERS에 쉼표로 구분하여 지정), 설치되지 않은 모델은 건너뜀
+ollama_router_tiers = [
+    name.strip() for name in os.environ.get("OLLAMA_ROUTER_TIERS", "").split(",") if name.strip()
+] or ["llama3.2:3b", "gemma3:4b", "llama3.1"]
+# 라우팅 결정과 지연 시간을 JSONL로 기록할 파일 (비우면 기록 안 함)
+model_router_log_file = os.environ.get("MODEL_ROUTER_LOG_FILE", "")
+
+# Ollama 응답 계측 설정 (ollama_telemetry.py)
+# 호출마다 토큰 수/소요 시간을 JSONL로 기록할 파일 (환경 변수 OLLAMA_TELEMETRY_FILE, 비우면 기록 안 함)
+ollama_telemetry_file = os.environ.get(
+    "OLLAMA_TELEMETRY_FILE",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "./metrics/ollama_calls.jsonl"))
+)
+# 기록 파일이 이 크기(바이트)를 넘으면 .1, .2 ... 로 넘기고 새 파일에 기록 (0이면 넘기지 않음)
+ollama_telemetry_max_bytes = int(os.environ.get("OLLAMA_TELEMETRY_MAX_BYTES", str(10 * 1024 * 1024)))
+# 보관할 이전 기록 파일 수
+ollama_telemetry_backup_count = int(os.environ.get("OLLAMA_TELEMETRY_BACKUP_COUNT", "3"))
+# 모델 로드 시간이 이 값(초) 이상이면 콜드 로드로 표시
+ollama_cold_load_seconds = float(os.environ.get("OLLAMA_COLD_LOAD_SECONDS", "1.0"))
+
+# Ollama 호출 재시도/회로 차단 설정 (resilience.py)
+# 우선순위 클래스별 최대 시도 횟수 (대화는 짧게, 인제스트 배치는 길게)
+ollama_retry_max_attempts = {
+    "interactive": 2,
+    "agent": 3,
+    "batch": 6,
+}
+# 재시도 간격: 0 ~ min(최대 간격, 기본 간격 x 2^n)초에서 무작위 선택
+ollama_retry_base_delay = float(os.environ.get("OLLAMA_RETRY_BASE_DELAY", "0.5"))
+ollama_retry_max_delay = float(os.environ.get("OLLAMA_RETRY_MAX_DELAY", "30"))
+# 재시도 예산: 요청 하나당 허용하는 재시도 비율
+ollama_retry_budget_ratio = float(os.environ.get("OLLAMA_RETRY_BUDGET_RATIO", "0.2"))
+# 연속 실패가 이 횟수에 이르면 서버로 가는 요청을 차단하고, 차단 시간(초) 뒤 시험 요청을 보냄
+ollama_breaker_failure_threshold = int(os.environ.get("OLLAMA_BREAKER_FAILURE_THRESHOLD", "5"))
+ollama_breaker_reset_seconds = float(os.environ.get("OLLAMA_BREAKER_RESET_SECONDS", "30"))
+# 대화 응답 생성 기한(초), 넘으면 재시도하지 않음
+ollama_chat_deadline_seconds = float(os.environ.get("OLLAMA_CHAT_DEADLINE_SECONDS", "120"))
+
+# 캐시 설정 (caching.py)
+# 질의 임베딩 캐시 크기 (같은 질의는 Ollama를 다시 부르지 않음, 0이면 캐시 안 함)
+embedding_query_cache_size = int(os.environ.get("EMBEDDING_QUERY_CACHE_SIZE", "1024"))
+# 질의 임베딩 캐시 만료 시간(초)
+embedding_query_cache_ttl = float(os.environ.get("EMBEDDING_QUERY_CACHE_TTL", "3600"))
+
+# 프로파일러 설정 (profiler.py)
+# 수집, 검색, 채팅 경로의 소요 시간 측정 여부 (환경 변수 PROFILER_ENABLED=1, 꺼져 있으면 비용이 거의 없음)
+profiler_enabled = os.environ.get("PROFILER_ENABLED", "0").lower() in ("1", "true", "yes")
+# 측정 비율 (0.1이면 10번 중 한 번 측정)
+profiler_sample_rate = float(os.environ.get("PROFILER_SAMPLE_RATE", "1.0"))
+# 주기적 스냅샷을 기록할 JSONL 파일 (비우면 기록 안 함)
+profiler_snapshot_file = os.environ.get(
+    "PROFILER_SNAPSHOT_FILE",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "./metrics/profile.jsonl"))
+)
+# 스냅샷 기록 간격(초)
+profiler_snapshot_interval = float(os.environ.get("PROFILER_SNAPSHOT_INTERVAL", "60"))
+
 # HuggingFace 모델 목록
 hf_models = [
     "mistralai/Mistral-7B-Instruct-v0.2",
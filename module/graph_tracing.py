@@ -0,0 +1,562 @@
+"""
+LangGraph 실행 추적 모듈
+
+컴파일된 그래프를 감싸 실행마다 노드 호출 단위의 구간(span)을 기록합니다.
+
+- node: 그래프 노드 호출 (단계 번호 포함, agent <-> tools 반복 횟수 계산)
+- llm: 모델 호출 (입력/출력 토큰 수, Ollama 스케줄러 대기 시간)
+- tool: 도구 호출
+- checkpoint: 체크포인터 저장/로드 (get_tuple, put, put_writes)
+
+실행 하나가 끝나면 JSON 한 줄로 파일에 추가합니다. 명령줄에서 요약을 볼 수 있습니다.
+    python graph_tracing.py summary traces.jsonl            # 플레임 형식 요약 + 노드별 p50/p95
+    python graph_tracing.py summary traces.jsonl --folded   # flamegraph.pl 입력 형식
+
+사용 예:
+    tracer = GraphTracer("traces/agent.jsonl")
+    app = trace_graph(workflow.compile(checkpointer=MemorySaver()), tracer, name="agent")
+    app.invoke({"messages": [...]}, config={"configurable": {"thread_id": 1}})
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from profiler import percentile
+
+logger = logging.getLogger(__name__)
+
+
+def _now_ms() -> float:
+    return time.perf_counter_ns() / 1e6
+
+
+class TraceRun:
+    """
+    그래프 실행 하나의 구간 기록
+
+    Args:
+        graph (str): 그래프 이름
+        thread_id (str): 체크포인터 스레드 ID (없으면 None)
+    """
+
+    def __init__(self, graph: str, thread_id: Optional[str] = None):
+        self.run_id = uuid.uuid4().hex
+        self.graph = graph
+        self.thread_id = thread_id
+        self.started_at = time.time()
+        self.start_ms = _now_ms()
+        self.spans: List[dict] = []
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add_span(self, span: dict) -> dict:
+        with self._lock:
+            span.setdefault("id", len(self.spans))
+            self.spans.append(span)
+        return span
+
+    def to_record(self) -> dict:
+        """JSONL에 기록할 실행 요약과 구간 목록"""
+        duration_ms = _now_ms() - self.start_ms
+        node_counts: Dict[str, int] = defaultdict(int)
+        tokens_in = tokens_out = 0
+        for span in self.spans:
+            if span["kind"] == "node":
+                node_counts[span["name"]] += 1
+            elif span["kind"] == "llm":
+                tokens_in += span.get("tokens_in") or 0
+                tokens_out += span.get("tokens_out") or 0
+        spans = [{**span, "start_ms": round(span["start_ms"] - self.start_ms, 3)} for span in self.spans]
+        return {
+            "run_id": self.run_id,
+            "graph": self.graph,
+            "thread_id": self.thread_id,
+            "started_at": self.started_at,
+            "duration_ms": round(duration_ms, 3),
+            "node_counts": dict(node_counts),
+            # agent -> tools -> agent 반복 횟수 = tools 노드 실행 횟수
+            "loop_iterations": node_counts.get("tools", 0),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "error": self.error,
+            "spans": spans,
+        }
+
+
+class GraphTracer:
+    """
+    실행 기록을 모아 JSONL 파일에 저장하는 추적기
+
+    Args:
+        path (str): JSONL 파일 경로 (None이면 파일에 쓰지 않고 runs에만 보관)
+        keep_runs (int): 메모리에 보관할 최근 실행 수
+    """
+
+    def __init__(self, path: Optional[str] = None, keep_runs: int = 100):
+        self.path = path
+        self.keep_runs = keep_runs
+        self.runs: List[dict] = []
+        self._active: Dict[Any, TraceRun] = {}
+        self._lock = threading.Lock()
+
+    def start_run(self, graph: str, thread_id: Optional[str] = None) -> TraceRun:
+        run = TraceRun(graph, thread_id)
+        with self._lock:
+            self._active[run.run_id] = run
+        return run
+
+    def finish_run(self, run: TraceRun, error: Optional[BaseException] = None) -> dict:
+        """실행 기록을 마무리하고 파일에 한 줄로 추가합니다."""
+        if error is not None:
+            run.error = f"{type(error).__name__}: {error}"
+        record = run.to_record()
+        with self._lock:
+            self._active.pop(run.run_id, None)
+            self.runs.append(record)
+            del self.runs[:-self.keep_runs]
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        return record
+
+    def active_run(self, thread_id: Optional[str]) -> Optional[TraceRun]:
+        """체크포인터 호출이 속한 진행 중인 실행 (같은 thread_id, 없으면 가장 최근 실행)"""
+        with self._lock:
+            runs = list(self._active.values())
+        matching = [run for run in runs if run.thread_id == thread_id] or runs
+        return matching[-1] if matching else None
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain 콜백으로 노드/모델/도구 구간을 기록하는 핸들러
+
+    Args:
+        run (TraceRun): 기록할 실행
+    """
+
+    raise_error = False
+
+    def __init__(self, run: TraceRun):
+        self.run = run
+        self._open: Dict[Any, dict] = {}
+        # 기록하지 않는 중간 실행(RunnableSequence 등)은 가장 가까운 기록 구간으로 연결
+        self._owner: Dict[Any, Optional[int]] = {}
+
+    def _parent_span(self, parent_run_id) -> Optional[int]:
+        if parent_run_id is None:
+            return None
+        return self._owner.get(parent_run_id)
+
+    def _open_span(self, run_id, parent_run_id, kind: str, name: str, **fields) -> dict:
+        span = self.run.add_span({
+            "kind": kind,
+            "name": name,
+            "parent": self._parent_span(parent_run_id),
+            "start_ms": _now_ms(),
+            "duration_ms": None,
+            **fields,
+        })
+        self._open[run_id] = span
+        self._owner[run_id] = span["id"]
+        return span
+
+    def _close_span(self, run_id, error: Optional[BaseException] = None) -> Optional[dict]:
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return None
+        span["duration_ms"] = round(_now_ms() - span["start_ms"], 3)
+        if error is not None:
+            span["error"] = f"{type(error).__name__}: {error}"
+        return span
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        is_node = any(tag.startswith("graph:step:") for tag in tags or []) and "langgraph_node" in metadata
+        if is_node:
+            self._open_span(run_id, parent_run_id, "node", metadata["langgraph_node"], step=metadata.get("langgraph_step"))
+        else:
+            self._owner[run_id] = self._parent_span(parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close_span(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close_span(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        name = metadata.get("ls_model_name") or kwargs.get("name") or (serialized or {}).get("name", "chat_model")
+        wait = metadata.get("ollama_queue_wait_s")
+        self._open_span(
+            run_id, parent_run_id, "llm", name,
+            queue_wait_ms=round(wait * 1000, 3) if wait is not None else None,
+            tokens_in=None, tokens_out=None,
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, parent_run_id=parent_run_id, metadata=metadata, **kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._close_span(run_id)
+        if span is None:
+            return
+        usage = None
+        try:
+            usage = response.generations[0][0].message.usage_metadata
+        except (AttributeError, IndexError):
+            pass
+        if usage:
+            span["tokens_in"] = usage.get("input_tokens")
+            span["tokens_out"] = usage.get("output_tokens")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._close_span(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._open_span(run_id, parent_run_id, "tool", name)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._close_span(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._close_span(run_id, error)
+
+
+class TimedCheckpointer(BaseCheckpointSaver):
+    """
+    체크포인터 호출 시간을 현재 실행의 checkpoint 구간으로 기록하는 래퍼
+
+    Args:
+        saver (BaseCheckpointSaver): 원래 체크포인터
+        tracer (GraphTracer): 추적기
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, tracer: GraphTracer):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.tracer = tracer
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    def _record(self, operation: str, config: Optional[dict], start_ms: float) -> None:
+        thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+        run = self.tracer.active_run(thread_id)
+        if run is not None:
+            run.add_span({
+                "kind": "checkpoint",
+                "name": operation,
+                "parent": None,
+                "start_ms": start_ms,
+                "duration_ms": round(_now_ms() - start_ms, 3),
+            })
+
+    def get_tuple(self, config):
+        start = _now_ms()
+        try:
+            return self.saver.get_tuple(config)
+        finally:
+            self._record("checkpoint.get", config, start)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        start = _now_ms()
+        try:
+            return self.saver.put(config, checkpoint, metadata, new_versions)
+        finally:
+            self._record("checkpoint.put", config, start)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        start = _now_ms()
+        try:
+            return self.saver.put_writes(config, writes, task_id, task_path)
+        finally:
+            self._record("checkpoint.put_writes", config, start)
+
+    async def aget_tuple(self, config):
+        start = _now_ms()
+        try:
+            return await self.saver.aget_tuple(config)
+        finally:
+            self._record("checkpoint.get", config, start)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        start = _now_ms()
+        try:
+            return await self.saver.aput(config, checkpoint, metadata, new_versions)
+        finally:
+            self._record("checkpoint.put", config, start)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        start = _now_ms()
+        try:
+            return await self.saver.aput_writes(config, writes, task_id, task_path)
+        finally:
+            self._record("checkpoint.put_writes", config, start)
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator:
+        return self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def alist(self, config, *, filter=None, before=None, limit=None):
+        return self.saver.alist(config, filter=filter, before=before, limit=limit)
+
+    def delete_thread(self, thread_id) -> None:
+        return self.saver.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id) -> None:
+        return await self.saver.adelete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+
+class TracedGraph:
+    """
+    컴파일된 그래프를 감싸 실행마다 추적 기록을 남기는 래퍼 (invoke/ainvoke/stream/astream 제공)
+
+    Args:
+        graph (CompiledStateGraph): 컴파일된 그래프
+        tracer (GraphTracer): 추적기
+        name (str): 기록에 사용할 그래프 이름
+    """
+
+    def __init__(self, graph, tracer: GraphTracer, name: str = "graph"):
+        self.graph = graph
+        self.tracer = tracer
+        self.name = name
+        if getattr(graph, "checkpointer", None) is not None and not isinstance(graph.checkpointer, TimedCheckpointer):
+            graph.checkpointer = TimedCheckpointer(graph.checkpointer, tracer)
+
+    def _begin(self, config: Optional[dict]):
+        config = dict(config or {})
+        thread_id = (config.get("configurable") or {}).get("thread_id")
+        run = self.tracer.start_run(self.name, thread_id)
+        callbacks = config.get("callbacks")
+        handler = TracingCallbackHandler(run)
+        if callbacks is None:
+            config["callbacks"] = [handler]
+        elif isinstance(callbacks, list):
+            config["callbacks"] = [*callbacks, handler]
+        else:
+            # CallbackManager가 넘어온 경우
+            callbacks = callbacks.copy()
+            callbacks.add_handler(handler, inherit=True)
+            config["callbacks"] = callbacks
+        return run, config
+
+    def invoke(self, input, config: Optional[dict] = None, **kwargs):
+        run, config = self._begin(config)
+        try:
+            result = self.graph.invoke(input, config, **kwargs)
+        except BaseException as e:
+            self.tracer.finish_run(run, e)
+            raise
+        self.tracer.finish_run(run)
+        return result
+
+    async def ainvoke(self, input, config: Optional[dict] = None, **kwargs):
+        run, config = self._begin(config)
+        try:
+            result = await self.graph.ainvoke(input, config, **kwargs)
+        except BaseException as e:
+            self.tracer.finish_run(run, e)
+            raise
+        self.tracer.finish_run(run)
+        return result
+
+    def stream(self, input, config: Optional[dict] = None, **kwargs):
+        run, config = self._begin(config)
+        try:
+            yield from self.graph.stream(input, config, **kwargs)
+        except BaseException as e:
+            self.tracer.finish_run(run, e)
+            raise
+        self.tracer.finish_run(run)
+
+    async def astream(self, input, config: Optional[dict] = None, **kwargs):
+        run, config = self._begin(config)
+        try:
+            async for chunk in self.graph.astream(input, config, **kwargs):
+                yield chunk
+        except BaseException as e:
+            self.tracer.finish_run(run, e)
+            raise
+        self.tracer.finish_run(run)
+
+    def __getattr__(self, name):
+        if name == "graph":
+            raise AttributeError(name)
+        return getattr(self.graph, name)
+
+
+def trace_graph(graph, tracer: Optional[GraphTracer] = None, name: str = "graph") -> TracedGraph:
+    """
+    컴파일된 그래프에 추적을 붙입니다.
+
+    Args:
+        graph (CompiledStateGraph): 컴파일된 그래프
+        tracer (GraphTracer): 추적기 (기본값: 환경 변수 GRAPH_TRACE_FILE 경로에 저장하는 추적기)
+        name (str): 기록에 사용할 그래프 이름
+
+    Returns:
+        TracedGraph: 추적이 붙은 그래프
+    """
+    return TracedGraph(graph, tracer or GraphTracer(os.environ.get("GRAPH_TRACE_FILE")), name=name)
+
+
+def load_runs(path: str) -> List[dict]:
+    """JSONL 추적 파일을 읽습니다. (깨진 줄은 건너뜀)"""
+    runs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return runs
+
+
+def _span_paths(run: dict) -> Iterator[tuple]:
+    spans = {span["id"]: span for span in run["spans"]}
+    for span in run["spans"]:
+        if span.get("duration_ms") is None:
+            continue
+        path = [f"{span['kind']}:{span['name']}"]
+        parent = span.get("parent")
+        while parent is not None and parent in spans:
+            path.append(f"{spans[parent]['kind']}:{spans[parent]['name']}")
+            parent = spans[parent].get("parent")
+        path.append(run["graph"])
+        yield tuple(reversed(path)), span
+
+
+def folded_stacks(runs: List[dict]) -> Dict[str, float]:
+    """
+    구간을 flamegraph 접힌 스택 형식(경로별 자기 시간 ms)으로 집계합니다.
+
+    Returns:
+        Dict[str, float]: "graph;node:agent;llm:llama3.1" 형식 경로별 자기 시간(ms)
+    """
+    self_ms: Dict[str, float] = defaultdict(float)
+    for run in runs:
+        children_ms: Dict[int, float] = defaultdict(float)
+        for span in run["spans"]:
+            if span.get("parent") is not None and span.get("duration_ms") is not None:
+                children_ms[span["parent"]] += span["duration_ms"]
+        accounted = 0.0
+        for path, span in _span_paths(run):
+            own = max(0.0, span["duration_ms"] - children_ms.get(span["id"], 0.0))
+            self_ms[";".join(path)] += own
+            if span.get("parent") is None:
+                accounted += span["duration_ms"]
+        # 노드/체크포인트 밖에서 보낸 시간 (Pregel 스케줄링 등)
+        self_ms[f"{run['graph']};(overhead)"] += max(0.0, run["duration_ms"] - accounted)
+    return dict(self_ms)
+
+
+def summarize(runs: List[dict], width: int = 40) -> str:
+    """
+    플레임 형식 요약과 노드별 p50/p95 표를 만듭니다.
+
+    Args:
+        runs (List[dict]): load_runs()로 읽은 실행 기록
+        width (int): 막대 그래프 너비
+
+    Returns:
+        str: 요약 문자열
+    """
+    if not runs:
+        return "기록된 실행이 없습니다."
+    total_ms = sum(run["duration_ms"] for run in runs)
+    lines = [
+        f"[그래프 실행 요약] 실행 {len(runs)}회, 평균 {total_ms / len(runs):.1f}ms, "
+        f"p95 {percentile([r['duration_ms'] for r in runs], 95):.1f}ms, "
+        f"반복 평균 {sum(r['loop_iterations'] for r in runs) / len(runs):.1f}회 (최대 {max(r['loop_iterations'] for r in runs)}), "
+        f"토큰 입력 {sum(r['tokens_in'] for r in runs)} / 출력 {sum(r['tokens_out'] for r in runs)}",
+        "",
+        "플레임 요약 (경로별 누적 시간, 자식 포함):",
+    ]
+
+    # 경로별 누적 시간(자식 포함) 트리
+    inclusive: Dict[tuple, float] = defaultdict(float)
+    for path, ms in folded_stacks(runs).items():
+        parts = tuple(path.split(";"))
+        for depth in range(1, len(parts) + 1):
+            inclusive[parts[:depth]] += ms
+
+    def walk(prefix: tuple, depth: int):
+        children = sorted((p for p in inclusive if len(p) == len(prefix) + 1 and p[:len(prefix)] == prefix), key=lambda p: -inclusive[p])
+        for child in children:
+            ms = inclusive[child]
+            bar = "█" * max(1, int(width * ms / total_ms)) if total_ms else ""
+            lines.append(f"{'  ' * depth}{child[-1]:<{36 - 2 * depth}} {ms:>10.1f}ms {100 * ms / total_ms:>5.1f}% {bar}")
+            walk(child, depth + 1)
+    walk((), 0)
+
+    # 노드/모델/도구/체크포인트별 지연 시간 분포
+    durations: Dict[tuple, List[float]] = defaultdict(list)
+    waits: Dict[tuple, List[float]] = defaultdict(list)
+    tokens: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0])
+    for run in runs:
+        for span in run["spans"]:
+            if span.get("duration_ms") is None:
+                continue
+            key = (span["kind"], span["name"])
+            durations[key].append(span["duration_ms"])
+            if span.get("queue_wait_ms") is not None:
+                waits[key].append(span["queue_wait_ms"])
+            if span["kind"] == "llm":
+                tokens[key][0] += span.get("tokens_in") or 0
+                tokens[key][1] += span.get("tokens_out") or 0
+
+    header = f"{'kind':<11} {'name':<24} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>10} {'wait p95':>9} {'tok in/out':>13}"
+    lines += ["", header, "-" * len(header)]
+    for key in sorted(durations, key=lambda k: -sum(durations[k])):
+        values = durations[key]
+        wait = f"{percentile(waits[key], 95):.1f}" if waits.get(key) else "-"
+        tok = f"{tokens[key][0]}/{tokens[key][1]}" if key[0] == "llm" else "-"
+        lines.append(
+            f"{key[0]:<11} {key[1][:24]:<24} {len(values):>6} {percentile(values, 50):>9.1f} "
+            f"{percentile(values, 95):>9.1f} {sum(values):>10.1f} {wait:>9} {tok:>13}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LangGraph 추적 기록(JSONL)을 요약합니다.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="플레임 형식 요약과 노드별 p50/p95 출력")
+    summary_parser.add_argument("path", help="추적 JSONL 파일 경로")
+    summary_parser.add_argument("--graph", default=None, help="이 이름의 그래프 실행만 요약")
+    summary_parser.add_argument("--last", type=int, default=None, help="최근 N개 실행만 요약")
+    summary_parser.add_argument("--folded", action="store_true", help="flamegraph.pl 입력 형식(접힌 스택, 마이크로초)으로 출력")
+    args = parser.parse_args(argv)
+
+    runs = load_runs(args.path)
+    if args.graph:
+        runs = [run for run in runs if run["graph"] == args.graph]
+    if args.last:
+        runs = runs[-args.last:]
+    if args.folded:
+        for path, ms in sorted(folded_stacks(runs).items()):
+            print(f"{path} {int(ms * 1000)}")
+    else:
+        print(summarize(runs))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
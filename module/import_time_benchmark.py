@@ -0,0 +1,183 @@
+"""
+모듈 임포트 시간 벤치마크
+
+`python -X importtime`으로 대상 모듈을 새 인터프리터에서 임포트하고,
+누적 임포트 시간과 가장 무거운 하위 모듈을 JSON-lines 파일에 기록합니다.
+이전 기록과 비교하여 시작 시간이 늘어났는지 추적할 수 있습니다.
+
+사용 예:
+    python import_time_benchmark.py rag_query vector_store_setting --repeat 5
+    python import_time_benchmark.py rag_query --max-ms 300
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULT_FILE = os.path.join(MODULE_DIR, "benchmarks", "import_time.jsonl")
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """
+    `-X importtime` 출력 결과를 파싱합니다.
+
+    Args:
+        stderr (str): 인터프리터의 표준 에러 출력
+
+    Returns:
+        List[dict]: 모듈별 self/cumulative 임포트 시간(마이크로초) 리스트
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # 헤더 줄("self [us] | cumulative | imported package")은 건너뜀
+            continue
+        name = fields[2]
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(fields[0].strip()),
+            "cumulative_us": int(fields[1].strip()),
+        })
+    return entries
+
+
+def measure_import(module_name: str, cwd: str = MODULE_DIR) -> dict:
+    """
+    새 인터프리터에서 모듈 하나를 임포트하고 시간을 측정합니다.
+
+    Args:
+        module_name (str): 임포트할 모듈 이름
+        cwd (str): 인터프리터를 실행할 디렉토리
+
+    Returns:
+        dict: 총 임포트 시간(ms), 벽시계 시간(ms), 모듈별 측정 결과
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{module_name} 임포트 실패:\n{proc.stderr[-2000:]}")
+
+    entries = parse_importtime(proc.stderr)
+    target = next((e for e in entries if e["module"] == module_name), None)
+    total_us = target["cumulative_us"] if target else sum(e["self_us"] for e in entries)
+    return {
+        "import_ms": total_us / 1000,
+        "wall_ms": wall_ms,
+        "module_count": len(entries),
+        "entries": entries,
+    }
+
+
+def benchmark(module_name: str, repeat: int = 3, top_n: int = 10) -> dict:
+    """
+    모듈 임포트 시간을 여러 번 측정하여 요약합니다.
+
+    Args:
+        module_name (str): 임포트할 모듈 이름
+        repeat (int): 반복 측정 횟수
+        top_n (int): 기록할 가장 무거운 모듈 수
+
+    Returns:
+        dict: 측정 요약 결과
+    """
+    runs = [measure_import(module_name) for _ in range(repeat)]
+    import_ms = [run["import_ms"] for run in runs]
+    best = min(runs, key=lambda run: run["import_ms"])
+
+    heaviest = sorted(best["entries"], key=lambda e: e["self_us"], reverse=True)[:top_n]
+    top_level = sorted(
+        {e["module"].split(".")[0] for e in best["entries"]}
+    )
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "module": module_name,
+        "repeat": repeat,
+        "import_ms_min": min(import_ms),
+        "import_ms_median": statistics.median(import_ms),
+        "wall_ms_median": statistics.median(run["wall_ms"] for run in runs),
+        "module_count": best["module_count"],
+        "top_level_packages": top_level,
+        "heaviest": [
+            {"module": e["module"], "self_ms": e["self_us"] / 1000, "cumulative_ms": e["cumulative_us"] / 1000}
+            for e in heaviest
+        ],
+    }
+
+
+def load_previous(result_file: str, module_name: str):
+    """
+    결과 파일에서 같은 모듈의 마지막 기록을 찾습니다.
+
+    Args:
+        result_file (str): JSON-lines 결과 파일 경로
+        module_name (str): 모듈 이름
+
+    Returns:
+        dict or None: 마지막 기록 또는 기록이 없으면 None
+    """
+    if not os.path.exists(result_file):
+        return None
+    previous = None
+    with open(result_file, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("module") == module_name:
+                previous = record
+    return previous
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="모듈 임포트 시간을 측정합니다.")
+    parser.add_argument("modules", nargs="*", default=["rag_query", "vector_store_setting"], help="측정할 모듈 이름")
+    parser.add_argument("--repeat", type=int, default=3, help="반복 측정 횟수")
+    parser.add_argument("--top", type=int, default=10, help="출력할 가장 무거운 모듈 수")
+    parser.add_argument("--output", default=DEFAULT_RESULT_FILE, help="결과를 추가할 JSON-lines 파일")
+    parser.add_argument("--max-ms", type=float, default=None, help="임포트 시간 상한 (초과 시 종료 코드 1)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    exit_code = 0
+
+    for module_name in args.modules:
+        result = benchmark(module_name, repeat=args.repeat, top_n=args.top)
+        previous = load_previous(args.output, module_name)
+
+        print(f"\n[{module_name}] 임포트 시간: {result['import_ms_median']:.1f}ms (최소 {result['import_ms_min']:.1f}ms, 모듈 {result['module_count']}개)")
+        if previous:
+            delta = result["import_ms_median"] - previous["import_ms_median"]
+            print(f"  - 이전 기록 대비: {delta:+.1f}ms ({previous['timestamp']})")
+        for entry in result["heaviest"]:
+            print(f"  - {entry['module']}: self {entry['self_ms']:.1f}ms / 누적 {entry['cumulative_ms']:.1f}ms")
+
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+        if args.max_ms is not None and result["import_ms_median"] > args.max_ms:
+            print(f"  - 임포트 시간 상한 초과: {result['import_ms_median']:.1f}ms > {args.max_ms:.1f}ms")
+            exit_code = 1
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+인제스트 단계별 계측 모듈
+
+벡터 저장소 생성 과정의 각 단계(discovery, parse, split, dedup, embed, index, persist)에 대해
+처리 개수, 바이트 수, 소요 시간, 처리량을 기록합니다.
+
+- 스팬이 끝날 때마다 JSON-lines 파일에 한 줄씩 기록
+- 단계별 누적 값은 Prometheus 텍스트 형식 파일로 내보내기 (node_exporter textfile collector용)
+- 실행이 끝나면 요약 표 출력
+
+사용 예:
+    metrics = IngestMetrics(jsonl_path="./metrics/ingest.jsonl", prometheus_path="./metrics/ingest.prom")
+    with metrics.span("parse") as span:
+        docs = load(...)
+        span.add(count=len(docs), nbytes=sum(len(d.page_content.encode()) for d in docs))
+    metrics.export_prometheus()
+    print(metrics.summary_table())
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 요약 표와 Prometheus 출력에서 사용할 기본 단계 순서
+STAGES = ["discovery", "parse", "split", "dedup", "embed", "index", "persist"]
+
+
+class Span:
+    """
+    단계 하나의 실행 구간
+
+    Args:
+        stage (str): 단계 이름
+        attrs (dict): 추가로 기록할 속성
+    """
+
+    def __init__(self, stage: str, attrs: Optional[dict] = None):
+        self.stage = stage
+        self.attrs = dict(attrs or {})
+        self.count = 0
+        self.nbytes = 0
+        self.started_at = time.time()
+        self._start_ns = time.perf_counter_ns()
+        self.duration_s = 0.0
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def add(self, count: int = 0, nbytes: int = 0) -> None:
+        """처리한 항목 수와 바이트 수를 누적합니다."""
+        self.count += count
+        self.nbytes += nbytes
+
+    def finish(self) -> None:
+        self.duration_s = (time.perf_counter_ns() - self._start_ns) / 1e9
+
+    def to_record(self, run_id: str) -> dict:
+        return {
+            "run_id": run_id,
+            "stage": self.stage,
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+            "count": self.count,
+            "bytes": self.nbytes,
+            "items_per_s": self.count / self.duration_s if self.duration_s > 0 else None,
+            "bytes_per_s": self.nbytes / self.duration_s if self.duration_s > 0 else None,
+            "status": self.status,
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+class StageStats:
+    """단계별 누적 통계"""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.calls = 0
+        self.errors = 0
+        self.count = 0
+        self.nbytes = 0
+        self.seconds = 0.0
+
+    def update(self, span: Span) -> None:
+        self.calls += 1
+        self.errors += span.status != "ok"
+        self.count += span.count
+        self.nbytes += span.nbytes
+        self.seconds += span.duration_s
+
+
+class IngestMetrics:
+    """
+    인제스트 계측 수집기
+
+    Args:
+        jsonl_path (str): 스팬 기록을 추가할 JSON-lines 파일 경로 (None이면 기록하지 않음)
+        prometheus_path (str): Prometheus 텍스트 형식으로 내보낼 파일 경로 (None이면 내보내지 않음)
+        run_id (str): 실행 식별자 (기본값: 임의 생성)
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None, run_id: Optional[str] = None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.stats: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+        for path in (jsonl_path, prometheus_path):
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @contextmanager
+    def span(self, stage: str, **attrs) -> Iterator[Span]:
+        """
+        단계 실행 구간을 측정하는 컨텍스트 매니저
+
+        예외가 발생해도 소요 시간과 오류 내용을 기록한 뒤 예외를 그대로 다시 발생시킵니다.
+
+        Args:
+            stage (str): 단계 이름
+            **attrs: 함께 기록할 속성 (예: batch=3)
+
+        Yields:
+            Span: 처리 개수/바이트 수를 누적할 스팬 객체
+        """
+        span = Span(stage, attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.finish()
+            self._record(span)
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            stats = self.stats.setdefault(span.stage, StageStats(span.stage))
+            stats.update(span)
+            if self.jsonl_path:
+                try:
+                    with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(span.to_record(self.run_id), ensure_ascii=False) + "\n")
+                except OSError as e:
+                    logger.warning(f"계측 기록 실패: {e}")
+
+    def _ordered_stats(self) -> List[StageStats]:
+        ordered = [self.stats[stage] for stage in STAGES if stage in self.stats]
+        ordered += [stats for stage, stats in self.stats.items() if stage not in STAGES]
+        return ordered
+
+    def export_prometheus(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        단계별 누적 값을 Prometheus 텍스트 형식으로 저장합니다.
+
+        수집기가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체합니다.
+
+        Args:
+            path (str): 저장할 파일 경로 (기본값: prometheus_path)
+
+        Returns:
+            str or None: 저장한 파일 경로
+        """
+        path = path or self.prometheus_path
+        if not path:
+            return None
+
+        metrics = [
+            ("rag_ingest_stage_seconds_total", "단계별 누적 소요 시간(초)", "counter", lambda s: s.seconds),
+            ("rag_ingest_stage_items_total", "단계별 누적 처리 항목 수", "counter", lambda s: s.count),
+            ("rag_ingest_stage_bytes_total", "단계별 누적 처리 바이트 수", "counter", lambda s: s.nbytes),
+            ("rag_ingest_stage_calls_total", "단계별 실행 횟수", "counter", lambda s: s.calls),
+            ("rag_ingest_stage_errors_total", "단계별 실패 횟수", "counter", lambda s: s.errors),
+            ("rag_ingest_stage_items_per_second", "단계별 처리량(항목/초)", "gauge", lambda s: s.count / s.seconds if s.seconds > 0 else 0),
+        ]
+        lines = []
+        with self._lock:
+            stats = self._ordered_stats()
+            for name, help_text, metric_type, getter in metrics:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for s in stats:
+                    lines.append(f'{name}{{stage="{s.stage}"}} {getter(s)}')
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return path
+
+    def summary_table(self) -> str:
+        """
+        단계별 요약 표 문자열을 생성합니다.
+
+        Returns:
+            str: 요약 표
+        """
+        header = f"{'stage':<10} {'calls':>6} {'items':>9} {'MB':>9} {'seconds':>9} {'share':>7} {'items/s':>10} {'MB/s':>8}"
+        rows = [f"[인제스트 계측 요약] run_id={self.run_id}", header, "-" * len(header)]
+        with self._lock:
+            stats = self._ordered_stats()
+        total_seconds = sum(s.seconds for s in stats)
+        for s in stats:
+            share = s.seconds / total_seconds * 100 if total_seconds > 0 else 0
+            items_per_s = s.count / s.seconds if s.seconds > 0 else 0
+            mb_per_s = s.nbytes / 1e6 / s.seconds if s.seconds > 0 else 0
+            rows.append(
+                f"{s.stage:<10} {s.calls:>6} {s.count:>9} {s.nbytes / 1e6:>9.2f} {s.seconds:>9.3f} {share:>6.1f}% {items_per_s:>10.1f} {mb_per_s:>8.2f}"
+            )
+        rows.append("-" * len(header))
+        rows.append(f"{'total':<10} {'':>6} {'':>9} {'':>9} {total_seconds:>9.3f} (경과 {time.perf_counter() - self._started:.3f}초)")
+        return "\n".join(rows)
+
+
+def text_bytes(texts) -> int:
+    """텍스트 목록의 UTF-8 바이트 수 합계를 구합니다."""
+    return sum(len(text.encode("utf-8")) for text in texts)
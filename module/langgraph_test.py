@@ -1,12 +1,16 @@
-from typing import Literal
+import argparse
+import time
+from typing import Literal, Optional
 
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langchain_core.tools import tool
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, START, StateGraph, MessagesState
 from langgraph.prebuilt import ToolNode
 import utils
-from langchain_ollama.chat_models import ChatOllama
-from langchain_nomic.embeddings import NomicEmbeddings
+from graph_tracing import trace_graph
+from ollama_scheduler import create_scheduled_chat_model
+from query_decomposition import build_decomposition_graph
 
 
 
@@ -23,73 +27,190 @@ def search(query: str):
 
 tools = [search]
 
-tool_node = ToolNode(tools)
-
-model = ChatOllama(model=utils.get_available_ollama_models()[0]).bind_tools(tools)
-
-# model = ChatAnthropic(model="claude-3-5-sonnet-latest", temperature=0).bind_tools(tools)
-
-# Define the function that determines whether to continue or not
-def should_continue(state: MessagesState) -> Literal["tools", END]:
-    messages = state['messages']
-    last_message = messages[-1]
-    # If the LLM makes a tool call, then we route to the "tools" node
-    if last_message.tool_calls:
-        return "tools"
-    # Otherwise, we stop (reply to the user)
-    return END
-
-
-# Define the function that calls the model
-def call_model(state: MessagesState):
-    messages = state['messages']
-    response = model.invoke(messages)
-    # We return a list, because this will get added to the existing list
-    return {"messages": [response]}
-
-
-# Define a new graph
-workflow = StateGraph(MessagesState)
-
-# Define the two nodes we will cycle between
-workflow.add_node("agent", call_model)
-workflow.add_node("tools", tool_node)
-
-# Set the entrypoint as `agent`
-# This means that this node is the first one called
-workflow.add_edge(START, "agent")
-
-# We now add a conditional edge
-workflow.add_conditional_edges(
-    # First, we define the start node. We use `agent`.
-    # This means these are the edges taken after the `agent` node is called.
-    "agent",
-    # Next, we pass in the function that will determine which node is called next.
-    should_continue,
-)
-
-# We now add a normal edge from `tools` to `agent`.
-# This means that after `tools` is called, `agent` node is called next.
-workflow.add_edge("tools", 'agent')
-
-# Initialize memory to persist state between graph runs
-checkpointer = MemorySaver()
-
-# Finally, we compile it!
-# This compiles it into a LangChain Runnable,
-# meaning you can use it as you would any other runnable.
-# Note that we're (optionally) passing the memory when compiling the graph
-app = workflow.compile(checkpointer=checkpointer)
-
-# Use the agent
-final_state = app.invoke(
-    {"messages": [{"role": "user", "content": "what is the weather in sf"}]},
-    config={"configurable": {"thread_id": 42}}
-)
-final_state["messages"][-1].content
-
-print(final_state["messages"][-1].content)
-
-
-
-
+FINALIZE_INSTRUCTION = "더 이상 도구를 사용할 수 없습니다. 지금까지 얻은 정보만으로 질문에 대한 최종 답변을 작성하세요."
+
+
+class AgentState(MessagesState):
+    # 실행마다 budget_init 노드에서 초기화되는 예산 사용량
+    iterations: int
+    tokens_used: int
+    started_at: float  # time.monotonic() (시계 조정에 영향받지 않음)
+    budget_limited: bool
+    budget_reason: Optional[str]
+
+
+class AgentBudget:
+    """
+    에이전트 실행 하나에 대한 예산
+
+    Args:
+        max_iterations (int): 최대 agent 호출 횟수 (agent <-> tools 반복 횟수 + 1)
+        max_seconds (float): 최대 실행 시간(초)
+        max_tokens (int): 모델 호출 전체의 최대 토큰 수 (입력 + 출력)
+    """
+
+    def __init__(self, max_iterations: int = 5, max_seconds: float = 60.0, max_tokens: int = 8000):
+        self.max_iterations = max_iterations
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+
+    def exhausted(self, state: AgentState) -> Optional[str]:
+        """
+        예산을 다 썼으면 그 이유를 반환합니다.
+
+        Args:
+            state (AgentState): 현재 그래프 상태
+
+        Returns:
+            str or None: "iterations", "wall_time", "tokens" 중 하나 (예산이 남아 있으면 None)
+        """
+        if state.get("iterations", 0) >= self.max_iterations:
+            return "iterations"
+        if time.monotonic() - state.get("started_at", time.monotonic()) >= self.max_seconds:
+            return "wall_time"
+        if state.get("tokens_used", 0) >= self.max_tokens:
+            return "tokens"
+        return None
+
+
+def _response_tokens(response: AIMessage) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return usage["total_tokens"]
+    return utils.count_tokens(str(response.content))
+
+
+def build_agent_graph(model, final_model, tools, budget: Optional[AgentBudget] = None, checkpointer=None):
+    """
+    예산이 적용된 agent <-> tools 그래프를 생성합니다.
+
+    예산(반복 횟수, 실행 시간, 토큰 수)을 다 쓰면 도구 호출을 멈추고 finalize 노드에서
+    지금까지의 상태로 최종 답변을 만든 뒤 budget_limited=True로 표시합니다.
+
+    Args:
+        model: 도구가 바인딩된 채팅 모델
+        final_model: 도구 없이 최종 답변을 만들 채팅 모델
+        tools (list): 에이전트가 사용할 도구 목록
+        budget (AgentBudget): 실행 예산 (기본값: AgentBudget())
+        checkpointer: 체크포인터 (None이면 사용하지 않음)
+
+    Returns:
+        CompiledStateGraph: 컴파일된 그래프
+    """
+    budget = budget or AgentBudget()
+
+    def budget_init(state: AgentState):
+        return {"iterations": 0, "tokens_used": 0, "started_at": time.monotonic(), "budget_limited": False, "budget_reason": None}
+
+    # Define the function that calls the model
+    def call_model(state: AgentState):
+        messages = state['messages']
+        response = model.invoke(messages)
+        # We return a list, because this will get added to the existing list
+        return {
+            "messages": [response],
+            "iterations": state.get("iterations", 0) + 1,
+            "tokens_used": state.get("tokens_used", 0) + _response_tokens(response),
+        }
+
+    # Define the function that determines whether to continue or not
+    def should_continue(state: AgentState) -> Literal["tools", "finalize", END]:
+        messages = state['messages']
+        last_message = messages[-1]
+        # If the LLM makes a tool call, then we route to the "tools" node
+        if last_message.tool_calls:
+            # 예산을 다 썼으면 도구를 더 호출하지 않고 최종 답변 작성
+            return "finalize" if budget.exhausted(state) else "tools"
+        # Otherwise, we stop (reply to the user)
+        return END
+
+    def after_tools(state: AgentState) -> Literal["agent", "finalize"]:
+        # 도구 실행 중에 실행 시간 예산을 넘겼을 수 있으므로 다시 확인 (예산을 넘겼으면 agent를 더 호출하지 않음)
+        return "finalize" if budget.exhausted(state) else "agent"
+
+    def finalize(state: AgentState):
+        reason = budget.exhausted(state) or "iterations"
+        messages = list(state["messages"])
+        # 응답받지 못한 도구 호출이 남은 마지막 메시지는 빼고 지금까지의 결과로 답변
+        if isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
+            messages = messages[:-1]
+        try:
+            response = final_model.invoke(messages + [HumanMessage(content=FINALIZE_INSTRUCTION)])
+            tokens = _response_tokens(response)
+        except Exception as e:
+            # 최종 답변 생성도 실패하면 지금까지의 도구 결과를 그대로 반환
+            tool_results = [str(m.content) for m in messages if isinstance(m, ToolMessage)]
+            response = AIMessage(content="\n".join(tool_results) or f"예산 초과로 답변을 완료하지 못했습니다: {e}")
+            tokens = 0
+        response.response_metadata = {**(response.response_metadata or {}), "budget_limited": True, "budget_reason": reason}
+        return {
+            "messages": [response],
+            "tokens_used": state.get("tokens_used", 0) + tokens,
+            "budget_limited": True,
+            "budget_reason": reason,
+        }
+
+    # Define a new graph
+    workflow = StateGraph(AgentState)
+
+    # Define the nodes we will cycle between
+    workflow.add_node("budget_init", budget_init)
+    workflow.add_node("agent", call_model)
+    workflow.add_node("tools", ToolNode(tools))
+    workflow.add_node("finalize", finalize)
+
+    # Set the entrypoint as `budget_init`, which resets the budget for every run
+    workflow.add_edge(START, "budget_init")
+    workflow.add_edge("budget_init", "agent")
+
+    # We now add a conditional edge
+    workflow.add_conditional_edges(
+        # First, we define the start node. We use `agent`.
+        # This means these are the edges taken after the `agent` node is called.
+        "agent",
+        # Next, we pass in the function that will determine which node is called next.
+        should_continue,
+    )
+
+    # After `tools` is called, `agent` node is called next unless the wall time budget ran out.
+    workflow.add_conditional_edges("tools", after_tools)
+    workflow.add_edge("finalize", END)
+
+    # Finally, we compile it!
+    # This compiles it into a LangChain Runnable,
+    # meaning you can use it as you would any other runnable.
+    return workflow.compile(checkpointer=checkpointer)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("question", nargs="?", default="what is the weather in sf")
+    # 여러 부분으로 된 질문은 하위 질의로 나누어 병렬로 조사한 뒤 종합 (query_decomposition.py)
+    parser.add_argument("--decompose", action="store_true")
+    args = parser.parse_args()
+
+    base_model = create_scheduled_chat_model(utils.get_available_ollama_models()[0], priority="agent")
+    model = base_model.bind_tools(tools)
+
+    # model = ChatAnthropic(model="claude-3-5-sonnet-latest", temperature=0).bind_tools(tools)
+
+    # Initialize memory to persist state between graph runs
+    checkpointer = MemorySaver()
+
+    if args.decompose:
+        app = build_decomposition_graph(base_model, search, max_concurrency=3, checkpointer=checkpointer)
+    else:
+        app = build_agent_graph(model, base_model, tools, budget=AgentBudget(), checkpointer=checkpointer)
+
+    # 노드별 실행 시간을 기록 (환경 변수 GRAPH_TRACE_FILE에 JSONL로 저장, graph_tracing.py summary로 요약)
+    app = trace_graph(app, name="langgraph_test")
+
+    # Use the agent
+    final_state = app.invoke(
+        {"messages": [{"role": "user", "content": args.question}]},
+        config={"configurable": {"thread_id": 42}}
+    )
+
+    print(final_state["messages"][-1].content)
+    if final_state.get("budget_limited"):
+        print(f"(예산 초과로 조기 종료: {final_state['budget_reason']})")
@@ -0,0 +1,203 @@
+"""
+메타데이터 인덱스 모듈
+
+벡터 저장소의 각 청크 위치(행 번호)를 source_file, page, doc_type 별로 정렬된 ID 리스트로 미리 색인합니다.
+필터가 있는 검색에서 top-k를 먼저 뽑은 뒤 거르는 대신, 조건에 맞는 ID만 대상으로 검색할 수 있습니다.
+
+인덱스는 인제스트 시점에 만들어지고 벡터 저장소 옆에 JSON 파일로 저장됩니다.
+"""
+
+import bisect
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 파일 이름에 포함된 키워드로 문서 종류를 분류하는 기본 규칙 (앞에 있는 규칙이 우선)
+DEFAULT_DOCUMENT_TYPE_RULES: List[Tuple[str, str]] = [
+    ("약관", "policy"),
+    ("policy", "policy"),
+    ("상품", "product"),
+    ("product", "product"),
+    ("안내", "guide"),
+    ("guide", "guide"),
+    ("매뉴얼", "manual"),
+    ("manual", "manual"),
+]
+
+INDEX_FILE_NAME = "metadata_index.json"
+
+
+def classify_document_type(file_name: str, rules: Optional[Sequence[Tuple[str, str]]] = None) -> str:
+    """
+    파일 이름으로 문서 종류를 분류합니다.
+
+    Args:
+        file_name (str): 파일 이름
+        rules (Sequence[Tuple[str, str]]): (키워드, 문서 종류) 규칙 목록
+
+    Returns:
+        str: 문서 종류 (일치하는 규칙이 없으면 "other")
+    """
+    lowered = file_name.lower()
+    for keyword, doc_type in rules or DEFAULT_DOCUMENT_TYPE_RULES:
+        if keyword.lower() in lowered:
+            return doc_type
+    return "other"
+
+
+def _intersect_sorted(a: List[int], b: List[int]) -> List[int]:
+    """정렬된 두 ID 리스트의 교집합을 구합니다."""
+    if len(a) > len(b):
+        a, b = b, a
+    lookup = set(b)
+    return [i for i in a if i in lookup]
+
+
+def _union_sorted(lists: Iterable[List[int]]) -> List[int]:
+    """정렬된 ID 리스트들의 합집합을 정렬된 리스트로 구합니다."""
+    merged = set()
+    for ids in lists:
+        merged.update(ids)
+    return sorted(merged)
+
+
+class MetadataIndex:
+    """
+    청크 위치 기반 메타데이터 인덱스
+
+    - source_file, doc_type: 값별 정렬된 ID 리스트
+    - page: (page, id) 순으로 정렬된 병렬 배열 (범위 검색은 이분 탐색)
+    """
+
+    def __init__(self):
+        self.source_files: Dict[str, List[int]] = {}
+        self.doc_types: Dict[str, List[int]] = {}
+        self.page_keys: List[int] = []
+        self.page_ids: List[int] = []
+        self.size = 0
+
+    @classmethod
+    def build(cls, metadatas: Sequence[dict]) -> "MetadataIndex":
+        """
+        메타데이터 목록으로 인덱스를 생성합니다. 리스트 순서가 벡터 저장소의 행 번호와 같아야 합니다.
+
+        Args:
+            metadatas (Sequence[dict]): 청크별 메타데이터
+
+        Returns:
+            MetadataIndex: 생성된 인덱스
+        """
+        index = cls()
+        index.add(metadatas, start_id=0)
+        return index
+
+    def add(self, metadatas: Sequence[dict], start_id: Optional[int] = None) -> None:
+        """
+        청크 메타데이터를 인덱스에 추가합니다.
+
+        Args:
+            metadatas (Sequence[dict]): 추가할 청크별 메타데이터
+            start_id (int): 첫 청크의 행 번호 (기본값: 현재 크기)
+        """
+        start_id = self.size if start_id is None else start_id
+        new_pages = []
+        for offset, metadata in enumerate(metadatas):
+            chunk_id = start_id + offset
+            source_file = metadata.get("source_file") or os.path.basename(metadata.get("source", "") or "")
+            doc_type = metadata.get("doc_type") or classify_document_type(source_file)
+            # 새 ID는 항상 기존 ID보다 크므로 append만으로 정렬이 유지됨
+            self.source_files.setdefault(source_file, []).append(chunk_id)
+            self.doc_types.setdefault(doc_type, []).append(chunk_id)
+            page = metadata.get("page")
+            if isinstance(page, int):
+                new_pages.append((page, chunk_id))
+
+        if new_pages:
+            merged = sorted(list(zip(self.page_keys, self.page_ids)) + new_pages)
+            self.page_keys = [page for page, _ in merged]
+            self.page_ids = [chunk_id for _, chunk_id in merged]
+        self.size = max(self.size, start_id + len(metadatas))
+
+    def _ids_in_page_range(self, page_range: Tuple[Optional[int], Optional[int]]) -> List[int]:
+        low, high = page_range
+        lo = 0 if low is None else bisect.bisect_left(self.page_keys, low)
+        hi = len(self.page_keys) if high is None else bisect.bisect_right(self.page_keys, high)
+        return sorted(self.page_ids[lo:hi])
+
+    def select(
+        self,
+        source_files: Optional[Iterable[str]] = None,
+        page_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+        doc_types: Optional[Iterable[str]] = None,
+    ) -> Optional[List[int]]:
+        """
+        조건에 맞는 청크 ID를 구합니다. 같은 조건 안의 값들은 OR, 서로 다른 조건은 AND로 결합합니다.
+
+        Args:
+            source_files (Iterable[str]): 포함할 파일 이름 목록
+            page_range (Tuple[int, int]): 포함할 페이지 범위 (양 끝 포함, None은 제한 없음)
+            doc_types (Iterable[str]): 포함할 문서 종류 목록
+
+        Returns:
+            List[int] or None: 정렬된 청크 ID 리스트 (조건이 하나도 없으면 None = 전체)
+        """
+        candidates: Optional[List[int]] = None
+
+        def narrow(ids: List[int]) -> List[int]:
+            return ids if candidates is None else _intersect_sorted(candidates, ids)
+
+        if source_files is not None:
+            candidates = narrow(_union_sorted(self.source_files.get(name, []) for name in source_files))
+        if doc_types is not None:
+            candidates = narrow(_union_sorted(self.doc_types.get(doc_type, []) for doc_type in doc_types))
+        if page_range is not None:
+            candidates = narrow(self._ids_in_page_range(page_range))
+        return candidates
+
+    def to_dict(self) -> dict:
+        return {
+            "version": 1,
+            "size": self.size,
+            "source_files": self.source_files,
+            "doc_types": self.doc_types,
+            "page_keys": self.page_keys,
+            "page_ids": self.page_ids,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MetadataIndex":
+        index = cls()
+        index.size = data["size"]
+        index.source_files = data["source_files"]
+        index.doc_types = data["doc_types"]
+        index.page_keys = data["page_keys"]
+        index.page_ids = data["page_ids"]
+        return index
+
+    def save(self, path: str) -> None:
+        """
+        인덱스를 JSON 파일로 저장합니다. (임시 파일에 쓴 뒤 교체)
+
+        Args:
+            path (str): 저장할 파일 경로
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["MetadataIndex"]:
+        """
+        JSON 파일에서 인덱스를 로드합니다.
+
+        Args:
+            path (str): 로드할 파일 경로
+
+        Returns:
+            MetadataIndex or None: 로드된 인덱스 (파일이 없으면 None)
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
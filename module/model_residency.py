@@ -0,0 +1,402 @@
+"""
+Ollama 모델 상주(residency) 관리 모듈
+
+모델을 바꿀 때마다 Ollama가 모델을 새로 메모리에 올리느라 첫 토큰이 크게 늦어지는 문제를 줄입니다.
+
+- 시작 시 설정된 모델(global_variables.ollama_preload_models)을 RAM 예산 안에서 미리 로드
+- /api/ps로 현재 로드된 모델과 메모리 사용량을 확인
+- 최근 사용 빈도에 따라 모델별 keep_alive를 조정 (자주 쓰는 모델은 오래 유지)
+- 새 모델을 올릴 때 예산을 넘으면 가장 오래 사용하지 않은 모델부터 언로드 (keep_alive=0)
+- 앱에서 모델을 선택하는 즉시 ensure_loaded()로 백그라운드 로드를 시작하여 질문 입력 시간과 겹치게 함
+
+사용 예:
+    manager = get_residency_manager()
+    manager.start()                                  # 설정된 모델 프리로드 (백그라운드)
+    manager.ensure_loaded("llama3.1")                # 모델 선택 시
+    llm = ChatOllama(model="llama3.1", keep_alive=manager.keep_alive_for("llama3.1"))
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import global_variables as gv
+from ollama_scheduler import get_scheduler, priority_client_kwargs
+
+logger = logging.getLogger(__name__)
+
+GIB = 1024 ** 3
+
+
+def is_embedding_model(model: str) -> bool:
+    """임베딩 모델 여부 (프리로드 요청 경로가 다름)"""
+    return model in gv.ollama_embedding_models or "embed" in model
+
+
+def _normalize(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+
+class ResidentModel:
+    """
+    모델 하나의 상주 상태와 최근 사용 기록
+
+    Args:
+        name (str): 모델 이름 (태그 포함)
+        demand_window (float): 사용 빈도를 계산할 기간(초)
+    """
+
+    def __init__(self, name: str, demand_window: float):
+        self.name = name
+        self.demand_window = demand_window
+        self.size = 0
+        self.loaded = False
+        self.loading = False
+        self.expires_at: Optional[str] = None
+        self.last_used = 0.0
+        self.uses: deque = deque()
+        self.loads = 0
+        self.evictions = 0
+        self.last_load_seconds: Optional[float] = None
+
+    def record_use(self, now: float) -> None:
+        self.last_used = now
+        self.uses.append(now)
+        self._trim(now)
+
+    def demand(self, now: float) -> int:
+        self._trim(now)
+        return len(self.uses)
+
+    def _trim(self, now: float) -> None:
+        while self.uses and now - self.uses[0] > self.demand_window:
+            self.uses.popleft()
+
+
+class ModelResidencyManager:
+    """
+    Ollama 서버 하나의 모델 상주 관리자
+
+    Args:
+        base_url (str): Ollama 서버 주소 (기본값: global_variables.ollama_base_url)
+        ram_budget_bytes (int): 상주 모델 전체 메모리 예산(바이트)
+        preload_models (List[str]): 시작 시 미리 로드할 모델 (앞쪽이 우선)
+        min_keep_alive (int): 사용 기록이 없는 모델의 keep_alive(초)
+        max_keep_alive (int): 가장 자주 쓰는 모델의 keep_alive(초)
+        demand_window (float): 사용 빈도를 계산할 기간(초)
+        hot_uses (int): 이 횟수 이상 사용된 모델은 max_keep_alive 적용
+        refresh_interval (float): /api/ps 상태를 다시 읽는 최소 간격(초)
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        ram_budget_bytes: Optional[int] = None,
+        preload_models: Optional[List[str]] = None,
+        min_keep_alive: int = 300,
+        max_keep_alive: int = 3600,
+        demand_window: float = 1800.0,
+        hot_uses: int = 10,
+        refresh_interval: float = 5.0,
+    ):
+        self.base_url = (base_url or gv.ollama_base_url).rstrip("/")
+        self.ram_budget_bytes = ram_budget_bytes if ram_budget_bytes is not None else int(gv.ollama_ram_budget_gb * GIB)
+        self.preload_models = list(gv.ollama_preload_models if preload_models is None else preload_models)
+        self.min_keep_alive = min_keep_alive
+        self.max_keep_alive = max_keep_alive
+        self.demand_window = demand_window
+        self.hot_uses = hot_uses
+        self.refresh_interval = refresh_interval
+
+        self.scheduler = get_scheduler(self.base_url)
+        self._models: Dict[str, ResidentModel] = {}
+        self._disk_sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._last_refresh = 0.0
+        self._started = False
+
+    def _client(self, priority: str = "batch"):
+        import httpx
+
+        return httpx.Client(base_url=self.base_url, timeout=600.0, **priority_client_kwargs(priority))
+
+    def _model(self, name: str) -> ResidentModel:
+        name = _normalize(name)
+        model = self._models.get(name)
+        if model is None:
+            model = ResidentModel(name, self.demand_window)
+            self._models[name] = model
+        return model
+
+    def refresh(self, force: bool = False) -> Dict[str, ResidentModel]:
+        """
+        /api/ps로 현재 로드된 모델과 메모리 사용량을 갱신합니다.
+
+        Args:
+            force (bool): refresh_interval과 관계없이 다시 읽을지 여부
+
+        Returns:
+            Dict[str, ResidentModel]: 모델별 상태
+        """
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return self._models
+        with self._client() as client:
+            response = client.get("/api/ps")
+            response.raise_for_status()
+            running = {_normalize(m.get("name") or m.get("model")): m for m in response.json().get("models", [])}
+            if not self._disk_sizes:
+                tags = client.get("/api/tags")
+                tags.raise_for_status()
+                self._disk_sizes = {_normalize(m.get("name") or m.get("model")): int(m.get("size") or 0) for m in tags.json().get("models", [])}
+
+        with self._lock:
+            for name, model in self._models.items():
+                if name not in running and not model.loading:
+                    model.loaded = False
+            for name, info in running.items():
+                model = self._model(name)
+                model.loaded = True
+                model.size = int(info.get("size") or 0)
+                model.expires_at = info.get("expires_at")
+            self._last_refresh = time.monotonic()
+        return self._models
+
+    def available_models(self) -> List[str]:
+        """서버에 설치된 모델 이름 목록 (/api/tags)"""
+        if not self._disk_sizes:
+            self.refresh(force=True)
+        return list(self._disk_sizes)
+
+    def estimated_size(self, name: str) -> int:
+        """로드 시 필요한 메모리 추정값 (로드된 적이 있으면 실제 크기, 없으면 모델 파일 크기)"""
+        model = self._models.get(_normalize(name))
+        if model is not None and model.size:
+            return model.size
+        return self._disk_sizes.get(_normalize(name), 0)
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(m.size for m in self._models.values() if m.loaded)
+
+    def keep_alive_for(self, name: str, record: bool = True) -> int:
+        """
+        최근 사용 빈도에 따른 keep_alive(초)를 계산합니다. 요청마다 호출하면 사용 기록도 남깁니다.
+
+        Args:
+            name (str): 모델 이름
+            record (bool): 이번 호출을 사용 기록에 추가할지 여부
+
+        Returns:
+            int: Ollama 요청에 넘길 keep_alive(초)
+        """
+        now = time.monotonic()
+        with self._lock:
+            model = self._model(name)
+            if record:
+                model.record_use(now)
+            ratio = min(1.0, model.demand(now) / self.hot_uses)
+        return int(self.min_keep_alive + (self.max_keep_alive - self.min_keep_alive) * ratio)
+
+    def _lru_victims(self, needed: int, protect: set) -> List[ResidentModel]:
+        with self._lock:
+            free = self.ram_budget_bytes - self.resident_bytes()
+            if free >= needed:
+                return []
+            candidates = sorted(
+                (m for m in self._models.values() if m.loaded and m.name not in protect),
+                key=lambda m: m.last_used,
+            )
+            victims = []
+            for model in candidates:
+                if free >= needed:
+                    break
+                victims.append(model)
+                free += model.size
+            return victims
+
+    def evict(self, name: str) -> None:
+        """
+        모델을 즉시 언로드합니다. (keep_alive=0 요청)
+
+        Args:
+            name (str): 모델 이름
+        """
+        name = _normalize(name)
+        path, payload = self._request_for(name, keep_alive=0)
+        with self._client() as client:
+            client.post(path, json=payload).raise_for_status()
+        with self._lock:
+            model = self._model(name)
+            model.loaded = False
+            model.evictions += 1
+        logger.info(f"모델 언로드: {name} (예산 {self.ram_budget_bytes / GIB:.1f}GB)")
+
+    def _request_for(self, name: str, keep_alive: int):
+        if is_embedding_model(name):
+            return "/api/embed", {"model": name, "input": [], "keep_alive": keep_alive}
+        return "/api/generate", {"model": name, "prompt": "", "keep_alive": keep_alive}
+
+    def load(self, name: str, priority: str = "batch") -> bool:
+        """
+        필요하면 LRU 모델을 언로드하여 예산을 확보한 뒤 모델을 로드합니다.
+
+        Args:
+            name (str): 모델 이름
+            priority (str): 로드 요청의 스케줄러 우선순위
+
+        Returns:
+            bool: 로드 여부 (예산보다 큰 모델이거나 실패하면 False)
+        """
+        name = _normalize(name)
+        self.refresh()
+        needed = self.estimated_size(name)
+        with self._lock:
+            model = self._model(name)
+            if model.loaded:
+                return True
+            if needed > self.ram_budget_bytes:
+                logger.warning(f"모델 {name}({needed / GIB:.1f}GB)이 RAM 예산({self.ram_budget_bytes / GIB:.1f}GB)보다 커서 로드하지 않습니다.")
+                return False
+            model.loading = True
+            victims = self._lru_victims(needed, protect={name})
+
+        try:
+            for victim in victims:
+                self.evict(victim.name)
+            path, payload = self._request_for(name, keep_alive=self.keep_alive_for(name, record=False))
+            started = time.perf_counter()
+            with self.scheduler.slot(priority), self._client(priority) as client:
+                client.post(path, json=payload).raise_for_status()
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            logger.warning(f"모델 로드 실패: {name} ({e})")
+            return False
+        finally:
+            with self._lock:
+                model.loading = False
+
+        with self._lock:
+            model.loaded = True
+            model.loads += 1
+            model.last_load_seconds = elapsed
+            model.last_used = model.last_used or time.monotonic()
+        self.refresh(force=True)
+        logger.info(f"모델 로드: {name} ({elapsed:.2f}초, 상주 {self.resident_bytes() / GIB:.1f}/{self.ram_budget_bytes / GIB:.1f}GB)")
+        return True
+
+    def ensure_loaded(self, name: str, block: bool = False, priority: str = "interactive") -> Optional[threading.Thread]:
+        """
+        모델이 로드되어 있지 않으면 로드를 시작합니다. (앱에서 모델을 선택했을 때 호출)
+
+        Args:
+            name (str): 모델 이름
+            block (bool): 로드가 끝날 때까지 기다릴지 여부
+            priority (str): 로드 요청의 스케줄러 우선순위
+
+        Returns:
+            threading.Thread or None: 백그라운드 로드 스레드 (이미 로드되었거나 block=True면 None)
+        """
+        with self._lock:
+            model = self._model(name)
+            model.last_used = time.monotonic()
+            if model.loaded or model.loading:
+                return None
+        if block:
+            self.load(name, priority)
+            return None
+        thread = threading.Thread(target=self.load, args=(name, priority), name=f"model-load-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def start(self, block: bool = False) -> Optional[threading.Thread]:
+        """
+        설정된 모델을 RAM 예산 안에서 순서대로 미리 로드합니다. 여러 번 호출해도 한 번만 실행합니다.
+
+        Args:
+            block (bool): 프리로드가 끝날 때까지 기다릴지 여부
+
+        Returns:
+            threading.Thread or None: 백그라운드 프리로드 스레드
+        """
+        with self._lock:
+            if self._started:
+                return None
+            self._started = True
+
+        def preload():
+            try:
+                available = set(self.available_models())
+            except Exception as e:
+                logger.warning(f"Ollama 서버에 연결할 수 없어 프리로드를 건너뜁니다: {e}")
+                return
+            budget_left = self.ram_budget_bytes
+            for name in self.preload_models:
+                name = _normalize(name)
+                if name not in available:
+                    logger.info(f"설치되지 않은 모델은 프리로드하지 않습니다: {name}")
+                    continue
+                size = self.estimated_size(name)
+                if size > budget_left:
+                    # 프리로드끼리는 서로 밀어내지 않음 (앞쪽 모델 우선)
+                    continue
+                if self.load(name, priority="batch"):
+                    budget_left -= self.estimated_size(name)
+
+        if block:
+            preload()
+            return None
+        thread = threading.Thread(target=preload, name="model-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> List[dict]:
+        """
+        모델별 상주 상태 (사이드바 표시용)
+
+        Returns:
+            List[dict]: 모델별 상태 (로드된 모델 먼저, 최근 사용 순)
+        """
+        now = time.monotonic()
+        with self._lock:
+            rows = [
+                {
+                    "model": m.name,
+                    "loaded": m.loaded,
+                    "loading": m.loading,
+                    "size_gb": round(m.size / GIB, 2),
+                    "demand": m.demand(now),
+                    "keep_alive_s": self.keep_alive_for(m.name, record=False),
+                    "idle_s": round(now - m.last_used, 1) if m.last_used else None,
+                    "loads": m.loads,
+                    "evictions": m.evictions,
+                    "last_load_s": m.last_load_seconds,
+                    "expires_at": m.expires_at,
+                }
+                for m in self._models.values()
+            ]
+        return sorted(rows, key=lambda r: (not r["loaded"], r["idle_s"] if r["idle_s"] is not None else float("inf")))
+
+
+_managers: Dict[str, ModelResidencyManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_residency_manager(base_url: Optional[str] = None) -> ModelResidencyManager:
+    """
+    Ollama 서버 주소별 공용 상주 관리자를 반환합니다.
+
+    Args:
+        base_url (str): Ollama 서버 주소 (기본값: global_variables.ollama_base_url)
+
+    Returns:
+        ModelResidencyManager: 해당 서버의 상주 관리자
+    """
+    key = (base_url or gv.ollama_base_url).rstrip("/")
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ModelResidencyManager(key)
+            _managers[key] = manager
+        return manager
@@ -0,0 +1,303 @@
+"""
+자동 모델 선택(라우팅) 모듈
+
+대부분의 질문은 작은 모델로도 충분하므로, 질문마다 가장 작은 모델부터 시작하고 필요할 때만 큰 모델로 올립니다.
+작은 모델은 같은 하드웨어에서 여러 배 빠르므로 처리량이 늘어납니다.
+
+- 질문 분류: 질문 길이, 복잡한 작업을 뜻하는 단어(비교, 분석, 계산 등), 여러 질문, 코드/수식, 대화 길이로 점수를 매겨 시작 단계 결정
+- 검색 신뢰도: RAG 모드에서 검색된 참고 문서와 질문의 관련도가 낮으면 한 단계 올림
+- 자체 점검: 응답이 비었거나, 같은 말을 반복하거나, 질문과 다른 언어로 답하거나, (문서 없이) 모른다고 답하면 다음 단계 모델로 다시 생성
+- 기록: 라우팅 결정, 상향 여부, 지연 시간을 JSONL로 기록하고 모델별 지연 시간 p50/p95와 상향 비율 집계
+
+사용 예:
+    router = ModelRouter(available=utils.get_available_ollama_models())
+    decision = router.route("환율이 뭐야?")
+    answer = create_llm(decision.model, 0.7, 1000).invoke(messages).content
+    reason = router.self_check("환율이 뭐야?", answer)
+    escalated = router.escalate(decision, reason) if reason else None
+    router.record(decision, latency_s=1.2, check_failure=reason, escalated=escalated is not None)
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import global_variables as gv
+from profiler import percentile
+from utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# 작은 모델이 자주 틀리는 작업을 뜻하는 단어
+COMPLEX_KEYWORDS = (
+    "비교", "분석", "차이", "이유", "왜", "설명해", "요약", "계산", "단계", "장단점", "전략", "추론", "번역", "작성해",
+    "compare", "analy", "explain", "why", "summar", "calculate", "step by step", "reason", "translate", "write",
+)
+# 답을 모른다는 표현 (참고 문서 없이 모른다고 하면 큰 모델로 다시 시도)
+UNCERTAIN_PHRASES = ("모르겠", "알 수 없", "답변드릴 수 없", "답할 수 없", "i don't know", "i'm not sure", "cannot answer")
+
+
+def _hangul_ratio(text: str) -> float:
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return 0.0
+    return sum("가" <= c <= "힣" for c in letters) / len(letters)
+
+
+def classify_query(
+    query: str,
+    history_tokens: int = 0,
+    short_query_tokens: int = 40,
+    long_query_tokens: int = 200,
+) -> Tuple[int, List[str]]:
+    """
+    질문의 복잡도 점수를 매깁니다. (모델 호출 없이 규칙으로 계산)
+
+    Args:
+        query (str): 사용자 질문
+        history_tokens (int): 함께 보낼 대화 기록 토큰 수
+        short_query_tokens (int): 이 길이를 넘으면 짧은 질문이 아님
+        long_query_tokens (int): 이 길이를 넘으면 긴 질문
+
+    Returns:
+        Tuple[int, List[str]]: 점수(0이면 단순한 질문)와 점수를 매긴 이유
+    """
+    score = 0
+    reasons: List[str] = []
+
+    tokens = count_tokens(query)
+    if tokens > long_query_tokens:
+        score += 2
+        reasons.append(f"long_query:{tokens}")
+    elif tokens > short_query_tokens:
+        score += 1
+        reasons.append(f"medium_query:{tokens}")
+
+    lowered = query.lower()
+    keywords = [keyword for keyword in COMPLEX_KEYWORDS if keyword in lowered]
+    if keywords:
+        score += min(2, len(keywords))
+        reasons.append("keywords:" + ",".join(keywords[:3]))
+
+    if query.count("?") + query.count("？") > 1:
+        score += 1
+        reasons.append("multi_part")
+    if "```" in query or re.search(r"\d+\s*[-+*/^%]\s*\d+", query):
+        score += 1
+        reasons.append("code_or_math")
+    if history_tokens > 2000:
+        score += 1
+        reasons.append(f"long_history:{history_tokens}")
+    return score, reasons
+
+
+class RouteDecision:
+    """
+    라우팅 결정 하나
+
+    Args:
+        model (str): 선택된 모델
+        tier (int): 모델 단계 (0이 가장 작은 모델)
+        reasons (List[str]): 이 단계를 고른 이유
+        query_tokens (int): 질문 토큰 수
+        attempt (int): 몇 번째 시도인지 (상향할 때마다 1 증가)
+    """
+
+    def __init__(self, model: str, tier: int, reasons: List[str], query_tokens: int, attempt: int = 0):
+        self.model = model
+        self.tier = tier
+        self.reasons = reasons
+        self.query_tokens = query_tokens
+        self.attempt = attempt
+
+    def to_dict(self) -> dict:
+        return {"model": self.model, "tier": self.tier, "reasons": self.reasons, "attempt": self.attempt}
+
+
+class ModelRouter:
+    """
+    질문마다 사용할 모델을 고르고 필요하면 큰 모델로 올리는 라우터
+
+    Args:
+        tiers (List[str]): 작은 모델부터 큰 모델 순서 (기본값: global_variables.ollama_router_tiers)
+        available (List[str]): 설치된 모델 목록 (지정하면 없는 모델은 건너뜀)
+        log_path (str): 라우팅 기록 JSONL 파일 경로 (기본값: global_variables.model_router_log_file, 비우면 기록 안 함)
+        short_query_tokens (int): 이 길이를 넘으면 짧은 질문이 아님
+        long_query_tokens (int): 이 길이를 넘으면 긴 질문
+        min_retrieval_confidence (float): 검색 신뢰도가 이보다 낮으면 한 단계 올림
+        max_escalations (int): 질문 하나에 대해 최대 상향 횟수
+        window (int): 모델별 지연 시간 통계에 쓸 최근 요청 수
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[List[str]] = None,
+        available: Optional[List[str]] = None,
+        log_path: Optional[str] = None,
+        short_query_tokens: int = 40,
+        long_query_tokens: int = 200,
+        min_retrieval_confidence: float = 0.2,
+        max_escalations: int = 1,
+        window: int = 500,
+    ):
+        tiers = list(tiers or gv.ollama_router_tiers)
+        if available is not None:
+            tiers = [model for model in tiers if model in available] or list(available[:1])
+        if not tiers:
+            raise ValueError("라우팅할 모델이 없습니다.")
+        self.tiers = tiers
+        self.log_path = gv.model_router_log_file if log_path is None else log_path
+        self.short_query_tokens = short_query_tokens
+        self.long_query_tokens = long_query_tokens
+        self.min_retrieval_confidence = min_retrieval_confidence
+        self.max_escalations = max_escalations
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def route(self, query: str, history_tokens: int = 0, retrieval_confidence: Optional[float] = None) -> RouteDecision:
+        """
+        질문에 사용할 모델을 고릅니다.
+
+        Args:
+            query (str): 사용자 질문
+            history_tokens (int): 함께 보낼 대화 기록 토큰 수
+            retrieval_confidence (float): RAG 검색 신뢰도 (0~1, RAG를 쓰지 않으면 None)
+
+        Returns:
+            RouteDecision: 라우팅 결정
+        """
+        score, reasons = classify_query(query, history_tokens, self.short_query_tokens, self.long_query_tokens)
+        tier = 0 if score == 0 else 1 if score <= 2 else 2
+        if retrieval_confidence is not None and retrieval_confidence < self.min_retrieval_confidence:
+            tier += 1
+            reasons.append(f"low_retrieval_confidence:{retrieval_confidence:.2f}")
+        tier = min(tier, len(self.tiers) - 1)
+        decision = RouteDecision(self.tiers[tier], tier, reasons or ["simple"], count_tokens(query))
+        logger.debug(f"모델 선택: {decision.model} (단계 {tier}, {decision.reasons})")
+        return decision
+
+    def escalate(self, decision: RouteDecision, reason: str) -> Optional[RouteDecision]:
+        """
+        다음 단계 모델로 올린 결정을 반환합니다.
+
+        Args:
+            decision (RouteDecision): 현재 결정
+            reason (str): 상향 이유 (자체 점검 결과 등)
+
+        Returns:
+            RouteDecision or None: 올린 결정 (이미 가장 큰 모델이거나 상향 횟수를 다 썼으면 None)
+        """
+        if decision.tier + 1 >= len(self.tiers) or decision.attempt >= self.max_escalations:
+            return None
+        tier = decision.tier + 1
+        logger.info(f"모델 상향: {decision.model} -> {self.tiers[tier]} ({reason})")
+        return RouteDecision(self.tiers[tier], tier, decision.reasons + [f"escalated:{reason}"], decision.query_tokens, decision.attempt + 1)
+
+    def self_check(self, query: str, answer: str, grounded: bool = False) -> Optional[str]:
+        """
+        응답을 간단히 점검합니다. (모델 호출 없음)
+
+        Args:
+            query (str): 사용자 질문
+            answer (str): 모델 응답
+            grounded (bool): 참고 문서를 주고 받은 응답인지 여부 (문서에 없어서 모른다고 하는 것은 정상으로 봄)
+
+        Returns:
+            str or None: 실패 이유 (통과하면 None)
+        """
+        text = answer.strip()
+        if not text:
+            return "empty_answer"
+
+        words = text.split()
+        if len(words) >= 30:
+            trigrams = [tuple(words[i:i + 3]) for i in range(len(words) - 2)]
+            if len(set(trigrams)) / len(trigrams) < 0.5:
+                return "repetition"
+
+        # 한국어 질문에 다른 언어로 답하는 것은 작은 모델의 흔한 실패
+        if _hangul_ratio(query) > 0.5 and len(text) > 20 and _hangul_ratio(text) < 0.2:
+            return "language_mismatch"
+
+        if not grounded and len(text) < 200 and any(phrase in text.lower() for phrase in UNCERTAIN_PHRASES):
+            return "uncertain_answer"
+        return None
+
+    def record(
+        self,
+        decision: RouteDecision,
+        latency_s: float,
+        ttft_s: Optional[float] = None,
+        status: str = "done",
+        check_failure: Optional[str] = None,
+        escalated: bool = False,
+    ) -> dict:
+        """
+        라우팅된 요청 하나의 결과를 기록합니다.
+
+        Args:
+            decision (RouteDecision): 라우팅 결정
+            latency_s (float): 생성 소요 시간(초)
+            ttft_s (float): 첫 토큰까지 걸린 시간(초)
+            status (str): 생성 결과 상태 (done, cancelled, failed)
+            check_failure (str): 자체 점검 실패 이유 (통과하면 None)
+            escalated (bool): 큰 모델로 다시 생성했는지 여부
+
+        Returns:
+            dict: 기록한 항목
+        """
+        entry = {
+            "ts": time.time(),
+            **decision.to_dict(),
+            "query_tokens": decision.query_tokens,
+            "latency_s": round(latency_s, 4),
+            "ttft_s": round(ttft_s, 4) if ttft_s is not None else None,
+            "status": status,
+            "check_failure": check_failure,
+            "escalated": escalated,
+        }
+        with self._lock:
+            self._latencies.setdefault(decision.model, deque(maxlen=self._window)).append(latency_s)
+            counts = self._counts.setdefault(decision.model, {"requests": 0, "check_failures": 0, "escalated": 0})
+            counts["requests"] += 1
+            counts["check_failures"] += bool(check_failure)
+            counts["escalated"] += escalated
+            if self.log_path:
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    logger.warning(f"라우팅 기록 실패: {e}")
+        return entry
+
+    def stats(self) -> List[dict]:
+        """
+        모델별 라우팅 통계
+
+        Returns:
+            List[dict]: 모델 단계 순서대로 model, requests, check_failure_rate, escalation_rate, p50_s, p95_s
+        """
+        with self._lock:
+            rows = []
+            for model in self.tiers:
+                counts = self._counts.get(model, {"requests": 0, "check_failures": 0, "escalated": 0})
+                latencies = list(self._latencies.get(model, []))
+                requests = counts["requests"]
+                rows.append({
+                    "model": model,
+                    "requests": requests,
+                    "check_failure_rate": counts["check_failures"] / requests if requests else 0.0,
+                    "escalation_rate": counts["escalated"] / requests if requests else 0.0,
+                    "p50_s": round(percentile(latencies, 50), 3),
+                    "p95_s": round(percentile(latencies, 95), 3),
+                })
+        return rows
@@ -0,0 +1,316 @@
+"""
+다중 Ollama 엔드포인트 임베딩 모듈
+
+여러 Ollama 서버(포트/머신)에 임베딩 배치를 나누어 보내 인제스트 처리량을 서버 수에 비례해 늘립니다.
+
+- 배치마다 "예상 완료 시간 = (진행 중 요청 수 + 1) x 항목당 지연 시간 EWMA"가 가장 작은 엔드포인트를 선택
+- 실패한 배치는 다른 엔드포인트로 재시도하고, 실패한 엔드포인트는 일정 시간 동안 제외
+- 질의 임베딩은 배치 분할/동시 요청 수 제한을 거치지 않고 엔드포인트 클라이언트의 embed_query로 보냄
+  (interactive 우선순위와 질의 캐시를 그대로 사용하므로 재인덱싱 중에도 배치 뒤에서 기다리지 않음)
+- verify()로 모든 엔드포인트가 같은 모델(다이제스트)과 같은 차원을 제공하는지 확인
+- summary_table()로 엔드포인트별/전체 처리량 보고
+
+OllamaEmbeddings와 같은 embed_documents / embed_query / aembed_* 인터페이스를 제공하므로
+VectorStoreSetting, FaissVectorStore에서 그대로 사용할 수 있습니다.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointState:
+    """
+    엔드포인트 하나의 상태와 누적 통계
+
+    Args:
+        base_url (str): Ollama 서버 주소
+        client (ScheduledEmbeddings): 해당 서버의 임베딩 클라이언트
+        initial_latency (float): 관측 전 항목당 지연 시간 추정값(초)
+    """
+
+    def __init__(self, base_url: str, client, initial_latency: float = 0.01):
+        self.base_url = base_url
+        self.client = client
+        self.latency_per_item = initial_latency
+        self.inflight = 0
+        self.items = 0
+        self.requests = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.unavailable_until = 0.0
+
+    def expected_finish(self, n_items: int) -> float:
+        return (self.inflight + 1) * self.latency_per_item * n_items
+
+    def available(self, now: float) -> bool:
+        return now >= self.unavailable_until
+
+
+class MultiEndpointEmbeddings(Embeddings):
+    """
+    여러 Ollama 엔드포인트에 부하를 분산하는 임베딩 클라이언트
+
+    Args:
+        model (str): 임베딩 모델 이름
+        base_urls (List[str]): Ollama 서버 주소 목록
+        batch_size (int): 엔드포인트 하나에 보내는 요청당 텍스트 수
+        max_inflight_per_endpoint (int): 엔드포인트당 동시 요청 수
+        ewma_alpha (float): 지연 시간 EWMA 가중치
+        cooldown_seconds (float): 실패한 엔드포인트를 제외하는 시간(초)
+    """
+
+    def __init__(
+        self,
+        model: str,
+        base_urls: List[str],
+        batch_size: int = 32,
+        max_inflight_per_endpoint: int = 2,
+        ewma_alpha: float = 0.3,
+        cooldown_seconds: float = 30.0,
+    ):
+        from ollama_scheduler import create_scheduled_embeddings
+
+        if not base_urls:
+            raise ValueError("임베딩 엔드포인트가 하나 이상 필요합니다.")
+        self.model = model
+        self.batch_size = batch_size
+        self.max_inflight_per_endpoint = max_inflight_per_endpoint
+        self.ewma_alpha = ewma_alpha
+        self.cooldown_seconds = cooldown_seconds
+        # 엔드포인트마다 해당 서버의 공용 스케줄러를 거치도록 생성 (같은 서버의 대화 요청이 먼저 처리됨)
+        self.endpoints = [EndpointState(url, create_scheduled_embeddings(model, base_url=url)) for url in dict.fromkeys(base_urls)]
+        self.dimension: Optional[int] = None
+
+        self._lock = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.endpoints) * max_inflight_per_endpoint,
+            thread_name_prefix="embed-endpoint",
+        )
+        self._started = time.perf_counter()
+
+    @property
+    def parallelism(self) -> int:
+        """동시에 처리할 수 있는 배치 수 (인제스트가 한 번에 보낼 배치 수 결정에 사용)"""
+        return len(self.endpoints) * self.max_inflight_per_endpoint
+
+    def verify(self) -> int:
+        """
+        모든 엔드포인트가 같은 모델과 같은 임베딩 차원을 제공하는지 확인합니다.
+
+        Returns:
+            int: 임베딩 차원
+
+        Raises:
+            ValueError: 모델이 없거나, 다이제스트/차원이 엔드포인트마다 다른 경우 발생
+        """
+        import httpx
+
+        digests: Dict[str, Optional[str]] = {}
+        dimensions: Dict[str, int] = {}
+        wanted = self.model if ":" in self.model else f"{self.model}:latest"
+        for endpoint in self.endpoints:
+            response = httpx.get(f"{endpoint.base_url.rstrip('/')}/api/tags", timeout=10.0)
+            response.raise_for_status()
+            models = {m.get("name") or m.get("model"): m for m in response.json().get("models", [])}
+            info = models.get(wanted) or models.get(self.model)
+            if info is None:
+                raise ValueError(f"{endpoint.base_url}에 임베딩 모델 {self.model}이(가) 없습니다.")
+            digests[endpoint.base_url] = info.get("digest")
+            dimensions[endpoint.base_url] = len(endpoint.client.embed_query("dimension check"))
+
+        if len({d for d in digests.values() if d}) > 1:
+            raise ValueError(f"엔드포인트마다 모델 다이제스트가 다릅니다: {digests}")
+        if len(set(dimensions.values())) > 1:
+            raise ValueError(f"엔드포인트마다 임베딩 차원이 다릅니다: {dimensions}")
+        self.dimension = next(iter(dimensions.values()))
+        logger.info(f"임베딩 엔드포인트 {len(self.endpoints)}개 확인 완료 (모델: {self.model}, 차원: {self.dimension})")
+        return self.dimension
+
+    def _acquire(self, n_items: int, exclude: set, interactive: bool = False) -> EndpointState:
+        # interactive: 질의는 동시 요청 수 제한 없이 바로 선택 (서버 쪽 스케줄러가 우선 처리)
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                candidates = [
+                    e for e in self.endpoints
+                    if e.base_url not in exclude and e.available(now)
+                    and (interactive or e.inflight < self.max_inflight_per_endpoint)
+                ]
+                if candidates:
+                    endpoint = min(candidates, key=lambda e: e.expected_finish(n_items))
+                    endpoint.inflight += 1
+                    return endpoint
+                remaining = [e for e in self.endpoints if e.base_url not in exclude]
+                if not remaining:
+                    raise RuntimeError("사용할 수 있는 임베딩 엔드포인트가 없습니다.")
+                if all(not e.available(now) for e in remaining):
+                    # 모두 제외 중이면 가장 먼저 풀리는 엔드포인트를 바로 시도
+                    endpoint = min(remaining, key=lambda e: e.unavailable_until)
+                    endpoint.inflight += 1
+                    return endpoint
+                self._lock.wait(timeout=0.5)
+
+    def _release(self, endpoint: EndpointState, n_items: int, elapsed: float, ok: bool, record: bool = True) -> None:
+        # record=False: 질의 임베딩 (캐시 적중이 섞이므로 배치 처리량/지연 시간 통계에 넣지 않음)
+        with self._lock:
+            endpoint.inflight -= 1
+            if not record and ok:
+                self._lock.notify_all()
+                return
+            endpoint.requests += 1
+            if ok:
+                per_item = elapsed / max(n_items, 1)
+                endpoint.latency_per_item += self.ewma_alpha * (per_item - endpoint.latency_per_item)
+                endpoint.items += n_items
+                endpoint.busy_seconds += elapsed
+            else:
+                endpoint.failures += 1
+                endpoint.unavailable_until = time.monotonic() + self.cooldown_seconds
+            self._lock.notify_all()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        tried = set()
+        last_error: Optional[Exception] = None
+        while len(tried) < len(self.endpoints):
+            endpoint = self._acquire(len(texts), tried)
+            started = time.perf_counter()
+            try:
+                vectors = endpoint.client.embed_documents(texts)
+            except Exception as e:
+                self._release(endpoint, len(texts), time.perf_counter() - started, ok=False)
+                tried.add(endpoint.base_url)
+                last_error = e
+                logger.warning(f"임베딩 엔드포인트 실패, 다른 엔드포인트로 재시도합니다: {endpoint.base_url} ({e})")
+                continue
+            self._release(endpoint, len(texts), time.perf_counter() - started, ok=True)
+            return vectors
+        raise RuntimeError(f"모든 임베딩 엔드포인트에서 배치 임베딩에 실패했습니다: {last_error}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        텍스트를 batch_size 단위로 나누어 여러 엔드포인트에서 동시에 임베딩합니다. (입력 순서 유지)
+
+        Args:
+            texts (List[str]): 임베딩할 텍스트
+
+        Returns:
+            List[List[float]]: 임베딩 벡터
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._embed_batch(texts) if texts else []
+        vectors: List[List[float]] = []
+        for batch_vectors in self._executor.map(self._embed_batch, batches):
+            vectors.extend(batch_vectors)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        질의 하나를 임베딩합니다. (엔드포인트 클라이언트의 embed_query: interactive 우선순위, 질의 캐시 사용)
+
+        Args:
+            text (str): 질의
+
+        Returns:
+            List[float]: 임베딩 벡터
+        """
+        tried = set()
+        last_error: Optional[Exception] = None
+        while len(tried) < len(self.endpoints):
+            endpoint = self._acquire(1, tried, interactive=True)
+            started = time.perf_counter()
+            try:
+                vector = endpoint.client.embed_query(text)
+            except Exception as e:
+                self._release(endpoint, 1, time.perf_counter() - started, ok=False, record=False)
+                tried.add(endpoint.base_url)
+                last_error = e
+                logger.warning(f"임베딩 엔드포인트 실패, 다른 엔드포인트로 재시도합니다: {endpoint.base_url} ({e})")
+                continue
+            self._release(endpoint, 1, time.perf_counter() - started, ok=True, record=False)
+            return vector
+        raise RuntimeError(f"모든 임베딩 엔드포인트에서 질의 임베딩에 실패했습니다: {last_error}")
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """embed_query()의 비동기 버전"""
+        tried = set()
+        last_error: Optional[Exception] = None
+        while len(tried) < len(self.endpoints):
+            endpoint = self._acquire(1, tried, interactive=True)
+            started = time.perf_counter()
+            try:
+                vector = await endpoint.client.aembed_query(text)
+            except Exception as e:
+                self._release(endpoint, 1, time.perf_counter() - started, ok=False, record=False)
+                tried.add(endpoint.base_url)
+                last_error = e
+                logger.warning(f"임베딩 엔드포인트 실패, 다른 엔드포인트로 재시도합니다: {endpoint.base_url} ({e})")
+                continue
+            self._release(endpoint, 1, time.perf_counter() - started, ok=True, record=False)
+            return vector
+        raise RuntimeError(f"모든 임베딩 엔드포인트에서 질의 임베딩에 실패했습니다: {last_error}")
+
+    def stats(self) -> dict:
+        """엔드포인트별/전체 처리량 통계"""
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            endpoints = [
+                {
+                    "base_url": e.base_url,
+                    "items": e.items,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "busy_seconds": e.busy_seconds,
+                    "items_per_s": e.items / e.busy_seconds if e.busy_seconds > 0 else 0.0,
+                    "latency_per_item_ms": e.latency_per_item * 1000,
+                    "inflight": e.inflight,
+                }
+                for e in self.endpoints
+            ]
+        total_items = sum(e["items"] for e in endpoints)
+        return {
+            "endpoints": endpoints,
+            "total_items": total_items,
+            "elapsed_seconds": elapsed,
+            "aggregate_items_per_s": total_items / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for e in self.endpoints:
+                e.items = e.requests = e.failures = 0
+                e.busy_seconds = 0.0
+            self._started = time.perf_counter()
+
+    def summary_table(self) -> str:
+        """
+        엔드포인트별 처리량 요약 표 문자열을 생성합니다.
+
+        Returns:
+            str: 요약 표
+        """
+        stats = self.stats()
+        header = f"{'endpoint':<32} {'items':>8} {'reqs':>6} {'fail':>5} {'items/s':>9} {'ms/item':>8}"
+        rows = [f"[임베딩 엔드포인트 처리량] 모델: {self.model}", header, "-" * len(header)]
+        for e in stats["endpoints"]:
+            rows.append(
+                f"{e['base_url']:<32} {e['items']:>8} {e['requests']:>6} {e['failures']:>5} "
+                f"{e['items_per_s']:>9.1f} {e['latency_per_item_ms']:>8.2f}"
+            )
+        rows.append("-" * len(header))
+        rows.append(f"{'total':<32} {stats['total_items']:>8} {'':>6} {'':>5} {stats['aggregate_items_per_s']:>9.1f} (경과 {stats['elapsed_seconds']:.2f}초)")
+        return "\n".join(rows)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
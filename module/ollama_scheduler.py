@@ -0,0 +1,815 @@
+"""
+Ollama 요청 승인 제어 및 우선순위 스케줄러 모듈
+
+인제스트 임베딩 배치, 챗봇 응답, LangGraph 에이전트 호출이 같은 Ollama 서버를 조율 없이 사용하면
+대량 재색인 중에 대화 응답이 크게 느려집니다. 이 모듈은 모든 호출 경로가 거치는 공용 스케줄러를 제공합니다.
+
+- 우선순위 클래스: interactive > agent > batch
+- 서버 전체 동시 실행 수와 클래스별 동시 실행 수 제한 (batch 제한으로 interactive용 여유 슬롯 확보)
+- 빈 슬롯은 항상 우선순위가 높은 대기 요청부터 배정 (같은 클래스 안에서는 도착 순)
+- 클래스별 대기 기한을 넘긴 요청은 SchedulerOverloaded로 거절 (부하 차단)
+- cancel_event를 넘긴 요청은 취소되면 대기열에서 빠지고, 슬롯을 받은 직후라도 요청을 보내지 않음 (RequestCancelled)
+- 클래스별 대기 시간/처리 시간 통계, Prometheus 텍스트 형식 내보내기
+
+한 프로세스 안에서는 get_scheduler()가 Ollama 서버 주소별로 같은 스케줄러를 돌려줍니다.
+여러 프로세스(Streamlit 앱, 인제스트 CLI 등)가 함께 쓰려면 프록시 모드로 실행하고 Ollama 주소를 프록시로 지정합니다.
+    python ollama_scheduler.py --port 11500 --upstream http://localhost:11434
+    OLLAMA_BASE_URL=http://127.0.0.1:11500 streamlit run app.py
+프록시는 X-Ollama-Priority 헤더로 우선순위를 구분합니다. (priority_client_kwargs() 참고)
+
+사용 예:
+    scheduler = get_scheduler()
+    with scheduler.slot("interactive"):
+        response = llm.invoke(messages)
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import global_variables as gv
+from caching import LRUCache
+from ollama_telemetry import get_telemetry
+from profiler import percentile, span
+from resilience import EndpointResilience, get_resilience, policy_for
+from resilience import export_prometheus as export_resilience_prometheus
+from resilience import snapshot as resilience_snapshot
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("interactive", "agent", "batch")
+PRIORITY_HEADER = "X-Ollama-Priority"
+
+# 모델 실행 요청만 스케줄링 (목록/상태 조회는 바로 통과)
+SCHEDULED_PATHS = ("/api/chat", "/api/generate", "/api/embed", "/api/embeddings")
+
+
+class SchedulerOverloaded(RuntimeError):
+    """대기 기한 안에 실행 슬롯을 받지 못해 거절된 요청"""
+
+    def __init__(self, priority: str, waited: float):
+        super().__init__(f"Ollama 요청 대기열이 가득 차 요청을 거절했습니다 (우선순위: {priority}, 대기: {waited:.2f}초)")
+        self.priority = priority
+        self.waited = waited
+
+
+class RequestCancelled(RuntimeError):
+    """슬롯을 기다리는 동안(또는 받은 직후, 요청을 보내기 전) 호출한 쪽이 취소한 요청"""
+
+    def __init__(self, priority: str, waited: float):
+        super().__init__(f"Ollama 요청이 실행 전에 취소되었습니다 (우선순위: {priority}, 대기: {waited:.2f}초)")
+        self.priority = priority
+        self.waited = waited
+
+
+# 취소 이벤트를 확인하는 간격(초), 대기 중인 요청은 취소 후 이 시간 안에 대기열에서 빠짐
+CANCEL_POLL_SECONDS = 0.05
+
+
+class _Waiter:
+    __slots__ = ("priority", "rank", "seq", "enqueued", "notify", "granted", "granted_at")
+
+    def __init__(self, priority: str, seq: int, notify: Callable[[], None]):
+        self.priority = priority
+        self.rank = PRIORITIES.index(priority)
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.notify = notify
+        self.granted = False
+        self.granted_at = 0.0
+
+    @property
+    def waited(self) -> float:
+        """대기열에서 기다린 시간(초)"""
+        return (self.granted_at or time.monotonic()) - self.enqueued
+
+
+class ClassStats:
+    """우선순위 클래스별 누적 통계"""
+
+    def __init__(self, priority: str, window: int = 2048):
+        self.priority = priority
+        self.admitted = 0
+        self.shed = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+        self.queued = 0
+        self.wait_seconds_total = 0.0
+        self.service_seconds_total = 0.0
+        self.recent_waits: deque = deque(maxlen=window)
+
+    def wait_percentile(self, q: float) -> float:
+        return percentile(self.recent_waits, q)
+
+
+class OllamaScheduler:
+    """
+    Ollama 서버 하나에 대한 우선순위 스케줄러
+
+    Args:
+        name (str): 스케줄러 이름 (보통 Ollama 서버 주소)
+        max_concurrency (int): 서버 전체 동시 실행 수 (Ollama의 OLLAMA_NUM_PARALLEL과 맞추는 것을 권장)
+        class_limits (Dict[str, int]): 클래스별 동시 실행 수 제한
+        queue_deadlines (Dict[str, float]): 클래스별 최대 대기 시간(초), None이면 무제한 대기
+    """
+
+    def __init__(
+        self,
+        name: str = "ollama",
+        max_concurrency: int = 4,
+        class_limits: Optional[Dict[str, int]] = None,
+        queue_deadlines: Optional[Dict[str, Optional[float]]] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.class_limits = {p: max_concurrency for p in PRIORITIES}
+        self.class_limits.update(class_limits or {})
+        self.queue_deadlines: Dict[str, Optional[float]] = {p: None for p in PRIORITIES}
+        self.queue_deadlines.update(queue_deadlines or {})
+
+        self.stats = {p: ClassStats(p) for p in PRIORITIES}
+        self._lock = threading.Lock()
+        self._waiters: List[_Waiter] = []
+        self._running = 0
+        self._seq = 0
+
+    def _check_priority(self, priority: str) -> None:
+        if priority not in PRIORITIES:
+            raise ValueError(f"알 수 없는 우선순위입니다: {priority} (사용 가능: {PRIORITIES})")
+
+    def _dispatch_locked(self) -> None:
+        # 우선순위 -> 도착 순으로 빈 슬롯 배정. 상위 클래스가 클래스 제한에 걸리면 하위 클래스가 슬롯을 사용
+        if not self._waiters or self._running >= self.max_concurrency:
+            return
+        self._waiters.sort(key=lambda w: (w.rank, w.seq))
+        for waiter in list(self._waiters):
+            if self._running >= self.max_concurrency:
+                break
+            stats = self.stats[waiter.priority]
+            if stats.running >= self.class_limits[waiter.priority]:
+                continue
+            self._waiters.remove(waiter)
+            self._grant_locked(waiter)
+            waiter.notify()
+
+    def _grant_locked(self, waiter: _Waiter) -> None:
+        stats = self.stats[waiter.priority]
+        waited = time.monotonic() - waiter.enqueued
+        waiter.granted = True
+        waiter.granted_at = time.monotonic()
+        self._running += 1
+        stats.running += 1
+        stats.queued -= 1
+        stats.admitted += 1
+        stats.wait_seconds_total += waited
+        stats.recent_waits.append(waited)
+
+    def _enqueue(self, priority: str, notify: Callable[[], None]) -> _Waiter:
+        self._check_priority(priority)
+        with self._lock:
+            self._seq += 1
+            waiter = _Waiter(priority, self._seq, notify)
+            self.stats[priority].queued += 1
+            self._waiters.append(waiter)
+            self._dispatch_locked()
+        return waiter
+
+    def _abandon(self, waiter: _Waiter, shed: bool, cancelled: bool = False) -> bool:
+        """대기를 포기합니다. 그 사이에 슬롯을 받았으면 False를 반환합니다."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._waiters.remove(waiter)
+            stats = self.stats[waiter.priority]
+            stats.queued -= 1
+            if shed:
+                stats.shed += 1
+            if cancelled:
+                stats.cancelled += 1
+            return True
+
+    def _timeout(self, priority: str, deadline: Optional[float]) -> Optional[float]:
+        return self.queue_deadlines[priority] if deadline is None else deadline
+
+    def release(self, waiter: _Waiter, ok: bool = True, cancelled: bool = False) -> None:
+        """실행 슬롯을 반납합니다."""
+        with self._lock:
+            stats = self.stats[waiter.priority]
+            self._running -= 1
+            stats.running -= 1
+            stats.service_seconds_total += time.monotonic() - waiter.granted_at
+            if cancelled:
+                stats.cancelled += 1
+            elif ok:
+                stats.completed += 1
+            else:
+                stats.failed += 1
+            self._dispatch_locked()
+
+    def acquire(self, priority: str, deadline: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> _Waiter:
+        """
+        실행 슬롯을 받을 때까지 기다립니다.
+
+        Args:
+            priority (str): "interactive", "agent", "batch"
+            deadline (float): 최대 대기 시간(초) (기본값: 클래스별 설정)
+            cancel_event (threading.Event): 설정되면 대기를 멈추고 슬롯을 받았더라도 바로 반납
+
+        Returns:
+            _Waiter: release()에 넘길 슬롯 토큰
+
+        Raises:
+            SchedulerOverloaded: 대기 기한 안에 슬롯을 받지 못한 경우 발생
+            RequestCancelled: 슬롯을 받아 요청을 보내기 전에 cancel_event가 설정된 경우 발생
+        """
+        event = threading.Event()
+        waiter = self._enqueue(priority, event.set)
+        timeout = self._timeout(priority, deadline)
+        if cancel_event is None:
+            granted = event.wait(timeout=timeout)
+        else:
+            # 취소 이벤트와 슬롯 배정을 함께 기다림 (짧은 간격으로 확인)
+            until = None if timeout is None else time.monotonic() + timeout
+            granted = event.is_set()
+            while not granted and not cancel_event.is_set():
+                left = CANCEL_POLL_SECONDS if until is None else min(CANCEL_POLL_SECONDS, until - time.monotonic())
+                if left <= 0:
+                    break
+                granted = event.wait(timeout=left)
+            if cancel_event.is_set():
+                if not self._abandon(waiter, shed=False, cancelled=True):
+                    self.release(waiter, ok=False, cancelled=True)
+                raise RequestCancelled(priority, time.monotonic() - waiter.enqueued)
+        if not granted and self._abandon(waiter, shed=True):
+            raise SchedulerOverloaded(priority, time.monotonic() - waiter.enqueued)
+        return waiter
+
+    @contextmanager
+    def slot(self, priority: str, deadline: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> Iterator[_Waiter]:
+        """
+        실행 슬롯을 받아 블록을 실행하고 반납하는 컨텍스트 매니저
+
+        Args:
+            priority (str): "interactive", "agent", "batch"
+            deadline (float): 최대 대기 시간(초) (기본값: 클래스별 설정)
+            cancel_event (threading.Event): 설정되면 대기를 멈춤 (acquire() 참고)
+
+        Returns:
+            Iterator[_Waiter]: 슬롯 토큰 (waited로 대기 시간 확인)
+        """
+        waiter = self.acquire(priority, deadline, cancel_event)
+        ok = False
+        try:
+            yield waiter
+            ok = True
+        finally:
+            self.release(waiter, ok=ok)
+
+    @asynccontextmanager
+    async def aslot(self, priority: str, deadline: Optional[float] = None):
+        """slot()의 비동기 버전. 대기 중 취소되면 대기열에서 빠집니다."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def notify():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(priority, notify)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self._timeout(priority, deadline))
+        except asyncio.TimeoutError:
+            if self._abandon(waiter, shed=True):
+                raise SchedulerOverloaded(priority, time.monotonic() - waiter.enqueued) from None
+        except asyncio.CancelledError:
+            if not self._abandon(waiter, shed=False):
+                self.release(waiter, ok=False)
+            raise
+
+        ok = False
+        try:
+            yield waiter
+            ok = True
+        finally:
+            self.release(waiter, ok=ok)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        클래스별 현재 상태와 누적 통계를 반환합니다.
+
+        Returns:
+            Dict[str, dict]: 우선순위별 통계
+        """
+        with self._lock:
+            return {
+                p: {
+                    "running": s.running,
+                    "queued": s.queued,
+                    "admitted": s.admitted,
+                    "shed": s.shed,
+                    "cancelled": s.cancelled,
+                    "completed": s.completed,
+                    "failed": s.failed,
+                    "wait_p50_s": s.wait_percentile(50),
+                    "wait_p95_s": s.wait_percentile(95),
+                    "wait_p99_s": s.wait_percentile(99),
+                    "wait_seconds_total": s.wait_seconds_total,
+                    "service_seconds_total": s.service_seconds_total,
+                    "limit": self.class_limits[p],
+                }
+                for p, s in self.stats.items()
+            }
+
+    def export_prometheus(self, path: str) -> str:
+        """
+        클래스별 통계를 Prometheus 텍스트 형식으로 저장합니다. (임시 파일에 쓴 뒤 교체)
+
+        Args:
+            path (str): 저장할 파일 경로
+
+        Returns:
+            str: 저장한 파일 경로
+        """
+        metrics = [
+            ("ollama_scheduler_admitted_total", "counter", "admitted"),
+            ("ollama_scheduler_shed_total", "counter", "shed"),
+            ("ollama_scheduler_cancelled_total", "counter", "cancelled"),
+            ("ollama_scheduler_failed_total", "counter", "failed"),
+            ("ollama_scheduler_wait_seconds_total", "counter", "wait_seconds_total"),
+            ("ollama_scheduler_service_seconds_total", "counter", "service_seconds_total"),
+            ("ollama_scheduler_running", "gauge", "running"),
+            ("ollama_scheduler_queued", "gauge", "queued"),
+            ("ollama_scheduler_wait_p95_seconds", "gauge", "wait_p95_s"),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for name, metric_type, key in metrics:
+            lines.append(f"# TYPE {name} {metric_type}")
+            for priority, values in snapshot.items():
+                lines.append(f'{name}{{scheduler="{self.name}",priority="{priority}"}} {values[key]}')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return path
+
+
+_schedulers: Dict[str, OllamaScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(base_url: Optional[str] = None) -> OllamaScheduler:
+    """
+    Ollama 서버 주소별 공용 스케줄러를 반환합니다. (global_variables 설정 사용)
+
+    Args:
+        base_url (str): Ollama 서버 주소 (기본값: global_variables.ollama_base_url)
+
+    Returns:
+        OllamaScheduler: 해당 서버의 스케줄러
+    """
+    key = (base_url or gv.ollama_base_url).rstrip("/")
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = OllamaScheduler(
+                name=key,
+                max_concurrency=gv.ollama_scheduler_max_concurrency,
+                class_limits=gv.ollama_scheduler_class_limits,
+                queue_deadlines=gv.ollama_scheduler_queue_deadlines,
+            )
+            _schedulers[key] = scheduler
+        return scheduler
+
+
+def priority_client_kwargs(priority: str) -> dict:
+    """
+    스케줄러 프록시가 우선순위를 구분할 수 있도록 Ollama 클라이언트에 넘길 client_kwargs를 만듭니다.
+
+    Args:
+        priority (str): "interactive", "agent", "batch"
+
+    Returns:
+        dict: ChatOllama / OllamaEmbeddings의 client_kwargs 값
+    """
+    return {"headers": {PRIORITY_HEADER: priority}}
+
+
+def _import_bases():
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.runnables import Runnable
+
+    return Embeddings, Runnable
+
+
+try:
+    _Embeddings, _Runnable = _import_bases()
+except ImportError:  # 프록시 모드만 사용하는 환경
+    _Embeddings, _Runnable = object, object
+
+
+class ScheduledEmbeddings(_Embeddings):
+    """
+    임베딩 호출을 스케줄러 슬롯 안에서 실행하는 래퍼
+
+    문서 임베딩(인제스트)과 질의 임베딩(검색)은 서로 다른 우선순위로 실행합니다.
+    query_cache를 지정하면 같은 질의의 임베딩은 Ollama를 다시 부르지 않고 캐시에서 돌려줍니다. (동시에 들어온 같은 질의는 한 번만 요청)
+    일시적인 오류는 우선순위별 정책에 따라 백오프하며 재시도합니다. (resilience.py, 재시도 대기 중에는 슬롯을 반납)
+
+    Args:
+        base (Embeddings): 원래 임베딩 모델
+        scheduler (OllamaScheduler): 사용할 스케줄러 (기본값: base의 base_url 스케줄러)
+        document_priority (str): embed_documents 우선순위
+        query_priority (str): embed_query 우선순위
+        query_base (Embeddings): embed_query에 사용할 임베딩 모델 (기본값: base, 프록시용 우선순위 헤더를 다르게 줄 때 사용)
+        query_cache (LRUCache): 질의 임베딩 캐시 (None이면 캐시 안 함)
+        resilience (EndpointResilience): 재시도/회로 차단 상태 (기본값: 스케줄러 서버의 공용 상태)
+    """
+
+    def __init__(
+        self,
+        base,
+        scheduler: Optional[OllamaScheduler] = None,
+        document_priority: str = "batch",
+        query_priority: str = "interactive",
+        query_base=None,
+        query_cache: Optional[LRUCache] = None,
+        resilience: Optional[EndpointResilience] = None,
+    ):
+        self.base = base
+        self.query_base = query_base or base
+        self.query_cache = query_cache
+        self.scheduler = scheduler or get_scheduler(getattr(base, "base_url", None))
+        self.document_priority = document_priority
+        self.query_priority = query_priority
+        self.resilience = resilience or get_resilience(self.scheduler.name)
+        self.document_policy = policy_for(document_priority)
+        self.query_policy = policy_for(query_priority)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        def call():
+            with self.scheduler.slot(self.document_priority), span("ollama.embed_documents"):
+                return self.base.embed_documents(texts)
+
+        return self.resilience.call(call, self.document_policy)
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.query_cache is not None:
+            # 캐시된 벡터를 호출한 쪽에서 수정해도 캐시가 바뀌지 않도록 복사본을 돌려줌
+            return list(self.query_cache.get_or_compute(text, lambda: self._embed_query(text)))
+        return self._embed_query(text)
+
+    def _embed_query(self, text: str) -> List[float]:
+        def call():
+            with self.scheduler.slot(self.query_priority), span("ollama.embed_query"):
+                return self.query_base.embed_query(text)
+
+        return self.resilience.call(call, self.query_policy)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        async def call():
+            async with self.scheduler.aslot(self.document_priority):
+                with span("ollama.embed_documents"):
+                    return await self.base.aembed_documents(texts)
+
+        return await self.resilience.acall(call, self.document_policy)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.query_cache is not None:
+            return list(await self.query_cache.aget_or_compute(text, lambda: self._aembed_query(text)))
+        return await self._aembed_query(text)
+
+    async def _aembed_query(self, text: str) -> List[float]:
+        async def call():
+            async with self.scheduler.aslot(self.query_priority):
+                with span("ollama.embed_query"):
+                    return await self.query_base.aembed_query(text)
+
+        return await self.resilience.acall(call, self.query_policy)
+
+    def __getattr__(self, name):
+        if name == "base":
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+
+def create_scheduled_embeddings(
+    model: str,
+    base_url: Optional[str] = None,
+    document_priority: str = "batch",
+    query_priority: str = "interactive",
+    **kwargs: Any,
+) -> ScheduledEmbeddings:
+    """
+    스케줄러를 거치는 OllamaEmbeddings를 생성합니다. (문서/질의 클라이언트에 각각 우선순위 헤더 지정)
+
+    Args:
+        model (str): 임베딩 모델 이름
+        base_url (str): Ollama 서버 주소 (기본값: global_variables.ollama_base_url)
+        document_priority (str): 문서 임베딩 우선순위
+        query_priority (str): 질의 임베딩 우선순위
+        **kwargs: OllamaEmbeddings에 넘길 추가 인자
+
+    Returns:
+        ScheduledEmbeddings: 스케줄러를 거치는 임베딩 모델
+    """
+    from langchain_ollama.embeddings import OllamaEmbeddings
+
+    base_url = base_url or gv.ollama_base_url
+    return ScheduledEmbeddings(
+        OllamaEmbeddings(model=model, base_url=base_url, client_kwargs=priority_client_kwargs(document_priority), **kwargs),
+        scheduler=get_scheduler(base_url),
+        document_priority=document_priority,
+        query_priority=query_priority,
+        query_base=OllamaEmbeddings(model=model, base_url=base_url, client_kwargs=priority_client_kwargs(query_priority), **kwargs),
+        query_cache=LRUCache(maxsize=gv.embedding_query_cache_size, ttl=gv.embedding_query_cache_ttl) if gv.embedding_query_cache_size else None,
+    )
+
+
+def create_scheduled_chat_model(model: str, priority: str = "interactive", base_url: Optional[str] = None, **kwargs: Any) -> "ScheduledChatModel":
+    """
+    스케줄러를 거치는 ChatOllama를 생성합니다.
+
+    Args:
+        model (str): Ollama 모델 이름
+        priority (str): "interactive", "agent", "batch"
+        base_url (str): Ollama 서버 주소 (기본값: global_variables.ollama_base_url)
+        **kwargs: ChatOllama에 넘길 추가 인자 (temperature, num_predict 등)
+
+    Returns:
+        ScheduledChatModel: 스케줄러를 거치는 채팅 모델
+    """
+    from langchain_ollama.chat_models import ChatOllama
+
+    base_url = base_url or gv.ollama_base_url
+    llm = ChatOllama(model=model, base_url=base_url, client_kwargs=priority_client_kwargs(priority), **kwargs)
+    return ScheduledChatModel(llm, priority, get_scheduler(base_url))
+
+
+def _with_queue_wait(config: Optional[dict], waiter: _Waiter) -> dict:
+    # 대기 시간을 실행 메타데이터로 넘겨 콜백(graph_tracing 등)에서 볼 수 있게 함
+    config = dict(config or {})
+    config["metadata"] = {**(config.get("metadata") or {}), "ollama_queue_wait_s": waiter.waited}
+    return config
+
+
+class ScheduledChatModel(_Runnable):
+    """
+    채팅 모델 호출을 스케줄러 슬롯 안에서 실행하는 래퍼 (스트리밍은 스트림이 끝날 때까지 슬롯 유지)
+
+    응답의 Ollama 타이밍 정보는 계측 기록기(ollama_telemetry.py)에 기록하고,
+    계산한 값은 응답(스트리밍은 마지막 청크)의 response_metadata["telemetry"]에 붙입니다.
+    일시적인 오류는 우선순위별 정책에 따라 재시도합니다. (resilience.py, 스트리밍은 첫 청크 전까지만)
+
+    Args:
+        llm (ChatOllama): 원래 채팅 모델 (bind_tools 결과도 가능)
+        priority (str): "interactive", "agent", "batch"
+        scheduler (OllamaScheduler): 사용할 스케줄러 (기본값: llm의 base_url 스케줄러)
+        telemetry (OllamaTelemetry): 계측 기록기 (기본값: 프로세스 공용 기록기)
+        resilience (EndpointResilience): 재시도/회로 차단 상태 (기본값: 스케줄러 서버의 공용 상태)
+    """
+
+    def __init__(
+        self,
+        llm,
+        priority: str = "interactive",
+        scheduler: Optional[OllamaScheduler] = None,
+        telemetry=None,
+        resilience: Optional[EndpointResilience] = None,
+    ):
+        self.llm = llm
+        self.priority = priority
+        bound = getattr(llm, "bound", llm)
+        self.scheduler = scheduler or get_scheduler(getattr(bound, "base_url", None))
+        self.model_name = getattr(bound, "model", None) or "unknown"
+        self.telemetry = telemetry
+        self.resilience = resilience or get_resilience(self.scheduler.name)
+        self.retry_policy = policy_for(priority)
+
+    def _record(self, message: Any, waiter: _Waiter) -> Any:
+        metadata = getattr(message, "response_metadata", None)
+        if not metadata or metadata.get("eval_count") is None:
+            return message
+        try:
+            telemetry = self.telemetry or get_telemetry()
+            sample = telemetry.record(metadata.get("model") or self.model_name, metadata, queue_wait_s=waiter.waited, source=self.priority)
+            if sample is not None:
+                metadata["telemetry"] = sample
+        except Exception as e:
+            # 계측 실패가 응답을 막지 않도록 함
+            logger.warning(f"Ollama 계측 실패: {e}")
+        return message
+
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        def call():
+            with self.scheduler.slot(self.priority) as waiter, span("ollama.chat"):
+                return self._record(self.llm.invoke(input, _with_queue_wait(config, waiter), **kwargs), waiter)
+
+        return self.resilience.call(call, self.retry_policy)
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        async def call():
+            async with self.scheduler.aslot(self.priority) as waiter:
+                with span("ollama.chat"):
+                    return self._record(await self.llm.ainvoke(input, _with_queue_wait(config, waiter), **kwargs), waiter)
+
+        return await self.resilience.acall(call, self.retry_policy)
+
+    def stream(self, input: Any, config: Optional[dict] = None, *, cancel_event: Optional[threading.Event] = None, **kwargs: Any):
+        """
+        응답을 스트리밍합니다.
+
+        cancel_event가 설정되면 슬롯 대기를 멈추고, 슬롯을 받은 뒤라도 요청을 보내기 전이면 보내지 않습니다.
+        (RequestCancelled 발생, 스트리밍 중에는 호출한 쪽이 다음 청크에서 스트림을 닫아야 함)
+        """
+        yield from self.resilience.stream(lambda: self._stream(input, config, cancel_event, **kwargs), self.retry_policy)
+
+    def _stream(self, input: Any, config: Optional[dict] = None, cancel_event: Optional[threading.Event] = None, **kwargs: Any):
+        with self.scheduler.slot(self.priority, cancel_event=cancel_event) as waiter:
+            for chunk in self.llm.stream(input, _with_queue_wait(config, waiter), **kwargs):
+                yield self._record(chunk, waiter)
+
+    async def astream(self, input: Any, config: Optional[dict] = None, **kwargs: Any):
+        async for chunk in self.resilience.astream(lambda: self._astream(input, config, **kwargs), self.retry_policy):
+            yield chunk
+
+    async def _astream(self, input: Any, config: Optional[dict] = None, **kwargs: Any):
+        async with self.scheduler.aslot(self.priority) as waiter:
+            async for chunk in self.llm.astream(input, _with_queue_wait(config, waiter), **kwargs):
+                yield self._record(chunk, waiter)
+
+    def bind_tools(self, tools, **kwargs) -> "ScheduledChatModel":
+        return ScheduledChatModel(self.llm.bind_tools(tools, **kwargs), self.priority, self.scheduler, self.telemetry, self.resilience)
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    """X-Ollama-Priority 헤더로 우선순위를 정해 Ollama로 전달하는 프록시 핸들러"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_GET(self):
+        self._forward()
+
+    def do_POST(self):
+        self._forward()
+
+    def do_DELETE(self):
+        self._forward()
+
+    def _default_priority(self) -> str:
+        return "batch" if self.path.startswith("/api/embed") else "interactive"
+
+    def _forward(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        if not self.path.startswith(SCHEDULED_PATHS):
+            self._relay(body)
+            return
+
+        priority = self.headers.get(PRIORITY_HEADER) or self._default_priority()
+        if priority not in PRIORITIES:
+            priority = self._default_priority()
+        try:
+            waiter = self.server.scheduler.acquire(priority)
+        except SchedulerOverloaded as e:
+            payload = json.dumps({"error": str(e)}).encode("utf-8")
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        ok = False
+        try:
+            ok = self._relay(body)
+        finally:
+            self.server.scheduler.release(waiter, ok=ok)
+
+    def _relay(self, body: Optional[bytes]) -> bool:
+        upstream = self.server.upstream
+        connection_cls = http.client.HTTPSConnection if upstream.scheme == "https" else http.client.HTTPConnection
+        connection = connection_cls(upstream.netloc, timeout=self.server.upstream_timeout)
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in ("host", "connection", PRIORITY_HEADER.lower())}
+        try:
+            connection.request(self.command, self.path, body=body, headers=headers)
+            response = connection.getresponse()
+        except OSError as e:
+            payload = json.dumps({"error": f"upstream error: {e}"}).encode("utf-8")
+            self.send_response(502)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return False
+
+        # 스트리밍 응답(NDJSON)을 받는 즉시 청크 단위로 전달
+        self.send_response(response.status)
+        self.send_header("Content-Type", response.getheader("Content-Type", "application/json"))
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while True:
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            connection.close()
+        return response.status < 400
+
+
+class SchedulerProxy:
+    """
+    여러 프로세스가 하나의 스케줄러를 공유하기 위한 Ollama 프록시 서버
+
+    Args:
+        upstream (str): 실제 Ollama 서버 주소
+        host (str): 프록시 주소
+        port (int): 프록시 포트 (0이면 임의 포트)
+        scheduler (OllamaScheduler): 사용할 스케줄러 (기본값: upstream 스케줄러)
+        upstream_timeout (float): Ollama 응답 대기 시간(초)
+    """
+
+    def __init__(self, upstream: str, host: str = "127.0.0.1", port: int = 11500, scheduler: Optional[OllamaScheduler] = None, upstream_timeout: float = 600.0):
+        self._server = ThreadingHTTPServer((host, port), _ProxyHandler)
+        self._server.daemon_threads = True
+        self._server.upstream = urlsplit(upstream)
+        self._server.upstream_timeout = upstream_timeout
+        self._server.scheduler = scheduler or get_scheduler(upstream)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def scheduler(self) -> OllamaScheduler:
+        return self._server.scheduler
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "SchedulerProxy":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ollama-scheduler-proxy", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="우선순위 스케줄링 Ollama 프록시를 실행합니다.")
+    parser.add_argument("--host", default="127.0.0.1", help="프록시 주소")
+    parser.add_argument("--port", type=int, default=11500, help="프록시 포트")
+    parser.add_argument("--upstream", default=gv.ollama_base_url, help="실제 Ollama 서버 주소")
+    parser.add_argument("--metrics-file", default=None, help="Prometheus 통계를 주기적으로 저장할 파일 경로 (재시도/회로 차단 통계는 *_resilience 파일)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0, help="통계 저장 간격(초)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    proxy = SchedulerProxy(args.upstream, host=args.host, port=args.port).start()
+    logger.info(f"Ollama 스케줄러 프록시 실행: {proxy.base_url} -> {args.upstream}")
+    try:
+        while True:
+            time.sleep(args.metrics_interval)
+            if args.metrics_file:
+                proxy.scheduler.export_prometheus(args.metrics_file)
+                root, ext = os.path.splitext(args.metrics_file)
+                export_resilience_prometheus(f"{root}_resilience{ext or '.prom'}")
+            logger.info(json.dumps(proxy.scheduler.snapshot(), ensure_ascii=False))
+            logger.info(json.dumps(resilience_snapshot(), ensure_ascii=False))
+    except KeyboardInterrupt:
+        proxy.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+"""
+Ollama 응답 계측 모듈
+
+Ollama는 응답마다 토큰 수와 단계별 소요 시간(나노초)을 돌려줍니다.
+(load_duration, prompt_eval_count, prompt_eval_duration, eval_count, eval_duration, total_duration)
+이 모듈은 모든 채팅 호출(ScheduledChatModel)에서 이 값을 받아 기록합니다.
+
+- 호출마다 프롬프트 처리 속도, 생성 속도(토큰/초), 로드 시간, 스케줄러 대기 시간을 계산하여 JSONL 파일에 한 줄씩 기록
+  (파일이 max_bytes를 넘으면 .1, .2 ... 로 넘기고 backup_count개까지만 보관)
+- 모델별 최근 호출로 p50/p95 집계 (Streamlit 사이드바 표시용)
+- 로드 시간이 기준(ollama_cold_load_seconds) 이상이거나 최근 중앙값보다 크게 늘면 콜드 로드로 표시하고 경고 로그
+
+명령줄에서 기록 파일을 요약할 수 있습니다.
+    python ollama_telemetry.py summary metrics/ollama_calls.jsonl
+
+사용 예:
+    telemetry = get_telemetry()
+    sample = telemetry.record("gemma3:4b", response.response_metadata)
+    print(sample["eval_tps"], telemetry.summary())
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import global_variables as gv
+from profiler import percentile
+
+logger = logging.getLogger(__name__)
+
+# 모델별로 백분위를 집계하는 지표
+METRICS = ("total_s", "load_s", "queue_wait_s", "prompt_eval_s", "eval_s", "prompt_tps", "eval_tps")
+
+
+def parse_metadata(metadata: Optional[dict]) -> Optional[dict]:
+    """
+    Ollama 응답 메타데이터를 초 단위 값과 처리 속도로 바꿉니다.
+
+    Args:
+        metadata (dict): 응답 메타데이터 (ChatOllama의 response_metadata)
+
+    Returns:
+        dict or None: 계측 값 (Ollama 타이밍 정보가 없으면 None)
+    """
+    if not metadata or metadata.get("eval_count") is None:
+        return None
+    seconds = lambda key: (metadata.get(key) or 0) / 1e9
+    prompt_eval_count = metadata.get("prompt_eval_count") or 0
+    eval_count = metadata.get("eval_count") or 0
+    prompt_eval_s = seconds("prompt_eval_duration")
+    eval_s = seconds("eval_duration")
+    return {
+        "total_s": seconds("total_duration"),
+        "load_s": seconds("load_duration"),
+        "prompt_eval_count": prompt_eval_count,
+        "prompt_eval_s": prompt_eval_s,
+        "eval_count": eval_count,
+        "eval_s": eval_s,
+        "prompt_tps": prompt_eval_count / prompt_eval_s if prompt_eval_s > 0 else None,
+        "eval_tps": eval_count / eval_s if eval_s > 0 else None,
+        "done_reason": metadata.get("done_reason"),
+    }
+
+
+class OllamaTelemetry:
+    """
+    Ollama 호출 계측 기록기
+
+    Args:
+        path (str): 호출 기록 JSONL 파일 경로 (None이면 파일에 기록 안 함)
+        window (int): 모델별 백분위 계산에 쓸 최근 호출 수
+        cold_load_seconds (float): 로드 시간이 이 값(초) 이상이면 콜드 로드로 표시
+        spike_factor (float): 로드 시간이 최근 중앙값의 이 배수를 넘으면 급증으로 표시
+        max_bytes (int): 기록 파일 최대 크기(바이트), 넘으면 이전 파일로 넘김 (0이면 넘기지 않음)
+        backup_count (int): 보관할 이전 기록 파일 수
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        window: int = 500,
+        cold_load_seconds: Optional[float] = None,
+        spike_factor: float = 5.0,
+        max_bytes: Optional[int] = None,
+        backup_count: Optional[int] = None,
+    ):
+        self.path = path
+        self.max_bytes = gv.ollama_telemetry_max_bytes if max_bytes is None else max_bytes
+        self.backup_count = gv.ollama_telemetry_backup_count if backup_count is None else backup_count
+        self.window = window
+        self.cold_load_seconds = gv.ollama_cold_load_seconds if cold_load_seconds is None else cold_load_seconds
+        self.spike_factor = spike_factor
+
+        self._samples: Dict[str, Dict[str, Deque[float]]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.spikes: Deque[dict] = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        model: str,
+        metadata: Optional[dict],
+        queue_wait_s: Optional[float] = None,
+        source: Optional[str] = None,
+    ) -> Optional[dict]:
+        """
+        호출 하나의 계측 값을 기록합니다.
+
+        Args:
+            model (str): 모델 이름
+            metadata (dict): 응답 메타데이터
+            queue_wait_s (float): 스케줄러 대기 시간(초)
+            source (str): 호출한 곳 (예: 스케줄러 우선순위)
+
+        Returns:
+            dict or None: 기록한 계측 값 (load_spike 포함, Ollama 타이밍 정보가 없으면 None)
+        """
+        sample = parse_metadata(metadata)
+        if sample is None:
+            return None
+        sample.update(ts=time.time(), model=model, source=source, queue_wait_s=queue_wait_s)
+
+        with self._lock:
+            series = self._samples.setdefault(model, {metric: deque(maxlen=self.window) for metric in METRICS})
+            recent_load = percentile(series["load_s"], 50) if series["load_s"] else 0.0
+            # 평소보다 크게 늘어난 로드 시간은 모델이 언로드되었다가 다시 올라온 것 (keep_alive, 메모리 예산 점검 필요)
+            sample["load_spike"] = sample["load_s"] >= self.cold_load_seconds or (
+                recent_load > 0 and sample["load_s"] > self.spike_factor * recent_load and sample["load_s"] > 0.2
+            )
+            self._add(sample)
+            if sample["load_spike"]:
+                self.spikes.append({"ts": sample["ts"], "model": model, "load_s": sample["load_s"]})
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    line = json.dumps(sample, ensure_ascii=False) + "\n"
+                    self._rotate_if_needed(len(line.encode("utf-8")))
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(line)
+                except OSError as e:
+                    logger.warning(f"Ollama 계측 기록 실패: {e}")
+
+        if sample["load_spike"]:
+            logger.warning(f"모델 콜드 로드: {model} 로드 {sample['load_s']:.2f}초 (최근 중앙값 {recent_load:.2f}초)")
+        return sample
+
+    def _rotate_if_needed(self, incoming: int) -> None:
+        # self._lock 안에서 호출. path -> path.1 -> path.2 ... 순서로 넘기고 backup_count보다 오래된 파일은 삭제
+        if self.max_bytes <= 0:
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size == 0 or size + incoming <= self.max_bytes:
+            return
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _add(self, sample: dict) -> None:
+        # self._lock 안에서 호출
+        series = self._samples.setdefault(sample["model"], {metric: deque(maxlen=self.window) for metric in METRICS})
+        for metric in METRICS:
+            if sample.get(metric) is not None:
+                series[metric].append(sample[metric])
+        counts = self._counts.setdefault(sample["model"], {"calls": 0, "load_spikes": 0, "prompt_tokens": 0, "eval_tokens": 0})
+        counts["calls"] += 1
+        counts["load_spikes"] += bool(sample.get("load_spike"))
+        counts["prompt_tokens"] += sample.get("prompt_eval_count") or 0
+        counts["eval_tokens"] += sample.get("eval_count") or 0
+
+    def summary(self) -> List[dict]:
+        """
+        모델별 최근 호출 백분위
+
+        Returns:
+            List[dict]: model, calls, load_spikes, 토큰 합계, 생성 속도/프롬프트 속도 p50, 전체/로드/대기 시간 p50/p95
+        """
+        with self._lock:
+            rows = []
+            for model, series in self._samples.items():
+                counts = self._counts[model]
+                row = {key: counts[key] for key in ("calls", "load_spikes", "prompt_tokens", "eval_tokens")}
+                row = {"model": model, **row}
+                row["eval_tps_p50"] = round(percentile(series["eval_tps"], 50), 1)
+                row["eval_tps_p5"] = round(percentile(series["eval_tps"], 5), 1)
+                row["prompt_tps_p50"] = round(percentile(series["prompt_tps"], 50), 1)
+                for metric in ("total_s", "prompt_eval_s", "load_s", "queue_wait_s"):
+                    row[f"{metric[:-2]}_p50_s"] = round(percentile(series[metric], 50), 3)
+                    row[f"{metric[:-2]}_p95_s"] = round(percentile(series[metric], 95), 3)
+                rows.append(row)
+        return rows
+
+
+_telemetry: Optional[OllamaTelemetry] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> OllamaTelemetry:
+    """프로세스 공용 계측 기록기 (global_variables.ollama_telemetry_file에 기록)"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = OllamaTelemetry(path=gv.ollama_telemetry_file or None)
+        return _telemetry
+
+
+def load_samples(path: str) -> List[dict]:
+    """JSONL 기록 파일을 읽습니다."""
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                samples.append(json.loads(line))
+    return samples
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Ollama 호출 계측 기록 요약")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="모델별 백분위 요약")
+    summary_parser.add_argument("path", help="계측 기록 JSONL 파일")
+    args = parser.parse_args(argv)
+
+    # 파일의 모든 호출을 다시 집계 (창 크기 제한 없음)
+    samples = load_samples(args.path)
+    telemetry = OllamaTelemetry(path=None, window=max(1, len(samples)))
+    with telemetry._lock:
+        for sample in samples:
+            telemetry._add(sample)
+
+    header = f"{'model':<20} {'calls':>6} {'spikes':>6} {'gen tok/s p50':>13} {'prompt tok/s p50':>16} {'total p50/p95(s)':>17} {'load p95(s)':>11} {'queue p95(s)':>12}"
+    print(header)
+    print("-" * len(header))
+    for row in telemetry.summary():
+        print(
+            f"{row['model']:<20} {row['calls']:>6} {row['load_spikes']:>6} {row['eval_tps_p50']:>13} {row['prompt_tps_p50']:>16} "
+            f"{row['total_p50_s']:>8}/{row['total_p95_s']:<8} {row['load_p95_s']:>11} {row['queue_wait_p95_s']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+대화 접두사 캐시 재사용 모듈
+
+Ollama는 직전 요청들과 앞부분(접두사)이 토큰 단위로 같은 프롬프트의 KV 캐시를 재사용하여,
+달라진 뒷부분만 프리필합니다. 대화는 턴마다 전체 메시지를 다시 보내므로 접두사만 유지되면 대부분의 프리필을 건너뛸 수 있습니다.
+이 모듈은 캐시가 맞도록 요청을 만드는 채팅 모드입니다.
+
+- 세션 고정: 세션마다 같은 Ollama 서버에 보냄 (서버 목록이 바뀌어도 대부분의 세션이 유지되는 rendezvous 해시)
+- keep_alive: 턴 사이에 모델과 캐시가 언로드되지 않도록 세션 최소 keep_alive 이상으로 요청
+- 옵션 고정: num_ctx가 요청마다 바뀌면 모델이 다시 로드되므로 고정값 사용
+- 접두사 유지: 시스템 프롬프트는 고정하고, 턴마다 바뀌는 내용(RAG 참고 문서 등)은 마지막 질문 바로 앞에 배치
+- 대화 기록 정리: 오래된 메시지를 한 턴씩 밀어내면 매번 접두사가 바뀌므로 블록 단위로 한꺼번에 잘라냄
+- 통계: 응답의 prompt_eval_count(새로 평가한 토큰 수)와 전체 프롬프트 토큰 수(직전 턴과 비교하여 추정)로 접두사 재사용률 계산
+  (세션별 상태는 최근 세션 max_sessions개만, keep_alive 동안만 보관)
+
+사용 예:
+    prefix_chat = PrefixCacheChat()
+    llm = prefix_chat.create_llm(session_id, "gemma3:4b", temperature=0.7, max_tokens=1000)
+    messages = prefix_chat.arrange(history, system_prompt="당신은 친절한 챗봇입니다.")
+    response = llm.invoke(messages)
+    prefix_chat.record(session_id, messages, response.response_metadata, response.content)
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+import global_variables as gv
+from caching import LRUCache
+from model_residency import get_residency_manager
+from ollama_scheduler import ScheduledChatModel, create_scheduled_chat_model
+from utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def stable_trim(messages: List[BaseMessage], token_budget: int, block_tokens: int = 1000) -> List[BaseMessage]:
+    """
+    대화 기록을 토큰 예산 안으로 줄이되, 잘라내는 위치를 블록 단위로만 옮겨 접두사를 유지합니다.
+
+    예산을 넘는 양을 block_tokens 단위로 올림하여 한꺼번에 잘라내므로, 다음 몇 턴 동안은 앞부분이 그대로 유지됩니다.
+    (마지막 메시지는 항상 포함)
+
+    Args:
+        messages (List[BaseMessage]): 대화 메시지
+        token_budget (int): 대화 기록에 쓸 토큰 예산
+        block_tokens (int): 한 번에 잘라낼 토큰 단위
+
+    Returns:
+        List[BaseMessage]: 정리된 대화 메시지 (원래 순서)
+    """
+    tokens = [count_tokens(str(message.content)) for message in messages]
+    excess = sum(tokens) - token_budget
+    if excess <= 0 or len(messages) <= 1:
+        return list(messages)
+
+    drop_target = -(-excess // block_tokens) * block_tokens
+    dropped = 0
+    cut = 0
+    while cut < len(messages) - 1 and dropped < drop_target:
+        dropped += tokens[cut]
+        cut += 1
+    return list(messages[cut:])
+
+
+def _empty_totals() -> Dict[str, float]:
+    return {"calls": 0, "prompt_tokens": 0, "evaluated_tokens": 0, "reused_tokens": 0, "prompt_eval_s": 0.0}
+
+
+class PrefixCacheChat:
+    """
+    세션별로 Ollama 접두사 캐시를 재사용하는 채팅 모드
+
+    Args:
+        endpoints (List[str]): 채팅 Ollama 서버 목록 (기본값: global_variables.ollama_chat_endpoints)
+        session_keep_alive (int): 세션 모델의 최소 keep_alive(초)
+        num_ctx (int): 고정 컨텍스트 길이
+        history_token_budget (int): 대화 기록에 쓸 토큰 예산
+        trim_block_tokens (int): 대화 기록을 잘라낼 때의 블록 크기(토큰)
+        max_sessions (int): 상태를 보관할 최근 세션 수
+        session_ttl (float): 세션 상태 보관 시간(초) (기본값: session_keep_alive, 그 뒤에는 서버의 캐시도 비워짐)
+    """
+
+    def __init__(
+        self,
+        endpoints: Optional[List[str]] = None,
+        session_keep_alive: Optional[int] = None,
+        num_ctx: Optional[int] = None,
+        history_token_budget: int = 4000,
+        trim_block_tokens: int = 1000,
+        max_sessions: int = 1024,
+        session_ttl: Optional[float] = None,
+    ):
+        self.endpoints = list(endpoints or gv.ollama_chat_endpoints)
+        self.session_keep_alive = gv.ollama_session_keep_alive if session_keep_alive is None else session_keep_alive
+        self.num_ctx = num_ctx or gv.ollama_chat_num_ctx
+        self.history_token_budget = history_token_budget
+        self.trim_block_tokens = trim_block_tokens
+
+        # 세션별 직전 프롬프트 + 응답 텍스트, 글자당 토큰 수(record에서 전체 프롬프트 토큰 수 추정에 사용), 세션 통계
+        # 세션마다 새 ID를 쓰는 경우(부하 테스트 등)에도 메모리가 늘지 않도록 LRU/TTL로 제한
+        if session_ttl is None:
+            # keep_alive가 0 이하(서버 기본값/무기한)이면 시간 제한 없이 개수로만 제한
+            session_ttl = self.session_keep_alive if self.session_keep_alive > 0 else None
+        self._sessions = LRUCache(maxsize=max_sessions, ttl=session_ttl, stripes=1)
+        # 프로세스 전체 누적 통계 (세션 상태가 지워져도 유지)
+        self._totals: Dict[str, float] = _empty_totals()
+        self._lock = threading.Lock()
+
+    def endpoint_for(self, session_id: str) -> str:
+        """세션이 고정된 Ollama 서버 주소"""
+        return max(self.endpoints, key=lambda url: hashlib.sha1(f"{url}|{session_id}".encode("utf-8")).digest())
+
+    def keep_alive_for(self, session_id: str, model: str) -> int:
+        """세션 모델의 keep_alive(초), 최근 사용 빈도에 따른 값과 세션 최소값 중 큰 값"""
+        return max(self.session_keep_alive, get_residency_manager(self.endpoint_for(session_id)).keep_alive_for(model))
+
+    def create_llm(
+        self,
+        session_id: str,
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int] = None,
+        priority: str = "interactive",
+    ) -> ScheduledChatModel:
+        """
+        세션이 고정된 서버로 보내는 채팅 모델을 생성합니다.
+
+        Args:
+            session_id (str): 세션 ID (그래프에서는 thread_id)
+            model (str): Ollama 모델 이름
+            temperature (float): 모델 온도 설정 (요청마다 달라도 캐시에 영향 없음)
+            max_tokens (int): 최대 생성 토큰 수
+            priority (str): 스케줄러 우선순위
+
+        Returns:
+            ScheduledChatModel: 생성된 채팅 모델 객체
+        """
+        return create_scheduled_chat_model(
+            model,
+            priority=priority,
+            base_url=self.endpoint_for(session_id),
+            temperature=temperature,
+            num_predict=max_tokens,
+            num_ctx=self.num_ctx,
+            keep_alive=self.keep_alive_for(session_id, model),
+        )
+
+    def arrange(
+        self,
+        messages: List[BaseMessage],
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None,
+    ) -> List[BaseMessage]:
+        """
+        접두사가 턴마다 유지되도록 메시지를 배치합니다.
+
+        [고정 시스템 프롬프트] + [블록 단위로 정리한 대화 기록] + [이번 턴의 참고 내용] + [마지막 질문]
+
+        Args:
+            messages (List[BaseMessage]): 대화 메시지 (마지막이 사용자 질문)
+            system_prompt (str): 고정 시스템 프롬프트 (턴마다 바뀌는 내용을 넣으면 안 됨)
+            context (str): 이번 턴에만 쓰는 참고 내용 (예: RAG 검색 결과)
+
+        Returns:
+            List[BaseMessage]: 모델에 보낼 메시지
+        """
+        history = stable_trim(messages, self.history_token_budget, self.trim_block_tokens)
+        arranged: List[BaseMessage] = [SystemMessage(content=system_prompt)] if system_prompt else []
+        arranged.extend(history[:-1])
+        if context:
+            arranged.append(SystemMessage(content=context))
+        arranged.extend(history[-1:])
+        return arranged
+
+    def record(
+        self,
+        session_id: str,
+        messages: List[BaseMessage],
+        response_metadata: Optional[dict],
+        response_text: str = "",
+    ) -> Optional[dict]:
+        """
+        응답의 프리필 정보로 접두사 재사용 통계를 기록합니다.
+
+        Ollama는 새로 평가한 토큰 수(prompt_eval_count)만 알려주므로, 세션의 첫 요청처럼 직전 턴과 겹치는 접두사가 없는 요청에서
+        이 모델의 글자당 토큰 수를 구하고, 이를 전체 프롬프트 길이에 곱해 전체 프롬프트 토큰 수를 추정합니다.
+
+        Args:
+            session_id (str): 세션 ID
+            messages (List[BaseMessage]): 모델에 보낸 메시지
+            response_metadata (dict): 응답 메타데이터 (Ollama의 prompt_eval_count, prompt_eval_duration)
+            response_text (str): 응답 텍스트 (다음 턴의 접두사 비교에 사용)
+
+        Returns:
+            dict or None: 이번 요청의 prompt_tokens(전체, 추정), evaluated_tokens(새로 평가), reused_tokens, hit_ratio,
+                stable_prefix_ratio(직전 턴과 같은 접두사 비율), prompt_eval_s (응답에 prompt_eval_count가 없으면 None)
+        """
+        if not response_metadata or response_metadata.get("prompt_eval_count") is None:
+            return None
+        evaluated = int(response_metadata["prompt_eval_count"])
+        text = "".join(f"<{message.type}>{message.content}" for message in messages)
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = {"previous": "", "tokens_per_char": None, "stats": _empty_totals()}
+            previous = session["previous"]
+            common = 0
+            for a, b in zip(previous, text):
+                if a != b:
+                    break
+                common += 1
+            # 재사용을 기대하지 않은 요청(전체를 평가)으로만 보정해야 캐시가 비워진 경우에도 추정이 부풀지 않음
+            if evaluated and (common == 0 or session["tokens_per_char"] is None):
+                session["tokens_per_char"] = evaluated / (len(text) - common or 1)
+            rate = session["tokens_per_char"]
+            session["previous"] = text + f"<ai>{response_text}"
+            # 다시 저장하여 최근 사용 순서와 만료 시간 갱신
+            self._sessions.set(session_id, session)
+
+        # 글자당 토큰 수를 아직 모르면(평가한 토큰이 없는 첫 요청) 토큰 수 추정 함수로 대신함
+        estimated = round(len(text) * rate) if rate else count_tokens(text)
+        prompt_tokens = max(evaluated, estimated)
+        turn = {
+            "prompt_tokens": prompt_tokens,
+            "evaluated_tokens": evaluated,
+            "reused_tokens": prompt_tokens - evaluated,
+            "hit_ratio": (prompt_tokens - evaluated) / prompt_tokens if prompt_tokens else 0.0,
+            "stable_prefix_ratio": common / len(text) if text else 0.0,
+            "prompt_eval_s": (response_metadata.get("prompt_eval_duration") or 0) / 1e9,
+        }
+        with self._lock:
+            for totals in (session["stats"], self._totals):
+                totals["calls"] += 1
+                for key in ("prompt_tokens", "evaluated_tokens", "reused_tokens", "prompt_eval_s"):
+                    totals[key] += turn[key]
+        logger.debug(f"접두사 캐시 (세션 {session_id}): 프롬프트 {prompt_tokens}토큰 중 {evaluated}토큰 평가 ({turn['hit_ratio']:.0%} 재사용)")
+        return turn
+
+    def stats(self, session_id: Optional[str] = None) -> dict:
+        """
+        접두사 재사용 통계
+
+        Args:
+            session_id (str): 세션 ID (None이면 프로세스 전체 누적)
+
+        Returns:
+            dict: calls, prompt_tokens, evaluated_tokens, reused_tokens, prompt_eval_s, hit_ratio
+        """
+        with self._lock:
+            if session_id is None:
+                totals = dict(self._totals)
+            else:
+                session = self._sessions.get(session_id)
+                totals = dict(session["stats"]) if session is not None else _empty_totals()
+        totals["hit_ratio"] = totals["reused_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+        return totals
+
+    def forget(self, session_id: str) -> None:
+        """세션 상태와 통계를 지웁니다. (대화 초기화 시 호출, 전체 누적 통계는 유지)"""
+        with self._lock:
+            self._sessions.delete(session_id)
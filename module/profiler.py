@@ -0,0 +1,472 @@
+"""
+핫 패스 프로파일러 모듈
+
+운영 중에도 켜 둘 수 있는 함수/구간 소요 시간 측정기입니다.
+(practice/decorator.py의 timer는 호출마다 print하므로 운영 경로에 둘 수 없음)
+
+- perf_counter_ns로 측정하고, 값은 스레드별 로그-선형 히스토그램(HDR 방식, 상대 오차 약 6%)에 기록
+  각 스레드는 자기 히스토그램에만 쓰므로 측정 경로에 락이 없음 (스냅샷은 모든 스레드의 히스토그램을 합쳐 계산,
+  끝난 스레드의 히스토그램은 이름별 누적 히스토그램에 합쳐서 짧게 사는 스레드가 많아도 메모리가 늘지 않음)
+- 샘플링: sample_rate=0.1이면 스레드별로 10번 중 한 번만 측정 (호출 수는 모두 셈)
+- 전역 켜기/끄기: 꺼져 있으면 전역 변수 확인 한 번만 하고 원래 함수를 호출
+- 주기적 스냅샷: 구간마다 이름별 호출 수, p50/p95/p99, 히스토그램을 JSONL 파일에 한 줄씩 기록
+  (global_variables.profiler_enabled가 켜져 있으면 임포트할 때 시작)
+
+명령줄에서 스냅샷 파일을 요약할 수 있습니다.
+    python profiler.py summary metrics/profile.jsonl
+
+사용 예:
+    @profile("retrieval.search")
+    def retrieve(query): ...
+
+    with span("ingest.embed_batch"):
+        vectors = embeddings.embed_documents(batch)
+
+    enable(snapshot_path="metrics/profile.jsonl", interval=60)
+    print(snapshot()["retrieval.search"]["p95_ms"])
+"""
+
+import argparse
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import global_variables as gv
+
+logger = logging.getLogger(__name__)
+
+# 2의 거듭제곱 구간마다 16개의 하위 구간 (구간 폭이 값의 1/16 이하)
+SUB_BITS = 4
+SUB_BUCKETS = 1 << SUB_BITS
+NUM_BUCKETS = (65 - SUB_BITS) * SUB_BUCKETS
+
+_enabled = False
+_default_every = 1
+# reset()할 때 늘려서 각 스레드가 새 히스토그램을 쓰게 함
+_generation = 0
+# (이름, 히스토그램, 기록하는 스레드), 끝난 스레드의 히스토그램은 _retired로 합치고 목록에서 뺌
+_registry: List[tuple] = []
+_retired: Dict[str, "_Histogram"] = {}
+_registry_lock = threading.Lock()
+_local = threading.local()
+
+
+def bucket_index(ns: int) -> int:
+    """값(나노초)이 들어갈 히스토그램 구간 번호"""
+    if ns < SUB_BUCKETS:
+        return max(ns, 0)
+    shift = ns.bit_length() - SUB_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (ns >> shift) - SUB_BUCKETS
+
+
+def bucket_value(index: int) -> float:
+    """구간의 대표값(나노초, 구간 중앙)"""
+    if index < SUB_BUCKETS:
+        return float(index)
+    shift = index // SUB_BUCKETS - 1
+    return ((SUB_BUCKETS + index % SUB_BUCKETS) << shift) + (1 << shift) / 2
+
+
+class _Histogram:
+    # 한 스레드가 한 이름으로 기록하는 히스토그램 (그 스레드만 씀)
+    __slots__ = ("counts", "count", "calls", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns: int) -> None:
+        self.counts[bucket_index(ns)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def absorb(self, other: "_Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.calls += other.calls
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+
+def _retire_dead_threads() -> None:
+    # _registry_lock 안에서 호출, 끝난 스레드는 더 쓰지 않으므로 이름별 누적 히스토그램에 합쳐 목록 크기를 살아 있는 스레드 수로 유지
+    alive = []
+    for name, histogram, thread in _registry:
+        if thread.is_alive():
+            alive.append((name, histogram, thread))
+        else:
+            _retired.setdefault(name, _Histogram()).absorb(histogram)
+    _registry[:] = alive
+
+
+def _histogram(name: str) -> _Histogram:
+    # 현재 스레드의 히스토그램 (처음 쓰는 이름이면 만들어 등록)
+    histograms = getattr(_local, "histograms", None)
+    if histograms is None or _local.generation != _generation:
+        histograms = _local.histograms = {}
+        _local.generation = _generation
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = _Histogram()
+        with _registry_lock:
+            _retire_dead_threads()
+            _registry.append((name, histogram, threading.current_thread()))
+    return histogram
+
+
+def _sample_every(sample_rate: Optional[float]) -> Optional[int]:
+    return None if sample_rate is None else max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+
+
+def record(name: str, ns: int) -> None:
+    """
+    이미 잰 값을 기록합니다. (예: 첫 토큰까지의 시간)
+
+    Args:
+        name (str): 측정 이름
+        ns (int): 소요 시간(나노초)
+    """
+    if not _enabled:
+        return
+    histogram = _histogram(name)
+    histogram.calls += 1
+    histogram.add(ns)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: _Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.add(time.perf_counter_ns() - self.start)
+        return False
+
+
+def span(name: str, sample_rate: Optional[float] = None):
+    """
+    with 블록의 소요 시간을 측정하는 컨텍스트 매니저
+
+    Args:
+        name (str): 측정 이름
+        sample_rate (float): 측정 비율 (None이면 전역 기본값, 0이면 호출 수만 셈)
+
+    Returns:
+        컨텍스트 매니저 (꺼져 있거나 샘플에서 빠지면 아무것도 하지 않는 공용 객체)
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    histogram = _histogram(name)
+    histogram.calls += 1
+    every = _sample_every(sample_rate)
+    every = _default_every if every is None else every
+    if not every or histogram.calls % every:
+        return _NOOP_SPAN
+    return _Span(histogram)
+
+
+def profile(name: Optional[str] = None, sample_rate: Optional[float] = None):
+    """
+    함수 소요 시간을 측정하는 데코레이터 (일반 함수와 async 함수 지원, 예외가 나도 측정)
+
+    Args:
+        name (str): 측정 이름 (None이면 "모듈.함수")
+        sample_rate (float): 측정 비율 (None이면 전역 기본값, 0이면 호출 수만 셈)
+
+    Returns:
+        Callable: 데코레이터
+    """
+    fixed_every = _sample_every(sample_rate)
+
+    def decorator(func: Callable) -> Callable:
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                histogram = _histogram(label)
+                histogram.calls += 1
+                every = _default_every if fixed_every is None else fixed_every
+                if not every or histogram.calls % every:
+                    return await func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.add(time.perf_counter_ns() - start)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not _enabled:
+                    return func(*args, **kwargs)
+                histogram = _histogram(label)
+                histogram.calls += 1
+                every = _default_every if fixed_every is None else fixed_every
+                if not every or histogram.calls % every:
+                    return func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.add(time.perf_counter_ns() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def _merge() -> Dict[str, dict]:
+    # 모든 스레드의 히스토그램을 이름별로 합침 (쓰는 중인 스레드가 있어도 락 없이 읽음, 값 하나 정도 어긋날 수 있음)
+    with _registry_lock:
+        _retire_dead_threads()
+        entries = [(name, histogram) for name, histogram, _ in _registry]
+        # 누적 히스토그램은 락 안에서만 바뀌므로 복사해서 사용
+        for name, retired in _retired.items():
+            copy = _Histogram()
+            copy.absorb(retired)
+            entries.append((name, copy))
+    merged: Dict[str, dict] = {}
+    for name, histogram in entries:
+        total = merged.setdefault(name, {"counts": [0] * NUM_BUCKETS, "count": 0, "calls": 0, "total_ns": 0, "max_ns": 0})
+        total["counts"] = [a + b for a, b in zip(total["counts"], histogram.counts)]
+        total["count"] += histogram.count
+        total["calls"] += histogram.calls
+        total["total_ns"] += histogram.total_ns
+        total["max_ns"] = max(total["max_ns"], histogram.max_ns)
+    return merged
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """
+    값 목록의 백분위수 (최근접 순위 방식, 히스토그램 백분위와 같은 규칙)
+
+    모든 지표(텔레메트리, 라우터, 그래프 추적, 스케줄러, 부하/벤치마크 스크립트)가 같은 규칙으로 백분위를 계산하도록 공용으로 사용합니다.
+
+    Args:
+        values (Iterable[float]): 값 목록 (정렬 불필요)
+        q (float): 백분위 (0~100)
+
+    Returns:
+        float: 백분위수 (값이 없으면 0.0)
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-q * len(ordered) // 100))
+    return ordered[min(len(ordered), int(rank)) - 1]
+
+
+def _percentile_ns(counts: List[int], count: int, q: float) -> float:
+    if not count:
+        return 0.0
+    rank = max(1, -(-q * count // 100))
+    seen = 0
+    for index, n in enumerate(counts):
+        seen += n
+        if seen >= rank:
+            return bucket_value(index)
+    return 0.0
+
+
+def _summarize(counts: List[int], count: int, calls: int, total_ns: int, max_ns: Optional[int] = None) -> dict:
+    if max_ns is None:
+        # 구간 차이로 만든 히스토그램은 최댓값을 따로 모르므로 가장 높은 구간의 대표값 사용
+        max_ns = next((bucket_value(i) for i in range(len(counts) - 1, -1, -1) if counts[i]), 0)
+    # 구간 대표값이 실제 최댓값보다 클 수 있으므로 최댓값으로 자름
+    pct = lambda q: round(min(_percentile_ns(counts, count, q), max_ns) / 1e6, 4)
+    return {
+        "calls": calls,
+        "count": count,
+        "mean_ms": round(total_ns / count / 1e6, 4) if count else 0.0,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(max_ns / 1e6, 4),
+    }
+
+
+def snapshot() -> Dict[str, dict]:
+    """
+    마지막 reset() 이후의 이름별 요약
+
+    Returns:
+        Dict[str, dict]: 이름별 calls(시작한 호출 수, 샘플에서 빠진 호출 포함), count(측정을 마친 수), mean_ms, p50_ms, p95_ms, p99_ms, max_ms
+    """
+    return {
+        name: _summarize(m["counts"], m["count"], m["calls"], m["total_ns"], m["max_ns"])
+        for name, m in sorted(_merge().items())
+    }
+
+
+def reset() -> None:
+    """모든 측정 값을 지웁니다. (각 스레드는 다음 기록부터 새 히스토그램 사용)"""
+    global _generation
+    with _registry_lock:
+        _registry.clear()
+        _retired.clear()
+        _generation += 1
+    with _writer_lock:
+        _last_dump.clear()
+
+
+_writer_lock = threading.Lock()
+_writer_stop: Optional[threading.Event] = None
+_last_dump: Dict[str, dict] = {}
+
+
+def dump_snapshot(path: str) -> int:
+    """
+    직전 기록 이후 구간의 측정 값을 파일에 한 줄 추가합니다.
+
+    Args:
+        path (str): 스냅샷 JSONL 파일 경로
+
+    Returns:
+        int: 기록한 이름 수 (구간 안에 호출이 없으면 0, 아무것도 쓰지 않음)
+    """
+    with _writer_lock:
+        metrics = {}
+        for name, m in sorted(_merge().items()):
+            previous = _last_dump.get(name)
+            counts = m["counts"] if previous is None else [a - b for a, b in zip(m["counts"], previous["counts"])]
+            calls = m["calls"] - (previous["calls"] if previous else 0)
+            if calls <= 0:
+                continue
+            count = m["count"] - (previous["count"] if previous else 0)
+            total_ns = m["total_ns"] - (previous["total_ns"] if previous else 0)
+            metrics[name] = {
+                **_summarize(counts, count, calls, total_ns),
+                "total_ns": total_ns,
+                "buckets": {str(i): n for i, n in enumerate(counts) if n},
+            }
+            _last_dump[name] = m
+        if not metrics:
+            return 0
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": time.time(), "pid": os.getpid(), "metrics": metrics}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"프로파일 스냅샷 기록 실패: {e}")
+        return len(metrics)
+
+
+def _snapshot_loop(path: str, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        dump_snapshot(path)
+    dump_snapshot(path)
+
+
+def enable(sample_rate: Optional[float] = None, snapshot_path: Optional[str] = None, interval: float = 60.0) -> None:
+    """
+    측정을 켭니다.
+
+    Args:
+        sample_rate (float): 전역 기본 측정 비율 (None이면 바꾸지 않음)
+        snapshot_path (str): 주기적으로 스냅샷을 기록할 파일 (None이면 기록 안 함)
+        interval (float): 스냅샷 기록 간격(초)
+    """
+    global _enabled, _default_every, _writer_stop
+    if sample_rate is not None:
+        _default_every = _sample_every(sample_rate)
+    _enabled = True
+    if snapshot_path:
+        with _writer_lock:
+            if _writer_stop is None:
+                _writer_stop = threading.Event()
+                threading.Thread(
+                    target=_snapshot_loop, args=(snapshot_path, interval, _writer_stop), name="profiler-snapshot", daemon=True
+                ).start()
+                # 프로세스가 끝날 때 마지막 구간도 기록
+                atexit.register(dump_snapshot, snapshot_path)
+    logger.info(f"프로파일러 켜짐 (측정 비율 1/{_default_every}, 스냅샷: {snapshot_path or '없음'})")
+
+
+def disable() -> None:
+    """측정을 끕니다. (스냅샷 기록 스레드는 마지막 구간을 기록하고 끝남)"""
+    global _enabled, _writer_stop
+    _enabled = False
+    with _writer_lock:
+        if _writer_stop is not None:
+            _writer_stop.set()
+            _writer_stop = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def load_snapshots(path: str) -> List[dict]:
+    """스냅샷 JSONL 파일을 읽습니다."""
+    snapshots = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                snapshots.append(json.loads(line))
+    return snapshots
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="프로파일 스냅샷 요약")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="이름별 백분위 요약 (파일의 모든 구간을 합침)")
+    summary_parser.add_argument("path", help="스냅샷 JSONL 파일")
+    args = parser.parse_args(argv)
+
+    totals: Dict[str, dict] = {}
+    for snap in load_snapshots(args.path):
+        for name, m in snap["metrics"].items():
+            total = totals.setdefault(name, {"counts": [0] * NUM_BUCKETS, "count": 0, "calls": 0, "total_ns": 0})
+            for index, n in m["buckets"].items():
+                total["counts"][int(index)] += n
+            for key in ("count", "calls", "total_ns"):
+                total[key] += m[key]
+
+    header = f"{'name':<36} {'calls':>8} {'sampled':>8} {'mean(ms)':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, total in sorted(totals.items()):
+        row = _summarize(total["counts"], total["count"], total["calls"], total["total_ns"])
+        print(
+            f"{name:<36} {row['calls']:>8} {row['count']:>8} {row['mean_ms']:>9} {row['p50_ms']:>9} "
+            f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}"
+        )
+
+
+if gv.profiler_enabled:
+    enable(gv.profiler_sample_rate, gv.profiler_snapshot_file or None, gv.profiler_snapshot_interval)
+
+
+if __name__ == "__main__":
+    main()
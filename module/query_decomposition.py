@@ -0,0 +1,188 @@
+"""
+병렬 질의 분해 그래프 모듈
+
+여러 부분으로 된 질문을 서로 독립적인 하위 질의로 나누고, 하위 질의마다 검색이나 도구 호출을
+병렬 분기(Send)로 실행한 뒤, 결과를 모아 한 번의 모델 호출로 최종 답변을 만듭니다.
+하위 작업을 차례로 실행하면 걸리는 시간이 각 작업 시간의 합이지만, 병렬로 실행하면 가장 느린 작업 시간 정도로 줄어듭니다.
+
+    decompose --Send--> branch (하위 질의마다 하나) --> synthesize --> END
+
+- 분기 동시 실행 수 제한: 그래프마다 전용 스레드 풀(max_concurrency)에서 하위 작업 실행
+- 부분 실패 처리: 분기가 실패하거나 제한 시간을 넘기면 실패로 기록하고, 성공한 결과만으로 답변 (실패한 부분은 답변에 명시)
+- 분해에 실패하거나 하위 질의가 하나뿐이면 원래 질문 하나로 실행
+
+사용 예:
+    app = build_decomposition_graph(llm, search, max_concurrency=3)
+    result = app.invoke({"messages": [{"role": "user", "content": "서울과 부산의 날씨를 알려줘."}]})
+    print(result["messages"][-1].content)
+"""
+
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Annotated, Any, Callable, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.types import Send
+
+from context_assembly import assemble_context
+
+logger = logging.getLogger(__name__)
+
+DECOMPOSE_PROMPT = (
+    "다음 질문을 서로 독립적으로 답할 수 있는 하위 질문으로 나누세요. "
+    "나눌 필요가 없으면 원래 질문 하나만 쓰세요. 하위 질문은 최대 {max_subqueries}개이며, "
+    "다른 설명 없이 JSON 문자열 배열로만 답하세요.\n\n질문: {question}"
+)
+
+SYNTHESIZE_PROMPT = (
+    "아래는 질문을 나누어 각각 조사한 결과입니다. 결과를 종합하여 원래 질문에 답하세요. "
+    "조사에 실패한 부분은 확인하지 못했다고 밝히세요.\n\n질문: {question}\n\n조사 결과:\n{results}"
+)
+
+
+def _merge_results(current: Optional[List[dict]], new: Optional[List[dict]]) -> List[dict]:
+    # 병렬 분기의 결과를 합침 (None이면 이전 실행의 결과를 비움)
+    if new is None:
+        return []
+    return (current or []) + new
+
+
+class DecompositionState(MessagesState):
+    question: str
+    sub_queries: List[str]
+    results: Annotated[List[dict], _merge_results]
+
+
+def parse_sub_queries(text: str, question: str, max_subqueries: int = 4) -> List[str]:
+    """
+    모델의 분해 결과에서 하위 질의 목록을 꺼냅니다.
+
+    JSON 배열을 우선 찾고, 없으면 번호/글머리표 목록으로 읽습니다.
+
+    Args:
+        text (str): 모델 응답
+        question (str): 원래 질문 (하위 질의를 찾지 못하면 사용)
+        max_subqueries (int): 최대 하위 질의 수
+
+    Returns:
+        List[str]: 중복을 제거한 하위 질의 목록 (최소 1개)
+    """
+    candidates: List[Any] = []
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if match:
+        try:
+            candidates = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            candidates = []
+    if not isinstance(candidates, list) or not candidates:
+        candidates = [re.sub(r"^\s*(?:\d+[.)]|[-*•])\s*", "", line) for line in text.splitlines() if re.match(r"^\s*(?:\d+[.)]|[-*•])\s*\S", line)]
+
+    sub_queries: List[str] = []
+    for candidate in candidates:
+        candidate = str(candidate).strip()
+        if candidate and candidate not in sub_queries:
+            sub_queries.append(candidate)
+    return sub_queries[:max_subqueries] or [question]
+
+
+def _format_result(result: Any, sub_query: str, token_budget: int) -> str:
+    # 검색 결과(Document 목록)는 청크를 이어 붙이고 예산 안으로 줄임, 도구 결과는 문자열로 변환
+    if isinstance(result, list) and result and hasattr(result[0], "page_content"):
+        return assemble_context(result, sub_query, token_budget).format()
+    return str(result)
+
+
+def build_decomposition_graph(
+    model,
+    handler: Callable[[str], Any],
+    max_subqueries: int = 4,
+    max_concurrency: int = 4,
+    branch_timeout: Optional[float] = 30.0,
+    branch_token_budget: int = 800,
+    checkpointer=None,
+):
+    """
+    질의 분해 -> 병렬 분기 -> 종합 그래프를 생성합니다.
+
+    Args:
+        model: 분해와 종합에 사용할 채팅 모델 (도구 없음)
+        handler: 하위 질의 하나를 처리하는 함수 또는 도구 (예: VectorStoreSetting.retrieve, search 도구)
+        max_subqueries (int): 최대 하위 질의 수
+        max_concurrency (int): 동시에 실행할 분기 수
+        branch_timeout (float): 분기 하나의 제한 시간(초), 넘기면 실패로 기록 (None이면 제한 없음)
+        branch_token_budget (int): 분기 하나의 검색 결과에 쓸 토큰 예산
+        checkpointer: 체크포인터 (None이면 사용하지 않음)
+
+    Returns:
+        CompiledStateGraph: 컴파일된 그래프
+    """
+    run = handler.invoke if hasattr(handler, "invoke") else handler
+    # 분기 동시 실행 수를 제한하는 전용 풀 (제한 시간을 넘긴 작업은 끝날 때까지 자리를 차지)
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="decomposition")
+
+    def decompose(state: DecompositionState):
+        question = str(state["messages"][-1].content)
+        try:
+            response = model.invoke([HumanMessage(content=DECOMPOSE_PROMPT.format(question=question, max_subqueries=max_subqueries))])
+            sub_queries = parse_sub_queries(str(response.content), question, max_subqueries)
+        except Exception as e:
+            logger.warning(f"질문 분해 실패, 원래 질문으로 실행합니다: {e}")
+            sub_queries = [question]
+        logger.info(f"하위 질의 {len(sub_queries)}개: {sub_queries}")
+        return {"question": question, "sub_queries": sub_queries, "results": None}
+
+    def fan_out(state: DecompositionState):
+        return [Send("branch", {"index": i, "sub_query": q}) for i, q in enumerate(state["sub_queries"])]
+
+    def branch(task: dict):
+        started = time.perf_counter()
+        future = executor.submit(run, task["sub_query"])
+        try:
+            output = _format_result(future.result(timeout=branch_timeout), task["sub_query"], branch_token_budget)
+            result = {"ok": True, "output": output}
+        except FutureTimeoutError:
+            future.cancel()
+            result = {"ok": False, "error": f"{branch_timeout}초 안에 끝나지 않음"}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        if not result["ok"]:
+            logger.warning(f"하위 질의 실패: {task['sub_query']} ({result['error']})")
+        result.update(index=task["index"], sub_query=task["sub_query"], seconds=time.perf_counter() - started)
+        return {"results": [result]}
+
+    def synthesize(state: DecompositionState):
+        results = sorted(state["results"], key=lambda r: r["index"])
+        lines = []
+        for i, result in enumerate(results, start=1):
+            body = result["output"] if result["ok"] else f"(조사 실패: {result['error']})"
+            lines.append(f"{i}. {result['sub_query']}\n{body}")
+        failed = sum(not r["ok"] for r in results)
+        metadata = {
+            "sub_queries": [r["sub_query"] for r in results],
+            "failed_branches": failed,
+            "branch_seconds": [round(r["seconds"], 3) for r in results],
+        }
+        if results and failed == len(results):
+            # 모든 분기가 실패하면 모델을 부르지 않고 실패를 알림
+            response = AIMessage(content="질문에 필요한 정보를 가져오지 못했습니다: " + "; ".join(r["error"] for r in results))
+        else:
+            response = model.invoke([HumanMessage(content=SYNTHESIZE_PROMPT.format(question=state["question"], results="\n\n".join(lines)))])
+        response.response_metadata = {**(response.response_metadata or {}), "decomposition": metadata}
+        return {"messages": [response]}
+
+    workflow = StateGraph(DecompositionState)
+    workflow.add_node("decompose", decompose)
+    workflow.add_node("branch", branch)
+    workflow.add_node("synthesize", synthesize)
+
+    workflow.add_edge(START, "decompose")
+    workflow.add_conditional_edges("decompose", fan_out, ["branch"])
+    workflow.add_edge("branch", "synthesize")
+    workflow.add_edge("synthesize", END)
+
+    return workflow.compile(checkpointer=checkpointer)
@@ -0,0 +1,84 @@
+"""
+조회 전용 RAG 검색 진입점
+
+이미 저장된 벡터 저장소를 열어서 질의에 대한 검색 결과만 출력합니다.
+cron이나 CLI에서 빠르게 실행할 수 있도록 인제스트 전용 의존성(텍스트 분할기, PDF 로더, tqdm)은 임포트하지 않습니다.
+
+사용 예:
+    python rag_query.py "무역 보험 약관에 대한 정보를 알려줘." --top-k 3
+"""
+
+import argparse
+import sys
+
+import global_variables as gv
+from vector_store_setting import VectorStoreSetting
+
+
+def answer_query(query: str, top_k: int = 3, vector_store_path: str = None, embedding_model_name: str = None):
+    """
+    저장된 벡터 저장소에서 질의와 유사한 문서를 검색합니다.
+
+    Args:
+        query (str): 검색 질의
+        top_k (int): 반환할 문서 수
+        vector_store_path (str): 벡터 저장소 경로 (기본값: global_variables 설정)
+        embedding_model_name (str): 임베딩 모델 이름 (기본값: global_variables 설정)
+
+    Returns:
+        list: 검색된 문서 리스트
+
+    Raises:
+        FileNotFoundError: 저장된 벡터 저장소가 없는 경우 발생
+        RuntimeError: 저장된 벡터 저장소는 있지만 로드에 실패한 경우 발생 (원인 예외를 __cause__로 연결)
+    """
+    vector_store_setting = VectorStoreSetting(
+        vector_store_path=vector_store_path or gv.absolute_vector_store_path,
+        embedding_model_name=embedding_model_name or gv.ollama_embedding_models[2],
+        retriever_top_k=top_k,
+    )
+
+    vectorstore = vector_store_setting.load_for_query()
+    if vectorstore is None:
+        if vector_store_setting.load_error is not None:
+            raise RuntimeError(
+                f"벡터 저장소 로드 실패: {vector_store_setting.vector_store_path} "
+                f"({type(vector_store_setting.load_error).__name__}: {vector_store_setting.load_error})"
+            ) from vector_store_setting.load_error
+        raise FileNotFoundError(
+            f"저장된 벡터 저장소가 없습니다: {vector_store_setting.vector_store_path} "
+            "(RAG_test.py로 먼저 벡터 저장소를 생성해주세요.)"
+        )
+
+    return vectorstore.similarity_search(query, k=top_k)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="저장된 벡터 저장소에 질의합니다.")
+    parser.add_argument("query", help="검색 질의")
+    parser.add_argument("--top-k", type=int, default=3, help="반환할 문서 수")
+    parser.add_argument("--vector-store-path", default=None, help="벡터 저장소 경로")
+    parser.add_argument("--embedding-model", default=None, help="임베딩 모델 이름")
+    args = parser.parse_args(argv)
+
+    try:
+        docs = answer_query(
+            args.query,
+            top_k=args.top_k,
+            vector_store_path=args.vector_store_path,
+            embedding_model_name=args.embedding_model,
+        )
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"오류 발생: {e}")
+        return 1
+
+    print(f"질의: {args.query}")
+    for i, doc in enumerate(docs):
+        print(f"\n[문서 {i+1}]")
+        print(f"출처: {doc.metadata.get('source_file', '알 수 없음')}")
+        print(f"내용: {doc.page_content[:150]}...")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,596 @@
+"""
+Ollama 호출 복원력 모듈
+
+Ollama 서버가 잠깐 응답하지 않거나 5xx를 돌려줄 때, 한 번의 오류로 몇 시간짜리 임베딩 작업이나 대화 응답이
+실패하지 않도록 재시도하되, 장애 중에 재시도가 몰려 서버를 더 괴롭히지 않도록 제한합니다.
+(practice/decorator.py의 retry는 고정 간격으로 재시도하고 비동기를 지원하지 않음)
+
+- 지수 백오프 + 전체 지터: 재시도 간격을 0 ~ min(max_delay, base_delay x 2^n)에서 무작위로 골라 재시도가 한꺼번에 몰리지 않게 함
+- 재시도 예산: 서버별로 요청마다 ratio만큼 토큰을 쌓고 재시도마다 하나씩 써서, 재시도가 전체 요청의 일정 비율을 넘지 않게 함
+- 서버별 회로 차단기: 연속 실패가 failure_threshold에 이르면 열림(바로 CircuitOpenError), reset_timeout 뒤 반열림 상태에서
+  시험 요청 하나만 보내 성공하면 닫힘, 실패하면 다시 열림
+- 기한 전파: deadline() 안의 호출은 남은 시간을 넘겨 재시도하지 않음 (contextvars이므로 비동기 작업에도 전달,
+  진행 중인 요청을 끊지는 않음)
+- 동기/비동기/스트리밍 모두 같은 규칙 (스트리밍은 첫 청크를 받기 전까지만 재시도)
+- 재시도 대상: 연결 오류, 시간 초과, 408/429/5xx 응답 (SchedulerOverloaded처럼 로컬에서 거절한 요청은 재시도 안 함)
+- 서버별 상태와 누적 통계: snapshot(), Prometheus 텍스트 형식 내보내기
+
+한 프로세스 안에서는 get_resilience()가 Ollama 서버 주소별로 같은 객체를 돌려줍니다.
+ScheduledChatModel, ScheduledEmbeddings(ollama_scheduler.py)가 모든 호출에 적용합니다.
+
+사용 예:
+    @resilient(lambda self, *args: self.base_url, policy=policy_for("batch"))
+    def embed_batch(self, texts): ...
+
+    resilience = get_resilience("http://localhost:11434")
+    vectors = resilience.call(lambda: embeddings.embed_documents(batch), policy=policy_for("batch"))
+
+    with deadline(30):
+        response = await resilience.acall(lambda: llm.ainvoke(messages))
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Union
+
+import global_variables as gv
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 HTTP 상태 코드 (요청 시간 초과, 요청 과다, 서버 오류)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("ollama_deadline", default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """회로 차단기가 열려 있어 보내지 않은 요청"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"Ollama 서버 {endpoint}의 회로 차단기가 열려 있어 요청을 보내지 않았습니다 ({retry_after:.1f}초 뒤 다시 시도)")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    """기한이 지나 보내지 않은 요청"""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    블록 안의 Ollama 호출에 기한을 둡니다. (바깥 기한이 더 이르면 바깥 기한 유지)
+
+    기한이 지나면 새 시도와 재시도를 시작하지 않을 뿐, 이미 진행 중인 요청을 끊지는 않습니다.
+    (요청 하나의 최대 시간은 HTTP 클라이언트의 timeout으로 제한)
+
+    Args:
+        seconds (float): 지금부터의 제한 시간(초) (None이면 바꾸지 않음)
+    """
+    if seconds is None:
+        yield
+        return
+    current = _deadline.get()
+    target = time.monotonic() + seconds
+    token = _deadline.set(target if current is None else min(current, target))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """현재 기한까지 남은 시간(초) (기한이 없으면 None)"""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    다시 시도하면 성공할 수 있는 오류인지 판단합니다.
+
+    Args:
+        exc (BaseException): 발생한 예외
+
+    Returns:
+        bool: 연결 오류, 시간 초과, 408/429/5xx 응답이면 True
+    """
+    if isinstance(exc, (CircuitOpenError, DeadlineExceeded)):
+        return False
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+
+        return isinstance(exc, httpx.TransportError)
+    except ImportError:
+        return False
+
+
+class RetryPolicy:
+    """
+    재시도 횟수와 백오프 간격
+
+    Args:
+        max_attempts (int): 최대 시도 횟수 (첫 시도 포함)
+        base_delay (float): 첫 재시도 간격의 상한(초)
+        max_delay (float): 재시도 간격의 최대 상한(초)
+        multiplier (float): 재시도마다 상한을 늘리는 배수
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        multiplier: float = 2.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = gv.ollama_retry_base_delay if base_delay is None else base_delay
+        self.max_delay = gv.ollama_retry_max_delay if max_delay is None else max_delay
+        self.multiplier = multiplier
+
+    def backoff(self, attempt: int) -> float:
+        """attempt번째 시도가 실패한 뒤 기다릴 시간(초), 전체 지터"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1)))
+
+
+def policy_for(priority: str) -> RetryPolicy:
+    """스케줄러 우선순위별 재시도 정책 (global_variables.ollama_retry_max_attempts)"""
+    return RetryPolicy(max_attempts=gv.ollama_retry_max_attempts.get(priority, 3))
+
+
+class RetryBudget:
+    """
+    재시도 예산 (토큰 버킷)
+
+    요청마다 ratio개, 초당 min_per_second개의 토큰을 쌓고 재시도마다 하나씩 씁니다.
+    장애 중에는 토큰이 금방 바닥나므로 재시도가 요청의 약 ratio 비율로 제한됩니다.
+
+    Args:
+        ratio (float): 요청 하나당 쌓는 토큰 수
+        min_per_second (float): 요청이 적을 때도 재시도할 수 있도록 초당 쌓는 토큰 수
+        max_tokens (float): 최대 토큰 수
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 0.5, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount: float = 0.0) -> None:
+        # self._lock 안에서 호출
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + amount + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        """재시도할 토큰이 있으면 하나 쓰고 True"""
+        with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    서버 하나의 회로 차단기
+
+    Args:
+        endpoint (str): 서버 주소 (오류 메시지용)
+        failure_threshold (int): 차단기를 여는 연속 실패 수
+        reset_timeout (float): 열린 뒤 시험 요청을 보내기까지 기다리는 시간(초)
+        half_open_max_calls (int): 반열림 상태에서 동시에 보낼 시험 요청 수
+    """
+
+    def __init__(self, endpoint: str, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_total = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # self._lock 안에서 호출, 열린 지 reset_timeout이 지났으면 반열림으로 전환
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        요청을 보내도 되는지 확인합니다.
+
+        Raises:
+            CircuitOpenError: 열려 있거나, 반열림 상태에서 이미 시험 요청이 진행 중인 경우 발생
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(self.endpoint, retry_after)
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Ollama 서버 {self.endpoint} 회로 차단기 닫힘 (시험 요청 성공)")
+            self._state = CLOSED
+            self.consecutive_failures = 0
+            self._probes = 0
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+                self.opened_total += 1
+                logger.warning(f"Ollama 서버 {self.endpoint} 회로 차단기 열림 (연속 실패 {self.consecutive_failures}회, {self.reset_timeout}초 동안 차단)")
+
+    def release(self) -> None:
+        """서버 상태와 관계없이 끝난 요청 (로컬 거절, 취소 등) - 반열림 시험 자리만 반납"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+
+class EndpointResilience:
+    """
+    서버 하나의 재시도 예산, 회로 차단기, 통계
+
+    Args:
+        endpoint (str): Ollama 서버 주소
+        breaker (CircuitBreaker): 회로 차단기 (기본값: global_variables 설정)
+        budget (RetryBudget): 재시도 예산 (기본값: global_variables 설정)
+        policy (RetryPolicy): 호출에 정책을 지정하지 않았을 때 쓸 재시도 정책
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        breaker: Optional[CircuitBreaker] = None,
+        budget: Optional[RetryBudget] = None,
+        policy: Optional[RetryPolicy] = None,
+    ):
+        self.endpoint = endpoint
+        self.breaker = breaker or CircuitBreaker(
+            endpoint,
+            failure_threshold=gv.ollama_breaker_failure_threshold,
+            reset_timeout=gv.ollama_breaker_reset_seconds,
+        )
+        self.budget = budget or RetryBudget(ratio=gv.ollama_retry_budget_ratio)
+        self.policy = policy or RetryPolicy()
+        self.counts = dict.fromkeys(
+            ("calls", "successes", "failures", "retries", "retries_denied", "short_circuited", "deadline_exceeded"), 0
+        )
+        self._lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def _before_attempt(self) -> None:
+        left = remaining()
+        if left is not None and left <= 0:
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"Ollama 서버 {self.endpoint} 호출 기한이 지났습니다.")
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("short_circuited")
+            raise
+
+    def _on_success(self) -> None:
+        self.breaker.on_success()
+        self._count("successes")
+
+    def _after_failure(self, exc: BaseException, attempt: int, policy: RetryPolicy) -> Optional[float]:
+        """실패를 기록하고, 다시 시도할 거라면 기다릴 시간(초)을, 아니면 None을 돌려줍니다."""
+        if not is_retryable(exc):
+            # 서버가 응답한 오류(400, 404 등)는 서버가 살아 있다는 뜻, 로컬 거절/취소는 서버 상태와 무관
+            if isinstance(exc, Exception) and getattr(exc, "status_code", None) is not None:
+                self._on_success()
+            else:
+                self.breaker.release()
+            return None
+        self.breaker.on_failure()
+        self._count("failures")
+        if attempt >= policy.max_attempts or self.breaker.state == OPEN:
+            return None
+        delay = policy.backoff(attempt)
+        left = remaining()
+        if left is not None and delay >= left:
+            self._count("deadline_exceeded")
+            return None
+        if not self.budget.try_spend():
+            self._count("retries_denied")
+            logger.warning(f"Ollama 서버 {self.endpoint} 재시도 예산 소진, 재시도하지 않습니다: {exc}")
+            return None
+        self._count("retries")
+        logger.info(f"Ollama 서버 {self.endpoint} 호출 실패, {delay:.2f}초 뒤 재시도 ({attempt}/{policy.max_attempts}): {exc}")
+        return delay
+
+    def call(self, fn: Callable[[], Any], policy: Optional[RetryPolicy] = None) -> Any:
+        """
+        재시도 규칙을 적용하여 fn()을 호출합니다.
+
+        Args:
+            fn (Callable): 호출할 함수
+            policy (RetryPolicy): 재시도 정책 (기본값: self.policy)
+
+        Returns:
+            fn()의 결과
+
+        Raises:
+            CircuitOpenError: 회로 차단기가 열려 있는 경우 발생
+            DeadlineExceeded: 시도 전에 기한이 지난 경우 발생
+            Exception: 재시도할 수 없거나 재시도를 다 쓴 경우 마지막 오류
+        """
+        policy = policy or self.policy
+        self._count("calls")
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._before_attempt()
+            try:
+                result = fn()
+            except BaseException as e:
+                delay = self._after_failure(e, attempt, policy)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                return result
+            time.sleep(delay)
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], policy: Optional[RetryPolicy] = None) -> Any:
+        """call()의 비동기 버전 (fn은 코루틴을 돌려주는 함수)"""
+        policy = policy or self.policy
+        self._count("calls")
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._before_attempt()
+            try:
+                result = await fn()
+            except BaseException as e:
+                delay = self._after_failure(e, attempt, policy)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                return result
+            await asyncio.sleep(delay)
+
+    def stream(self, fn: Callable[[], Iterator[Any]], policy: Optional[RetryPolicy] = None) -> Iterator[Any]:
+        """
+        스트리밍 호출에 재시도 규칙을 적용합니다. (첫 청크를 받은 뒤의 오류는 재시도하지 않음)
+
+        Args:
+            fn (Callable): 이터레이터를 돌려주는 함수
+            policy (RetryPolicy): 재시도 정책
+
+        Yields:
+            fn()이 내놓는 청크
+        """
+        policy = policy or self.policy
+        self._count("calls")
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._before_attempt()
+            iterator = fn()
+            started = False
+            try:
+                for item in iterator:
+                    started = True
+                    yield item
+            except Exception as e:
+                # 이미 내보낸 청크는 되돌릴 수 없으므로 마지막 시도로 처리
+                delay = self._after_failure(e, policy.max_attempts if started else attempt, policy)
+                if delay is None:
+                    raise
+            except BaseException:
+                # 호출한 쪽이 스트림을 닫은 경우 (GeneratorExit) 등
+                if started:
+                    self._on_success()
+                else:
+                    self.breaker.release()
+                raise
+            else:
+                self._on_success()
+                return
+            finally:
+                # 닫아야 스트리밍 HTTP 응답과 스케줄러 슬롯이 반납됨
+                close = getattr(iterator, "close", None)
+                if close:
+                    close()
+            time.sleep(delay)
+
+    async def astream(self, fn: Callable[[], AsyncIterator[Any]], policy: Optional[RetryPolicy] = None) -> AsyncIterator[Any]:
+        """stream()의 비동기 버전 (fn은 비동기 이터레이터를 돌려주는 함수)"""
+        policy = policy or self.policy
+        self._count("calls")
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._before_attempt()
+            iterator = fn()
+            started = False
+            try:
+                async for item in iterator:
+                    started = True
+                    yield item
+            except Exception as e:
+                delay = self._after_failure(e, policy.max_attempts if started else attempt, policy)
+                if delay is None:
+                    raise
+            except BaseException:
+                if started:
+                    self._on_success()
+                else:
+                    self.breaker.release()
+                raise
+            else:
+                self._on_success()
+                return
+            finally:
+                aclose = getattr(iterator, "aclose", None)
+                if aclose:
+                    await aclose()
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> dict:
+        """
+        현재 상태와 누적 통계
+
+        Returns:
+            dict: state, consecutive_failures, opened_total, budget_tokens, calls, successes, failures, retries,
+                retries_denied, short_circuited, deadline_exceeded
+        """
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "opened_total": self.breaker.opened_total,
+            "budget_tokens": round(self.budget.tokens, 2),
+            **counts,
+        }
+
+
+_resilience: Dict[str, EndpointResilience] = {}
+_resilience_lock = threading.Lock()
+
+
+def get_resilience(base_url: Optional[str] = None) -> EndpointResilience:
+    """
+    Ollama 서버 주소별 공용 재시도/차단 상태를 반환합니다. (global_variables 설정 사용)
+
+    Args:
+        base_url (str): Ollama 서버 주소 (기본값: global_variables.ollama_base_url)
+
+    Returns:
+        EndpointResilience: 해당 서버의 재시도/차단 상태
+    """
+    key = (base_url or gv.ollama_base_url).rstrip("/")
+    with _resilience_lock:
+        resilience = _resilience.get(key)
+        if resilience is None:
+            resilience = _resilience[key] = EndpointResilience(key)
+        return resilience
+
+
+def resilient(endpoint: Union[str, Callable[..., str], None] = None, policy: Optional[RetryPolicy] = None):
+    """
+    함수에 재시도 규칙을 적용하는 데코레이터 (일반 함수와 async 함수 지원)
+
+    Args:
+        endpoint: Ollama 서버 주소, 또는 호출 인자로 서버 주소를 구하는 함수 (None이면 기본 주소)
+        policy (RetryPolicy): 재시도 정책 (None이면 서버의 기본 정책)
+
+    Returns:
+        Callable: 데코레이터
+    """
+    resolve = endpoint if callable(endpoint) else (lambda *args, **kwargs: endpoint)
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await get_resilience(resolve(*args, **kwargs)).acall(lambda: func(*args, **kwargs), policy)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return get_resilience(resolve(*args, **kwargs)).call(lambda: func(*args, **kwargs), policy)
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> Dict[str, dict]:
+    """서버별 상태와 누적 통계"""
+    with _resilience_lock:
+        endpoints = dict(_resilience)
+    return {endpoint: resilience.snapshot() for endpoint, resilience in endpoints.items()}
+
+
+def export_prometheus(path: str) -> str:
+    """
+    서버별 상태와 누적 통계를 Prometheus 텍스트 형식으로 저장합니다. (임시 파일에 쓴 뒤 교체)
+
+    Args:
+        path (str): 저장할 파일 경로
+
+    Returns:
+        str: 저장한 파일 경로
+    """
+    metrics = [
+        ("ollama_resilience_calls_total", "counter", "calls"),
+        ("ollama_resilience_failures_total", "counter", "failures"),
+        ("ollama_resilience_retries_total", "counter", "retries"),
+        ("ollama_resilience_retries_denied_total", "counter", "retries_denied"),
+        ("ollama_resilience_short_circuited_total", "counter", "short_circuited"),
+        ("ollama_resilience_deadline_exceeded_total", "counter", "deadline_exceeded"),
+        ("ollama_breaker_opened_total", "counter", "opened_total"),
+        ("ollama_retry_budget_tokens", "gauge", "budget_tokens"),
+    ]
+    states = snapshot()
+    lines = ["# TYPE ollama_breaker_state gauge"]
+    for endpoint, values in states.items():
+        # 0: 닫힘, 1: 반열림, 2: 열림
+        lines.append(f'ollama_breaker_state{{endpoint="{endpoint}"}} {(CLOSED, HALF_OPEN, OPEN).index(values["state"])}')
+    for name, metric_type, key in metrics:
+        lines.append(f"# TYPE {name} {metric_type}")
+        for endpoint, values in states.items():
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {values[key]}')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,375 @@
+"""
+세그먼트 기반 벡터 저장소 모듈
+
+검색과 문서 추가를 동시에 수행할 수 있도록 벡터 저장소를 세그먼트로 나눕니다.
+
+- 봉인(sealed) 세그먼트: 더 이상 바뀌지 않는 세그먼트. 잠금 없이 검색합니다.
+- 가변(mutable) 세그먼트: 새 청크가 추가되는 작은 세그먼트. 미리 할당한 배열에 행을 쓴 뒤
+  행 수(count)를 마지막에 늘리므로, 검색은 읽는 시점의 count까지만 보고 잠금 없이 진행합니다.
+- 세그먼트 목록은 튜플로 두고 변경 시 통째로 교체(copy-on-write)하므로 검색 중에 목록이 바뀌지 않습니다.
+- 가변 세그먼트가 가득 차면 봉인하고, 봉인 세그먼트가 많아지면 백그라운드 스레드에서 병합합니다.
+
+임베딩 계산(가장 오래 걸리는 부분)은 쓰기 잠금 밖에서 수행하므로 검색 지연이 인제스트에 영향을 받지 않습니다.
+세그먼트 저장소는 메모리에만 존재합니다. 추가된 문서를 디스크에 반영하려면 스냅샷을 다시 생성합니다.
+"""
+
+import heapq
+import logging
+import threading
+import uuid
+from collections.abc import Sequence
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MUTABLE_CAPACITY = 1024
+DEFAULT_MERGE_THRESHOLD = 8
+
+
+def _prepare(vectors: np.ndarray, metric: str) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if metric == "cosine":
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+    return vectors
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class Segment:
+    """
+    봉인된(변경되지 않는) 세그먼트
+
+    Args:
+        vectors (np.ndarray): 정규화된(cosine) 또는 원본(l2) 벡터 행렬
+        ids (Sequence[str]): 청크 ID
+        texts (Sequence[str]): 청크 텍스트 (압축 청크 저장소의 지연 시퀀스도 가능)
+        metadatas (Sequence[dict]): 청크 메타데이터
+        metric (str): "cosine" 또는 "l2"
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: Sequence, texts: Sequence, metadatas: Sequence, metric: str):
+        self.vectors = vectors
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.metric = metric
+        # l2 거리 계산용 제곱 노름 (||x||^2 - 2x·q 형태로 정렬)
+        self.sq_norms = np.einsum("ij,ij->i", vectors, vectors) if metric == "l2" else None
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, query: np.ndarray, k: int, count: Optional[int] = None) -> List[Tuple[float, int]]:
+        """
+        세그먼트 안에서 상위 k개 (점수, 위치)를 구합니다. 점수는 클수록 유사합니다.
+
+        Args:
+            query (np.ndarray): 전처리된 질의 벡터
+            k (int): 반환할 개수
+            count (int): 앞에서부터 검색할 행 수 (가변 세그먼트용)
+        """
+        count = len(self) if count is None else count
+        if count == 0:
+            return []
+        vectors = self.vectors[:count]
+        scores = vectors @ query
+        if self.metric == "l2":
+            scores = 2 * scores - self.sq_norms[:count]
+        return [(float(scores[i]), int(i)) for i in _top_k(scores, k)]
+
+    def document(self, position: int, score: float) -> Document:
+        return Document(
+            page_content=self.texts[position],
+            metadata={"id": self.ids[position], **self.metadatas[position], "score": score},
+        )
+
+
+class MutableSegment(Segment):
+    """
+    새 청크가 추가되는 세그먼트
+
+    배열은 capacity만큼 미리 할당하고, 행을 모두 쓴 뒤 count를 늘려서 검색에 공개합니다.
+    쓰기는 SegmentedVectorStore의 쓰기 잠금 안에서만 수행합니다.
+    """
+
+    def __init__(self, dimension: int, capacity: int, metric: str):
+        super().__init__(np.zeros((capacity, dimension), dtype=np.float32), [], [], [], metric)
+        self.sq_norms = np.zeros(capacity, dtype=np.float32) if metric == "l2" else None
+        self.capacity = capacity
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def room(self) -> int:
+        return self.capacity - self.count
+
+    def append(self, vectors: np.ndarray, ids: List[str], texts: List[str], metadatas: List[dict]) -> None:
+        start, end = self.count, self.count + len(vectors)
+        self.vectors[start:end] = vectors
+        if self.sq_norms is not None:
+            self.sq_norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        # 데이터를 모두 쓴 뒤 공개
+        self.count = end
+
+    def seal(self) -> Segment:
+        """현재까지 추가된 행으로 봉인 세그먼트를 만듭니다."""
+        count = self.count
+        return Segment(self.vectors[:count].copy(), self.ids[:count], self.texts[:count], self.metadatas[:count], self.metric)
+
+
+class SegmentedVectorStore(VectorStore):
+    """
+    검색과 문서 추가를 동시에 수행할 수 있는 세그먼트 벡터 저장소
+
+    Args:
+        embedding (Embeddings): 임베딩 모델
+        dimension (int): 벡터 차원 (None이면 첫 추가 시 결정)
+        metric (str): "cosine" 또는 "l2" (FAISS IndexFlatL2와 같은 순서가 필요하면 l2)
+        mutable_capacity (int): 가변 세그먼트 최대 행 수
+        merge_threshold (int): 봉인 세그먼트 수가 이 값을 넘으면 백그라운드 병합
+    """
+
+    def __init__(
+        self,
+        embedding,
+        dimension: Optional[int] = None,
+        metric: str = "cosine",
+        mutable_capacity: int = DEFAULT_MUTABLE_CAPACITY,
+        merge_threshold: int = DEFAULT_MERGE_THRESHOLD,
+    ):
+        if metric not in ("cosine", "l2"):
+            raise ValueError(f"지원하지 않는 거리 척도입니다: {metric}")
+        self._embedding = embedding
+        self.dimension = dimension
+        self.metric = metric
+        self.mutable_capacity = mutable_capacity
+        self.merge_threshold = merge_threshold
+
+        self._sealed: Tuple[Segment, ...] = ()
+        self._mutable: Optional[MutableSegment] = None
+        self._write_lock = threading.Lock()
+        self._merge_thread: Optional[threading.Thread] = None
+        self.merges = 0
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    @classmethod
+    def from_sklearn(cls, vectorstore, **kwargs) -> "SegmentedVectorStore":
+        """
+        SKLearnVectorStore의 데이터를 첫 봉인 세그먼트로 사용하는 저장소를 만듭니다.
+
+        텍스트/메타데이터 시퀀스는 복사하지 않고 그대로 참조합니다. (압축 청크 저장소의 지연 시퀀스 포함)
+        """
+        store = cls(vectorstore.embeddings, metric="cosine", **kwargs)
+        vectors = np.asarray(vectorstore._embeddings_np, dtype=np.float32)
+        if len(vectors):
+            store.dimension = vectors.shape[1]
+            store._sealed = (Segment(_prepare(vectors, "cosine"), vectorstore._ids, vectorstore._texts, vectorstore._metadatas, "cosine"),)
+        return store
+
+    @classmethod
+    def from_faiss(cls, vectorstore, **kwargs) -> "SegmentedVectorStore":
+        """
+        FAISS 벡터 저장소의 데이터를 첫 봉인 세그먼트로 사용하는 저장소를 만듭니다. (l2 거리)
+
+        문서는 docstore에서 필요할 때 조회합니다.
+        """
+        store = cls(vectorstore.embeddings, metric="l2", **kwargs)
+        index = vectorstore.index
+        if index.ntotal:
+            store.dimension = index.d
+            ids = [vectorstore.index_to_docstore_id[i] for i in range(index.ntotal)]
+            view = _DocstoreView(vectorstore.docstore, ids)
+            store._sealed = (Segment(index.reconstruct_n(0, index.ntotal), ids, view.texts(), view.metadatas(), "l2"),)
+        return store
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """
+        텍스트를 임베딩하여 가변 세그먼트에 추가합니다. 추가 중에도 검색은 계속 수행됩니다.
+
+        Args:
+            texts (Iterable[str]): 추가할 청크 텍스트
+            metadatas (List[dict]): 청크 메타데이터
+            ids (List[str]): 청크 ID (기본값: 임의 생성)
+
+        Returns:
+            List[str]: 추가된 청크 ID
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+
+        # 임베딩은 잠금 밖에서 계산
+        vectors = _prepare(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32), self.metric)
+
+        with self._write_lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            start = 0
+            while start < len(texts):
+                if self._mutable is None or self._mutable.room() == 0:
+                    self._seal_locked()
+                    self._mutable = MutableSegment(self.dimension, self.mutable_capacity, self.metric)
+                end = start + min(self._mutable.room(), len(texts) - start)
+                self._mutable.append(vectors[start:end], ids[start:end], texts[start:end], metadatas[start:end])
+                start = end
+        self._maybe_merge()
+        return ids
+
+    def _seal_locked(self) -> None:
+        if self._mutable is not None and self._mutable.count:
+            # 봉인 세그먼트를 목록에 먼저 공개한 뒤 가변 세그먼트를 교체
+            # (그 사이의 검색은 같은 행을 두 번 볼 수 있으므로 ID로 중복 제거)
+            self._sealed = self._sealed + (self._mutable.seal(),)
+            self._mutable = None
+
+    def seal(self) -> None:
+        """현재 가변 세그먼트를 봉인합니다."""
+        with self._write_lock:
+            self._seal_locked()
+        self._maybe_merge()
+
+    def _maybe_merge(self) -> None:
+        if len(self._sealed) <= self.merge_threshold:
+            return
+        if self._merge_thread is not None and self._merge_thread.is_alive():
+            return
+        self._merge_thread = threading.Thread(target=self.merge, name="segment-merge", daemon=True)
+        self._merge_thread.start()
+
+    def merge(self) -> None:
+        """
+        첫 번째(가장 큰) 세그먼트를 제외한 봉인 세그먼트를 하나로 병합합니다.
+
+        병합은 잠금 밖에서 수행하고, 교체할 때만 쓰기 잠금을 잡습니다.
+        """
+        targets = self._sealed[1:]
+        if len(targets) < 2:
+            return
+        merged = Segment(
+            np.vstack([segment.vectors for segment in targets]),
+            [doc_id for segment in targets for doc_id in segment.ids],
+            [text for segment in targets for text in segment.texts],
+            [metadata for segment in targets for metadata in segment.metadatas],
+            self.metric,
+        )
+        with self._write_lock:
+            current = self._sealed
+            if current[1:len(targets) + 1] != targets:
+                logger.warning("병합 중 세그먼트 목록이 바뀌어 병합을 취소합니다.")
+                return
+            self._sealed = (current[0], merged) + current[len(targets) + 1:]
+            self.merges += 1
+        logger.info(f"봉인 세그먼트 {len(targets)}개를 병합했습니다 ({len(merged)}개 청크)")
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        """
+        질의 벡터로 모든 세그먼트를 검색하여 상위 k개 문서를 반환합니다.
+
+        Returns:
+            List[Tuple[Document, float]]: (문서, 점수) 리스트. cosine은 유사도, l2는 거리(작을수록 유사)
+        """
+        # 가변 세그먼트와 count를 먼저 읽은 뒤 봉인 목록을 읽어, 그 사이에 봉인된 행도 빠지지 않게 함
+        mutable = self._mutable
+        mutable_count = mutable.count if mutable is not None else 0
+        sealed = self._sealed
+
+        query = _prepare(np.asarray([embedding], dtype=np.float32), self.metric)[0]
+        query_sq = float(query @ query) if self.metric == "l2" else 0.0
+
+        candidates = []
+        for segment in sealed:
+            candidates.extend((score, pos, segment) for score, pos in segment.search(query, k))
+        if mutable_count:
+            candidates.extend((score, pos, mutable) for score, pos in mutable.search(query, k, count=mutable_count))
+
+        results = []
+        seen = set()
+        for score, pos, segment in heapq.nlargest(len(candidates), candidates, key=lambda c: c[0]):
+            doc_id = segment.ids[pos]
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            # l2는 ||x-q||^2 = ||q||^2 - (2x·q - ||x||^2)
+            value = score if self.metric == "cosine" else max(query_sq - score, 0.0)
+            results.append((segment.document(pos, value), value))
+            if len(results) == k:
+                break
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k=k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k=k)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding, metadatas: Optional[List[dict]] = None, **kwargs: Any) -> "SegmentedVectorStore":
+        ids = kwargs.pop("ids", None)
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def __len__(self) -> int:
+        mutable = self._mutable
+        return sum(len(segment) for segment in self._sealed) + (mutable.count if mutable is not None else 0)
+
+    def stats(self) -> dict:
+        """세그먼트 구성 통계"""
+        mutable = self._mutable
+        return {
+            "sealed_segments": len(self._sealed),
+            "sealed_chunks": sum(len(segment) for segment in self._sealed),
+            "mutable_chunks": mutable.count if mutable is not None else 0,
+            "merges": self.merges,
+        }
+
+
+class _DocstoreView:
+    """FAISS docstore의 문서를 위치 기반 시퀀스로 보여주는 도우미"""
+
+    def __init__(self, docstore, ids: List[str]):
+        self.docstore = docstore
+        self.ids = ids
+
+    def texts(self) -> Sequence:
+        return _DocstoreField(self, "page_content")
+
+    def metadatas(self) -> Sequence:
+        return _DocstoreField(self, "metadata")
+
+
+class _DocstoreField(Sequence):
+    def __init__(self, view: _DocstoreView, field: str):
+        self.view = view
+        self.field = field
+
+    def __len__(self) -> int:
+        return len(self.view.ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        return getattr(self.view.docstore.search(self.view.ids[position]), self.field)
@@ -0,0 +1,296 @@
+"""
+벡터 저장소 스냅샷 관리 모듈
+
+벡터 저장소를 버전별 스냅샷 디렉토리로 관리하여, 서비스 중에도 중단 없이 인덱스를 다시 만들 수 있게 합니다.
+
+디렉토리 구성 (루트 = vector_store_path):
+    CURRENT                        현재 서비스 중인 스냅샷 버전 (한 줄)
+    retired.json                   교체된 스냅샷 버전별 교체 시각 (GC 유예 기간 계산용)
+    snapshots/<버전>/               완성된 스냅샷 (MANIFEST.json 포함)
+    snapshots/<버전>.partial/       생성 중인 스냅샷 (완성되면 이름 변경)
+
+- 새 스냅샷은 .partial 디렉토리에 만든 뒤 이름을 바꾸고, CURRENT를 임시 파일 + os.replace로 교체합니다.
+  CURRENT를 읽는 쪽은 항상 완성된 스냅샷만 보게 됩니다.
+- LiveSnapshotRetriever는 질의 사이에 CURRENT 변경을 확인하고, 새 스냅샷은 백그라운드에서 로드한 뒤
+  참조 하나만 바꿔서 교체합니다. 로드하는 동안에는 이전 스냅샷으로 계속 응답합니다.
+- 교체된 스냅샷은 유예 기간이 지난 뒤 gc()에서 삭제합니다.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE_NAME = "CURRENT"
+RETIRED_FILE_NAME = "retired.json"
+MANIFEST_FILE_NAME = "MANIFEST.json"
+SNAPSHOTS_DIR_NAME = "snapshots"
+PARTIAL_SUFFIX = ".partial"
+
+# 교체된 스냅샷을 삭제하기 전까지 기다리는 시간 (다른 프로세스가 아직 읽고 있을 수 있음)
+DEFAULT_GRACE_SECONDS = 600
+# 이 시간보다 오래된 .partial 디렉토리는 중단된 생성으로 보고 삭제
+DEFAULT_PARTIAL_MAX_AGE_SECONDS = 24 * 3600
+
+
+def _write_atomic(path: str, content: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SnapshotManager:
+    """
+    버전별 스냅샷 디렉토리와 CURRENT 포인터 관리
+
+    Args:
+        root (str): 스냅샷 루트 경로
+        grace_seconds (float): 교체된 스냅샷을 삭제하기 전 유예 시간(초)
+    """
+
+    def __init__(self, root: str, grace_seconds: float = DEFAULT_GRACE_SECONDS):
+        self.root = root
+        self.grace_seconds = grace_seconds
+        self.snapshots_dir = os.path.join(root, SNAPSHOTS_DIR_NAME)
+        self._lock = threading.Lock()
+
+    def new_version(self) -> str:
+        """정렬 가능한 새 스냅샷 버전 이름을 만듭니다. (예: v20250101-093000-1a2b)"""
+        return time.strftime("v%Y%m%d-%H%M%S") + f"-{uuid.uuid4().hex[:4]}"
+
+    def snapshot_path(self, version: str) -> str:
+        return os.path.join(self.snapshots_dir, version)
+
+    def partial_path(self, version: str) -> str:
+        return self.snapshot_path(version) + PARTIAL_SUFFIX
+
+    def current_version(self) -> Optional[str]:
+        """
+        현재 서비스 중인 스냅샷 버전을 읽습니다.
+
+        Returns:
+            str or None: 스냅샷 버전 (아직 스냅샷이 없으면 None)
+        """
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE_NAME), encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def current_path(self) -> Optional[str]:
+        version = self.current_version()
+        return self.snapshot_path(version) if version else None
+
+    def list_versions(self) -> List[str]:
+        """완성된 스냅샷 버전 목록 (오래된 순)"""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.snapshots_dir)
+            if not name.endswith(PARTIAL_SUFFIX) and os.path.isdir(self.snapshot_path(name))
+        )
+
+    def read_manifest(self, version: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.snapshot_path(version), MANIFEST_FILE_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def begin(self) -> Tuple[str, str]:
+        """
+        새 스냅샷 생성을 시작합니다.
+
+        Returns:
+            Tuple[str, str]: (버전, 스냅샷을 생성할 .partial 디렉토리 경로)
+        """
+        version = self.new_version()
+        path = self.partial_path(version)
+        os.makedirs(path, exist_ok=False)
+        return version, path
+
+    def publish(self, version: str, manifest: Optional[dict] = None) -> str:
+        """
+        생성이 끝난 스냅샷을 완성 처리하고 CURRENT를 새 버전으로 교체합니다.
+
+        Args:
+            version (str): begin()에서 받은 스냅샷 버전
+            manifest (dict): MANIFEST.json에 기록할 추가 정보
+
+        Returns:
+            str: 완성된 스냅샷 경로
+        """
+        partial = self.partial_path(version)
+        final = self.snapshot_path(version)
+        record = {"version": version, "created_at": time.time(), **(manifest or {})}
+        _write_atomic(os.path.join(partial, MANIFEST_FILE_NAME), json.dumps(record, ensure_ascii=False, indent=2))
+        os.rename(partial, final)
+
+        with self._lock:
+            previous = self.current_version()
+            _write_atomic(os.path.join(self.root, CURRENT_FILE_NAME), version + "\n")
+            if previous and previous != version:
+                retired = self._read_retired()
+                retired[previous] = time.time()
+                self._write_retired(retired)
+        logger.info(f"스냅샷을 교체했습니다: {previous} -> {version}")
+        return final
+
+    def abort(self, version: str) -> None:
+        """실패한 스냅샷 생성을 정리합니다."""
+        shutil.rmtree(self.partial_path(version), ignore_errors=True)
+
+    def _read_retired(self) -> Dict[str, float]:
+        try:
+            with open(os.path.join(self.root, RETIRED_FILE_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_retired(self, retired: Dict[str, float]) -> None:
+        _write_atomic(os.path.join(self.root, RETIRED_FILE_NAME), json.dumps(retired))
+
+    def gc(self, grace_seconds: Optional[float] = None, partial_max_age: float = DEFAULT_PARTIAL_MAX_AGE_SECONDS) -> List[str]:
+        """
+        유예 기간이 지난 이전 스냅샷과 오래된 .partial 디렉토리를 삭제합니다. 현재 스냅샷은 삭제하지 않습니다.
+
+        Args:
+            grace_seconds (float): 유예 시간(초) (기본값: 생성 시 지정한 값)
+            partial_max_age (float): 중단된 생성으로 간주할 .partial 디렉토리 나이(초)
+
+        Returns:
+            List[str]: 삭제한 디렉토리 이름 목록
+        """
+        grace_seconds = self.grace_seconds if grace_seconds is None else grace_seconds
+        now = time.time()
+        removed = []
+        if not os.path.isdir(self.snapshots_dir):
+            return removed
+
+        with self._lock:
+            current = self.current_version()
+            retired = self._read_retired()
+            for name in os.listdir(self.snapshots_dir):
+                path = os.path.join(self.snapshots_dir, name)
+                if name == current or not os.path.isdir(path):
+                    continue
+                if name.endswith(PARTIAL_SUFFIX):
+                    expired = now - os.path.getmtime(path) > partial_max_age
+                else:
+                    # 교체 기록이 없는 스냅샷(게시 직후 다른 스냅샷으로 교체 등)은 디렉토리 수정 시각 기준
+                    expired = now - retired.get(name, os.path.getmtime(path)) > grace_seconds
+                if expired:
+                    shutil.rmtree(path, ignore_errors=True)
+                    retired.pop(name, None)
+                    removed.append(name)
+            self._write_retired({name: at for name, at in retired.items() if name != current})
+
+        if removed:
+            logger.info(f"이전 스냅샷 {len(removed)}개를 삭제했습니다: {removed}")
+        return removed
+
+
+class LiveSnapshotRetriever:
+    """
+    CURRENT 교체를 질의 사이에 반영하는 검색기
+
+    질의마다 현재 스냅샷 참조를 한 번만 읽으므로 하나의 질의는 항상 한 스냅샷 안에서 처리됩니다.
+    CURRENT 변경은 poll_interval 간격으로 확인하며, 새 스냅샷은 백그라운드 스레드에서 로드한 뒤 교체합니다.
+
+    Args:
+        manager (SnapshotManager): 스냅샷 관리자
+        open_snapshot (Callable[[str], Any]): 스냅샷 경로를 받아 retrieve/aretrieve를 제공하는 객체를 반환하는 함수
+        poll_interval (float): CURRENT 변경 확인 간격(초)
+    """
+
+    def __init__(self, manager: SnapshotManager, open_snapshot: Callable[[str], Any], poll_interval: float = 1.0):
+        self.manager = manager
+        self.open_snapshot = open_snapshot
+        self.poll_interval = poll_interval
+        self._active: Optional[Tuple[str, Any]] = None
+        self._last_poll = 0.0
+        self._loading: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[str]:
+        active = self._active
+        return active[0] if active else None
+
+    def current(self) -> Any:
+        """
+        현재 스냅샷 객체를 반환합니다. (처음 호출 시에는 동기 로드)
+
+        Returns:
+            Any: open_snapshot이 반환한 객체
+
+        Raises:
+            FileNotFoundError: 서비스 중인 스냅샷이 없는 경우 발생
+        """
+        active = self._active
+        if active is None:
+            self.refresh(block=True)
+            active = self._active
+            if active is None:
+                raise FileNotFoundError(f"서비스 중인 스냅샷이 없습니다: {self.manager.root}")
+        elif time.monotonic() - self._last_poll >= self.poll_interval:
+            self.refresh(block=False)
+        return active[1]
+
+    def refresh(self, block: bool = False) -> Optional[str]:
+        """
+        CURRENT를 확인하고 바뀌었으면 새 스냅샷을 로드하여 교체합니다.
+
+        Args:
+            block (bool): True면 로드가 끝날 때까지 기다림, False면 백그라운드에서 로드
+
+        Returns:
+            str or None: 확인한 시점의 CURRENT 버전
+        """
+        self._last_poll = time.monotonic()
+        version = self.manager.current_version()
+        if version is None or version == self.version:
+            return version
+
+        with self._lock:
+            if self._loading is not None and self._loading.is_alive():
+                loading = self._loading
+            else:
+                loading = threading.Thread(target=self._load, args=(version,), name=f"snapshot-load-{version}", daemon=True)
+                self._loading = loading
+                loading.start()
+        if block:
+            loading.join()
+        return version
+
+    def _load(self, version: str) -> None:
+        started = time.perf_counter()
+        try:
+            handle = self.open_snapshot(self.manager.snapshot_path(version))
+        except Exception as e:
+            logger.error(f"스냅샷 로드 실패 ({version}), 이전 스냅샷으로 계속 응답합니다: {e}")
+            return
+        if handle is None:
+            logger.error(f"스냅샷을 열 수 없습니다 ({version}), 이전 스냅샷으로 계속 응답합니다.")
+            return
+        previous = self.version
+        self._active = (version, handle)
+        logger.info(f"스냅샷 교체 반영: {previous} -> {version} ({time.perf_counter() - started:.2f}초 소요)")
+
+    def invoke(self, query: str) -> list:
+        """현재 스냅샷에서 검색합니다. (retriever.invoke와 같은 사용법)"""
+        return self.current().retrieve(query)
+
+    async def ainvoke(self, query: str) -> list:
+        """현재 스냅샷에서 비동기로 검색합니다. (retriever.ainvoke와 같은 사용법)"""
+        return await self.current().aretrieve(query)
@@ -4,12 +4,16 @@
 import os
 import glob
 import logging
+from functools import lru_cache
 from typing import List, Any, Union
 
 # LangChain 관련 임포트
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_community.document_loaders import PyMuPDFLoader
 
+import global_variables as gv
+from caching import memoize
+
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -39,3 +43,59 @@ def format_chat_history(messages: List[Union[HumanMessage, AIMessage, SystemMess
             formatted_history += f"System: {message.content}\n"
     
     return formatted_history
+
+
+def get_available_ollama_models(base_url: str = None) -> List[str]:
+    """
+    Ollama 서버에 설치된 채팅 모델 목록을 반환합니다. (global_variables.ollama_models 순서 우선)
+
+    Args:
+        base_url (str): Ollama 서버 주소 (기본값: global_variables.ollama_base_url)
+
+    Returns:
+        List[str]: 사용할 수 있는 채팅 모델 이름 (서버에 연결할 수 없으면 설정된 모델 목록)
+    """
+    from model_residency import get_residency_manager, is_embedding_model
+
+    try:
+        installed = get_residency_manager(base_url).available_models()
+    except Exception as e:
+        logger.warning(f"Ollama 모델 목록을 가져오지 못해 설정된 목록을 사용합니다: {e}")
+        return list(gv.ollama_models)
+
+    installed_set = set(installed)
+    configured = [m for m in gv.ollama_models if m in installed_set or f"{m}:latest" in installed_set]
+    others = [m for m in installed if not is_embedding_model(m) and m not in configured and m.removesuffix(":latest") not in configured]
+    return configured + others
+
+
+@lru_cache(maxsize=1)
+def _token_encoder():
+    # 인제스트 분할기(from_tiktoken_encoder)와 같은 인코딩 사용, 인코딩 파일이 없으면 None
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken 인코딩을 사용할 수 없어 글자 수로 토큰 수를 추정합니다: {e}")
+        return None
+
+
+@memoize(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    텍스트의 토큰 수를 계산합니다. (tiktoken을 사용할 수 없으면 글자 수 기반 추정)
+
+    대화 기록은 턴마다 같은 메시지를 다시 세므로 최근 결과를 캐시합니다.
+
+    Args:
+        text (str): 토큰 수를 계산할 텍스트
+
+    Returns:
+        int: 토큰 수
+    """
+    encoder = _token_encoder()
+    if encoder is None:
+        # 한국어는 대략 글자 1~2개당 1토큰이므로 보수적으로 글자 수 그대로 사용
+        return len(text)
+    return len(encoder.encode(text, disallowed_special=()))
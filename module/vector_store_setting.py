@@ -1,21 +1,66 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import SKLearnVectorStore
-from langchain_community.vectorstores.sklearn import SKLearnVectorStoreException
-from langchain_ollama.embeddings import OllamaEmbeddings
-from langchain_community.document_loaders import PyMuPDFLoader
-
 import os
 import glob
+import hashlib
 import logging
+import threading
 import time
-from typing import List, Any
-from tqdm import tqdm
+from typing import Dict, List, Any, Optional, TYPE_CHECKING
+
+from async_retrieval import asimilarity_search, create_async_retriever
+from compressed_docstore import CompressedChunkStore, LazyChunkSequence
+from ingest_metrics import IngestMetrics, text_bytes
+from metadata_index import INDEX_FILE_NAME, MetadataIndex, classify_document_type
+from ollama_scheduler import create_scheduled_embeddings
+from profiler import profile
+from snapshot_manager import DEFAULT_GRACE_SECONDS, LiveSnapshotRetriever, SnapshotManager
+
+# 무거운 의존성(langchain, PyMuPDF, tqdm, scikit-learn, ollama)은 사용하는 메서드 안에서 지연 임포트합니다.
+# 조회 전용 경로(이미 저장된 벡터 저장소 로드 후 검색)에서 인제스트 전용 모듈을 불러오지 않기 위함입니다.
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import SKLearnVectorStore
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+class PrecomputedEmbeddings:
+    """
+    미리 계산한 문서 벡터를 재사용하는 임베딩 래퍼
+    
+    SKLearnVectorStore.from_documents가 임베딩을 다시 요청하지 않도록 계산해 둔 벡터를 돌려주고,
+    없는 텍스트와 질의 임베딩은 원래 임베딩 모델에 위임합니다.
+    """
+
+    def __init__(self, base, vectors: Dict[str, List[float]]):
+        """
+        Args:
+            base (OllamaEmbeddings): 원래 임베딩 모델
+            vectors (Dict[str, List[float]]): 청크 텍스트별 임베딩 벡터
+        """
+        self.base = base
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing = [text for text in texts if text not in self.vectors]
+        if missing:
+            self.vectors.update(zip(missing, self.base.embed_documents(missing)))
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    def release(self):
+        """보관 중인 벡터 사본을 해제합니다. 이후에는 원래 임베딩 모델만 사용합니다."""
+        self.vectors = {}
+
+    def __getattr__(self, name):
+        # aembed_query 등 나머지 속성은 원래 임베딩 모델에 위임
+        if name == "base":
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+
 class VectorStoreSetting:
     """
     벡터 저장소 설정 및 관리를 위한 클래스
@@ -35,7 +80,19 @@ class VectorStoreSetting:
             embedding_model_name (str): 사용할 임베딩 모델 이름
             batch_size (int): 임베딩 생성 시 배치 크기
             retriever_top_k (int): 검색 시 반환할 문서 수
+            ollama_base_url (str): Ollama 서버 주소 (None이면 기본 주소 사용)
+            metrics_dir (str): 인제스트 계측 결과를 저장할 경로 (기본값: 벡터 저장소 경로/metrics)
+            compress_chunks (bool): 청크 텍스트/메타데이터를 DB 파일 대신 압축 블록 파일에 저장하고 필요할 때만 읽을지 여부 (기본값: True)
+            chunk_cache_blocks (int): 압축 해제한 블록을 보관할 LRU 캐시 크기 (기본값: 32)
+            retriever_timeout (float): 비동기 검색 제한 시간(초) (기본값: None = 제한 없음)
+            checkpoint_dir (str): 임베딩 배치 체크포인트 경로 (기본값: 벡터 저장소 경로/embedding_checkpoint)
+            embedding_endpoints (List[str]): 임베딩 배치를 나누어 보낼 Ollama 서버 주소 목록 (둘 이상이면 부하 분산)
+            snapshots (bool): vector_store_path를 버전별 스냅샷 루트로 사용할지 여부 (기본값: False)
+            snapshot_grace_seconds (float): 교체된 스냅샷을 삭제하기 전 유예 시간(초) (기본값: 600)
+            snapshot_poll_interval (float): 검색기가 스냅샷 교체를 확인하는 간격(초) (기본값: 1.0)
         """
+        # 스냅샷 생성/로드용 설정 복사에 사용
+        self._settings = dict(kwargs)
         self.absolute_path = kwargs.get("absolute_path")
         self.vector_store_path = kwargs.get("vector_store_path")
         self.model_name = kwargs.get("model_name")
@@ -43,25 +100,193 @@ class VectorStoreSetting:
         self.retriever_top_k = kwargs.get("retriever_top_k", 3)
         self.embedding_model_name = kwargs.get("embedding_model_name")
         self.batch_size = kwargs.get("batch_size", 32)  # 기본 배치 크기 32
+        self.ollama_base_url = kwargs.get("ollama_base_url")
+        self.embedding_endpoints = kwargs.get("embedding_endpoints") or []
+        self.metrics_dir = kwargs.get("metrics_dir") or os.path.join(self.vector_store_path or ".", "metrics")
+        self.compress_chunks = kwargs.get("compress_chunks", True)
+        self.chunk_cache_blocks = kwargs.get("chunk_cache_blocks", 32)
+        self.retriever_timeout = kwargs.get("retriever_timeout")
+        self.checkpoint_dir = kwargs.get("checkpoint_dir") or os.path.join(self.vector_store_path or ".", "embedding_checkpoint")
+
+        # 이번 인제스트에서 이미 계산한 벡터 (폴백 저장소가 다시 임베딩하지 않도록 보관)
+        self._embedded_vectors: Dict[str, List[float]] = {}
+
+        # 버전별 스냅샷 관리 (snapshots=True일 때)
+        self.snapshot_manager: Optional[SnapshotManager] = None
+        if kwargs.get("snapshots"):
+            self.snapshot_manager = SnapshotManager(
+                self.vector_store_path,
+                grace_seconds=kwargs.get("snapshot_grace_seconds", DEFAULT_GRACE_SECONDS),
+            )
+        self.snapshot_poll_interval = kwargs.get("snapshot_poll_interval", 1.0)
+        self._rebuild_lock = threading.Lock()
+
+        # 검색 중 문서 추가를 위한 세그먼트 저장소 (enable_concurrent_writes() 호출 시 생성)
+        self.segmented_store = None
+
+        # 인제스트 단계별 계측 (새 저장소를 만들 때 파일 기록용 수집기로 교체됨)
+        self.metrics = IngestMetrics()
 
-        self.vector_db: SKLearnVectorStore = None
+        self.vector_db: Optional["SKLearnVectorStore"] = None
+        # source_file / page / doc_type 별 청크 위치 인덱스 (필터 검색용)
+        self.metadata_index: Optional[MetadataIndex] = None
+        # 청크 텍스트/메타데이터 압축 블록 저장소 (compress_chunks=True일 때 로드 후 사용)
+        self.chunk_store: Optional[CompressedChunkStore] = None
+        # 마지막 로드 실패 원인 (DB 파일은 있지만 로드 중 예외가 난 경우, 파일이 없으면 None)
+        self.load_error: Optional[Exception] = None
 
     def initialize(self):
         """
         벡터 저장소 초기화 함수
         
         기존 벡터 저장소가 있으면 로드하고, 없으면 새로 생성
+        (중단된 인제스트는 폴더만 있고 DB 파일이 없으므로 새로 생성하며, 체크포인트에서 이어서 진행)
         
         Returns:
             vectorstore 또는 retriever: 벡터 저장소 또는 검색기 객체
         """
-        # 벡터 저장소 경로가 존재하는 경우 로드
-        if os.path.exists(self.vector_store_path):
+        if self.snapshot_manager is not None:
+            return self._initialize_snapshots()
+
+        # 저장이 끝난 벡터 저장소 DB 파일이 존재하는 경우 로드
+        if os.path.exists(os.path.join(self.vector_store_path, "sklearn_vectorstore")):
             return self._load_existing_vectorstore()
         else:
             # 벡터 저장소 경로가 없는 경우 새로 생성
             return self._create_new_vectorstore()
 
+    def load_for_query(self):
+        """
+        조회 전용 벡터 저장소 로드 함수
+
+        저장된 벡터 저장소만 로드하며, 없으면 새로 생성하지 않고 None을 반환합니다.
+        텍스트 분할기, PDF 로더, tqdm 등 인제스트 전용 의존성을 임포트하지 않습니다.
+
+        Returns:
+            SKLearnVectorStore or None: 로드된 벡터 저장소 객체 또는 실패 시 None
+                (저장소가 없으면 load_error가 None, 로드 중 오류가 나면 load_error에 원인 기록)
+        """
+        self.load_error = None
+        store_dir = self.vector_store_path
+        if self.snapshot_manager is not None:
+            # 스냅샷 모드에서는 현재 서비스 중인 스냅샷을 로드
+            store_dir = self.snapshot_manager.current_path()
+            if store_dir is None:
+                logger.warning(f"서비스 중인 스냅샷이 없습니다: {self.vector_store_path}")
+                return None
+        db_file = os.path.join(store_dir, "sklearn_vectorstore")
+        return self._load_vector_store(db_file)
+
+    def _initialize_snapshots(self):
+        """
+        스냅샷 모드 초기화
+        
+        서비스 중인 스냅샷이 없으면 첫 스냅샷을 동기로 생성하고, 스냅샷 교체를 자동으로 반영하는 검색기를 반환합니다.
+        
+        Returns:
+            LiveSnapshotRetriever: 스냅샷 교체를 질의 사이에 반영하는 검색기
+        """
+        if self.snapshot_manager.current_version() is None:
+            logger.info(f"서비스 중인 스냅샷이 없어 첫 스냅샷을 생성합니다: {self.vector_store_path}")
+            if self.rebuild_snapshot(background=False) is None:
+                return None
+        return self.live_retriever()
+
+    def live_retriever(self) -> LiveSnapshotRetriever:
+        """
+        스냅샷 교체를 질의 사이에 반영하는 검색기를 생성합니다.
+        
+        Returns:
+            LiveSnapshotRetriever: 검색기 (current()로 현재 스냅샷의 VectorStoreSetting을 얻을 수 있음)
+        """
+        if self.snapshot_manager is None:
+            raise ValueError("스냅샷 모드가 아닙니다. snapshots=True로 생성해주세요.")
+        return LiveSnapshotRetriever(self.snapshot_manager, self._open_snapshot, poll_interval=self.snapshot_poll_interval)
+
+    def _snapshot_setting(self, store_dir: str) -> "VectorStoreSetting":
+        """같은 설정으로 스냅샷 디렉토리 하나를 다루는 VectorStoreSetting을 생성합니다."""
+        return VectorStoreSetting(**{
+            **self._settings,
+            "vector_store_path": store_dir,
+            "snapshots": False,
+            # 체크포인트와 계측 결과는 스냅샷이 아닌 루트에 두어 다음 생성에서 이어서 사용
+            "checkpoint_dir": self._settings.get("checkpoint_dir") or os.path.join(self.vector_store_path, "embedding_checkpoint"),
+            "metrics_dir": self.metrics_dir,
+        })
+
+    def _open_snapshot(self, store_dir: str) -> Optional["VectorStoreSetting"]:
+        setting = self._snapshot_setting(store_dir)
+        return setting if setting.load_for_query() is not None else None
+
+    def rebuild_snapshot(self, background: bool = True):
+        """
+        원본 문서로 새 스냅샷을 생성하고 완성되면 CURRENT를 교체합니다.
+        
+        서비스 중인 스냅샷은 그대로 두고 별도 디렉토리에 생성하므로, 생성 중에도 기존 검색기는 계속 응답합니다.
+        교체 후에는 유예 기간이 지난 이전 스냅샷을 삭제합니다.
+        
+        Args:
+            background (bool): True면 백그라운드 스레드에서 생성하고 스레드를 반환
+            
+        Returns:
+            str or threading.Thread or None: 새 스냅샷 버전 (백그라운드면 스레드, 이미 생성 중이거나 실패하면 None)
+        """
+        if self.snapshot_manager is None:
+            raise ValueError("스냅샷 모드가 아닙니다. snapshots=True로 생성해주세요.")
+        if background:
+            thread = threading.Thread(target=self.rebuild_snapshot, kwargs={"background": False}, name="snapshot-rebuild", daemon=True)
+            thread.start()
+            return thread
+
+        if not self._rebuild_lock.acquire(blocking=False):
+            logger.warning("이미 스냅샷을 생성하는 중입니다.")
+            return None
+        try:
+            manager = self.snapshot_manager
+            version, partial_dir = manager.begin()
+            logger.info(f"새 스냅샷을 생성합니다: {version}")
+            builder = self._snapshot_setting(partial_dir)
+            try:
+                builder._create_new_vectorstore()
+            except Exception as e:
+                logger.error(f"스냅샷 생성 실패 ({version}): {e}")
+                manager.abort(version)
+                return None
+            
+            # 저장까지 끝난 경우에만 교체 (폴백 저장소는 메모리에만 있으므로 교체하지 않음)
+            if builder.vector_db is None or not os.path.exists(os.path.join(partial_dir, "sklearn_vectorstore")):
+                logger.error(f"스냅샷이 저장되지 않아 교체하지 않습니다: {version}")
+                manager.abort(version)
+                return None
+            manager.publish(version, {
+                "source_path": self.absolute_path,
+                "embedding_model_name": self.embedding_model_name,
+                "chunk_count": len(builder.vector_db._texts),
+                "files": sorted(os.listdir(partial_dir)),
+            })
+            manager.gc()
+            return version
+        finally:
+            self._rebuild_lock.release()
+
+    def _create_embedding_model(self):
+        """
+        임베딩 모델 생성
+
+        embedding_endpoints에 서버가 둘 이상이면 배치를 여러 서버에 나누어 보내는 임베딩 클라이언트를 생성합니다.
+        어느 경우든 임베딩 요청은 서버별 공용 스케줄러를 거칩니다. (문서: batch, 질의: interactive)
+
+        Returns:
+            ScheduledEmbeddings or MultiEndpointEmbeddings: 설정된 임베딩 모델 객체
+        """
+        if len(self.embedding_endpoints) > 1:
+            from multi_endpoint_embeddings import MultiEndpointEmbeddings
+
+            embedding_model = MultiEndpointEmbeddings(self.embedding_model_name, self.embedding_endpoints, batch_size=self.batch_size)
+            embedding_model.verify()
+            return embedding_model
+        return create_scheduled_embeddings(self.embedding_model_name, base_url=self.ollama_base_url)
+
     def _load_existing_vectorstore(self):
         """
         기존 벡터 저장소 로드
@@ -69,6 +294,8 @@ class VectorStoreSetting:
         Returns:
             vectorstore: 로드된 벡터 저장소 객체
         """
+        from langchain_community.vectorstores import SKLearnVectorStore
+
         logger.info(f"벡터 저장소 DB를 로드합니다: {self.vector_store_path}")
         
         # 새로 구현한 로드 메서드 사용
@@ -80,12 +307,12 @@ class VectorStoreSetting:
             # 기존 방식으로 로드 시도 (폴백)
             try:
                 vectorstore = SKLearnVectorStore(
-                    embedding=OllamaEmbeddings(
-                        model=self.embedding_model_name
-                    ),
+                    embedding=self._create_embedding_model(),
                     persist_path=self.vector_store_path,
                     serializer="bson"  # 바이너리 JSON 형식으로 로드
                 )
+                if len(vectorstore._texts) != len(vectorstore._ids):
+                    raise ValueError("청크 텍스트가 압축 블록 파일에만 있어 기존 방식으로 로드할 수 없습니다.")
                 logger.info("기존 방식으로 벡터 저장소 DB 로드 완료")
             except Exception as e:
                 logger.error(f"벡터 저장소 로드 실패: {e}")
@@ -99,6 +326,7 @@ class VectorStoreSetting:
         새로운 벡터 저장소 생성
         
         PDF 문서를 로드하고 분할한 후 벡터화하여 저장소에 저장
+        각 단계(discovery, parse, split, dedup, embed, index, persist)는 self.metrics에 계측됩니다.
         
         Returns:
             retriever: 생성된 벡터 저장소의 검색기 객체
@@ -111,54 +339,70 @@ class VectorStoreSetting:
         # 벡터 저장소 파일 경로 설정
         db_file = os.path.join(self.vector_store_path, "sklearn_vectorstore")
 
-        # 파일 탐색 및 로드
-        pdf_files = self._find_pdf_files(self.absolute_path)
-        docs_list = self._load_pdf_documents(pdf_files)
+        # 단계별 계측 초기화 (JSON-lines / Prometheus 파일로 기록)
+        self.metrics = self._create_ingest_metrics()
 
-        # 문서가 없는 경우 처리
-        if not docs_list:
-            logger.warning("로드된 문서가 없습니다. 벡터 저장소 생성을 건너뜁니다.")
-            return None
+        try:
+            # 파일 탐색 및 로드
+            with self.metrics.span("discovery") as span:
+                pdf_files = self._find_pdf_files(self.absolute_path)
+                span.add(count=len(pdf_files), nbytes=sum(os.path.getsize(f) for f in pdf_files))
 
-        # 문서 분할
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=1000,
-            chunk_overlap=100
-        )
-        logger.info("문서 분할 중...")
-        doc_splits = text_splitter.split_documents(docs_list)
-        logger.info(f"문서를 {len(doc_splits)}개의 청크로 분할했습니다.")
+            with self.metrics.span("parse") as span:
+                docs_list = self._load_pdf_documents(pdf_files)
+                span.add(count=len(docs_list), nbytes=text_bytes(doc.page_content for doc in docs_list))
 
-        # 벡터 저장소 생성 시도
-        try:
-            # 새로운 벡터 저장소 생성
-            vectorstore = self._create_and_save_vectorstore(self.vector_store_path, db_file, doc_splits)
-            
-            # 새로 구현한 저장 메서드 사용
-            success = self._save_vector_store(vectorstore, db_file)
-            if success:
-                logger.info(f"벡터 저장소를 성공적으로 저장했습니다: {db_file}")
-            else:
-                logger.warning("벡터 저장소 저장에 실패했지만, 메모리에는 로드되었습니다.")
-            
-            # 검색기 생성
-            retriever = self._create_retriever(vectorstore)
-            logger.info(f"검색기 생성 완료 (top_k={self.retriever_top_k})")
-            
-            return retriever
-            
-        except Exception as e:
-            # 오류 발생 시 폴백 벡터 저장소 생성 (저장 없이)
-            logger.warning(f"벡터 저장소 생성 중 오류 발생: {e}")
-            logger.info("폴백 벡터 저장소를 생성합니다 (메모리에만 저장)")
-            
-            vectorstore = self._create_fallback_vectorstore(doc_splits, e)
-            
-            # 검색기 생성
-            retriever = self._create_retriever(vectorstore)
-            logger.info(f"폴백 검색기 생성 완료 (top_k={self.retriever_top_k})")
-            
-            return retriever
+            # 문서가 없는 경우 처리
+            if not docs_list:
+                logger.warning("로드된 문서가 없습니다. 벡터 저장소 생성을 건너뜁니다.")
+                return None
+
+            # 문서 분할
+            with self.metrics.span("split") as span:
+                doc_splits = self._split_documents(docs_list)
+                span.add(count=len(doc_splits), nbytes=text_bytes(doc.page_content for doc in doc_splits))
+
+            # 중복 청크 제거
+            with self.metrics.span("dedup") as span:
+                doc_splits = self._deduplicate_chunks(doc_splits)
+                span.add(count=len(doc_splits), nbytes=text_bytes(doc.page_content for doc in doc_splits))
+
+            # 벡터 저장소 생성 시도
+            try:
+                # 새로운 벡터 저장소 생성
+                vectorstore = self._create_and_save_vectorstore(self.vector_store_path, db_file, doc_splits)
+                
+                # 새로 구현한 저장 메서드 사용
+                with self.metrics.span("persist") as span:
+                    success = self._save_vector_store(vectorstore, db_file)
+                    if success and os.path.exists(db_file):
+                        span.add(count=len(doc_splits), nbytes=os.path.getsize(db_file))
+                if success:
+                    logger.info(f"벡터 저장소를 성공적으로 저장했습니다: {db_file}")
+                else:
+                    logger.warning("벡터 저장소 저장에 실패했지만, 메모리에는 로드되었습니다.")
+                
+                # 검색기 생성
+                retriever = self._create_retriever(vectorstore)
+                logger.info(f"검색기 생성 완료 (top_k={self.retriever_top_k})")
+                
+                return retriever
+                
+            except Exception as e:
+                # 오류 발생 시 폴백 벡터 저장소 생성 (저장 없이)
+                logger.warning(f"벡터 저장소 생성 중 오류 발생: {e}")
+                logger.info("폴백 벡터 저장소를 생성합니다 (메모리에만 저장)")
+                
+                vectorstore = self._create_fallback_vectorstore(doc_splits, e)
+                
+                # 검색기 생성
+                retriever = self._create_retriever(vectorstore)
+                logger.info(f"폴백 검색기 생성 완료 (top_k={self.retriever_top_k})")
+                
+                return retriever
+        finally:
+            self._embedded_vectors = {}
+            self._report_ingest_metrics()
 
     def _load_db_file(self, db_file):
         """
@@ -170,6 +414,8 @@ class VectorStoreSetting:
         Returns:
             vectorstore: 로드된 벡터 저장소 객체
         """
+        from langchain_community.vectorstores import SKLearnVectorStore
+
         logger.info(f"기존 벡터 저장소 DB를 로드합니다: {db_file}")
         
         # 새로 구현한 로드 메서드 사용
@@ -181,12 +427,12 @@ class VectorStoreSetting:
             try:
                 # 저장된 벡터스토어 로드 (BSON 형식)
                 vectorstore = SKLearnVectorStore(
-                    embedding=OllamaEmbeddings(
-                        model=self.embedding_model_name
-                    ),
+                    embedding=self._create_embedding_model(),
                     persist_path=db_file,
                     serializer="bson"  # 바이너리 JSON 형식으로 로드
                 )
+                if len(vectorstore._texts) != len(vectorstore._ids):
+                    raise ValueError("청크 텍스트가 압축 블록 파일에만 있어 기존 방식으로 로드할 수 없습니다.")
                 logger.info("기존 방식으로 벡터 저장소 DB 로드 완료")
             except Exception as e:
                 logger.error(f"벡터 저장소 로드 실패: {e}")
@@ -211,58 +457,23 @@ class VectorStoreSetting:
         os.makedirs(vectorstore_path, exist_ok=True)
         
         # 임베딩 모델 초기화
-        embedding_model = OllamaEmbeddings(
-            model=self.embedding_model_name
-        )
+        embedding_model = self._create_embedding_model()
         
-        # 배치 처리를 위한 설정
-        total_docs = len(doc_splits)
-        batch_size = self.batch_size
-        total_batches = (total_docs + batch_size - 1) // batch_size  # 올림 나눗셈
+        logger.info(f"[임베딩 벡터 생성] 총 {len(doc_splits)}개 문서, 배치 크기: {self.batch_size}")
+        start_time = time.perf_counter()
         
-        logger.info(f"총 {total_docs}개 문서를 {batch_size}개씩 {total_batches}개 배치로 처리합니다.")
-        print(f"\n[임베딩 벡터 생성] 총 {total_docs}개 문서, 배치 크기: {batch_size}")
-        
-        # 배치 처리 시작 시간 기록
-        start_time = time.time()
-        
-        # 배치 단위로 문서 처리
-        processed_docs = []
-        for i in tqdm(range(0, total_docs, batch_size), desc="임베딩 벡터 생성 중"):
-            batch = doc_splits[i:i+batch_size]
-            batch_start_time = time.time()
-            
-            # 현재 배치 정보 로깅
-            batch_num = i // batch_size + 1
-            logger.info(f"배치 {batch_num}/{total_batches} 처리 중 ({len(batch)}개 문서)")
-            
-            # 배치 처리 완료 후 진행 상황 업데이트
-            processed_docs.extend(batch)
-            batch_end_time = time.time()
-            batch_duration = batch_end_time - batch_start_time
-            
-            logger.info(f"배치 {batch_num} 완료: {batch_duration:.2f}초 소요 (누적: {len(processed_docs)}/{total_docs})")
-            
-            # 배치 처리 중간 결과 출력
-            elapsed = batch_end_time - start_time
-            docs_per_sec = len(processed_docs) / elapsed if elapsed > 0 else 0
-            remaining = (total_docs - len(processed_docs)) / docs_per_sec if docs_per_sec > 0 else 0
-            print(f"  - 진행률: {len(processed_docs)}/{total_docs} ({len(processed_docs)/total_docs*100:.1f}%) | 예상 남은 시간: {remaining:.1f}초")
+        # 배치 단위로 임베딩 생성
+        vectors = self._embed_documents_in_batches(embedding_model, doc_splits)
         
-        # 벡터 저장소 생성 및 저장
+        # 벡터 저장소 생성 (저장은 _save_vector_store에서 수행)
         logger.info("벡터 저장소 생성 중...")
-        vectorstore = SKLearnVectorStore.from_documents(
-            documents=doc_splits,
-            embedding=embedding_model,
-            persist_path=db_file,  # DB 파일 경로 지정
-            serializer="bson"  # 바이너리 JSON 형식으로 저장
-        )
+        vectorstore = self._build_vectorstore(doc_splits, embedding_model, vectors, persist_path=db_file)
         
         # 총 소요 시간 계산 및 로깅
-        total_duration = time.time() - start_time
-        logger.info(f"벡터 저장소를 DB 파일로 저장했습니다: {db_file}")
+        total_duration = time.perf_counter() - start_time
+        logger.info(f"벡터 저장소 DB 파일 경로: {db_file}")
         logger.info(f"벡터 저장소 생성 완료: 총 {total_duration:.2f}초 소요")
-        print(f"[완료] 벡터 저장소 생성 완료: 총 {total_duration:.2f}초 소요\n")
+        logger.info(f"[완료] 벡터 저장소 생성 완료: 총 {total_duration:.2f}초 소요")
         
         return vectorstore
 
@@ -281,59 +492,353 @@ class VectorStoreSetting:
         logger.warning("저장 기능 없이 벡터 저장소를 생성합니다.")
         
         # 임베딩 모델 초기화
-        embedding_model = OllamaEmbeddings(
-            model=self.embedding_model_name
-        )
+        embedding_model = self._create_embedding_model()
+        
+        logger.info(f"[임베딩 벡터 생성 (폴백 모드)] 총 {len(doc_splits)}개 문서, 배치 크기: {self.batch_size}")
+        start_time = time.perf_counter()
+        
+        # 배치 단위로 임베딩 생성
+        vectors = self._embed_documents_in_batches(embedding_model, doc_splits)
+        
+        # 벡터 저장소 생성 (저장 없이)
+        logger.info("벡터 저장소 생성 중...")
+        vectorstore = self._build_vectorstore(doc_splits, embedding_model, vectors)
+        
+        # 총 소요 시간 계산 및 로깅
+        total_duration = time.perf_counter() - start_time
+        logger.warning("저장 기능 없이 벡터 저장소를 생성했습니다.")
+        logger.info(f"벡터 저장소 생성 완료: 총 {total_duration:.2f}초 소요")
+        logger.info(f"[완료] 벡터 저장소 생성 완료: 총 {total_duration:.2f}초 소요")
+        
+        return vectorstore
+
+    @profile("ingest.embed")
+    def _embed_documents_in_batches(self, embedding_model, doc_splits) -> Dict[str, List[float]]:
+        """
+        문서 청크를 배치 단위로 임베딩합니다.
+        
+        임베딩한 배치는 체크포인트에 바로 확정되므로, 중간에 실패해도 다음 실행(또는 폴백)에서
+        이미 임베딩한 청크는 건너뛰고 남은 청크만 임베딩합니다.
+        
+        Args:
+            embedding_model (OllamaEmbeddings): 임베딩 모델
+            doc_splits (list): 분할된 문서 리스트
+            
+        Returns:
+            Dict[str, List[float]]: 청크 텍스트별 임베딩 벡터
+        """
+        from tqdm import tqdm
+        from embedding_checkpoint import EmbeddingCheckpoint, text_digest
+
+        texts = [doc.page_content for doc in doc_splits]
         
-        # 배치 처리를 위한 설정
-        total_docs = len(doc_splits)
-        batch_size = self.batch_size
+        # 이번 실행에서 계산한 벡터와 체크포인트에 확정된 벡터를 먼저 재사용
+        vectors = {text: self._embedded_vectors[text] for text in texts if text in self._embedded_vectors}
+        checkpoint = EmbeddingCheckpoint(self.checkpoint_dir, self.embedding_model_name)
+        committed = checkpoint.load()
+        if committed:
+            for text in texts:
+                if text not in vectors:
+                    vector = committed.get(text_digest(text))
+                    if vector is not None:
+                        vectors[text] = vector.tolist()
+            del committed
+        if vectors:
+            logger.info(f"이어서 진행: {len(vectors)}/{len(texts)}개 청크는 이미 임베딩되어 있습니다.")
+        self._embedded_vectors = vectors
+
+        pending = [text for text in texts if text not in vectors]
+        total_docs = len(pending)
+        # 여러 엔드포인트에 나누어 보내는 경우 한 번에 엔드포인트 수만큼의 배치를 보냄
+        batch_size = self.batch_size * getattr(embedding_model, "parallelism", 1)
         total_batches = (total_docs + batch_size - 1) // batch_size  # 올림 나눗셈
         
         logger.info(f"총 {total_docs}개 문서를 {batch_size}개씩 {total_batches}개 배치로 처리합니다.")
-        print(f"\n[임베딩 벡터 생성 (폴백 모드)] 총 {total_docs}개 문서, 배치 크기: {batch_size}")
         
         # 배치 처리 시작 시간 기록
-        start_time = time.time()
+        start_time = time.perf_counter()
         
-        # 배치 단위로 문서 처리
-        processed_docs = []
+        processed = 0
+        checkpoint_enabled = True
         for i in tqdm(range(0, total_docs, batch_size), desc="임베딩 벡터 생성 중"):
-            batch = doc_splits[i:i+batch_size]
-            batch_start_time = time.time()
+            batch = pending[i:i+batch_size]
             
             # 현재 배치 정보 로깅
             batch_num = i // batch_size + 1
             logger.info(f"배치 {batch_num}/{total_batches} 처리 중 ({len(batch)}개 문서)")
             
-            # 배치 처리 완료 후 진행 상황 업데이트
-            processed_docs.extend(batch)
-            batch_end_time = time.time()
-            batch_duration = batch_end_time - batch_start_time
+            with self.metrics.span("embed", batch=batch_num) as span:
+                batch_vectors = embedding_model.embed_documents(batch)
+                span.add(count=len(batch), nbytes=text_bytes(batch))
+            vectors.update(zip(batch, batch_vectors))
+            processed += len(batch)
             
-            logger.info(f"배치 {batch_num} 완료: {batch_duration:.2f}초 소요 (누적: {len(processed_docs)}/{total_docs})")
+            # 배치 확정 (디스크 오류 시 체크포인트 없이 계속 진행)
+            if checkpoint_enabled:
+                try:
+                    checkpoint.commit(batch, batch_vectors)
+                except OSError as e:
+                    logger.warning(f"임베딩 체크포인트 저장 실패, 체크포인트 없이 계속합니다: {e}")
+                    checkpoint_enabled = False
+            
+            logger.info(f"배치 {batch_num} 완료: {span.duration_s:.2f}초 소요 (누적: {processed}/{total_docs})")
             
             # 배치 처리 중간 결과 출력
-            elapsed = batch_end_time - start_time
-            docs_per_sec = len(processed_docs) / elapsed if elapsed > 0 else 0
-            remaining = (total_docs - len(processed_docs)) / docs_per_sec if docs_per_sec > 0 else 0
-            print(f"  - 진행률: {len(processed_docs)}/{total_docs} ({len(processed_docs)/total_docs*100:.1f}%) | 예상 남은 시간: {remaining:.1f}초")
+            elapsed = time.perf_counter() - start_time
+            docs_per_sec = processed / elapsed if elapsed > 0 else 0
+            remaining = (total_docs - processed) / docs_per_sec if docs_per_sec > 0 else 0
+            logger.info(f"진행률: {processed}/{total_docs} ({processed/total_docs*100:.1f}%) | {docs_per_sec:.1f}개/초 | 예상 남은 시간: {remaining:.1f}초")
         
-        # 벡터 저장소 생성 (저장 없이)
-        logger.info("벡터 저장소 생성 중...")
-        vectorstore = SKLearnVectorStore.from_documents(
-            documents=doc_splits,
-            embedding=embedding_model
-        )
+        if total_docs and hasattr(embedding_model, "summary_table"):
+            logger.info("\n" + embedding_model.summary_table())
+        return vectors
+
+    @profile("ingest.index")
+    def _build_vectorstore(self, doc_splits, embedding_model, vectors, persist_path=None):
+        """
+        미리 계산한 임베딩 벡터로 SKLearnVectorStore 생성
         
-        # 총 소요 시간 계산 및 로깅
-        total_duration = time.time() - start_time
-        logger.warning("저장 기능 없이 벡터 저장소를 생성했습니다.")
-        logger.info(f"벡터 저장소 생성 완료: 총 {total_duration:.2f}초 소요")
-        print(f"[완료] 벡터 저장소 생성 완료: 총 {total_duration:.2f}초 소요\n")
+        Args:
+            doc_splits (list): 분할된 문서 리스트
+            embedding_model (OllamaEmbeddings): 질의 임베딩에 사용할 임베딩 모델
+            vectors (Dict[str, List[float]]): 청크 텍스트별 임베딩 벡터
+            persist_path (str): 저장할 DB 파일 경로 (None이면 메모리에만 생성)
+            
+        Returns:
+            SKLearnVectorStore: 생성된 벡터 저장소 객체
+        """
+        from langchain_community.vectorstores import SKLearnVectorStore
+
+        precomputed = PrecomputedEmbeddings(embedding_model, vectors)
+        store_kwargs = {"persist_path": persist_path, "serializer": "bson"} if persist_path else {}
+        
+        with self.metrics.span("index") as span:
+            vectorstore = SKLearnVectorStore.from_documents(
+                documents=doc_splits,
+                embedding=precomputed,
+                **store_kwargs
+            )
+            span.add(count=len(doc_splits))
+            
+            # 필터 검색용 메타데이터 인덱스 (청크 순서 = 벡터 저장소 행 번호)
+            self.metadata_index = MetadataIndex.build([doc.metadata for doc in doc_splits])
         
+        # 인덱스 생성 후에는 벡터 사본을 해제하여 메모리를 돌려줌
+        precomputed.release()
+        self.vector_db = vectorstore
         return vectorstore
 
+    def _deduplicate_chunks(self, doc_splits: List[Any]) -> List[Any]:
+        """
+        내용이 완전히 같은 청크를 제거합니다. (처음 나온 청크만 유지)
+        
+        Args:
+            doc_splits (List[Any]): 분할된 문서 청크 리스트
+            
+        Returns:
+            List[Any]: 중복이 제거된 문서 청크 리스트
+        """
+        seen = set()
+        unique_splits = []
+        for doc in doc_splits:
+            digest = hashlib.sha1(doc.page_content.encode("utf-8")).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            unique_splits.append(doc)
+        
+        removed = len(doc_splits) - len(unique_splits)
+        if removed:
+            logger.info(f"중복 청크 {removed}개를 제거했습니다. (남은 청크: {len(unique_splits)}개)")
+        return unique_splits
+
+    def _create_ingest_metrics(self) -> IngestMetrics:
+        """
+        인제스트 계측 수집기 생성
+        
+        Returns:
+            IngestMetrics: metrics_dir에 기록하는 계측 수집기
+        """
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        return IngestMetrics(
+            jsonl_path=os.path.join(self.metrics_dir, "ingest_spans.jsonl"),
+            prometheus_path=os.path.join(self.metrics_dir, "ingest_metrics.prom"),
+        )
+
+    def _report_ingest_metrics(self):
+        """인제스트 계측 결과를 Prometheus 파일로 내보내고 요약 표를 출력합니다."""
+        try:
+            prom_path = self.metrics.export_prometheus()
+        except OSError as e:
+            logger.warning(f"Prometheus 계측 파일 저장 실패: {e}")
+            prom_path = None
+        print("\n" + self.metrics.summary_table() + "\n")
+        if prom_path:
+            logger.info(f"인제스트 계측 결과 저장: {self.metrics.jsonl_path}, {prom_path}")
+
+    def filtered_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        source_files: Optional[List[str]] = None,
+        page_range: Optional[tuple] = None,
+        doc_types: Optional[List[str]] = None,
+    ) -> List[Any]:
+        """
+        메타데이터 조건에 맞는 청크만 대상으로 유사도 검색을 수행합니다.
+        
+        top-k를 뽑은 뒤 거르는 방식과 달리, 조건에 맞는 청크가 k개 이상이면 항상 k개를 반환합니다.
+        
+        Args:
+            query (str): 검색 질의
+            k (int): 반환할 문서 수 (기본값: retriever_top_k)
+            source_files (List[str]): 포함할 파일 이름 목록
+            page_range (tuple): 포함할 페이지 범위 (시작, 끝), 양 끝 포함
+            doc_types (List[str]): 포함할 문서 종류 목록 (예: ["policy", "product"])
+            
+        Returns:
+            List[Document]: 검색된 문서 리스트 (metadata["score"]에 코사인 유사도 포함)
+            
+        Raises:
+            ValueError: 벡터 저장소가 로드되지 않은 경우 발생
+        """
+        import numpy as np
+        from langchain_core.documents import Document
+
+        vectorstore = self.vector_db
+        if vectorstore is None:
+            raise ValueError("벡터 저장소가 로드되지 않았습니다. initialize() 또는 load_for_query()를 먼저 호출해주세요.")
+        k = k or self.retriever_top_k
+
+        if self.metadata_index is None:
+            logger.warning("메타데이터 인덱스가 없어 인덱스를 새로 생성합니다.")
+            self.metadata_index = MetadataIndex.build(vectorstore._metadatas)
+
+        ids = self.metadata_index.select(source_files=source_files, page_range=page_range, doc_types=doc_types)
+        if ids is None:
+            ids = list(range(len(vectorstore._texts)))
+        if not ids:
+            return []
+
+        # 조건에 맞는 행만 잘라서 코사인 유사도 계산
+        query_vector = np.asarray(vectorstore.embeddings.embed_query(query), dtype=np.float32)
+        candidates = np.asarray(vectorstore._embeddings_np[ids], dtype=np.float32)
+        norms = np.linalg.norm(candidates, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        scores = candidates @ query_vector / np.where(norms == 0, 1.0, norms)
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for position in top:
+            idx = ids[position]
+            results.append(Document(
+                page_content=vectorstore._texts[idx],
+                metadata={"id": vectorstore._ids[idx], **vectorstore._metadatas[idx], "score": float(scores[position])},
+            ))
+        return results
+
+    async def asimilarity_search(self, query: str, k: Optional[int] = None, timeout: Optional[float] = None) -> List[Any]:
+        """
+        비동기 유사도 검색
+        
+        질의 임베딩은 Ollama 비동기 API로 기다리고, 최근접 이웃 검색은 공용 스레드 풀에서 실행하여
+        이벤트 루프를 막지 않습니다. 호출한 태스크가 취소되면 검색 결과는 버려집니다.
+        
+        Args:
+            query (str): 검색 질의
+            k (int): 반환할 문서 수 (기본값: retriever_top_k)
+            timeout (float): 제한 시간(초) (기본값: retriever_timeout)
+            
+        Returns:
+            List[Document]: 검색된 문서 리스트
+            
+        Raises:
+            ValueError: 벡터 저장소가 로드되지 않은 경우 발생
+            asyncio.TimeoutError: 제한 시간 안에 검색이 끝나지 않은 경우 발생
+        """
+        return await asimilarity_search(
+            self._search_store(),
+            query,
+            k=k or self.retriever_top_k,
+            timeout=timeout if timeout is not None else self.retriever_timeout,
+        )
+
+    def _search_store(self):
+        """검색에 사용할 저장소 (동시 쓰기 모드면 세그먼트 저장소)"""
+        if self.segmented_store is not None:
+            return self.segmented_store
+        if self.vector_db is None:
+            raise ValueError("벡터 저장소가 로드되지 않았습니다. initialize() 또는 load_for_query()를 먼저 호출해주세요.")
+        return self.vector_db
+
+    def enable_concurrent_writes(self, mutable_capacity: int = 1024, merge_threshold: int = 8):
+        """
+        검색 중에도 문서를 추가할 수 있는 동시 쓰기 모드로 전환합니다.
+        
+        로드된 벡터 저장소를 첫 봉인 세그먼트로 사용하고, add_documents()로 추가한 청크는 작은 가변 세그먼트에
+        쌓였다가 봉인/병합됩니다. 추가된 청크는 메모리에만 있으므로 디스크에 반영하려면 저장소(스냅샷)를 다시 생성합니다.
+        filtered_search()는 기존 저장소의 청크만 대상으로 합니다.
+        
+        Args:
+            mutable_capacity (int): 가변 세그먼트 최대 청크 수
+            merge_threshold (int): 봉인 세그먼트 수가 이 값을 넘으면 백그라운드 병합
+            
+        Returns:
+            retriever: 세그먼트 저장소를 검색하는 검색기
+        """
+        from segmented_store import SegmentedVectorStore
+
+        if self.vector_db is None:
+            raise ValueError("벡터 저장소가 로드되지 않았습니다. initialize() 또는 load_for_query()를 먼저 호출해주세요.")
+        if self.segmented_store is None:
+            self.segmented_store = SegmentedVectorStore.from_sklearn(
+                self.vector_db, mutable_capacity=mutable_capacity, merge_threshold=merge_threshold
+            )
+        return create_async_retriever(self.segmented_store, k=self.retriever_top_k, timeout=self.retriever_timeout)
+
+    def add_documents(self, documents: List[Any]) -> List[str]:
+        """
+        동시 쓰기 모드에서 문서 청크를 추가합니다. 추가 중에도 검색은 잠금 없이 계속 수행됩니다.
+        
+        Args:
+            documents (List[Document]): 추가할 문서 청크
+            
+        Returns:
+            List[str]: 추가된 청크 ID
+        """
+        if self.segmented_store is None:
+            raise ValueError("동시 쓰기 모드가 아닙니다. enable_concurrent_writes()를 먼저 호출해주세요.")
+        return self.segmented_store.add_documents(documents)
+
+    @profile("retrieval.search")
+    def retrieve(self, query: str) -> List[Any]:
+        """
+        검색 (retriever.invoke와 같은 결과, retriever_top_k개 반환)
+        
+        Args:
+            query (str): 검색 질의
+            
+        Returns:
+            List[Document]: 검색된 문서 리스트
+        """
+        return self._search_store().similarity_search(query, k=self.retriever_top_k)
+
+    @profile("retrieval.asearch")
+    async def aretrieve(self, query: str, timeout: Optional[float] = None) -> List[Any]:
+        """
+        비동기 검색 (retriever.ainvoke와 같은 결과, retriever_top_k개 반환)
+        
+        Args:
+            query (str): 검색 질의
+            timeout (float): 제한 시간(초) (기본값: retriever_timeout)
+            
+        Returns:
+            List[Document]: 검색된 문서 리스트
+        """
+        return await self.asimilarity_search(query, timeout=timeout)
+
     def _create_retriever(self, vectorstore):
         """
         검색기 생성
@@ -347,12 +852,15 @@ class VectorStoreSetting:
         Raises:
             ValueError: 벡터 저장소가 None이거나 비어있는 경우 발생
         """
+        from langchain_community.vectorstores.sklearn import SKLearnVectorStoreException
+
         if vectorstore is None:
             logger.error("벡터 저장소가 None입니다. 검색기를 생성할 수 없습니다.")
             raise ValueError("벡터 저장소가 비어 있습니다. 문서를 먼저 로드하고 벡터 저장소를 생성해주세요.")
         
         try:
-            retriever = vectorstore.as_retriever(k=self.retriever_top_k)
+            # invoke는 기존과 같고, ainvoke는 임베딩을 비동기로 기다린 뒤 검색을 스레드 풀에서 실행
+            retriever = create_async_retriever(vectorstore, k=self.retriever_top_k, timeout=self.retriever_timeout)
             logger.info("검색기 생성 완료")
             return retriever
         except SKLearnVectorStoreException as e:
@@ -394,6 +902,7 @@ class VectorStoreSetting:
         return pdf_files
 
 
+    @profile("ingest.parse")
     def _load_pdf_documents(self, pdf_files: List[str]) -> List[Any]:
         """
         PDF 파일 목록을 로드하여 문서 객체 리스트를 반환합니다.
@@ -404,6 +913,8 @@ class VectorStoreSetting:
         Returns:
             List[Any]: 로드된 문서 객체 리스트
         """
+        from langchain_community.document_loaders import PyMuPDFLoader
+
         documents = []
         
         for pdf_file in pdf_files:
@@ -412,9 +923,12 @@ class VectorStoreSetting:
                 loader = PyMuPDFLoader(pdf_file)
                 docs = loader.load()
                 
-                # 메타데이터에 파일명 추가
+                # 메타데이터에 파일명과 문서 종류 추가
+                file_name = os.path.basename(pdf_file)
+                doc_type = classify_document_type(file_name)
                 for doc in docs:
-                    doc.metadata["source_file"] = os.path.basename(pdf_file)
+                    doc.metadata["source_file"] = file_name
+                    doc.metadata["doc_type"] = doc_type
                     
                 documents.extend(docs)
                 logger.info(f"로드 완료: {os.path.basename(pdf_file)} - {len(docs)}페이지")
@@ -424,10 +938,37 @@ class VectorStoreSetting:
         logger.info(f"총 {len(documents)}개의 문서 청크를 로드했습니다.")
         return documents
 
+    @profile("ingest.split")
+    def _split_documents(self, docs_list: List[Any]) -> List[Any]:
+        """
+        문서 객체 리스트를 청크로 분할합니다.
+        
+        Args:
+            docs_list (List[Any]): 로드된 문서 객체 리스트
+            
+        Returns:
+            List[Any]: 분할된 문서 청크 리스트
+        """
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        # start_index: 검색 결과의 겹치는 청크를 위치 기준으로 이어 붙이는 데 사용 (context_assembly.py)
+        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=1000,
+            chunk_overlap=100,
+            add_start_index=True
+        )
+        logger.info("문서 분할 중...")
+        doc_splits = text_splitter.split_documents(docs_list)
+        logger.info(f"문서를 {len(doc_splits)}개의 청크로 분할했습니다.")
+        return doc_splits
+
     def _save_vector_store(self, vectorstore, db_file):
         """
         벡터 저장소를 파일로 저장
         
+        DB 파일은 임시 파일에 쓴 뒤 마지막에 교체하므로, 중간에 죽으면 DB 파일이 없는 상태로 남아
+        다음 실행에서 체크포인트를 이용해 다시 생성합니다. 저장이 끝나면 임베딩 체크포인트를 삭제합니다.
+        
         Args:
             vectorstore (SKLearnVectorStore): 저장할 벡터 저장소 객체
             db_file (str): 저장할 파일 경로
@@ -439,10 +980,20 @@ class VectorStoreSetting:
             # 저장소 경로가 없으면 생성
             os.makedirs(os.path.dirname(db_file), exist_ok=True)
             
-            # 벡터 저장소 저장
-            vectorstore.save_local(db_file)
+            # 압축 모드에서는 청크 텍스트/메타데이터를 압축 블록 파일에만 저장하고 DB 파일에는 ID와 벡터만 저장
+            if self.compress_chunks:
+                self._attach_chunk_store(vectorstore, db_file, overwrite=True)
+            # 임시 파일 이름을 프로세스/스레드별로 달리하여 동시에 저장해도 서로의 임시 파일을 덮어쓰지 않도록 함
+            tmp_file = f"{db_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            self._persist_vectors(vectorstore, tmp_file)
+            if self.metadata_index is not None:
+                self.metadata_index.save(os.path.join(os.path.dirname(db_file), INDEX_FILE_NAME))
+            os.replace(tmp_file, db_file)
             logger.info(f"벡터 저장소를 저장했습니다: {db_file}")
             self.vector_db = vectorstore
+            
+            from embedding_checkpoint import EmbeddingCheckpoint
+            EmbeddingCheckpoint(self.checkpoint_dir, self.embedding_model_name).clear()
             return True
         except Exception as e:
             logger.error(f"벡터 저장소 저장 실패: {e}")
@@ -456,24 +1007,132 @@ class VectorStoreSetting:
             db_file (str): 로드할 파일 경로
             
         Returns:
-            SKLearnVectorStore or None: 로드된 벡터 저장소 객체 또는 실패 시 None
+            SKLearnVectorStore or None: 로드된 벡터 저장소 객체 또는 실패 시 None (실패 원인은 load_error에 기록)
         """
+        self.load_error = None
         try:
             if not os.path.exists(db_file):
                 logger.warning(f"벡터 저장소 파일이 없습니다: {db_file}")
                 return None
+
+            from langchain_community.vectorstores import SKLearnVectorStore
                 
             # 임베딩 모델 생성
-            embeddings = OllamaEmbeddings(model=self.embedding_model_name)
+            embeddings = self._create_embedding_model()
             
-            # 벡터 저장소 로드
-            vectorstore = SKLearnVectorStore.load_local(
-                folder_path=db_file,
-                embeddings=embeddings
+            # 벡터 저장소 로드 (persist_path의 파일이 있으면 생성자에서 바로 로드됨)
+            vectorstore = SKLearnVectorStore(
+                embedding=embeddings,
+                persist_path=db_file,
+                serializer="bson"
             )
+            self.metadata_index = MetadataIndex.load(os.path.join(os.path.dirname(db_file), INDEX_FILE_NAME))
+            if len(vectorstore._texts) != len(vectorstore._ids):
+                # 청크 텍스트/메타데이터를 압축 블록 파일에만 저장한 DB 파일
+                self._attach_chunk_store(vectorstore, db_file)
+                if not self.compress_chunks:
+                    vectorstore._texts = list(vectorstore._texts)
+                    vectorstore._metadatas = list(vectorstore._metadatas)
+                    self.chunk_store = None
+            elif self.compress_chunks and vectorstore._ids:
+                # 이전 형식(DB 파일에 텍스트 포함): 로드는 읽기 전용이므로 파일은 바꾸지 않고,
+                # 맞는 압축 블록 파일이 이미 있을 때만 메모리에서 교체 (변환은 저장 시 또는 migrate_chunk_store)
+                if not self._attach_chunk_store(vectorstore, db_file, create=False):
+                    logger.info(f"이전 형식의 벡터 저장소입니다. 청크 텍스트를 메모리에 둡니다 (migrate_chunk_store()로 변환 가능): {db_file}")
             logger.info(f"벡터 저장소를 로드했습니다: {db_file}")
             self.vector_db = vectorstore
             return vectorstore
         except Exception as e:
             logger.error(f"벡터 저장소 로드 실패: {e}")
-            return None
\ No newline at end of file
+            self.load_error = e
+            return None
+
+    def migrate_chunk_store(self) -> bool:
+        """
+        이전 형식(DB 파일에 청크 텍스트 포함)의 벡터 저장소를 압축 블록 형식으로 변환합니다.
+        
+        로드 경로에서는 파일을 바꾸지 않으므로, 인제스트가 돌지 않을 때 한 번 실행하는 명시적 변환 함수입니다.
+        스냅샷은 게시 후 바꾸지 않으므로 지원하지 않습니다. (새 스냅샷은 저장 시 압축 형식으로 만들어짐)
+        
+        Returns:
+            bool: 변환(또는 이미 변환된 상태 확인) 성공 여부
+            
+        Raises:
+            ValueError: 스냅샷 모드이거나 compress_chunks=False인 경우
+        """
+        if self.snapshot_manager is not None:
+            raise ValueError("스냅샷은 변환할 수 없습니다. rebuild_snapshot()으로 새 스냅샷을 만들어주세요.")
+        if not self.compress_chunks:
+            raise ValueError("compress_chunks=False에서는 변환할 필요가 없습니다.")
+
+        db_file = os.path.join(self.vector_store_path, "sklearn_vectorstore")
+        vectorstore = self._load_vector_store(db_file)
+        if vectorstore is None:
+            return False
+        success = self._save_vector_store(vectorstore, db_file)
+        if success:
+            logger.info(f"청크 텍스트를 압축 블록 파일로 옮겼습니다: {db_file}")
+        return success
+
+    def _persist_vectors(self, vectorstore, path):
+        """
+        벡터 저장소를 BSON 파일로 저장합니다.
+        
+        청크 텍스트/메타데이터가 압축 블록 저장소에 있으면 DB 파일에는 빈 리스트로 저장하여,
+        로드 시 텍스트를 메모리에 올리지 않고 디스크에도 두 번 저장하지 않습니다.
+        
+        Args:
+            vectorstore (SKLearnVectorStore): 저장할 벡터 저장소 객체
+            path (str): 저장할 파일 경로
+        """
+        external = isinstance(vectorstore._texts, LazyChunkSequence)
+        data = {
+            "ids": vectorstore._ids,
+            "texts": [] if external else vectorstore._texts,
+            "metadatas": [] if external else vectorstore._metadatas,
+            "embeddings": vectorstore._embeddings,
+        }
+        type(vectorstore._serializer)(persist_path=path).save(data)
+
+    def _attach_chunk_store(self, vectorstore, db_file, overwrite=False, create=True):
+        """
+        벡터 저장소의 청크 텍스트/메타데이터 리스트를 압축 블록 저장소 기반 지연 시퀀스로 교체합니다.
+        
+        압축 블록 파일이 없거나 청크 수가 맞지 않으면 현재 리스트로 새로 만듭니다.
+        (DB 파일에 텍스트가 없는데 압축 블록 파일도 맞지 않으면 ValueError)
+        교체 후에는 원래 리스트가 해제되어 검색 결과에 필요한 블록만 메모리에 올라갑니다.
+        
+        Args:
+            vectorstore (SKLearnVectorStore): 벡터 저장소 객체
+            db_file (str): 벡터 저장소 DB 파일 경로 (같은 폴더의 chunks/에 저장)
+            overwrite (bool): 기존 압축 블록 파일을 무시하고 새로 만들지 여부 (새 저장소 저장 시)
+            create (bool): 맞는 압축 블록 파일이 없을 때 새로 만들지 여부 (False이면 파일을 쓰지 않고 교체도 하지 않음)
+            
+        Returns:
+            bool: 압축 블록 저장소로 교체되었는지 여부
+        """
+        chunk_dir = os.path.join(os.path.dirname(db_file), "chunks")
+        if isinstance(vectorstore._texts, LazyChunkSequence):
+            return True
+
+        store = None
+        if not overwrite and CompressedChunkStore.exists(chunk_dir):
+            store = CompressedChunkStore(chunk_dir, cache_blocks=self.chunk_cache_blocks)
+            if len(store) != len(vectorstore._ids):
+                logger.warning("압축 청크 저장소의 청크 수가 벡터 저장소와 달라 다시 생성합니다.")
+                store = None
+        if store is None:
+            if not create and len(vectorstore._texts) == len(vectorstore._ids):
+                return False
+            if len(vectorstore._texts) != len(vectorstore._ids):
+                raise ValueError(f"청크 텍스트가 DB 파일에 없고 압축 청크 저장소도 맞지 않습니다: {chunk_dir}")
+            store = CompressedChunkStore.write(
+                chunk_dir,
+                zip(vectorstore._texts, vectorstore._metadatas),
+                cache_blocks=self.chunk_cache_blocks,
+            )
+
+        vectorstore._texts = LazyChunkSequence(store, "text")
+        vectorstore._metadatas = LazyChunkSequence(store, "metadata")
+        self.chunk_store = store
+        return True
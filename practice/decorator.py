@@ -55,16 +55,19 @@ def greet(name):
 
 
 # 예제 3: 실행 시간 측정 데코레이터
+# 운영 경로에는 module/profiler.py의 profile/span 사용 (히스토그램 기록, 샘플링, 전역 켜기/끄기)
 def timer(func):
-    """함수의 실행 시간을 측정하는 데코레이터"""
+    """함수의 실행 시간을 측정하는 데코레이터 (예외가 발생해도 측정)"""
     
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        print(f"{func.__name__} 함수 실행 시간: {end_time - start_time:.4f}초")
-        return result
+        # time.time()은 시스템 시계 변경의 영향을 받으므로 단조 증가하는 perf_counter 사용
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            print(f"{func.__name__} 함수 실행 시간: {elapsed:.4f}초")
     
     return wrapper
 
@@ -106,6 +109,7 @@ def divide(a, b):
 
 
 # 예제 5: 캐싱 데코레이터 (메모이제이션)
+# 운영 코드에서는 module/caching.py의 memoize 사용 (LRU/TTL, 키워드 인자, 스레드 안전, 비동기, 단일 실행)
 def memoize(func):
     """함수 호출 결과를 캐싱하는 데코레이터"""
     cache = {}
@@ -156,6 +160,7 @@ def get_secret_data():
 
 
 # 예제 7: 재시도 데코레이터
+# 운영 코드에서는 module/resilience.py 사용 (지수 백오프 + 지터, 재시도 예산, 회로 차단기, 기한, 비동기)
 def retry(max_attempts=3, delay=1):
     """지정된 횟수만큼 함수 실행을 재시도하는 데코레이터"""
     
@@ -2,9 +2,16 @@ import os
 import streamlit as st
 from dotenv import load_dotenv
 
-from langchain_ollama import ChatOllama
 from langchain.schema import HumanMessage, AIMessage
 
+from chat_service import ModelRouter, PrefixCacheChat, SchedulerOverloaded
+from generation_jobs import CANCELLED, FAILED, GenerationJobManager
+from model_residency import get_residency_manager
+from ollama_telemetry import get_telemetry
+from rag_service import RagPreparer, load_vector_store_setting
+import resilience
+import utils
+
 # 환경 변수 로드
 load_dotenv()
 
@@ -15,6 +22,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# 자동 모델 선택 옵션 이름
+AUTO_MODEL = "auto (자동 선택)"
+
 # 세션 상태 초기화
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -22,22 +32,138 @@ if "messages" not in st.session_state:
 if "llm_model" not in st.session_state:
     st.session_state.llm_model = "gemma3:4b"
 
+
+@st.cache_resource
+def start_model_residency():
+    """설정된 모델을 백그라운드에서 미리 로드합니다. (서버 프로세스당 한 번)"""
+    manager = get_residency_manager()
+    manager.start()
+    return manager
+
+
+@st.cache_data(ttl=60)
+def list_chat_models():
+    """Ollama 서버에 설치된 채팅 모델 목록 (1분 캐시)"""
+    return utils.get_available_ollama_models()
+
+
+@st.cache_resource
+def get_job_manager():
+    """세션이 공유하는 응답 생성 작업 관리자 (서버 프로세스당 하나)"""
+    return GenerationJobManager()
+
+
+@st.cache_resource
+def get_prefix_chat():
+    """세션별 서버 고정과 접두사 재사용 통계를 공유하는 채팅 모드 (서버 프로세스당 하나)"""
+    return PrefixCacheChat()
+
+
+@st.cache_resource
+def get_model_router():
+    """자동 모델 선택 라우터 (설치된 모델 중 global_variables.ollama_router_tiers 순서, 서버 프로세스당 하나)"""
+    return ModelRouter(available=utils.get_available_ollama_models())
+
+
+@st.cache_resource(show_spinner="벡터 저장소를 불러오는 중...")
+def get_vector_store_setting():
+    """RAG 모드에서 모든 세션이 공유하는 벡터 저장소 (서버 프로세스당 한 번 로드)"""
+    return load_vector_store_setting()
+
+
+def format_latency(message) -> str:
+    """응답 메시지에 기록된 검색/생성 소요 시간 표시 문자열"""
+    metadata = getattr(message, "response_metadata", None) or {}
+    latency = metadata.get("latency")
+    if not latency:
+        return ""
+    parts = []
+    rag = metadata.get("rag")
+    if rag and rag.get("retrieval_s") is not None:
+        parts.append(
+            f"검색 {rag['retrieval_s']:.2f}초 (청크 {rag['retrieved']}개 → 구간 {rag['used']}개, "
+            f"{rag.get('input_tokens', 0)} → {rag['context_tokens']}토큰)"
+        )
+    if latency.get("ttft_s") is not None:
+        parts.append(f"첫 토큰 {latency['ttft_s']:.2f}초")
+    if latency.get("llm_s") is not None:
+        parts.append(f"생성 {latency['llm_s']:.2f}초")
+    route = metadata.get("route")
+    if route:
+        escalated = "".join(f"{e['model']} ✗({e['reason']}) → " for e in route.get("escalations", []))
+        parts.insert(0, f"모델 {escalated}{route['model']}")
+    telemetry = metadata.get("telemetry")
+    if telemetry and telemetry.get("eval_tps"):
+        parts.append(f"{telemetry['eval_tps']:.1f}토큰/초")
+        if telemetry.get("load_spike"):
+            parts.append(f"⚠️ 콜드 로드 {telemetry['load_s']:.1f}초")
+    prefix = metadata.get("prefix_cache")
+    if prefix:
+        parts.append(
+            f"프리필 {prefix['evaluated_tokens']}/{prefix['prompt_tokens']}토큰 "
+            f"(접두사 재사용 {prefix['hit_ratio']:.0%}, {prefix['prompt_eval_s']:.2f}초)"
+        )
+    return " · ".join(parts)
+
+
+def show_message_details(message):
+    """응답 메시지 아래에 소요 시간과 참고 문서 출처를 표시합니다."""
+    caption = format_latency(message)
+    if caption:
+        st.caption(caption)
+    rag = (getattr(message, "response_metadata", None) or {}).get("rag")
+    if rag and rag.get("sources"):
+        with st.expander("참고 문서"):
+            for i, source in enumerate(rag["sources"], start=1):
+                st.markdown(f"[{i}] {source}")
+
+
+def get_session_id() -> str:
+    """현재 브라우저 세션 ID"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
+residency = start_model_residency()
+jobs = get_job_manager()
+prefix_chat = get_prefix_chat()
+session_id = get_session_id()
+
 # 사이드바 설정
 with st.sidebar:
     st.title("🤖 LLM 챗봇 설정")
     
     # 모델 선택
     st.subheader("모델 설정")
+    model_options = [AUTO_MODEL] + list_chat_models()
     model_option = st.selectbox(
         "사용할 LLM 모델을 선택하세요:",
-        options=[
-            "gemma3:4b",
-            "llama3.2:3b", 
-            "llama3.1", 
-        ],
-        index=0
+        options=model_options,
+        index=model_options.index(st.session_state.llm_model) if st.session_state.llm_model in model_options else 0
     )
+    # 선택하는 즉시 백그라운드 로드를 시작하여 첫 응답 지연을 줄임 (자동 선택이면 가장 작은 모델)
+    residency.ensure_loaded(get_model_router().tiers[0] if model_option == AUTO_MODEL else model_option)
     
+    # 문서 검색(RAG) 설정
+    st.subheader("문서 검색")
+    rag_enabled = st.toggle("RAG 모드 (근거자료 검색 후 답변)", value=False)
+    context_token_budget = st.slider(
+        "참고 문서 토큰 예산",
+        min_value=500,
+        max_value=4000,
+        value=1500,
+        step=250,
+        disabled=not rag_enabled
+    )
+
+    # 접두사 캐시 재사용 설정
+    prefix_cache_enabled = st.toggle(
+        "접두사 캐시 재사용 (세션을 한 서버에 고정하고 이전 턴의 프리필 재사용)",
+        value=True
+    )
+
     # 모델 파라미터 설정
     st.subheader("모델 파라미터")
     temperature = st.slider(
@@ -63,9 +189,58 @@ with st.sidebar:
     
     # 대화 초기화 버튼
     if st.button("대화 초기화"):
+        jobs.cancel(session_id)
+        jobs.discard(session_id)
         st.session_state.messages = []
+        prefix_chat.forget(session_id)
         st.success("대화가 초기화되었습니다!")
     
+    # 모델 상주 상태
+    with st.expander("모델 상주 상태"):
+        try:
+            residency.refresh()
+        except Exception as e:
+            st.caption(f"Ollama 상태를 확인할 수 없습니다: {e}")
+        st.caption(f"메모리 사용: {residency.resident_bytes() / 1024 ** 3:.1f}GB / 예산 {residency.ram_budget_bytes / 1024 ** 3:.1f}GB")
+        st.dataframe(residency.status(), hide_index=True)
+
+    # Ollama 계측 (모델별 최근 호출 백분위)
+    with st.expander("Ollama 계측"):
+        telemetry = get_telemetry()
+        rows = telemetry.summary()
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.caption("아직 기록된 호출이 없습니다.")
+        for spike in list(telemetry.spikes)[-3:]:
+            st.warning(f"콜드 로드: {spike['model']} {spike['load_s']:.1f}초")
+        if telemetry.path:
+            st.caption(f"기록 파일: {telemetry.path}")
+
+    # Ollama 서버별 회로 차단기 상태와 재시도 통계
+    with st.expander("Ollama 연결 상태"):
+        states = resilience.snapshot()
+        if states:
+            st.dataframe([{"endpoint": endpoint, **values} for endpoint, values in states.items()], hide_index=True)
+            for endpoint, values in states.items():
+                if values["state"] != resilience.CLOSED:
+                    st.warning(f"회로 차단기 {values['state']}: {endpoint}")
+        else:
+            st.caption("아직 기록된 호출이 없습니다.")
+
+    # 자동 모델 선택 통계
+    if st.session_state.llm_model == AUTO_MODEL:
+        with st.expander("자동 모델 선택 통계"):
+            st.dataframe(get_model_router().stats(), hide_index=True)
+
+    # 접두사 재사용 통계
+    with st.expander("접두사 캐시 통계"):
+        for label, stats in (("이 세션", prefix_chat.stats(session_id)), ("전체", prefix_chat.stats())):
+            st.caption(
+                f"{label}: 요청 {stats['calls']}회, 프리필 {stats['evaluated_tokens']}/{stats['prompt_tokens']}토큰 "
+                f"(접두사 재사용 {stats['hit_ratio']:.0%}, 프리필 {stats['prompt_eval_s']:.1f}초)"
+            )
+
     st.divider()
     st.caption("© 2025 LLM 챗봇 | 모든 권리 보유")
 
@@ -81,6 +256,42 @@ for message in st.session_state.messages:
     else:  # AIMessage
         with st.chat_message("assistant"):
             st.write(message.content)
+            show_message_details(message)
+
+
+@st.fragment(run_every=0.5)
+def show_generation():
+    """백그라운드 생성 작업을 주기적으로 읽어 표시합니다. (이 부분만 다시 실행되므로 다른 위젯 조작과 무관하게 진행)"""
+    job = jobs.get(session_id)
+    if job is None:
+        return
+    jobs.heartbeat(session_id)
+
+    if not job.finished:
+        with st.chat_message("assistant"):
+            if job.text:
+                st.markdown(job.text + " ▌")
+            else:
+                st.markdown("문서 검색 중..." if job.prepare and job.prepared_at is None else "생각 중...")
+            if st.button("⏹ 생성 중지", key=f"stop-{job.job_id}"):
+                job.cancel()
+        return
+
+    # 완료(또는 중지, 실패)된 결과를 대화 기록으로 옮기고 전체 화면을 다시 그림
+    # (응답 텍스트가 없으면 오류/중지 안내를 기록해 다음 화면에서도 남아 있게 함)
+    if job.text:
+        st.session_state.messages.append(job.to_message())
+    elif job.status in (FAILED, CANCELLED):
+        if job.status == CANCELLED:
+            notice = "생성을 중지했습니다."
+        elif isinstance(job.error, SchedulerOverloaded):
+            notice = "요청이 많아 지금은 응답할 수 없습니다. 잠시 후 다시 시도해 주세요."
+        else:
+            notice = f"오류가 발생했습니다: {str(job.error)}"
+        st.session_state.messages.append(AIMessage(content=notice, response_metadata={"status": job.status}))
+    jobs.discard(session_id)
+    st.rerun()
+
 
 # 사용자 입력 처리
 if prompt := st.chat_input("무엇이든 물어보세요!"):
@@ -88,31 +299,33 @@ if prompt := st.chat_input("무엇이든 물어보세요!"):
     st.session_state.messages.append(HumanMessage(content=prompt))
     with st.chat_message("user"):
         st.write(prompt)
-    
-    # AI 응답 생성 중 표시
-    with st.chat_message("assistant"):
-        message_placeholder = st.empty()
-        message_placeholder.markdown("생각 중...")
-        
+
+    # RAG 모드면 검색과 프롬프트 준비를 생성 작업 안에서 함께 진행
+    prepare = None
+    if rag_enabled:
         try:
-            # LLM 모델 초기화
-            llm = ChatOllama(
-                model=st.session_state.llm_model,
-                temperature=temperature,
-                max_tokens=max_tokens
+            prepare = RagPreparer(
+                get_vector_store_setting(),
+                prompt,
+                context_token_budget=context_token_budget,
+                prefix_chat=prefix_chat if prefix_cache_enabled else None
             )
-            
-            # 응답 생성
-            response = llm.invoke(st.session_state.messages)
-            
-            # 응답 표시
-            message_placeholder.markdown(response.content)
-            
-            # 응답 저장
-            st.session_state.messages.append(AIMessage(content=response.content))
-            
-        except Exception as e:
-            message_placeholder.markdown(f"오류가 발생했습니다: {str(e)}")
+        except (FileNotFoundError, RuntimeError) as e:
+            st.warning(f"{e} 문서 검색 없이 답변합니다.")
+
+    # 응답은 백그라운드 작업으로 생성 (진행 중인 이전 생성은 취소됨, 오류/중지 안내는 모델에 보내지 않음)
+    jobs.submit(
+        session_id,
+        [m for m in st.session_state.messages if (getattr(m, "response_metadata", None) or {}).get("status") not in (FAILED, CANCELLED)],
+        model=st.session_state.llm_model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        prepare=prepare,
+        prefix_chat=prefix_chat if prefix_cache_enabled else None,
+        router=get_model_router() if st.session_state.llm_model == AUTO_MODEL else None
+    )
+
+show_generation()
 
 # 앱 실행 방법 안내
 st.sidebar.markdown("""\n### 실행 방법\n```bash\nstreamlit run app.py\n```""")
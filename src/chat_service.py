@@ -0,0 +1,79 @@
+"""
+챗봇 모델 호출 모듈
+
+Streamlit 화면 코드(app.py)와 분리된 LLM 호출 경로입니다.
+벤치마크나 부하 테스트에서도 앱과 동일한 경로로 모델을 호출할 수 있습니다.
+"""
+
+import os
+import sys
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "module"))
+from model_residency import get_residency_manager
+from model_router import ModelRouter
+from ollama_scheduler import ScheduledChatModel, SchedulerOverloaded, create_scheduled_chat_model
+from prefix_cache_chat import PrefixCacheChat
+from profiler import profile
+
+
+def create_llm(
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    base_url: Optional[str] = None,
+    priority: str = "interactive",
+) -> ScheduledChatModel:
+    """
+    ChatOllama 모델 객체 생성 (공용 스케줄러를 거쳐 호출)
+
+    Args:
+        model (str): 사용할 Ollama 모델 이름
+        temperature (float): 모델 온도 설정
+        max_tokens (int): 최대 생성 토큰 수 (Ollama의 num_predict)
+        base_url (str): Ollama 서버 주소 (None이면 기본 주소 사용)
+        priority (str): 스케줄러 우선순위 (대화 응답은 interactive)
+
+    Returns:
+        ScheduledChatModel: 생성된 채팅 모델 객체
+    """
+    # 최근 사용 빈도에 따라 keep_alive를 늘려 자주 쓰는 모델이 언로드되지 않게 함
+    keep_alive = get_residency_manager(base_url).keep_alive_for(model)
+    return create_scheduled_chat_model(
+        model,
+        priority=priority,
+        base_url=base_url,
+        temperature=temperature,
+        num_predict=max_tokens,
+        keep_alive=keep_alive,
+    )
+
+
+@profile("chat.invoke")
+def generate_response(
+    messages: List[BaseMessage],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    base_url: Optional[str] = None,
+) -> AIMessage:
+    """
+    대화 내역을 모델에 전달하여 응답을 생성합니다.
+
+    Args:
+        messages (List[BaseMessage]): 대화 메시지 목록
+        model (str): 사용할 Ollama 모델 이름
+        temperature (float): 모델 온도 설정
+        max_tokens (int): 최대 생성 토큰 수
+        base_url (str): Ollama 서버 주소
+
+    Returns:
+        AIMessage: 모델 응답 메시지
+
+    Raises:
+        SchedulerOverloaded: Ollama 대기열이 밀려 대기 기한 안에 실행하지 못한 경우 발생
+    """
+    llm = create_llm(model, temperature, max_tokens, base_url=base_url)
+    return llm.invoke(messages)
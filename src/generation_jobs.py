@@ -0,0 +1,421 @@
+"""
+백그라운드 응답 생성 작업 모듈
+
+Streamlit 스크립트 안에서 바로 응답을 생성하면 위젯 조작으로 스크립트가 다시 실행될 때 생성이 끊기고,
+버려진 요청은 끝날 때까지 Ollama 연산을 계속 차지합니다. 이 모듈은 응답 생성을 세션별 백그라운드 작업으로 실행합니다.
+
+- 작업은 공용 작업자 풀에서 스트리밍으로 실행되고, 화면은 job.text를 주기적으로 읽어 표시
+- cancel()된 작업은 작업자 풀이나 스케줄러 대기열에 있으면 Ollama에 요청을 보내지 않고,
+  생성 중이면 다음 청크를 받는 시점에 스트림을 닫아 HTTP 연결을 끊음 (Ollama는 연결이 끊기면 생성을 중단)
+  이미 보낸 요청의 첫 토큰 전 프리필은 청크가 오지 않으므로 끝날 때까지 Ollama 연산이 계속됨
+- 같은 세션에서 새 작업을 제출하면 이전 작업은 취소
+- 화면이 heartbeat()를 orphan_timeout 동안 보내지 않으면(탭 닫힘, 세션 종료) 작업을 취소하고 정리
+- prefix_chat을 지정하면 세션이 고정된 서버로 보내고 접두사 재사용 통계를 기록 (prefix_cache_chat.py)
+- router를 지정하면 질문마다 모델을 고르고, 자체 점검에 실패하면 큰 모델로 다시 생성 (model_router.py)
+- 일시적인 Ollama 오류는 첫 토큰 전까지 재시도하되, ollama_chat_deadline_seconds 기한 안에서만 (resilience.py)
+
+사용 예:
+    manager = GenerationJobManager()
+    job = manager.submit(session_id, messages, model="llama3.1", temperature=0.7, max_tokens=1000)
+    while not job.finished:
+        manager.heartbeat(session_id)
+        print(job.text)
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "module"))
+import global_variables as gv
+from chat_service import ModelRouter, PrefixCacheChat, create_llm
+from profiler import record, span
+from resilience import deadline
+from utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class GenerationJob:
+    """
+    응답 생성 작업 하나의 상태
+
+    Args:
+        session_id (str): 작업을 제출한 세션 ID
+        messages (List[BaseMessage]): 모델에 전달할 대화 메시지
+        model (str): 사용할 Ollama 모델 이름
+        temperature (float): 모델 온도 설정
+        max_tokens (int): 최대 생성 토큰 수
+        base_url (str): Ollama 서버 주소
+        prepare (Callable): 생성 전에 작업자 스레드에서 메시지를 준비하는 함수 (예: RAG 검색), summary()가 있으면 결과에 기록
+        prefix_chat (PrefixCacheChat): 접두사 캐시 모드 (None이면 사용 안 함)
+        router (ModelRouter): 자동 모델 선택 (지정하면 model 대신 라우터가 고른 모델 사용)
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        messages: List[BaseMessage],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        base_url: Optional[str] = None,
+        prepare: Optional[Callable[[List[BaseMessage]], List[BaseMessage]]] = None,
+        prefix_chat: Optional[PrefixCacheChat] = None,
+        router: Optional[ModelRouter] = None,
+    ):
+        self.job_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.messages = list(messages)
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.base_url = base_url
+        self.prepare = prepare
+        self.prefix_chat = prefix_chat
+        self.router = router
+        self.route = None
+        self.escalations: List[dict] = []
+
+        self.status = QUEUED
+        self.error: Optional[BaseException] = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.prepared_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._chunks: List[str] = []
+        self._attempt_first_token_at: Optional[float] = None
+        self.response_metadata: dict = {}
+        self.prefix_stats: Optional[dict] = None
+        self._done_event = threading.Event()
+        self._state_lock = threading.Lock()
+
+    @property
+    def text(self) -> str:
+        """지금까지 생성된 응답 텍스트"""
+        return "".join(self._chunks)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, CANCELLED, FAILED)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """제출부터 첫 토큰까지 걸린 시간(초)"""
+        return self.first_token_at - self.created_at if self.first_token_at else None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.created_at
+
+    def cancel(self) -> None:
+        """
+        생성을 중단합니다.
+
+        작업자 풀이나 스케줄러 대기열에 있으면 요청을 보내지 않고, 생성 중이면 다음 청크를 받는 시점에 Ollama 연결을 끊습니다.
+        (이미 보낸 요청의 첫 토큰 전 프리필은 끝날 때까지 계속됨)
+        """
+        self.cancel_event.set()
+        with self._state_lock:
+            if self.status == QUEUED:
+                self._finish(CANCELLED)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """작업이 끝날 때까지 기다립니다."""
+        return self._done_event.wait(timeout)
+
+    def latency(self) -> dict:
+        """
+        단계별 소요 시간(초)
+
+        Returns:
+            dict: queue_s(대기), prepare_s(메시지 준비), ttft_s(첫 토큰), generation_s(첫 토큰 이후 생성), total_s(전체)
+        """
+        prepared_at = self.prepared_at or self.started_at
+        return {
+            "queue_s": self.started_at - self.created_at if self.started_at else None,
+            "prepare_s": self.prepared_at - self.started_at if self.prepared_at and self.prepare else None,
+            "ttft_s": self.ttft,
+            "generation_s": (self.finished_at or time.monotonic()) - self.first_token_at if self.first_token_at else None,
+            "llm_s": (self.finished_at or time.monotonic()) - prepared_at if prepared_at else None,
+            "total_s": self.elapsed,
+        }
+
+    def to_message(self) -> AIMessage:
+        """생성된 응답을 대화 기록에 추가할 메시지로 변환합니다. (소요 시간과 준비 단계 기록 포함)"""
+        metadata = {"latency": self.latency()}
+        summary = getattr(self.prepare, "summary", None)
+        if summary is not None:
+            metadata["rag"] = summary()
+        if self.prefix_stats is not None:
+            metadata["prefix_cache"] = self.prefix_stats
+        if self.response_metadata.get("telemetry"):
+            metadata["telemetry"] = self.response_metadata["telemetry"]
+        if self.route is not None:
+            metadata["route"] = {**self.route.to_dict(), "escalations": self.escalations}
+        return AIMessage(content=self.text, response_metadata=metadata)
+
+    def _finish(self, status: str, error: Optional[BaseException] = None) -> None:
+        # self._state_lock 안에서 호출 (cancel()과 run()이 동시에 상태를 바꾸지 않도록)
+        if self.finished:
+            return
+        self.status = status
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._done_event.set()
+
+    def run(self) -> None:
+        """작업자 스레드에서 스트리밍으로 응답을 생성합니다."""
+        with self._state_lock:
+            if self.finished:
+                return
+            if self.cancel_event.is_set():
+                # cancel()이 상태를 바꾸기 전에 작업자가 먼저 잡은 경우
+                self._finish(CANCELLED)
+                return
+            self.status = RUNNING
+            self.started_at = time.monotonic()
+        try:
+            if self.prepare:
+                messages = self.prepare(self.messages)
+            elif self.prefix_chat:
+                messages = self.prefix_chat.arrange(self.messages)
+            else:
+                messages = self.messages
+            self.prepared_at = time.monotonic()
+            if self.cancel_event.is_set():
+                with self._state_lock:
+                    self._finish(CANCELLED)
+                return
+            # 재시도를 포함한 전체 생성 시간의 상한 (resilience.py가 기한을 넘겨 재시도하지 않음)
+            with span("chat.generate"), deadline(gv.ollama_chat_deadline_seconds):
+                if self.router:
+                    self._route_and_generate(messages)
+                else:
+                    self._generate(messages)
+        except Exception as e:
+            if self.cancel_event.is_set():
+                # 슬롯 대기 중 취소(RequestCancelled) 등 취소로 인한 중단
+                with self._state_lock:
+                    self._finish(CANCELLED)
+                return
+            logger.warning(f"응답 생성 실패 (세션 {self.session_id}): {e}")
+            with self._state_lock:
+                self._finish(FAILED, e)
+            return
+        if self.prefix_chat and not self.cancel_event.is_set():
+            self.prefix_stats = self.prefix_chat.record(self.session_id, messages, self.response_metadata, self.text)
+        with self._state_lock:
+            self._finish(CANCELLED if self.cancel_event.is_set() else DONE)
+
+    def _generate(self, messages: List[BaseMessage]) -> None:
+        """현재 모델로 응답을 스트리밍하여 self._chunks에 채웁니다."""
+        if self.prefix_chat:
+            llm = self.prefix_chat.create_llm(self.session_id, self.model, self.temperature, self.max_tokens)
+        else:
+            llm = create_llm(self.model, self.temperature, self.max_tokens, base_url=self.base_url)
+        self._attempt_first_token_at = None
+        attempt_started = time.monotonic()
+        # 스케줄러 대기 중에 취소되면 요청을 보내지 않고 RequestCancelled 발생
+        stream = llm.stream(messages, cancel_event=self.cancel_event)
+        try:
+            for chunk in stream:
+                if self.cancel_event.is_set():
+                    break
+                if chunk.content:
+                    if self._attempt_first_token_at is None:
+                        self._attempt_first_token_at = time.monotonic()
+                        self.first_token_at = self.first_token_at or self._attempt_first_token_at
+                        record("chat.ttft", int((self._attempt_first_token_at - attempt_started) * 1e9))
+                    self._chunks.append(chunk.content)
+                if chunk.response_metadata:
+                    # 마지막 청크에 Ollama의 토큰 수와 소요 시간이 담겨 옴
+                    self.response_metadata = chunk.response_metadata
+        finally:
+            # 제너레이터를 닫으면 스트리밍 HTTP 응답이 닫히고 스케줄러 슬롯도 반납됨
+            stream.close()
+
+    def _route_and_generate(self, messages: List[BaseMessage]) -> None:
+        """라우터가 고른 모델로 생성하고, 자체 점검에 실패하면 다음 단계 모델로 다시 생성합니다."""
+        query = str(self.messages[-1].content)
+        history_tokens = sum(count_tokens(str(message.content)) for message in self.messages[:-1])
+        self.route = self.router.route(query, history_tokens, retrieval_confidence=getattr(self.prepare, "confidence", None))
+        while True:
+            self.model = self.route.model
+            attempt_started = time.monotonic()
+            try:
+                self._generate(messages)
+            except Exception:
+                status = CANCELLED if self.cancel_event.is_set() else FAILED
+                self.router.record(self.route, time.monotonic() - attempt_started, status=status)
+                raise
+            latency = time.monotonic() - attempt_started
+            ttft = self._attempt_first_token_at - attempt_started if self._attempt_first_token_at else None
+            if self.cancel_event.is_set():
+                self.router.record(self.route, latency, ttft, status=CANCELLED)
+                return
+            reason = self.router.self_check(query, self.text, grounded=self.prepare is not None)
+            escalated = self.router.escalate(self.route, reason) if reason else None
+            self.router.record(self.route, latency, ttft, check_failure=reason, escalated=escalated is not None)
+            if escalated is None:
+                return
+            # 화면에는 큰 모델의 응답으로 바뀌어 표시됨
+            self.escalations.append({"model": self.route.model, "reason": reason, "latency_s": latency})
+            self.route = escalated
+            self._chunks = []
+
+
+class GenerationJobManager:
+    """
+    세션별 응답 생성 작업 관리자
+
+    Args:
+        max_workers (int): 동시에 생성할 수 있는 작업 수
+        orphan_timeout (float): heartbeat가 이 시간(초) 동안 없으면 세션이 사라진 것으로 보고 작업 취소
+        retention (float): 끝난 작업을 보관하는 시간(초)
+        sweep_interval (float): 고아 작업 정리 간격(초)
+    """
+
+    def __init__(self, max_workers: int = 4, orphan_timeout: float = 30.0, retention: float = 300.0, sweep_interval: float = 5.0):
+        self.orphan_timeout = orphan_timeout
+        self.retention = retention
+        self.sweep_interval = sweep_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="generation-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def submit(
+        self,
+        session_id: str,
+        messages: List[BaseMessage],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        base_url: Optional[str] = None,
+        prepare: Optional[Callable[[List[BaseMessage]], List[BaseMessage]]] = None,
+        prefix_chat: Optional[PrefixCacheChat] = None,
+        router: Optional[ModelRouter] = None,
+    ) -> GenerationJob:
+        """
+        응답 생성 작업을 제출합니다. 같은 세션에서 진행 중인 작업은 취소합니다.
+
+        Args:
+            session_id (str): 세션 ID
+            messages (List[BaseMessage]): 대화 메시지
+            model (str): 사용할 Ollama 모델 이름
+            temperature (float): 모델 온도 설정
+            max_tokens (int): 최대 생성 토큰 수
+            base_url (str): Ollama 서버 주소
+            prepare (Callable): 생성 전에 메시지를 준비하는 함수 (예: RagPreparer)
+            prefix_chat (PrefixCacheChat): 접두사 캐시 모드 (None이면 사용 안 함)
+            router (ModelRouter): 자동 모델 선택 (None이면 model 사용)
+
+        Returns:
+            GenerationJob: 제출된 작업
+        """
+        job = GenerationJob(session_id, messages, model, temperature, max_tokens, base_url=base_url, prepare=prepare, prefix_chat=prefix_chat, router=router)
+        with self._lock:
+            previous = self._jobs.get(session_id)
+            self._jobs[session_id] = job
+            self._last_seen[session_id] = time.monotonic()
+        if previous is not None and not previous.finished:
+            previous.cancel()
+        self._executor.submit(job.run)
+        return job
+
+    def get(self, session_id: str) -> Optional[GenerationJob]:
+        """세션의 최근 작업을 반환합니다."""
+        with self._lock:
+            return self._jobs.get(session_id)
+
+    def heartbeat(self, session_id: str) -> None:
+        """세션이 살아 있음을 알립니다. (화면이 작업 상태를 읽을 때마다 호출)"""
+        with self._lock:
+            self._last_seen[session_id] = time.monotonic()
+
+    def cancel(self, session_id: str) -> bool:
+        """
+        세션의 진행 중인 작업을 취소합니다.
+
+        Returns:
+            bool: 취소한 작업이 있었는지 여부
+        """
+        job = self.get(session_id)
+        if job is None or job.finished:
+            return False
+        job.cancel()
+        return True
+
+    def discard(self, session_id: str) -> None:
+        """세션의 작업 기록을 지웁니다. (결과를 대화 기록으로 옮긴 뒤 호출)"""
+        with self._lock:
+            job = self._jobs.get(session_id)
+            if job is not None and job.finished:
+                del self._jobs[session_id]
+
+    def sweep(self) -> int:
+        """
+        세션이 사라진 작업을 취소하고 오래된 작업 기록을 지웁니다.
+
+        Returns:
+            int: 취소한 작업 수
+        """
+        now = time.monotonic()
+        cancelled = 0
+        with self._lock:
+            for session_id, job in list(self._jobs.items()):
+                idle = now - self._last_seen.get(session_id, job.created_at)
+                if not job.finished and idle > self.orphan_timeout:
+                    job.cancel()
+                    cancelled += 1
+                    logger.info(f"세션 응답이 없어 생성 작업을 취소했습니다: {session_id} ({idle:.0f}초)")
+                elif job.finished and now - job.finished_at > self.retention:
+                    del self._jobs[session_id]
+            for session_id, seen in list(self._last_seen.items()):
+                if session_id not in self._jobs and now - seen > self.retention:
+                    del self._last_seen[session_id]
+        return cancelled
+
+    def _sweep_loop(self) -> None:
+        while not self._closed.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"생성 작업 정리 실패: {e}")
+
+    def stats(self) -> dict:
+        """상태별 작업 수"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, CANCELLED, FAILED)}
+        for job in jobs:
+            counts[job.status] += 1
+        return counts
+
+    def close(self) -> None:
+        """진행 중인 작업을 모두 취소하고 작업자 풀을 종료합니다."""
+        self._closed.set()
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=False)
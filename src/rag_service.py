@@ -0,0 +1,195 @@
+"""
+RAG 응답 준비 모듈
+
+앱의 RAG 모드에서 질문마다 문서를 검색하고, 검색 결과를 토큰 예산 안에서 골라 모델에 전달할 메시지를 만듭니다.
+
+- 벡터 저장소(VectorStoreSetting)는 프로세스당 한 번 로드하여 모든 세션이 공유 (app.py의 st.cache_resource)
+- 검색은 공용 검색 스레드 풀에서 실행하고, 그동안 대화 기록 정리(프롬프트 준비)를 함께 진행
+- 검색된 청크는 겹치는 청크를 이어 붙이고 관련 없는 문장을 뺀 뒤 토큰 예산 안에 채움 (context_assembly.py)
+- 검색 시간, 사용한 청크/토큰 수, 출처를 기록하여 화면에 표시
+- 접두사 캐시 모드(prefix_chat)에서는 시스템 프롬프트를 고정하고 참고 문서를 마지막 질문 바로 앞에 배치 (prefix_cache_chat.py)
+
+사용 예:
+    setting = load_vector_store_setting()
+    preparer = RagPreparer(setting, "무역 보험 약관에 대한 정보를 알려줘.")
+    messages = preparer(history)
+"""
+
+import logging
+import os
+import sys
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "module"))
+import global_variables as gv
+from async_retrieval import get_search_executor
+from context_assembly import assemble_context, lexical_relevance
+from prefix_cache_chat import PrefixCacheChat
+from profiler import profile
+from utils import count_tokens
+from vector_store_setting import VectorStoreSetting
+
+logger = logging.getLogger(__name__)
+
+RAG_INSTRUCTIONS = (
+    "당신은 무역보험 영업 지원 챗봇입니다. 참고 문서의 내용을 근거로 답변하고, "
+    "답변에 사용한 문서 번호를 [1]처럼 표시하세요. 참고 문서에 없는 내용은 모른다고 답하세요."
+)
+RAG_SYSTEM_PROMPT = RAG_INSTRUCTIONS + "\n\n참고 문서:\n"
+
+
+def load_vector_store_setting(
+    vector_store_path: Optional[str] = None,
+    embedding_model_name: Optional[str] = None,
+    top_k: int = 4,
+    retriever_timeout: Optional[float] = 10.0,
+) -> VectorStoreSetting:
+    """
+    저장된 벡터 저장소를 조회 전용으로 로드합니다. (인제스트 의존성 없이 로드)
+
+    Args:
+        vector_store_path (str): 벡터 저장소 경로 (기본값: global_variables 설정)
+        embedding_model_name (str): 임베딩 모델 이름 (기본값: global_variables 설정)
+        top_k (int): 질문마다 검색할 청크 수
+        retriever_timeout (float): 검색 제한 시간(초)
+
+    Returns:
+        VectorStoreSetting: 로드된 벡터 저장소 설정 객체
+
+    Raises:
+        FileNotFoundError: 저장된 벡터 저장소가 없는 경우 발생
+        RuntimeError: 저장된 벡터 저장소는 있지만 로드에 실패한 경우 발생 (원인 예외를 __cause__로 연결)
+    """
+    setting = VectorStoreSetting(
+        vector_store_path=vector_store_path or gv.absolute_vector_store_path,
+        embedding_model_name=embedding_model_name or gv.ollama_embedding_models[2],
+        retriever_top_k=top_k,
+        retriever_timeout=retriever_timeout,
+    )
+    if setting.load_for_query() is None:
+        if setting.load_error is not None:
+            raise RuntimeError(
+                f"벡터 저장소 로드 실패: {setting.vector_store_path} "
+                f"({type(setting.load_error).__name__}: {setting.load_error})"
+            ) from setting.load_error
+        raise FileNotFoundError(
+            f"저장된 벡터 저장소가 없습니다: {setting.vector_store_path} "
+            "(RAG_test.py로 먼저 벡터 저장소를 생성해주세요.)"
+        )
+    return setting
+
+
+def trim_history(messages: List[BaseMessage], token_budget: int) -> List[BaseMessage]:
+    """
+    최근 대화부터 토큰 예산 안에 들어가는 메시지만 남깁니다. (마지막 메시지는 항상 포함)
+
+    Args:
+        messages (List[BaseMessage]): 대화 메시지
+        token_budget (int): 대화 기록에 쓸 토큰 예산
+
+    Returns:
+        List[BaseMessage]: 정리된 대화 메시지 (원래 순서)
+    """
+    kept: List[BaseMessage] = []
+    used = 0
+    for message in reversed(messages):
+        tokens = count_tokens(str(message.content))
+        if kept and used + tokens > token_budget:
+            break
+        kept.append(message)
+        used += tokens
+    return list(reversed(kept))
+
+
+class RagPreparer:
+    """
+    질문 하나에 대한 RAG 메시지 준비 (GenerationJob의 prepare로 사용)
+
+    Args:
+        setting (VectorStoreSetting): 공유 벡터 저장소 설정 객체
+        query (str): 사용자 질문
+        context_token_budget (int): 참고 문서에 쓸 토큰 예산
+        history_token_budget (int): 대화 기록에 쓸 토큰 예산
+        timeout (float): 검색 제한 시간(초), 넘기면 참고 문서 없이 답변
+        min_relevance (float): 참고 문서에서 유지할 문장의 최소 관련도 (0이면 문장 제거 안 함)
+        prefix_chat (PrefixCacheChat): 접두사 캐시 모드 (지정하면 대화 기록은 prefix_chat의 예산으로 블록 단위 정리)
+    """
+
+    def __init__(
+        self,
+        setting: VectorStoreSetting,
+        query: str,
+        context_token_budget: int = 1500,
+        history_token_budget: int = 2000,
+        timeout: float = 10.0,
+        min_relevance: float = 0.15,
+        prefix_chat: Optional[PrefixCacheChat] = None,
+    ):
+        self.setting = setting
+        self.query = query
+        self.context_token_budget = context_token_budget
+        self.history_token_budget = history_token_budget
+        self.timeout = timeout
+        self.min_relevance = min_relevance
+        self.prefix_chat = prefix_chat
+
+        self.retrieval_seconds: Optional[float] = None
+        self.retrieved = 0
+        self.context = None
+        self.confidence: Optional[float] = None
+
+    @profile("rag.prepare")
+    def __call__(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        검색과 대화 기록 정리를 함께 진행하여 모델에 전달할 메시지를 만듭니다.
+
+        Args:
+            messages (List[BaseMessage]): 대화 메시지 (마지막이 사용자 질문)
+
+        Returns:
+            List[BaseMessage]: 참고 문서 시스템 메시지 + 정리된 대화 메시지
+                (접두사 캐시 모드에서는 고정 시스템 프롬프트 + 대화 기록 + 참고 문서 + 마지막 질문)
+        """
+        started = time.perf_counter()
+        future = get_search_executor().submit(self.setting.retrieve, self.query)
+
+        # 검색이 진행되는 동안 대화 기록 정리
+        history = trim_history(messages, self.history_token_budget) if self.prefix_chat is None else None
+
+        try:
+            docs = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"문서 검색이 {self.timeout}초 안에 끝나지 않아 참고 문서 없이 답변합니다.")
+            docs = []
+        self.retrieval_seconds = time.perf_counter() - started
+        self.retrieved = len(docs)
+
+        self.context = assemble_context(docs, self.query, self.context_token_budget, min_relevance=self.min_relevance)
+        # 검색 신뢰도: 참고 문서 구간 중 질문과 가장 관련 있는 구간의 관련도 (자동 모델 선택에 사용)
+        relevance = lexical_relevance(self.query)
+        self.confidence = max((relevance(span.text) for span in self.context.spans), default=0.0)
+        if self.prefix_chat is not None:
+            # 참고 문서 유무와 관계없이 시스템 프롬프트를 유지해야 접두사가 바뀌지 않음
+            context = "참고 문서:\n" + (self.context.format() if self.context.spans else "(검색된 문서 없음)")
+            return self.prefix_chat.arrange(messages, system_prompt=RAG_INSTRUCTIONS, context=context)
+        if not self.context.spans:
+            return history
+        return [SystemMessage(content=RAG_SYSTEM_PROMPT + self.context.format())] + history
+
+    def summary(self) -> dict:
+        """턴별 RAG 기록 (화면 표시용)"""
+        stats = self.context.stats() if self.context else {}
+        return {
+            "retrieval_s": self.retrieval_seconds,
+            "retrieved": self.retrieved,
+            "used": stats.get("spans", 0),
+            "input_tokens": stats.get("input_tokens", 0),
+            "context_tokens": stats.get("tokens", 0),
+            "confidence": self.confidence,
+            "sources": self.context.sources if self.context else [],
+        }
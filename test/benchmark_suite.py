@@ -0,0 +1,415 @@
+"""
+오프라인 엔드투엔드 벤치마크
+
+로컬 Ollama 스텁 서버(ollama_stub_server.py)를 띄운 뒤 실제 모델 없이
+VectorStoreSetting, FaissVectorStore, 챗봇 모델 호출 경로(src/chat_service.py)의 성능을 측정합니다.
+
+측정 단계:
+    pdf_load, split, embed, index_build, persist, load, query (벡터 저장소별)
+    chat (챗봇 왕복)
+
+결과는 JSON 파일로 저장되며, --baseline으로 이전 결과를 지정하면 회귀 여부를 검사합니다.
+
+사용 예:
+    python benchmark_suite.py --output bench_results.json
+    python benchmark_suite.py --baseline bench_results.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TEST_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "module"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import HumanMessage
+
+from ollama_stub_server import StubConfig, StubOllamaServer
+from profiler import percentile
+
+
+WORDS = (
+    "trade insurance policy export credit premium coverage claim buyer seller "
+    "contract payment default risk limit exporter importer bank guarantee "
+    "shipment invoice term condition liability exclusion deductible notice"
+).split()
+
+QUERIES = [
+    "export credit insurance coverage limit",
+    "claim payment default buyer",
+    "policy exclusion and deductible terms",
+    "bank guarantee for shipment invoice",
+]
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    미리 계산한 벡터를 텍스트 기준으로 돌려주는 임베딩 (인덱스 구축 시간만 따로 측정하기 위함)
+
+    Args:
+        vectors (Dict[str, List[float]]): 텍스트별 벡터
+        fallback (Embeddings): 질의 임베딩에 사용할 실제 임베딩 모델
+    """
+
+    def __init__(self, vectors: Dict[str, List[float]], fallback: Embeddings):
+        self.vectors = vectors
+        self.fallback = fallback
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.fallback.embed_query(text)
+
+
+def make_corpus(directory: str, n_files: int, n_pages: int, words_per_page: int) -> None:
+    """
+    벤치마크용 합성 PDF 문서를 생성합니다.
+
+    Args:
+        directory (str): PDF를 저장할 디렉토리
+        n_files (int): PDF 파일 수
+        n_pages (int): 파일당 페이지 수
+        words_per_page (int): 페이지당 단어 수
+    """
+    import fitz  # PyMuPDF
+
+    os.makedirs(directory, exist_ok=True)
+    for file_no in range(n_files):
+        pdf = fitz.open()
+        for page_no in range(n_pages):
+            # 파일/페이지 번호로 시드를 고정하여 실행할 때마다 같은 문서를 생성
+            rng = random.Random(file_no * 100003 + page_no)
+            words = [rng.choice(WORDS) for _ in range(words_per_page)]
+            lines = [" ".join(words[i:i + 12]) + "." for i in range(0, len(words), 12)]
+            page = pdf.new_page()
+            page.insert_textbox(fitz.Rect(36, 36, 576, 806), "\n".join(lines), fontsize=7)
+        pdf.save(os.path.join(directory, f"policy_{file_no:03d}.pdf"))
+        pdf.close()
+
+
+class BenchmarkRecorder:
+    """
+    단계별 측정 결과를 모으는 클래스
+
+    Args:
+        suite (str): 측정 대상 이름 (예: sklearn, faiss, chat)
+    """
+
+    def __init__(self, suite: str):
+        self.suite = suite
+        self.results: List[dict] = []
+
+    def stage(self, name: str, func: Callable, count: Optional[Callable] = None):
+        """
+        단계 하나를 실행하고 소요 시간을 기록합니다. 실패해도 다음 단계는 계속 진행합니다.
+
+        Args:
+            name (str): 단계 이름
+            func (Callable): 실행할 함수
+            count (Callable): 결과에서 처리 개수를 구하는 함수
+
+        Returns:
+            Any: func의 반환값 (실패 시 None)
+        """
+        start = time.perf_counter()
+        try:
+            value = func()
+        except Exception as e:
+            self.results.append({"suite": self.suite, "stage": name, "error": f"{type(e).__name__}: {e}"})
+            print(f"  - [{self.suite}] {name}: 실패 ({type(e).__name__}: {e})")
+            return None
+        seconds = time.perf_counter() - start
+        record = {"suite": self.suite, "stage": name, "seconds": seconds}
+        if count is not None:
+            n = count(value)
+            record["count"] = n
+            record["throughput_per_s"] = n / seconds if seconds > 0 else None
+        self.results.append(record)
+        print(f"  - [{self.suite}] {name}: {seconds * 1000:.1f}ms" + (f" ({record['count']}개)" if count else ""))
+        return value
+
+    def latency(self, name: str, func: Callable, repeat: int) -> None:
+        """
+        같은 작업을 반복 실행하여 지연 시간 분포를 기록합니다.
+
+        Args:
+            name (str): 단계 이름
+            func (Callable): 반복 실행할 함수 (반복 번호를 인자로 받음)
+            repeat (int): 반복 횟수
+        """
+        samples = []
+        try:
+            for i in range(repeat):
+                start = time.perf_counter()
+                func(i)
+                samples.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            self.results.append({"suite": self.suite, "stage": name, "error": f"{type(e).__name__}: {e}"})
+            print(f"  - [{self.suite}] {name}: 실패 ({type(e).__name__}: {e})")
+            return
+        record = {
+            "suite": self.suite,
+            "stage": name,
+            "count": len(samples),
+            "seconds": sum(samples) / 1000,
+            "mean_ms": statistics.mean(samples),
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+            "p99_ms": percentile(samples, 99),
+        }
+        self.results.append(record)
+        print(f"  - [{self.suite}] {name}: p50 {record['p50_ms']:.2f}ms / p95 {record['p95_ms']:.2f}ms ({len(samples)}회)")
+
+
+def embed_in_batches(embedding_model: Embeddings, texts: List[str], batch_size: int) -> Dict[str, List[float]]:
+    vectors = {}
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        for text, vector in zip(batch, embedding_model.embed_documents(batch)):
+            vectors[text] = vector
+    return vectors
+
+
+def bench_sklearn(args, base_url: str, corpus_dir: str, work_dir: str) -> List[dict]:
+    """VectorStoreSetting(SKLearnVectorStore) 단계별 성능 측정"""
+    from langchain_community.vectorstores import SKLearnVectorStore
+    from vector_store_setting import VectorStoreSetting
+
+    recorder = BenchmarkRecorder("sklearn")
+    store_dir = os.path.join(work_dir, "sklearn")
+    setting = VectorStoreSetting(
+        absolute_path=corpus_dir,
+        vector_store_path=store_dir,
+        embedding_model_name=args.embedding_model,
+        batch_size=args.batch_size,
+        ollama_base_url=base_url,
+    )
+    embedding_model = setting._create_embedding_model()
+    db_file = os.path.join(store_dir, "sklearn_vectorstore")
+
+    pdf_files = setting._find_pdf_files(corpus_dir)
+    docs = recorder.stage("pdf_load", lambda: setting._load_pdf_documents(pdf_files), count=len) or []
+    splits = recorder.stage("split", lambda: setting._split_documents(docs), count=len) or []
+    texts = [doc.page_content for doc in splits]
+    vectors = recorder.stage("embed", lambda: embed_in_batches(embedding_model, texts, args.batch_size), count=lambda _: len(texts))
+    if not vectors:
+        return recorder.results
+
+    # scikit-learn 첫 임포트 시간이 인덱스 구축 시간에 섞이지 않도록 미리 임포트
+    import sklearn.neighbors  # noqa: F401
+
+    os.makedirs(store_dir, exist_ok=True)
+    vectorstore = recorder.stage(
+        "index_build",
+        lambda: SKLearnVectorStore.from_documents(
+            documents=splits,
+            embedding=PrecomputedEmbeddings(vectors, embedding_model),
+            persist_path=db_file,
+            serializer="bson",
+        ),
+        count=lambda vs: len(splits),
+    )
+    if vectorstore is not None:
+        def persist():
+            # _save_vector_store는 실패 시 예외 대신 False를 반환함
+            if not setting._save_vector_store(vectorstore, db_file):
+                raise RuntimeError("벡터 저장소 저장 실패")
+
+        recorder.stage("persist", persist)
+    loaded = recorder.stage("load", lambda: setting.load_for_query())
+    if loaded is not None:
+        recorder.latency("query", lambda i: loaded.similarity_search(QUERIES[i % len(QUERIES)], k=args.top_k), args.queries)
+    return recorder.results
+
+
+def bench_faiss(args, base_url: str, corpus_dir: str, work_dir: str) -> List[dict]:
+    """FaissVectorStore 단계별 성능 측정"""
+    from langchain_community.vectorstores import FAISS
+    from faiss_vector_store import FaissVectorStore
+
+    recorder = BenchmarkRecorder("faiss")
+    db_path = os.path.join(work_dir, "faiss")
+    store = FaissVectorStore(
+        vector_db_path=db_path,
+        source_document_path=corpus_dir,
+        embedding_model_name=args.embedding_model,
+        base_url=base_url,
+    )
+
+    pdf_files = store._find_files(corpus_dir)
+    docs = recorder.stage("pdf_load", lambda: store._load_documents(pdf_files), count=len) or []
+    splits = recorder.stage("split", lambda: store._split_documents(docs), count=len) or []
+    texts = [doc.page_content for doc in splits]
+    vectors = recorder.stage("embed", lambda: embed_in_batches(store.embedding_model, texts, args.batch_size), count=lambda _: len(texts))
+    if not vectors:
+        return recorder.results
+
+    store.vectorstore = recorder.stage(
+        "index_build",
+        lambda: FAISS.from_embeddings(
+            [(text, vectors[text]) for text in texts],
+            store.embedding_model,
+            metadatas=[doc.metadata for doc in splits],
+        ),
+        count=lambda vs: len(splits),
+    )
+    if store.vectorstore is not None:
+        recorder.stage("persist", lambda: store._save_vectorstore(db_path))
+    loaded = recorder.stage("load", lambda: store._load_vectorstore(db_path))
+    if loaded is not None:
+        recorder.latency("query", lambda i: loaded.similarity_search(QUERIES[i % len(QUERIES)], k=args.top_k), args.queries)
+    return recorder.results
+
+
+def bench_chat(args, base_url: str) -> List[dict]:
+    """src/chat_service.py 모델 호출 경로 왕복 시간 측정"""
+    from chat_service import generate_response
+
+    recorder = BenchmarkRecorder("chat")
+    history = [HumanMessage(content=QUERIES[0])]
+    recorder.latency(
+        "chat",
+        lambda i: generate_response(
+            history + [HumanMessage(content=QUERIES[i % len(QUERIES)])],
+            model=args.chat_model,
+            temperature=0.0,
+            max_tokens=args.response_tokens,
+            base_url=base_url,
+        ),
+        args.chat_rounds,
+    )
+    return recorder.results
+
+
+def compare_with_baseline(results: List[dict], baseline_file: str, tolerance: float) -> List[str]:
+    """
+    이전 결과와 비교하여 허용 범위를 넘게 느려진 단계를 찾습니다.
+
+    Args:
+        results (List[dict]): 현재 측정 결과
+        baseline_file (str): 이전 결과 JSON 파일
+        tolerance (float): 허용 증가 비율 (0.25 = 25%)
+
+    Returns:
+        List[str]: 회귀 설명 목록
+    """
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = {(r["suite"], r["stage"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for record in results:
+        previous = baseline.get((record["suite"], record["stage"]))
+        if previous is None:
+            continue
+        if "error" in record and "error" not in previous:
+            regressions.append(f"{record['suite']}/{record['stage']}: 새로 실패함 ({record['error']})")
+            continue
+        metric = "p95_ms" if "p95_ms" in record else "seconds"
+        if metric not in record or metric not in previous or previous[metric] <= 0:
+            continue
+        ratio = record[metric] / previous[metric]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{record['suite']}/{record['stage']}: {metric} {previous[metric]:.4f} -> {record[metric]:.4f} (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="오프라인 벡터 저장소/챗봇 벤치마크")
+    parser.add_argument("--suites", default="sklearn,faiss,chat", help="실행할 벤치마크 (쉼표 구분)")
+    parser.add_argument("--files", type=int, default=4, help="합성 PDF 파일 수")
+    parser.add_argument("--pages", type=int, default=10, help="파일당 페이지 수")
+    parser.add_argument("--words-per-page", type=int, default=400, help="페이지당 단어 수")
+    parser.add_argument("--batch-size", type=int, default=32, help="임베딩 배치 크기")
+    parser.add_argument("--top-k", type=int, default=3, help="검색 결과 수")
+    parser.add_argument("--queries", type=int, default=50, help="질의 반복 횟수")
+    parser.add_argument("--chat-rounds", type=int, default=20, help="챗봇 왕복 횟수")
+    parser.add_argument("--embedding-model", default="nomic-embed-text:latest")
+    parser.add_argument("--chat-model", default="gemma3:4b")
+    parser.add_argument("--dimension", type=int, default=768, help="스텁 임베딩 차원")
+    parser.add_argument("--embed-latency-ms", type=float, default=1.0, help="스텁 임베딩 요청 지연")
+    parser.add_argument("--prompt-latency-ms", type=float, default=5.0, help="스텁 첫 토큰 지연")
+    parser.add_argument("--token-latency-ms", type=float, default=0.5, help="스텁 토큰당 지연")
+    parser.add_argument("--response-tokens", type=int, default=32, help="스텁 응답 토큰 수")
+    parser.add_argument("--base-url", default=None, help="스텁 대신 사용할 Ollama 서버 주소")
+    parser.add_argument("--output", default=os.path.join(TEST_DIR, "bench_results.json"), help="결과 JSON 파일")
+    parser.add_argument("--baseline", default=None, help="비교할 이전 결과 JSON 파일")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="회귀로 판단할 증가 비율")
+    args = parser.parse_args(argv)
+
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    stub_config = StubConfig(
+        dimension=args.dimension,
+        embed_latency_ms=args.embed_latency_ms,
+        prompt_latency_ms=args.prompt_latency_ms,
+        token_latency_ms=args.token_latency_ms,
+        response_tokens=args.response_tokens,
+    )
+
+    work_dir = tempfile.mkdtemp(prefix="rag_bench_")
+    server = None
+    try:
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            server = StubOllamaServer(config=stub_config).start()
+            base_url = server.base_url
+        print(f"Ollama 주소: {base_url}")
+
+        corpus_dir = os.path.join(work_dir, "corpus")
+        make_corpus(corpus_dir, args.files, args.pages, args.words_per_page)
+
+        results = []
+        if "sklearn" in suites:
+            results += bench_sklearn(args, base_url, corpus_dir, work_dir)
+        if "faiss" in suites:
+            results += bench_faiss(args, base_url, corpus_dir, work_dir)
+        if "chat" in suites:
+            results += bench_chat(args, base_url)
+    finally:
+        if server:
+            server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub": None if args.base_url else vars(stub_config),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        report["regressions"] = regressions
+        if regressions:
+            print("\n[회귀 발견]")
+            for line in regressions:
+                print(f"  - {line}")
+            exit_code = 1
+        else:
+            print("\n회귀 없음")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
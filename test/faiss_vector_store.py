@@ -3,13 +3,20 @@ from typing import List, Optional
 
 from langchain_community.vectorstores import FAISS
 from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_ollama.embeddings import OllamaEmbeddings
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
 import os
+import sys
 import faiss
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "module"))
+from async_retrieval import asimilarity_search
+from compressed_docstore import CompressedDocstore
+from metadata_index import INDEX_FILE_NAME, MetadataIndex, classify_document_type
+from ollama_scheduler import create_scheduled_embeddings
 
 # Rich 라이브러리 임포트
 from rich.console import Console
@@ -29,7 +36,10 @@ class FaissVectorStore:
                  source_document_path: str = "./.text_data/",
                  embedding_model_name: str = "nomic-embed-text",
                  chunk_size: int = 1000,  # 더 작은 값으로 조정
-                 chunk_overlap: int = 100):
+                 chunk_overlap: int = 100,
+                 base_url: Optional[str] = None,
+                 embedding_endpoints: Optional[List[str]] = None,
+                 compress_docstore: bool = True):
         """
         초기화 함수
         
@@ -39,15 +49,26 @@ class FaissVectorStore:
             embedding_model_name: 임베딩 모델 이름
             chunk_size: 텍스트 청크 크기
             chunk_overlap: 텍스트 청크 오버랩 크기
+            base_url: Ollama 서버 주소 (None이면 기본 주소 사용)
+            embedding_endpoints: 임베딩을 나누어 보낼 Ollama 서버 주소 목록 (둘 이상이면 부하 분산)
+            compress_docstore: 저장 시 청크 텍스트를 압축 블록 파일로 옮길지 여부
         """
         self.vector_db_path = vector_db_path
         self.source_document_path = source_document_path
+        self.compress_docstore = compress_docstore
         
         # 임베딩 모델 초기화
-        self.embedding_model = OllamaEmbeddings(
-            model=embedding_model_name,
-            temperature=0.0
-        )
+        if embedding_endpoints and len(embedding_endpoints) > 1:
+            from multi_endpoint_embeddings import MultiEndpointEmbeddings
+
+            self.embedding_model = MultiEndpointEmbeddings(embedding_model_name, embedding_endpoints)
+            self.embedding_model.verify()
+        else:
+            self.embedding_model = create_scheduled_embeddings(
+                embedding_model_name,
+                base_url=base_url,
+                temperature=0.0,
+            )
         
         # 텍스트 분할기 초기화
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -55,9 +76,14 @@ class FaissVectorStore:
             chunk_overlap=chunk_overlap,
             length_function=len,
             keep_separator=True,  # 구분자 유지
+            add_start_index=True,  # 검색 결과를 이어 붙일 때 위치로 판단 (context_assembly.py)
         )
         
         self.vectorstore = None
+        # 검색 중 문서 추가를 위한 세그먼트 저장소 (enable_concurrent_writes() 호출 시 생성)
+        self.segmented_store = None
+        # source_file / page / doc_type 별 청크 위치 인덱스 (필터 검색용)
+        self.metadata_index: Optional[MetadataIndex] = None
     
     def initialize(self) -> FAISS:
         """
@@ -86,11 +112,31 @@ class FaissVectorStore:
         # PDF 파일 찾기
         pdf_files = self._find_files(self.source_document_path)
         
-        # 문서 로드
+        # 문서 로드 및 분할
+        documents = self._load_documents(pdf_files)
+        texts = self._split_documents(documents)
+        
+        return self._build_vectorstore(texts)
+    
+    def _load_documents(self, pdf_files: List[str]) -> List[Document]:
+        """
+        PDF 파일 로드
+        
+        Args:
+            pdf_files: PDF 파일 경로 목록
+            
+        Returns:
+            List[Document]: 페이지 단위 문서 목록
+        """
         documents = []
         for pdf_file in pdf_files:
             loader = PyMuPDFLoader(pdf_file)
             loaded_docs = loader.load()
+            # 메타데이터에 파일명과 문서 종류 추가
+            file_name = os.path.basename(pdf_file)
+            for doc in loaded_docs:
+                doc.metadata["source_file"] = file_name
+                doc.metadata["doc_type"] = classify_document_type(file_name)
             print(f"PDF 파일: {pdf_file} - 로드된 페이지 수: {len(loaded_docs)}개")
             # 처음 몇 개 페이지의 길이 출력
             for i, doc in enumerate(loaded_docs[:3]):
@@ -98,36 +144,42 @@ class FaissVectorStore:
             documents.extend(loaded_docs)
         
         print(f"총 로드된 문서 수: {len(documents)}개")
+        return documents
+    
+    def _split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        문서 분할 - 각 페이지를 적절한 크기로 분할하고 너무 짧은 청크는 합칩니다.
         
-        # 문서 분할 - 각 페이지를 적절한 크기로 분할
+        Args:
+            documents: 페이지 단위 문서 목록
+            
+        Returns:
+            List[Document]: 분할된 청크 문서 목록
+        """
         texts = []
         for doc in documents:
             # 페이지 내용이 너무 짧은지 확인
             if len(doc.page_content.strip()) < 100:  # 너무 짧은 페이지는 건너뛀
                 continue
                 
-            # 각 문서를 청크로 분할
-            chunks = self.text_splitter.split_text(doc.page_content)
+            # 각 문서를 청크로 분할 (metadata["start_index"]에 페이지 안 시작 위치 기록)
+            chunks = self.text_splitter.create_documents([doc.page_content], [doc.metadata])
             
-            # 너무 짧은 청크는 합치기
-            merged_chunks = []
-            current_chunk = ""
+            # 너무 짧은 청크는 합치기 (합친 청크도 페이지 원문 구간이 되도록 시작~끝 위치로 잘라냄)
+            merged_ranges = []
             
             for chunk in chunks:
+                start = chunk.metadata["start_index"]
+                end = start + len(chunk.page_content)
                 # 청크가 너무 짧으면 합치기
-                if len(chunk.strip()) < 100 and current_chunk:
-                    current_chunk += " " + chunk
+                if len(chunk.page_content.strip()) < 100 and merged_ranges:
+                    merged_ranges[-1][1] = max(merged_ranges[-1][1], end)
                 else:
-                    if current_chunk:  # 이전 청크 저장
-                        merged_chunks.append(current_chunk)
-                    current_chunk = chunk
-            
-            if current_chunk:  # 마지막 청크 저장
-                merged_chunks.append(current_chunk)
+                    merged_ranges.append([start, end])
             
             # 메타데이터 유지하면서 새 Document 객체 생성
-            for chunk in merged_chunks:
-                texts.append(Document(page_content=chunk, metadata=doc.metadata))
+            for start, end in merged_ranges:
+                texts.append(Document(page_content=doc.page_content[start:end], metadata={**doc.metadata, "start_index": start}))
         
         # 디버그 정보 출력
         print(f"분할된 텍스트 청크 수: {len(texts)}개")
@@ -136,6 +188,18 @@ class FaissVectorStore:
             print(f"두 번째 청크 길이: {len(texts[1].page_content) if len(texts) > 1 else 0} 글자")
             print(f"첫 번째 청크 내용 일부: {texts[0].page_content[:100]}...")
         
+        return texts
+    
+    def _build_vectorstore(self, texts: List[Document]) -> FAISS:
+        """
+        청크 문서를 임베딩하여 FAISS 인덱스 생성
+        
+        Args:
+            texts: 분할된 청크 문서 목록
+            
+        Returns:
+            FAISS: 생성된 FAISS 벡터 저장소
+        """
         # 임베딩 차원 크기 계산
         dimension_size = len(self.embedding_model.embed_query("hello world"))
         
@@ -150,6 +214,9 @@ class FaissVectorStore:
         # 문서 추가
         vectorstore.add_documents(texts)
         
+        # 필터 검색용 메타데이터 인덱스 (문서 추가 순서 = FAISS 인덱스 행 번호)
+        self.metadata_index = MetadataIndex.build([doc.metadata for doc in texts])
+        
         return vectorstore
     
     def _save_vectorstore(self, db_file: str) -> None:
@@ -160,7 +227,15 @@ class FaissVectorStore:
             db_file: 저장할 파일 경로
         """
         if self.vectorstore:
+            # 청크 텍스트는 압축 블록 파일(db_file/chunks)에 두고 pickle에는 ID 테이블만 저장
+            docstore = self.vectorstore.docstore
+            if isinstance(docstore, CompressedDocstore):
+                docstore.save()
+            elif self.compress_docstore and isinstance(docstore, InMemoryDocstore):
+                self.vectorstore.docstore = CompressedDocstore.from_documents(os.path.join(db_file, "chunks"), docstore._dict)
             self.vectorstore.save_local(db_file)
+            if self.metadata_index is not None:
+                self.metadata_index.save(os.path.join(db_file, INDEX_FILE_NAME))
     
     def _load_vectorstore(self, db_file: str) -> FAISS:
         """
@@ -172,11 +247,16 @@ class FaissVectorStore:
         Returns:
             FAISS: 로드된 FAISS 벡터 저장소
         """
-        return FAISS.load_local(
+        vectorstore = FAISS.load_local(
             db_file, 
             self.embedding_model, 
             allow_dangerous_deserialization=True
         )
+        if isinstance(vectorstore.docstore, CompressedDocstore):
+            # 저장소 폴더가 옮겨졌을 수 있으므로 청크 파일 경로를 다시 지정
+            vectorstore.docstore.reopen(os.path.join(db_file, "chunks"))
+        self.metadata_index = MetadataIndex.load(os.path.join(db_file, INDEX_FILE_NAME))
+        return vectorstore
     
     @staticmethod
     def _find_files(directory: str) -> List[str]:
@@ -210,8 +290,8 @@ class FaissVectorStore:
         if not self.vectorstore:
             self.initialize()
         
-        # 검색 수행
-        results = self.vectorstore.similarity_search(query, k=k)
+        # 검색 수행 (동시 쓰기 모드면 세그먼트 저장소에서 검색)
+        results = (self.segmented_store or self.vectorstore).similarity_search(query, k=k)
         
         # 검색 결과 길이 확인
         print(f"검색 쿼리: '{query}', 결과 {len(results)}개 받음")
@@ -220,6 +300,115 @@ class FaissVectorStore:
         
         return results
 
+    async def asimilarity_search(self, query: str, k: int = 4, timeout: Optional[float] = None) -> List[Document]:
+        """
+        비동기 유사도 검색
+        
+        질의 임베딩은 비동기로 기다리고 FAISS 검색은 공용 스레드 풀에서 실행하여 이벤트 루프를 막지 않습니다.
+        
+        Args:
+            query: 검색 쿼리
+            k: 반환할 결과 수
+            timeout: 제한 시간(초), None이면 제한 없음
+            
+        Returns:
+            List[Document]: 검색 결과 문서 목록
+        """
+        if not self.vectorstore:
+            raise ValueError("벡터 저장소가 초기화되지 않았습니다. initialize()를 먼저 호출해주세요.")
+        return await asimilarity_search(self.segmented_store or self.vectorstore, query, k=k, timeout=timeout)
+
+    def enable_concurrent_writes(self, mutable_capacity: int = 1024, merge_threshold: int = 8) -> None:
+        """
+        검색 중에도 문서를 추가할 수 있는 동시 쓰기 모드로 전환합니다.
+        
+        FAISS 인덱스를 첫 봉인 세그먼트로 사용하고(l2 거리), add_documents()로 추가한 청크는 가변 세그먼트에 쌓입니다.
+        추가된 청크는 메모리에만 있으므로 디스크에 반영하려면 벡터 저장소를 다시 생성합니다.
+        
+        Args:
+            mutable_capacity: 가변 세그먼트 최대 청크 수
+            merge_threshold: 봉인 세그먼트 수가 이 값을 넘으면 백그라운드 병합
+        """
+        from segmented_store import SegmentedVectorStore
+
+        if not self.vectorstore:
+            self.initialize()
+        if self.segmented_store is None:
+            self.segmented_store = SegmentedVectorStore.from_faiss(
+                self.vectorstore, mutable_capacity=mutable_capacity, merge_threshold=merge_threshold
+            )
+
+    def add_documents(self, documents: List[Document]) -> List[str]:
+        """
+        문서 청크 추가
+        
+        동시 쓰기 모드면 세그먼트 저장소에 추가하여 검색과 동시에 수행할 수 있고,
+        아니면 FAISS 인덱스에 직접 추가합니다. (이 경우 검색과 동시에 호출하면 안 됨)
+        
+        Args:
+            documents: 추가할 문서 청크 목록
+            
+        Returns:
+            List[str]: 추가된 청크 ID 목록
+        """
+        if self.segmented_store is not None:
+            return self.segmented_store.add_documents(documents)
+        if not self.vectorstore:
+            self.initialize()
+        start_id = self.vectorstore.index.ntotal
+        ids = self.vectorstore.add_documents(documents)
+        if self.metadata_index is not None:
+            self.metadata_index.add([doc.metadata for doc in documents], start_id=start_id)
+        return ids
+    
+    def filtered_similarity_search(self, 
+                                   query: str, 
+                                   k: int = 4,
+                                   source_files: Optional[List[str]] = None,
+                                   page_range: Optional[tuple] = None,
+                                   doc_types: Optional[List[str]] = None) -> List[Document]:
+        """
+        메타데이터 조건에 맞는 청크만 대상으로 유사도 검색 수행
+        
+        FAISS의 IDSelector로 조건에 맞는 행만 검색하므로 top-k를 뽑은 뒤 거를 때처럼 결과가 모자라지 않습니다.
+        
+        Args:
+            query: 검색 쿼리
+            k: 반환할 결과 수
+            source_files: 포함할 파일 이름 목록
+            page_range: 포함할 페이지 범위 (시작, 끝), 양 끝 포함
+            doc_types: 포함할 문서 종류 목록 (예: ["policy", "product"])
+            
+        Returns:
+            List[Document]: 검색 결과 문서 목록 (metadata["score"]에 L2 거리 포함)
+        """
+        if not self.vectorstore:
+            self.initialize()
+        if self.metadata_index is None:
+            # 인덱스 파일이 없는 이전 저장소는 docstore 메타데이터로 인덱스를 다시 생성
+            docstore_ids = [self.vectorstore.index_to_docstore_id[i] for i in range(self.vectorstore.index.ntotal)]
+            self.metadata_index = MetadataIndex.build(
+                [self.vectorstore.docstore.search(doc_id).metadata for doc_id in docstore_ids]
+            )
+        
+        ids = self.metadata_index.select(source_files=source_files, page_range=page_range, doc_types=doc_types)
+        if ids is None:
+            return self.similarity_search(query, k=k)
+        if not ids:
+            return []
+        
+        query_vector = np.asarray([self.embedding_model.embed_query(query)], dtype=np.float32)
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.asarray(ids, dtype=np.int64)))
+        distances, positions = self.vectorstore.index.search(query_vector, min(k, len(ids)), params=params)
+        
+        results = []
+        for distance, position in zip(distances[0], positions[0]):
+            if position < 0:
+                continue
+            doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[int(position)])
+            results.append(Document(page_content=doc.page_content, metadata={**doc.metadata, "score": float(distance)}))
+        return results
+
 
     def _test(self):
         # 캠시 파일 삭제
@@ -0,0 +1,423 @@
+"""
+오프라인 부하 테스트
+
+가상 사용자 N명이 대화 코퍼스를 동시에 재생하면서 챗봇 모델 호출 경로(src/generation_jobs.py, 앱과 동일)와
+LangGraph 그래프(module/langgraph_test.py의 에이전트 그래프, module/query_decomposition.py의 질의 분해 그래프)를 호출합니다.
+동시 사용자 수를 단계별로 늘리며 처리량(요청/초, 생성 토큰/초), 첫 토큰 시간(TTFT), 전체 지연 시간의 백분위를 측정하고,
+지연 시간이 무너지는 단계를 찾아 감당할 수 있는 최대 동시 사용자 수를 보고합니다.
+
+--base-url을 지정하지 않으면 로컬 Ollama 스텁 서버(ollama_stub_server.py)를 띄워 실제 모델 없이 실행합니다.
+스텁의 --num-parallel(동시 생성 수), --token-latency-ms(토큰당 지연) 등을 대상 하드웨어의 값에 맞추면
+구매 전에 하드웨어 규모를 가늠할 수 있습니다. 스케줄러의 서버당 동시 실행 수는 환경 변수
+OLLAMA_SCHEDULER_MAX_CONCURRENCY로 조정합니다. (global_variables.py)
+
+코퍼스는 JSONL 파일로 지정할 수 있습니다. (한 줄에 대화 하나: {"turns": ["질문1", "질문2", ...]} 또는 ["질문1", ...])
+
+사용 예:
+    python load_test.py --targets chat,agent --ramp 1,2,4,8,16 --step-seconds 20
+    python load_test.py --num-parallel 2 --token-latency-ms 20 --response-tokens 200 --output load_results.json
+    python load_test.py --base-url http://gpu-server:11434 --model gemma3:4b --corpus conversations.jsonl
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TEST_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "module"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+# 부하 테스트 호출이 앱의 Ollama 계측 기록 파일에 섞이지 않도록 기본값은 기록 안 함
+os.environ.setdefault("OLLAMA_TELEMETRY_FILE", "")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from ollama_stub_server import StubConfig, StubOllamaServer
+from profiler import percentile
+
+# 요청마다 남는 HTTP 로그가 진행 상황 출력을 가리지 않도록 함
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+CORPUS = [
+    ["수출신용보험이 무엇인가요?", "보상 한도는 어떻게 정해지나요?", "보험료는 언제 내야 하나요?"],
+    ["단기수출보험의 보상 범위를 알려주세요.", "수입자가 대금을 지급하지 않으면 어떻게 되나요?"],
+    ["What is export credit insurance?", "How is the premium calculated?", "What are the main exclusions?"],
+    ["중소기업 수출 지원 제도를 설명해 주세요.", "신청 서류는 무엇이 필요한가요?", "심사에는 얼마나 걸리나요?", "보증과 보험의 차이는 무엇인가요?"],
+    ["선적 후 수입자가 파산했습니다. 보험금 청구 절차를 알려주세요.", "청구 기한이 있나요?"],
+    ["환변동보험은 어떤 경우에 유리한가요?", "옵션형과 일반형의 차이는 무엇인가요?"],
+]
+
+
+def load_corpus(path: Optional[str]) -> List[List[str]]:
+    """
+    대화 코퍼스를 읽습니다.
+
+    Args:
+        path (str): JSONL 파일 경로 (None이면 내장 코퍼스 사용)
+
+    Returns:
+        List[List[str]]: 대화별 사용자 질문 목록
+    """
+    if not path:
+        return CORPUS
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            turns = item.get("turns", []) if isinstance(item, dict) else item
+            turns = [str(turn) for turn in turns if str(turn).strip()]
+            if turns:
+                conversations.append(turns)
+    if not conversations:
+        raise ValueError(f"코퍼스에 대화가 없습니다: {path}")
+    return conversations
+
+
+class ChatTarget:
+    """
+    앱과 같은 응답 생성 경로 (GenerationJob 스트리밍, 공용 스케줄러 경유)
+
+    Args:
+        base_url (str): Ollama 서버 주소
+        model (str): 채팅 모델 이름
+        max_tokens (int): 최대 생성 토큰 수
+        prefix_cache (bool): 접두사 캐시 모드 사용 여부 (prefix_cache_chat.py)
+    """
+
+    name = "chat"
+
+    def __init__(self, base_url: str, model: str, max_tokens: int, prefix_cache: bool = False):
+        from chat_service import PrefixCacheChat
+
+        self.base_url = base_url
+        self.model = model
+        self.max_tokens = max_tokens
+        self.prefix_chat = PrefixCacheChat(endpoints=[base_url]) if prefix_cache else None
+
+    def start_conversation(self) -> dict:
+        return {"session_id": uuid.uuid4().hex, "messages": []}
+
+    def turn(self, conversation: dict, question: str) -> dict:
+        from generation_jobs import DONE, GenerationJob
+
+        conversation["messages"].append(HumanMessage(content=question))
+        job = GenerationJob(
+            conversation["session_id"],
+            conversation["messages"],
+            model=self.model,
+            temperature=0.7,
+            max_tokens=self.max_tokens,
+            base_url=self.base_url,
+            prefix_chat=self.prefix_chat,
+        )
+        job.run()
+        if job.status != DONE:
+            raise job.error or RuntimeError(f"응답 생성 실패 ({job.status})")
+        conversation["messages"].append(AIMessage(content=job.text))
+        latency = job.latency()
+        return {
+            "ttft_s": latency["ttft_s"],
+            "e2e_s": latency["total_s"],
+            "tokens": job.response_metadata.get("eval_count") or len(job._chunks),
+        }
+
+
+class GraphTarget:
+    """
+    LangGraph 그래프 호출 경로 (stream_mode="messages"로 첫 토큰 시간 측정, 대화 기록은 체크포인터가 유지)
+
+    Args:
+        name (str): "agent"(예산이 적용된 에이전트 그래프) 또는 "decompose"(질의 분해 그래프)
+        base_url (str): Ollama 서버 주소
+        model (str): 채팅 모델 이름
+        max_tokens (int): 최대 생성 토큰 수
+    """
+
+    def __init__(self, name: str, base_url: str, model: str, max_tokens: int):
+        from langgraph.checkpoint.memory import MemorySaver
+
+        from langgraph_test import AgentBudget, build_agent_graph, search, tools
+        from ollama_scheduler import create_scheduled_chat_model
+        from query_decomposition import build_decomposition_graph
+
+        self.name = name
+        base_model = create_scheduled_chat_model(model, priority="agent", base_url=base_url, num_predict=max_tokens)
+        if name == "agent":
+            self.app = build_agent_graph(base_model.bind_tools(tools), base_model, tools, budget=AgentBudget(), checkpointer=MemorySaver())
+        elif name == "decompose":
+            self.app = build_decomposition_graph(base_model, search, checkpointer=MemorySaver())
+        else:
+            raise ValueError(f"알 수 없는 그래프: {name}")
+
+    def start_conversation(self) -> dict:
+        return {"thread_id": uuid.uuid4().hex}
+
+    def turn(self, conversation: dict, question: str) -> dict:
+        started = time.monotonic()
+        first_token_at = None
+        tokens = 0
+        for chunk, _ in self.app.stream(
+            {"messages": [HumanMessage(content=question)]},
+            config={"configurable": {"thread_id": conversation["thread_id"]}},
+            stream_mode="messages",
+        ):
+            # 그래프 안의 어느 모델 호출이든 처음 나온 토큰 (질의 분해 그래프는 분해 단계의 토큰)
+            if isinstance(chunk.content, str) and chunk.content:
+                first_token_at = first_token_at or time.monotonic()
+                tokens += 1
+        finished = time.monotonic()
+        return {
+            "ttft_s": first_token_at - started if first_token_at else None,
+            "e2e_s": finished - started,
+            "tokens": tokens,
+        }
+
+
+def create_target(name: str, args, base_url: str):
+    if name == "chat":
+        return ChatTarget(base_url, args.model, args.max_tokens, prefix_cache=args.prefix_cache)
+    return GraphTarget(name, base_url, args.model, args.max_tokens)
+
+
+def virtual_user(
+    target,
+    corpus: List[List[str]],
+    stop: threading.Event,
+    records: List[dict],
+    lock: threading.Lock,
+    think_seconds: float,
+    rng: random.Random,
+) -> None:
+    """
+    가상 사용자 하나: 멈출 때까지 코퍼스의 대화를 골라 턴마다 요청하고, 턴 사이에 생각 시간만큼 쉽니다.
+
+    Args:
+        target: 호출 경로 (ChatTarget 또는 GraphTarget)
+        corpus (List[List[str]]): 대화 코퍼스
+        stop (threading.Event): 멈춤 신호 (진행 중인 요청은 끝까지 기다림)
+        records (List[dict]): 요청별 측정 결과를 추가할 목록
+        lock (threading.Lock): records 보호용 락
+        think_seconds (float): 평균 생각 시간(초), 지수 분포로 뽑음
+        rng (random.Random): 사용자별 난수 생성기
+    """
+    while not stop.is_set():
+        conversation = target.start_conversation()
+        for question in rng.choice(corpus):
+            if stop.is_set():
+                return
+            started = time.monotonic()
+            try:
+                record = {"status": "ok", **target.turn(conversation, question)}
+            except Exception as e:
+                # 스케줄러가 대기 기한을 넘겨 거절한 요청(SchedulerOverloaded)은 따로 집계
+                status = "rejected" if type(e).__name__ == "SchedulerOverloaded" else "error"
+                record = {"status": status, "error": str(e), "ttft_s": None, "e2e_s": time.monotonic() - started, "tokens": 0}
+            record["started"] = started
+            record["finished"] = time.monotonic()
+            with lock:
+                records.append(record)
+            if record["status"] != "ok":
+                # 실패한 대화는 이어 가지 않음
+                break
+            if think_seconds > 0:
+                stop.wait(rng.expovariate(1 / think_seconds))
+
+
+def run_step(target, corpus: List[List[str]], users: int, seconds: float, think_seconds: float, seed: int) -> dict:
+    """
+    동시 사용자 수 하나로 정해진 시간 동안 부하를 주고 결과를 집계합니다.
+
+    Args:
+        target: 호출 경로
+        corpus (List[List[str]]): 대화 코퍼스
+        users (int): 동시 가상 사용자 수
+        seconds (float): 부하 시간(초), 끝나면 새 요청을 멈추고 진행 중인 요청을 기다림
+        think_seconds (float): 평균 생각 시간(초)
+        seed (int): 난수 시드
+
+    Returns:
+        dict: 단계 집계 결과
+    """
+    records: List[dict] = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=virtual_user,
+            args=(target, corpus, stop, records, lock, think_seconds, random.Random(seed * 1000 + i)),
+            name=f"vu-{i}",
+            daemon=True,
+        )
+        for i in range(users)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    stop.wait(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    duration = max(time.monotonic() - started, 1e-9)
+
+    ok = [r for r in records if r["status"] == "ok"]
+    ttfts = [r["ttft_s"] for r in ok if r["ttft_s"] is not None]
+    e2es = [r["e2e_s"] for r in ok]
+    summary = {
+        "users": users,
+        "duration_s": round(duration, 3),
+        "requests": len(records),
+        "ok": len(ok),
+        "errors": sum(r["status"] == "error" for r in records),
+        "rejected": sum(r["status"] == "rejected" for r in records),
+        "error_rate": round((len(records) - len(ok)) / len(records), 4) if records else 0.0,
+        "throughput_rps": round(len(ok) / duration, 3),
+        "tokens_per_s": round(sum(r["tokens"] for r in ok) / duration, 1),
+    }
+    for label, values in (("ttft", ttfts), ("e2e", e2es)):
+        for pct in (50, 95, 99):
+            summary[f"{label}_p{pct}_s"] = round(percentile(values, pct), 4)
+    errors = sorted({r["error"] for r in records if r["status"] != "ok"})
+    if errors:
+        summary["error_samples"] = errors[:3]
+    return summary
+
+
+def find_saturation(steps: List[dict], collapse_factor: float, max_error_rate: float) -> dict:
+    """
+    지연 시간이 무너진 단계를 찾습니다.
+
+    첫 단계보다 e2e p95가 collapse_factor배 이상 늘었거나 오류율이 max_error_rate를 넘은 첫 단계를 붕괴 지점으로 보고,
+    그 직전 단계의 동시 사용자 수를 감당 가능한 최대값으로 봅니다.
+
+    Args:
+        steps (List[dict]): run_step 결과 (동시 사용자 수 오름차순)
+        collapse_factor (float): 붕괴로 판단할 e2e p95 증가 배수
+        max_error_rate (float): 붕괴로 판단할 오류율
+
+    Returns:
+        dict: max_users(감당 가능한 최대 동시 사용자 수, 첫 단계부터 무너지면 0), collapse_users(붕괴 단계, 없으면 None), reason
+    """
+    baseline = next((step["e2e_p95_s"] for step in steps if step["ok"]), 0.0)
+    max_users = 0
+    for step in steps:
+        if step["error_rate"] > max_error_rate:
+            return {"max_users": max_users, "collapse_users": step["users"], "reason": f"오류율 {step['error_rate']:.1%}"}
+        if baseline and step["e2e_p95_s"] > collapse_factor * baseline:
+            return {"max_users": max_users, "collapse_users": step["users"], "reason": f"e2e p95 {step['e2e_p95_s'] / baseline:.1f}배"}
+        max_users = step["users"]
+    return {"max_users": max_users, "collapse_users": None, "reason": None}
+
+
+def print_steps(name: str, steps: List[dict]) -> None:
+    header = f"{'users':>5} {'req':>5} {'err':>4} {'rej':>4} {'req/s':>7} {'tok/s':>8} {'ttft p50/p95/p99(s)':>22} {'e2e p50/p95/p99(s)':>22}"
+    print(f"\n[{name}]")
+    print(header)
+    print("-" * len(header))
+    for s in steps:
+        ttft = f"{s['ttft_p50_s']:.3f}/{s['ttft_p95_s']:.3f}/{s['ttft_p99_s']:.3f}"
+        e2e = f"{s['e2e_p50_s']:.3f}/{s['e2e_p95_s']:.3f}/{s['e2e_p99_s']:.3f}"
+        print(f"{s['users']:>5} {s['requests']:>5} {s['errors']:>4} {s['rejected']:>4} {s['throughput_rps']:>7} {s['tokens_per_s']:>8} {ttft:>22} {e2e:>22}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="오프라인 챗봇/그래프 부하 테스트")
+    parser.add_argument("--targets", default="chat,agent", help="호출 경로: chat, agent, decompose (쉼표 구분)")
+    parser.add_argument("--ramp", default="1,2,4,8,16", help="단계별 동시 사용자 수 (쉼표 구분)")
+    parser.add_argument("--step-seconds", type=float, default=15.0, help="단계당 부하 시간(초)")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="턴 사이 평균 생각 시간")
+    parser.add_argument("--corpus", default=None, help="대화 코퍼스 JSONL 파일 (기본값: 내장 코퍼스)")
+    parser.add_argument("--model", default="gemma3:4b")
+    parser.add_argument("--max-tokens", type=int, default=256, help="최대 생성 토큰 수")
+    parser.add_argument("--prefix-cache", action="store_true", help="chat 경로에 접두사 캐시 모드 사용")
+    parser.add_argument("--collapse-factor", type=float, default=3.0, help="붕괴로 판단할 e2e p95 증가 배수 (첫 단계 대비)")
+    parser.add_argument("--max-error-rate", type=float, default=0.05, help="붕괴로 판단할 오류율")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prompt-latency-ms", type=float, default=50.0, help="스텁 첫 토큰 지연")
+    parser.add_argument("--prompt-token-latency-ms", type=float, default=0.2, help="스텁 프롬프트 토큰당 프리필 지연")
+    parser.add_argument("--token-latency-ms", type=float, default=10.0, help="스텁 토큰당 지연")
+    parser.add_argument("--response-tokens", type=int, default=64, help="스텁 응답 토큰 수")
+    parser.add_argument("--num-parallel", type=int, default=4, help="스텁 동시 생성 수 (0이면 무제한)")
+    parser.add_argument("--prefix-cache-slots", type=int, default=4, help="스텁 모델별 접두사 캐시 슬롯 수")
+    parser.add_argument("--base-url", default=None, help="스텁 대신 사용할 Ollama 서버 주소")
+    parser.add_argument("--output", default=os.path.join(TEST_DIR, "load_results.json"), help="결과 JSON 파일")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    ramp = sorted({int(u) for u in args.ramp.split(",") if u.strip()})
+    corpus = load_corpus(args.corpus)
+    stub_config = StubConfig(
+        prompt_latency_ms=args.prompt_latency_ms,
+        prompt_token_latency_ms=args.prompt_token_latency_ms,
+        token_latency_ms=args.token_latency_ms,
+        response_tokens=args.response_tokens,
+        num_parallel=args.num_parallel,
+        prefix_cache_slots=args.prefix_cache_slots,
+    )
+
+    server = None
+    results: Dict[str, dict] = {}
+    try:
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            server = StubOllamaServer(config=stub_config).start()
+            base_url = server.base_url
+        print(f"Ollama 주소: {base_url}")
+
+        for name in targets:
+            target = create_target(name, args, base_url)
+            # 모델 로드 시간이 첫 단계에 섞이지 않도록 한 번 미리 호출
+            target.turn(target.start_conversation(), corpus[0][0])
+            steps = []
+            for i, users in enumerate(ramp):
+                step = run_step(target, corpus, users, args.step_seconds, args.think_ms / 1000, seed=args.seed + i)
+                steps.append(step)
+                print(f"  {name}: 사용자 {users}명 -> {step['throughput_rps']} req/s, e2e p95 {step['e2e_p95_s']}초, 오류 {step['errors'] + step['rejected']}건")
+            saturation = find_saturation(steps, args.collapse_factor, args.max_error_rate)
+            results[name] = {"steps": steps, "saturation": saturation}
+    finally:
+        if server:
+            server.stop()
+
+    for name, result in results.items():
+        print_steps(name, result["steps"])
+        saturation = result["saturation"]
+        if saturation["collapse_users"] is None:
+            print(f"붕괴 없음 (최대 {saturation['max_users']}명까지 측정)")
+        else:
+            print(f"사용자 {saturation['collapse_users']}명에서 붕괴 ({saturation['reason']}), 감당 가능: {saturation['max_users']}명")
+
+    from ollama_telemetry import get_telemetry
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub": None if args.base_url else vars(stub_config),
+            "args": vars(args),
+            "corpus_conversations": len(corpus),
+        },
+        "results": results,
+        "telemetry": get_telemetry().summary(),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
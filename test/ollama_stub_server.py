@@ -0,0 +1,436 @@
+"""
+Ollama API 호환 로컬 스텁 서버
+
+실제 모델 없이 벤치마크와 부하 테스트를 돌리기 위한 서버입니다.
+임베딩은 입력 텍스트의 해시로 만든 결정적(deterministic) 벡터를 반환하고,
+채팅/생성은 설정한 지연 시간에 맞춰 고정된 형식의 응답을 (스트리밍으로) 반환합니다.
+
+지원하는 엔드포인트:
+    POST /api/embed, /api/embeddings, /api/chat, /api/generate, /api/show
+    GET  /api/tags, /api/ps, /api/version
+
+사용 예:
+    python ollama_stub_server.py --port 11435 --embed-latency-ms 5 --token-latency-ms 2
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+def deterministic_vector(text: str, dimension: int) -> List[float]:
+    """
+    텍스트 해시로 결정적인 단위 벡터를 생성합니다.
+
+    Args:
+        text (str): 입력 텍스트
+        dimension (int): 벡터 차원
+
+    Returns:
+        List[float]: L2 정규화된 벡터
+    """
+    values = []
+    counter = 0
+    while len(values) < dimension:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        for (raw,) in struct.iter_unpack(">I", digest):
+            values.append(raw / 0xFFFFFFFF * 2.0 - 1.0)
+        counter += 1
+    values = values[:dimension]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def estimate_tokens(text: str) -> int:
+    """공백 기준 단어 수와 글자 수로 토큰 수를 대략 추정합니다."""
+    return max(1, len(text) // 4, len(text.split()))
+
+
+class StubConfig:
+    """
+    스텁 서버 동작 설정
+
+    Args:
+        dimension (int): 임베딩 차원
+        embed_latency_ms (float): 임베딩 요청당 고정 지연 시간
+        embed_per_item_ms (float): 임베딩 입력 하나당 추가 지연 시간
+        prompt_latency_ms (float): 채팅 첫 토큰까지의 지연 시간 (프리필)
+        token_latency_ms (float): 생성 토큰 하나당 지연 시간
+        response_tokens (int): 채팅 응답 토큰 수
+        load_latency_ms (float): 모델이 처음 요청될 때의 로드 지연 시간
+        models (List[str]): /api/tags에 노출할 모델 목록
+        model_sizes (Dict[str, int]): 모델별 크기(바이트), /api/tags, /api/ps에 보고
+        prompt_token_latency_ms (float): 캐시되지 않은 프롬프트 토큰 하나당 추가 프리필 지연 시간
+        prefix_cache_slots (int): 모델별로 기억할 최근 프롬프트 수 (0이면 접두사 캐시 흉내 안 냄)
+        num_parallel (int): 동시에 생성할 수 있는 요청 수, 나머지는 대기 (Ollama의 OLLAMA_NUM_PARALLEL, 0이면 무제한)
+        error_rate (float): 임베딩/생성 요청을 503으로 실패시킬 비율 (부분 장애 흉내)
+    """
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        embed_latency_ms: float = 0.0,
+        embed_per_item_ms: float = 0.0,
+        prompt_latency_ms: float = 0.0,
+        token_latency_ms: float = 0.0,
+        response_tokens: int = 32,
+        load_latency_ms: float = 0.0,
+        models: Optional[List[str]] = None,
+        model_sizes: Optional[Dict[str, int]] = None,
+        prompt_token_latency_ms: float = 0.0,
+        prefix_cache_slots: int = 0,
+        num_parallel: int = 0,
+        error_rate: float = 0.0,
+    ):
+        self.dimension = dimension
+        self.embed_latency_ms = embed_latency_ms
+        self.embed_per_item_ms = embed_per_item_ms
+        self.prompt_latency_ms = prompt_latency_ms
+        self.token_latency_ms = token_latency_ms
+        self.response_tokens = response_tokens
+        self.load_latency_ms = load_latency_ms
+        self.models = models or ["gemma3:4b", "llama3.2:3b", "llama3.1", "nomic-embed-text:latest"]
+        self.model_sizes = model_sizes or {}
+        self.prompt_token_latency_ms = prompt_token_latency_ms
+        self.prefix_cache_slots = prefix_cache_slots
+        self.num_parallel = num_parallel
+        self.error_rate = error_rate
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 헤더와 본문을 따로 쓰므로 Nagle 알고리즘 때문에 응답마다 수십 ms 지연이 생기지 않도록 끔
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # 요청 로그는 벤치마크 출력을 어지럽히므로 생략
+        pass
+
+    @property
+    def config(self) -> StubConfig:
+        return self.server.stub_config
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, payload: dict) -> None:
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _load_model(self, model: str, keep_alive=None) -> int:
+        """모델이 처음 요청되면 로드 지연을 흉내 내고 load_duration(ns)을 반환합니다. keep_alive가 0이면 언로드합니다."""
+        loaded = self.server.loaded_models
+        if keep_alive in (0, "0", "0s", "0m"):
+            with self.server.lock:
+                loaded.pop(model, None)
+                self.server.prompt_cache.pop(model, None)
+            return 0
+        with self.server.lock:
+            first_time = model not in loaded
+            loaded[model] = time.time() + (keep_alive if isinstance(keep_alive, (int, float)) and keep_alive > 0 else 300)
+        if first_time and self.config.load_latency_ms:
+            time.sleep(self.config.load_latency_ms / 1000)
+            return int(self.config.load_latency_ms * 1e6)
+        return 0
+
+    def _cached_prefix(self, model: str, prompt_text: str) -> int:
+        """
+        Ollama의 KV 캐시 재사용을 흉내 냅니다. 모델의 최근 프롬프트(+응답) 중 가장 길게 일치하는 접두사 길이(글자)를 반환합니다.
+        """
+        if not self.config.prefix_cache_slots:
+            return 0
+        best = 0
+        with self.server.lock:
+            for cached in self.server.prompt_cache.get(model, []):
+                common = 0
+                for a, b in zip(cached, prompt_text):
+                    if a != b:
+                        break
+                    common += 1
+                best = max(best, common)
+        return best
+
+    def _remember_prompt(self, model: str, text: str) -> None:
+        if not self.config.prefix_cache_slots:
+            return
+        with self.server.lock:
+            slots = self.server.prompt_cache.setdefault(model, [])
+            slots.append(text)
+            del slots[:-self.config.prefix_cache_slots]
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-stub"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": [
+                {"name": name, "model": name, "size": self.config.model_sizes.get(name, 0), "digest": hashlib.sha256(name.encode()).hexdigest()}
+                for name in self.config.models
+            ]})
+        elif self.path == "/api/ps":
+            with self.server.lock:
+                loaded = list(self.server.loaded_models.items())
+            self._send_json({"models": [
+                {
+                    "name": name,
+                    "model": name,
+                    "size": self.config.model_sizes.get(name, 0),
+                    "size_vram": 0,
+                    "expires_at": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+                }
+                for name, ts in loaded
+            ]})
+        else:
+            self._send_json({"error": f"not found: {self.path}"}, status=404)
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except ValueError as e:
+            self._send_json({"error": f"invalid json: {e}"}, status=400)
+            return
+
+        with self.server.lock:
+            self.server.request_counts[self.path] = self.server.request_counts.get(self.path, 0) + 1
+            inject_error = self.path in ("/api/embed", "/api/embeddings", "/api/chat", "/api/generate") and self.server.rng.random() < self.config.error_rate
+
+        if inject_error:
+            self._send_json({"error": "stub injected failure"}, status=503)
+            return
+
+        if self.path == "/api/embed":
+            self._handle_embed(request)
+        elif self.path == "/api/embeddings":
+            self._handle_legacy_embeddings(request)
+        elif self.path == "/api/chat":
+            self._handle_generation(request, chat=True)
+        elif self.path == "/api/generate":
+            self._handle_generation(request, chat=False)
+        elif self.path == "/api/show":
+            self._send_json({
+                "details": {"family": "stub", "parameter_size": "0B"},
+                "model_info": {"stub.embedding_length": self.config.dimension},
+            })
+        else:
+            self._send_json({"error": f"not found: {self.path}"}, status=404)
+
+    def _handle_embed(self, request: dict) -> None:
+        started = time.perf_counter_ns()
+        model = request.get("model", "")
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        load_ns = self._load_model(model, request.get("keep_alive"))
+        time.sleep((self.config.embed_latency_ms + self.config.embed_per_item_ms * len(inputs)) / 1000)
+        embeddings = [deterministic_vector(text, self.config.dimension) for text in inputs]
+        self._send_json({
+            "model": model,
+            "embeddings": embeddings,
+            "total_duration": time.perf_counter_ns() - started,
+            "load_duration": load_ns,
+            "prompt_eval_count": sum(estimate_tokens(text) for text in inputs),
+        })
+
+    def _handle_legacy_embeddings(self, request: dict) -> None:
+        self._load_model(request.get("model", ""))
+        time.sleep((self.config.embed_latency_ms + self.config.embed_per_item_ms) / 1000)
+        self._send_json({"embedding": deterministic_vector(request.get("prompt", ""), self.config.dimension)})
+
+    def _handle_generation(self, request: dict, chat: bool) -> None:
+        started = time.perf_counter_ns()
+        model = request.get("model", "")
+        stream = request.get("stream", True)
+        if chat:
+            prompt_text = "".join(str(m.get("content", "")) for m in request.get("messages", []))
+        else:
+            prompt_text = request.get("prompt", "")
+        options = request.get("options") or {}
+        max_tokens = options.get("num_predict")
+        n_tokens = self.config.response_tokens if not max_tokens or max_tokens < 0 else min(max_tokens, self.config.response_tokens)
+
+        # 동시 생성 수를 넘으면 슬롯이 빌 때까지 대기 (대기 시간은 total_duration에 포함)
+        slots = self.server.generation_slots
+        if slots is not None:
+            slots.acquire()
+        try:
+            self._generate(request, chat, model, stream, prompt_text, n_tokens, started)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def _generate(self, request: dict, chat: bool, model: str, stream: bool, prompt_text: str, n_tokens: int, started: int) -> None:
+        load_ns = self._load_model(model, request.get("keep_alive"))
+        # 빈 프롬프트 생성 요청은 Ollama에서 모델 프리로드/언로드 용도로 사용됨
+        if not chat and not prompt_text:
+            n_tokens = 0
+
+        # 캐시된 접두사 뒤의 프롬프트만 평가 (Ollama도 prompt_eval_count에 새로 평가한 토큰만 보고)
+        uncached = prompt_text[self._cached_prefix(model, prompt_text):]
+        prompt_eval_count = estimate_tokens(uncached) if uncached else 0
+        prompt_started = time.perf_counter_ns()
+        time.sleep((self.config.prompt_latency_ms + self.config.prompt_token_latency_ms * prompt_eval_count) / 1000)
+        prompt_eval_ns = time.perf_counter_ns() - prompt_started
+
+        digest = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+        tokens = [f"tok{digest[i % len(digest)]}{i} " for i in range(n_tokens)]
+
+        def piece(content: str, done: bool) -> dict:
+            payload = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+            if chat:
+                payload["message"] = {"role": "assistant", "content": content}
+            else:
+                payload["response"] = content
+            return payload
+
+        eval_started = time.perf_counter_ns()
+        if stream:
+            self._start_stream()
+            for token in tokens:
+                time.sleep(self.config.token_latency_ms / 1000)
+                self._write_chunk(piece(token, False))
+        else:
+            time.sleep(self.config.token_latency_ms * n_tokens / 1000)
+        eval_ns = time.perf_counter_ns() - eval_started
+        self._remember_prompt(model, prompt_text + "".join(tokens))
+
+        final = piece("" if stream else "".join(tokens), True)
+        final.update({
+            "done_reason": "stop",
+            "total_duration": time.perf_counter_ns() - started,
+            "load_duration": load_ns,
+            "prompt_eval_count": prompt_eval_count,
+            "prompt_eval_duration": prompt_eval_ns,
+            "eval_count": n_tokens,
+            "eval_duration": eval_ns,
+        })
+        if stream:
+            self._write_chunk(final)
+            self._end_stream()
+        else:
+            self._send_json(final)
+
+
+class StubOllamaServer:
+    """
+    백그라운드 스레드에서 실행되는 Ollama 호환 스텁 서버
+
+    with 문으로 사용하면 시작/종료가 자동으로 처리됩니다.
+
+    Args:
+        host (str): 바인딩할 호스트
+        port (int): 바인딩할 포트 (0이면 임의의 빈 포트)
+        config (StubConfig): 스텁 동작 설정
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[StubConfig] = None):
+        self.config = config or StubConfig()
+        self._server = ThreadingHTTPServer((host, port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub_config = self.config
+        self._server.lock = threading.Lock()
+        self._server.loaded_models = {}
+        self._server.prompt_cache = {}
+        self._server.generation_slots = threading.Semaphore(self.config.num_parallel) if self.config.num_parallel else None
+        self._server.request_counts = {}
+        self._server.rng = random.Random(0)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_counts(self) -> dict:
+        with self._server.lock:
+            return dict(self._server.request_counts)
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ollama-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama API 호환 스텁 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dimension", type=int, default=768, help="임베딩 차원")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="임베딩 요청당 지연 시간")
+    parser.add_argument("--embed-per-item-ms", type=float, default=0.0, help="임베딩 입력 하나당 지연 시간")
+    parser.add_argument("--prompt-latency-ms", type=float, default=0.0, help="첫 토큰까지의 지연 시간")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="생성 토큰당 지연 시간")
+    parser.add_argument("--response-tokens", type=int, default=32, help="채팅 응답 토큰 수")
+    parser.add_argument("--load-latency-ms", type=float, default=0.0, help="모델 첫 로드 지연 시간")
+    parser.add_argument("--prompt-token-latency-ms", type=float, default=0.0, help="캐시되지 않은 프롬프트 토큰당 지연 시간")
+    parser.add_argument("--prefix-cache-slots", type=int, default=0, help="모델별 접두사 캐시 슬롯 수 (0이면 사용 안 함)")
+    parser.add_argument("--num-parallel", type=int, default=0, help="동시 생성 수 (0이면 무제한)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="임베딩/생성 요청을 503으로 실패시킬 비율")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        dimension=args.dimension,
+        embed_latency_ms=args.embed_latency_ms,
+        embed_per_item_ms=args.embed_per_item_ms,
+        prompt_latency_ms=args.prompt_latency_ms,
+        token_latency_ms=args.token_latency_ms,
+        response_tokens=args.response_tokens,
+        load_latency_ms=args.load_latency_ms,
+        prompt_token_latency_ms=args.prompt_token_latency_ms,
+        prefix_cache_slots=args.prefix_cache_slots,
+        num_parallel=args.num_parallel,
+        error_rate=args.error_rate,
+    )
+    server = StubOllamaServer(args.host, args.port, config)
+    print(f"Ollama 스텁 서버 실행 중: {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()